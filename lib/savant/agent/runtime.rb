@@ -233,6 +233,8 @@ module Savant
             # ignore
           end
           action, usage, model = decide_and_parse(prompt: prompt, model: model, allowed_tools: base_tools, step: steps, dry_run: dry_run)
+          # Searches the worker ran itself took steps..steps+n-1; this decision follows them
+          steps += action.delete('local_steps').to_i
           # Re-check cancellation after potentially long LLM call
           if @cancel_key && Savant::Agent::Cancel.signal?(@cancel_key)
             final_text = 'Canceled by user'
@@ -421,6 +423,22 @@ module Savant
         File.file?(path)
       end
 
+      # Searches the worker already ran itself (REASONING_LOCAL_SEARCH) go into memory like our own tool calls,
+      # so the next payload's history includes them. Each takes its own step index, starting at `step`;
+      # returns how many were recorded so the caller can move its step counter past them.
+      def record_local_steps(intent, step)
+        local = Array(intent.local_steps)
+        local.each_with_index do |s, i|
+          action = JSON.parse(JSON.generate(s[:action] || {}))
+          @memory.append_step(index: step.to_i + i, action: action, output: s[:output], note: 'worker_local_search')
+        end
+        @memory.snapshot! if local.any?
+        local.size
+      rescue StandardError => e
+        @logger.warn(event: 'local_steps_record_failed', error: e.message)
+        0
+      end
+
       def decide_and_parse(_prompt: nil, model: nil, _allowed_tools: [], step: nil, dry_run: false)
         usage = { prompt_tokens: nil, output_tokens: nil }
         # In dry-run, do not hit external services; finish immediately
@@ -441,6 +459,7 @@ module Savant
         # Call Reasoning Worker via Redis
         begin
           intent = reasoning_client.agent_intent(payload)
+          local_count = record_local_steps(intent, step)
 
           dur_ms = ((Process.clock_gettime(Process::CLOCK_MONOTONIC) - started) * 1000.0).round
 
@@ -450,7 +469,8 @@ module Savant
             'tool_name' => intent.tool_name.to_s,
             'args' => intent.tool_args || {},
             'final' => intent.final_text || '',
-            'reasoning' => intent.reasoning || ''
+            'reasoning' => intent.reasoning || '',
+            'local_steps' => local_count
           }
 
           @logger.info(
@@ -756,24 +756,19 @@ module Savant
           return generate_demo_positions(run)
         end
 
-        positions = []
         members = session_agents_for_run(run)
-
-        # In a real implementation, these would run in parallel
-        members.each do |agent_name|
+        payloads = members.to_h do |agent_name|
           prompt = build_agent_position_prompt(run, agent_name)
-          begin
-            result = with_retries("positions:#{agent_name}") do
-              payload = build_agent_payload(goal_text: prompt, agent_name: agent_name, session_id: run[:session_id])
-              client.agent_intent(payload)
-            end
-            positions << { agent: agent_name, position: parse_agent_response(result, agent_name) }
-          rescue StandardError => e
-            positions << { agent: agent_name, position: skipped_agent_payload(agent_name, e) }
-          end
+          [agent_name, build_agent_payload(goal_text: prompt, agent_name: agent_name, session_id: run[:session_id])]
         end
 
-        positions
+        agent_intents_for_round(client, 'positions', payloads).map do |agent_name, result|
+          if result.is_a?(StandardError)
+            { agent: agent_name, position: skipped_agent_payload(agent_name, result) }
+          else
+            { agent: agent_name, position: parse_agent_response(result, agent_name) }
+          end
+        end
       end
 
       # Generate demo positions without calling the reasoning API
@@ -823,9 +818,8 @@ module Savant
           "Round #{round[:round] || round['round']}:\n#{JSON.generate(items)}"
         end.join("\n\n")
 
-        items = []
         members = session_agents_for_run(run)
-        members.each do |agent_name|
+        payloads = members.to_h do |agent_name|
           debate_prompt = <<~PROMPT
             This is debate round #{round_number} of a maximum of 3. Review the positions from all council members and respond.
 
@@ -845,14 +839,14 @@ module Savant
             Keep it concise. This process repeats for up to 3 rounds total.
           PROMPT
 
-          begin
-            result = with_retries("debate:#{round_number}:#{agent_name}") do
-              payload = build_agent_payload(goal_text: debate_prompt, agent_name: agent_name, session_id: run[:session_id])
-              client.agent_intent(payload)
-            end
-            items << { agent: agent_name, text: (result.final_text || result.reasoning || '').to_s }
-          rescue StandardError => e
-            items << { agent: agent_name, text: skipped_agent_payload(agent_name, e) }
+          [agent_name, build_agent_payload(goal_text: debate_prompt, agent_name: agent_name, session_id: run[:session_id])]
+        end
+
+        items = agent_intents_for_round(client, "debate:#{round_number}", payloads).map do |agent_name, result|
+          if result.is_a?(StandardError)
+            { agent: agent_name, text: skipped_agent_payload(agent_name, result) }
+          else
+            { agent: agent_name, text: (result.final_text || result.reasoning || '').to_s }
           end
         end
 
@@ -1006,6 +1000,46 @@ module Savant
         end
       end
 
+      # Run one round's agent intents as a single fan-out job so they finish together.
+      # Agents whose batch item failed (or every agent, if the batch itself fails) are
+      # retried one by one. Returns { agent_name => Intent or StandardError } in member order.
+      def agent_intents_for_round(client, label, payloads)
+        batched = {}
+        if payloads.size > 1 && client.respond_to?(:agent_intent_batch)
+          begin
+            shared, items = split_shared_fields(payloads.values)
+            results = client.agent_intent_batch(items, shared: shared)
+            payloads.keys.each_with_index do |agent_name, i|
+              batched[agent_name] = results[i] unless results[i].is_a?(StandardError)
+            end
+          rescue StandardError
+            batched = {}
+          end
+        end
+
+        payloads.to_h do |agent_name, payload|
+          result = batched[agent_name] || begin
+            with_retries("#{label}:#{agent_name}") { client.agent_intent(payload) }
+          rescue StandardError => e
+            e
+          end
+          [agent_name, result]
+        end
+      end
+
+      # Top-level fields equal in every payload (session, llm, a common persona/driver/rules)
+      # go into the batch's `shared` section once; each item keeps only what differs.
+      # The worker merges `shared` under each item, so the merged payloads are unchanged.
+      def split_shared_fields(payloads)
+        first = payloads.first || {}
+        common_keys = first.keys.select do |key|
+          payloads.all? { |p| p.key?(key) && p[key] == first[key] }
+        end
+        shared = first.slice(*common_keys)
+        items = payloads.map { |p| p.reject { |key, _| common_keys.include?(key) } }
+        [shared, items]
+      end
+
       # Build prompt for initial position
       def build_position_prompt(run, role)
         context = run[:context] || {}
@@ -11,7 +11,7 @@ require_relative '../framework/engine/runtime_context'
 module Savant
   module Reasoning
     Intent = Struct.new(
-      :intent_id, :tool_name, :tool_args, :finish, :final_text, :next_node, :action_type, :reasoning, :trace,
+      :intent_id, :tool_name, :tool_args, :finish, :final_text, :next_node, :action_type, :reasoning, :trace, :local_steps,
       keyword_init: true
     )
 
@@ -51,15 +51,7 @@ module Savant
                      final_text: res[:final_text],
                      intent_id: res[:intent_id])
         validate_agent_response!(res)
-        Intent.new(
-          intent_id: res[:intent_id],
-          tool_name: res[:tool_name],
-          tool_args: res[:tool_args] || {},
-          finish: !!res[:finish],
-          final_text: res[:final_text],
-          reasoning: res[:reasoning],
-          trace: res[:trace]
-        )
+        intent_from(res)
       end
 
       def workflow_intent(_payload)
@@ -91,6 +83,63 @@ module Savant
         }
       end
 
+      # Fan-out batch: one queue job for many intents, run in parallel by the worker.
+      # `items` is an array of payload hashes; `shared` is merged under each of them
+      # (persona/driver/llm/etc. sent once). Returns an array in item order where each
+      # element is an Intent or the StandardError for that item.
+      def agent_intent_batch(items, shared: {})
+        redis = redis_client
+        raise StandardError, 'reasoning_redis_unavailable' unless redis
+        return [] if items.nil? || items.empty?
+
+        started = Time.now
+        job_id = "batch-#{Time.now.to_i}-#{rand(100_000)}"
+        item_ids = items.each_index.map { |i| "item-#{i}" }
+        job = {
+          job_id: job_id,
+          type: 'batch',
+          payload: {
+            shared: symbolize_json(shared || {}),
+            items: items.each_with_index.map { |p, i| { item_id: item_ids[i], payload: symbolize_json(p) } },
+            mode: 'stream'
+          },
+          created_at: Time.now.utc.iso8601
+        }
+        redis.rpush('savant:queue:reasoning', JSON.generate(job))
+
+        # Items arrive in completion order on a list; wait for all of them under one deadline.
+        results = {}
+        deadline = Time.now + (@timeout_ms.to_f / 1000.0)
+        items_key = "savant:result:#{job_id}:items"
+        while results.size < item_ids.size
+          remaining = (deadline - Time.now).ceil
+          break if remaining <= 0
+
+          res = redis.blpop(items_key, timeout: remaining)
+          break unless res
+
+          doc = JSON.parse(res[1], symbolize_names: true)
+          results[doc[:item_id].to_s] = doc
+        end
+
+        out = item_ids.map do |item_id|
+          doc = results[item_id]
+          next StandardError.new('timeout') unless doc
+          next StandardError.new(doc[:error] || 'unknown_worker_error') unless doc[:status] == 'ok'
+
+          begin
+            validate_agent_response!(doc)
+            intent_from(doc)
+          rescue StandardError => e
+            e
+          end
+        end
+
+        @logger.info(event: 'agent_intent_batch', duration_ms: ((Time.now - started) * 1000).to_i, items: item_ids.size,
+                     failed: out.count { |r| r.is_a?(StandardError) })
+        out
+      end
+
       def agent_intent_async_wait(*_args, **_kwargs)
         # Not supported in new redis-only architecture without status polling API from Rails.
         # For MVP, assume caller uses sync agent_intent if they want to wait.
@@ -161,6 +210,19 @@ module Savant
         result
       end
 
+      def intent_from(res)
+        Intent.new(
+          intent_id: res[:intent_id],
+          tool_name: res[:tool_name],
+          tool_args: res[:tool_args] || {},
+          finish: !!res[:finish],
+          final_text: res[:final_text],
+          reasoning: res[:reasoning],
+          trace: res[:trace],
+          local_steps: res[:local_steps] || []
+        )
+      end
+
       public
 
       def cancel(_correlation_id: nil)
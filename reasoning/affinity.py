@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Model-affinity routing and the worker capability registry.
+
+Every worker publishes `{models, load, concurrency, ts}` into the
+`savant:workers:registry` hash (field = worker_id). With affinity enabled,
+local-model jobs are steered onto per-model lanes
+(`savant:queue:reasoning:model:{provider}:{model}`):
+
+  - a worker BLPOPs its warm-model lanes before the shared queue, so BLPOP's
+    key order gives it a preference for models it already has loaded;
+  - a job taken from the shared queue whose model is warm on another live,
+    non-saturated worker is pushed onto that model's lane instead of forcing
+    a model swap here;
+  - an idle worker steals from the longest non-empty lane so lanes never
+    strand jobs when their warm worker is busy or gone.
+
+Lane names are kept in the set `savant:queue:reasoning:lanes`, added by
+`push_to_lane` whenever a job is routed. Stealing (and
+scripts/reasoning_queue_status.py) reads that set instead of scanning the
+keyspace. Entries are never removed: there is one per local model ever
+routed, and dropping an empty lane could race a concurrent push.
+
+Sync and async workers both publish and both serve lanes (the async worker
+uses the `*_async` methods). A job is only routed to a peer whose registry
+entry says `affinity: true`: workers without affinity never BLPOP lanes, so
+routing to them would leave the job waiting for a steal.
+
+Env:
+  - REASONING_MODEL_AFFINITY=1 enables routing (registry is always published)
+  - REASONING_WARM_TTL_S (default 300, Ollama's default keep_alive)
+  - REASONING_WARM_MODELS (default 2): models tracked as warm per worker
+"""
+
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from reasoning.batching import batch_key
+
+REGISTRY_KEY = 'savant:workers:registry'
+LANE_PREFIX = 'savant:queue:reasoning:model:'
+LANES_KEY = 'savant:queue:reasoning:lanes'
+REGISTRY_STALE_S = 30.0
+
+AFFINITY_ENABLED = os.environ.get('REASONING_MODEL_AFFINITY', '0') not in ('0', '', 'false', 'False')
+WARM_TTL_S = float(os.environ.get('REASONING_WARM_TTL_S', '300'))
+WARM_MODELS = int(os.environ.get('REASONING_WARM_MODELS', '2'))
+
+# Remote providers never swap models locally, so they are never routed.
+LOCAL_PROVIDERS = {'ollama', ''}
+
+
+def lane_key(provider: str, model: str) -> str:
+    return f"{LANE_PREFIX}{provider}:{model}"
+
+
+def model_id(provider: str, model: str) -> str:
+    return f"{provider}:{model}"
+
+
+def _live_entries(raw: Dict[str, str], now: float) -> Dict[str, Dict[str, Any]]:
+    out = {}
+    for worker_id, doc in raw.items():
+        try:
+            info = json.loads(doc)
+        except Exception:
+            continue
+        if now - float(info.get('ts') or 0) > REGISTRY_STALE_S:
+            continue
+        out[worker_id] = info
+    return out
+
+
+def read_registry(r, now: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    """Live registry entries keyed by worker_id (stale entries are skipped)."""
+    now = now or time.time()
+    try:
+        raw = r.hgetall(REGISTRY_KEY) or {}
+    except Exception:
+        return {}
+    return _live_entries(raw, now)
+
+
+async def read_registry_async(r, now: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+    now = now or time.time()
+    try:
+        raw = await r.hgetall(REGISTRY_KEY) or {}
+    except Exception:
+        return {}
+    return _live_entries(raw, now)
+
+
+class AffinityRouter:
+    """Per-worker warm-model tracking plus lane selection/routing decisions."""
+
+    def __init__(self, worker_id: str, queue_key: str, enabled: bool = AFFINITY_ENABLED,
+                 warm_ttl_s: float = WARM_TTL_S, max_warm: int = WARM_MODELS, concurrency: int = 1):
+        self.worker_id = worker_id
+        self.queue_key = queue_key
+        self.enabled = enabled
+        self.warm_ttl_s = warm_ttl_s
+        self.max_warm = max(1, max_warm)
+        self.concurrency = concurrency
+        self.warm: "OrderedDict[str, float]" = OrderedDict()
+        self._registry_cache: Tuple[float, Dict[str, Dict[str, Any]]] = (0.0, {})
+
+    # --- warm set ---
+
+    def note_model(self, provider: str, model: str, now: Optional[float] = None) -> None:
+        if provider not in LOCAL_PROVIDERS:
+            return
+        mid = model_id(provider, model)
+        self.warm.pop(mid, None)
+        self.warm[mid] = now or time.time()
+        while len(self.warm) > self.max_warm:
+            self.warm.popitem(last=False)
+
+    def warm_models(self, now: Optional[float] = None) -> List[str]:
+        now = now or time.time()
+        for mid, ts in list(self.warm.items()):
+            if now - ts > self.warm_ttl_s:
+                del self.warm[mid]
+        # Most recently used first
+        return list(reversed(self.warm.keys()))
+
+    # --- registry ---
+
+    def _doc(self, load: int) -> str:
+        return json.dumps({
+            'models': self.warm_models(),
+            'load': int(load),
+            'concurrency': int(self.concurrency),
+            'affinity': self.enabled,
+            'ts': time.time(),
+        })
+
+    def publish(self, r, load: int = 0) -> None:
+        try:
+            r.hset(REGISTRY_KEY, self.worker_id, self._doc(load))
+        except Exception:
+            pass
+
+    async def publish_async(self, r, load: int = 0) -> None:
+        try:
+            await r.hset(REGISTRY_KEY, self.worker_id, self._doc(load))
+        except Exception:
+            pass
+
+    def unregister(self, r) -> None:
+        try:
+            r.hdel(REGISTRY_KEY, self.worker_id)
+        except Exception:
+            pass
+
+    async def unregister_async(self, r) -> None:
+        try:
+            await r.hdel(REGISTRY_KEY, self.worker_id)
+        except Exception:
+            pass
+
+    def _registry(self, r, max_age_s: float = 1.0) -> Dict[str, Dict[str, Any]]:
+        ts, cached = self._registry_cache
+        now = time.time()
+        if now - ts > max_age_s:
+            cached = read_registry(r, now)
+            self._registry_cache = (now, cached)
+        return cached
+
+    async def _registry_async(self, r, max_age_s: float = 1.0) -> Dict[str, Dict[str, Any]]:
+        ts, cached = self._registry_cache
+        now = time.time()
+        if now - ts > max_age_s:
+            cached = await read_registry_async(r, now)
+            self._registry_cache = (now, cached)
+        return cached
+
+    # --- queue selection ---
+
+    def pop_keys(self) -> List[str]:
+        """BLPOP key order: warm lanes first, then the shared queue."""
+        if not self.enabled:
+            return [self.queue_key]
+        keys = []
+        for mid in self.warm_models():
+            provider, _, model = mid.partition(':')
+            keys.append(lane_key(provider, model))
+        keys.append(self.queue_key)
+        return keys
+
+    def _routable(self, job: Dict[str, Any]) -> Optional[Tuple[str, str]]:
+        """(provider, model) of a job that may go to a peer's lane, or None to process it here."""
+        if not self.enabled or not isinstance(job, dict):
+            return None
+        provider, model = batch_key(job)
+        if provider not in LOCAL_PROVIDERS or model_id(provider, model) in self.warm_models():
+            return None
+        return provider, model
+
+    def _pick_lane(self, provider: str, model: str, registry: Dict[str, Dict[str, Any]]) -> Optional[str]:
+        mid = model_id(provider, model)
+        for worker_id, info in registry.items():
+            if worker_id == self.worker_id or not info.get('affinity'):
+                continue
+            if mid in (info.get('models') or []) and int(info.get('load') or 0) < int(info.get('concurrency') or 1):
+                return lane_key(provider, model)
+        return None
+
+    def route_target(self, r, job: Dict[str, Any]) -> Optional[str]:
+        """Lane to hand a shared-queue job to, or None to process it here."""
+        target = self._routable(job)
+        return self._pick_lane(*target, self._registry(r)) if target else None
+
+    async def route_target_async(self, r, job: Dict[str, Any]) -> Optional[str]:
+        target = self._routable(job)
+        return self._pick_lane(*target, await self._registry_async(r)) if target else None
+
+    @staticmethod
+    def push_to_lane(r, lane: str, job_json: str) -> None:
+        """Queue a routed job on `lane` and register the lane for stealers."""
+        pipe = r.pipeline(transaction=False)
+        pipe.rpush(lane, job_json)
+        pipe.sadd(LANES_KEY, lane)
+        pipe.execute()
+
+    @staticmethod
+    async def push_to_lane_async(r, lane: str, job_json: str) -> None:
+        pipe = r.pipeline(transaction=False)
+        pipe.rpush(lane, job_json)
+        pipe.sadd(LANES_KEY, lane)
+        await pipe.execute()
+
+    def steal(self, r) -> Optional[Tuple[str, str]]:
+        """Pop one job from the longest non-empty lane: (lane_key, job_json) or None."""
+        if not self.enabled:
+            return None
+        try:
+            lanes = list(r.smembers(LANES_KEY) or ())
+            if not lanes:
+                return None
+            pipe = r.pipeline(transaction=False)
+            for lane in lanes:
+                pipe.llen(lane)
+            lengths = pipe.execute()
+            for length, lane in sorted(zip(lengths, lanes), reverse=True):
+                if not length:
+                    break
+                job_json = r.lpop(lane)
+                if job_json:
+                    return lane, job_json
+        except Exception:
+            return None
+        return None
+
+    async def steal_async(self, r) -> Optional[Tuple[str, str]]:
+        """Async `steal` for redis.asyncio clients."""
+        if not self.enabled:
+            return None
+        try:
+            lanes = list(await r.smembers(LANES_KEY) or ())
+            if not lanes:
+                return None
+            pipe = r.pipeline(transaction=False)
+            for lane in lanes:
+                pipe.llen(lane)
+            lengths = await pipe.execute()
+            for length, lane in sorted(zip(lengths, lanes), reverse=True):
+                if not length:
+                    break
+                job_json = await r.lpop(lane)
+                if job_json:
+                    return lane, job_json
+        except Exception:
+            return None
+        return None
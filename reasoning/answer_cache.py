@@ -0,0 +1,359 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Semantic near-duplicate cache of finished answers.
+
+Goals that differ only in wording ("what does the rate limiter do?",
+"explain the rate limiter") should not each cost an LLM call. When a
+first-step intent (no history) ends with `finish=True` and a real answer,
+the goal is stored with that answer. A later goal in the same scope that
+is similar enough gets the stored `final_text` back without an LLM call.
+
+- Vectors: a signed hashing vectorizer over the normalized goal's content
+  words (phrasing like "what does", "explain" is dropped) and their
+  character trigrams. Dense float32, L2-normalized, so the index
+  is a plain array and a lookup is one matrix-vector product.
+- Scope: repo (as in the search memo) + persona name. Answers never
+  cross scopes.
+- Confidence: the best match must reach THRESHOLD, and both goals must
+  carry the same "exact" tokens (numbers, paths, dotted or snake_case
+  identifiers). "timeout in api.py" never matches "timeout in worker.py".
+  They must also ask the same kind of question: the same question words
+  (how/why/where/when/who) and modals (can/should/will/must/may). "where
+  is the limiter configured" never matches "why is the limiter
+  configured", nor "does the worker retry" "can the worker retry".
+  "what", "which" and imperatives like "explain" all count as plain
+  "what" questions.
+- Persistence: one Redis hash per scope (`savant:answer_cache:{scope}`,
+  field = goal hash) plus a ZSET of write times (`...:{scope}:ts`), TTL
+  refreshed on write. A Lua script writes an entry and trims the oldest
+  past MAX_PER_SCOPE in one step, so Redis holds what the indexes hold
+  and a reload reads at most that many. A process loads a scope on first
+  use and reloads it after REFRESH_S to pick up other workers' answers.
+  Vectors are recomputed locally, so only goals and answers are stored.
+
+Redis access fails open, as in search_memo. The index needs numpy
+(reasoning/requirements.txt); without it the cache stays off.
+
+Env:
+  - REASONING_ANSWER_CACHE=1 enables it for every request (default off;
+    a request can opt in or out with `llm.answer_cache`)
+  - REASONING_ANSWER_CACHE_THRESHOLD (default 0.9): cosine similarity needed for a hit
+  - REASONING_ANSWER_CACHE_MAX (default 512): entries per scope (oldest evicted)
+  - REASONING_ANSWER_CACHE_TTL_S (default 604800, 7 days)
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+from reasoning import fastjson
+
+CACHE_PREFIX = 'savant:answer_cache:'
+CACHE_ENABLED = os.environ.get('REASONING_ANSWER_CACHE', '0') not in ('0', '', 'false', 'False')
+THRESHOLD = float(os.environ.get('REASONING_ANSWER_CACHE_THRESHOLD', '0.9'))
+MAX_PER_SCOPE = int(os.environ.get('REASONING_ANSWER_CACHE_MAX', '512'))
+TTL_S = int(os.environ.get('REASONING_ANSWER_CACHE_TTL_S', str(7 * 24 * 3600)))
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+
+DIM = 1024
+REFRESH_S = 60.0
+RETRY_AFTER_ERROR_S = 30.0
+
+# Phrasing that changes the wording of a question but not what it asks.
+_STOPWORDS = {
+    'a', 'an', 'the', 'to', 'for', 'and', 'or', 'in', 'of', 'on', 'with', 'by', 'from', 'about', 'into', 'at',
+    'is', 'are', 'was', 'were', 'be', 'been', 'do', 'does', 'did', 'can', 'could', 'would', 'should', 'will',
+    'what', 'whats', 'how', 'why', 'which', 'who', 'where', 'when', 'this', 'that', 'these', 'those', 'it', 'its',
+    'me', 'my', 'i', 'we', 'our', 'you', 'your', 'please', 'explain', 'describe', 'tell', 'show', 'give',
+    'summarize', 'summarise', 'overview', 'mean', 'means', 'meaning', 'work', 'works', 'working', 'role', 'purpose',
+    'exactly', 'briefly', 'quick', 'quickly', 'us', 'some', 'there', 'here', 'have', 'has', 'had',
+}
+# Words that change what is asked; kept out of the vectors but required to match (as in `exact_tokens`).
+_QUESTION_WORDS = {
+    'how': 'how', 'why': 'why', 'where': 'where', 'when': 'when', 'who': 'who', 'whom': 'who', 'whose': 'who',
+    'can': 'can', 'could': 'can', 'should': 'should', 'will': 'will', 'would': 'will', 'must': 'must',
+    'may': 'may', 'might': 'may', 'shall': 'should',
+}
+_TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9_./:-]*")
+_EXACT_RE = re.compile(r"\d|[_./:]")
+
+# KEYS: scope hash, its ts ZSET. ARGV: goal id, entry json, ts, max entries, ttl s.
+# Hash fields missing from the ZSET (written before it existed) join it as the oldest.
+_STORE_LUA = """
+redis.call('HSET', KEYS[1], ARGV[1], ARGV[2])
+redis.call('ZADD', KEYS[2], tonumber(ARGV[3]), ARGV[1])
+if redis.call('HLEN', KEYS[1]) > redis.call('ZCARD', KEYS[2]) then
+  for _, field in ipairs(redis.call('HKEYS', KEYS[1])) do
+    if not redis.call('ZSCORE', KEYS[2], field) then
+      redis.call('ZADD', KEYS[2], 0, field)
+    end
+  end
+end
+local excess = redis.call('ZCARD', KEYS[2]) - tonumber(ARGV[4])
+if excess > 0 then
+  local oldest = redis.call('ZRANGE', KEYS[2], 0, excess - 1)
+  redis.call('HDEL', KEYS[1], unpack(oldest))
+  redis.call('ZREM', KEYS[2], unpack(oldest))
+else
+  excess = 0
+end
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[5]))
+redis.call('EXPIRE', KEYS[2], tonumber(ARGV[5]))
+return excess
+"""
+
+_client = None
+_script = None
+_disabled_until = 0.0
+_lock = threading.Lock()
+_scopes: Dict[str, '_ScopeIndex'] = {}
+_STATS = {'lookups': 0, 'hits': 0, 'misses': 0, 'low_confidence': 0, 'stores': 0, 'errors': 0}
+
+
+def available() -> bool:
+    return np is not None
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        import redis
+        _client = redis.Redis.from_url(REDIS_URL, decode_responses=True,
+                                       socket_timeout=0.2, socket_connect_timeout=0.2)
+    return _client
+
+
+def _get_script():
+    global _script
+    client = _get_client()
+    if _script is None:
+        _script = client.register_script(_STORE_LUA)
+    return client, _script
+
+
+def _redis_ok() -> bool:
+    return time.time() >= _disabled_until
+
+
+def _backoff() -> None:
+    global _disabled_until
+    _disabled_until = time.time() + RETRY_AFTER_ERROR_S
+    _bump('errors')
+
+
+def _bump(name: str) -> None:
+    with _lock:
+        _STATS[name] += 1
+
+
+def _stem(tok: str) -> str:
+    # plural only: "breakers" -> "breaker", "caches" -> "cache"; identifiers stay untouched
+    if len(tok) > 3 and tok.isalpha() and tok.endswith('s') and not tok.endswith(('ss', 'us', 'is')):
+        return tok[:-1]
+    return tok
+
+
+def content_tokens(text: str) -> List[str]:
+    toks = []
+    for tok in _TOKEN_RE.findall((text or '').lower()):
+        tok = tok.strip('.:-/')
+        if tok and tok not in _STOPWORDS and (len(tok) > 1 or tok.isdigit()):
+            toks.append(_stem(tok))
+    return toks
+
+
+def exact_tokens(text: str) -> frozenset:
+    """Tokens that must match exactly for two goals to share an answer."""
+    return frozenset(t for t in content_tokens(text) if _EXACT_RE.search(t))
+
+
+def question_kind(text: str) -> frozenset:
+    """Question words and modals of `text`, normalized; two goals share an answer only when these match."""
+    return frozenset(_QUESTION_WORDS[w] for w in re.findall(r"[a-z]+", (text or '').lower()) if w in _QUESTION_WORDS)
+
+
+def _feature(name: str) -> Tuple[int, float]:
+    h = zlib.crc32(name.encode('utf-8'))
+    return h % DIM, (1.0 if (h >> 16) & 1 else -1.0)
+
+
+def vectorize(text: str):
+    """L2-normalized hashed vector of `text` (None when it has no content words)."""
+    toks = content_tokens(text)
+    if not toks or np is None:
+        return None
+    vec = np.zeros(DIM, dtype=np.float32)
+    for tok in set(toks):
+        idx, sign = _feature('w:' + tok)
+        vec[idx] += sign
+        padded = f" {tok} "
+        grams = [padded[i:i + 3] for i in range(len(padded) - 2)]
+        for gram in grams:
+            idx, sign = _feature('c:' + gram)
+            vec[idx] += sign * (1.5 / len(grams))
+    norm = float(np.linalg.norm(vec))
+    return vec / norm if norm else None
+
+
+def scope_key(repo: str, persona: str) -> str:
+    digest = hashlib.sha1(f"{repo}\x00{persona}".encode('utf-8')).hexdigest()[:16]
+    return f"{CACHE_PREFIX}{digest}"
+
+
+def ts_key(key: str) -> str:
+    return f"{key}:ts"
+
+
+def _goal_id(goal: str) -> str:
+    key = ' '.join(content_tokens(goal)) + '\x00' + ' '.join(sorted(question_kind(goal)))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+
+class _ScopeIndex:
+    """Fixed-capacity array of goal vectors plus their cached answers (oldest evicted first)."""
+
+    def __init__(self, capacity: int = MAX_PER_SCOPE):
+        self.capacity = capacity
+        self.vectors = np.zeros((0, DIM), dtype=np.float32)
+        self.entries: List[Dict[str, Any]] = []
+        self.ids: Dict[str, int] = {}
+        self.loaded_at = 0.0
+
+    def add(self, entry: Dict[str, Any]) -> None:
+        vec = vectorize(entry['goal'])
+        if vec is None:
+            return
+        gid = entry.get('id') or _goal_id(entry['goal'])
+        if gid in self.ids:
+            i = self.ids[gid]
+            self.entries[i] = entry
+            self.vectors[i] = vec
+            return
+        if len(self.entries) >= self.capacity:
+            oldest = min(range(len(self.entries)), key=lambda i: self.entries[i].get('ts') or 0)
+            self.ids.pop(self.entries[oldest].get('id'), None)
+            self.entries[oldest] = entry
+            self.vectors[oldest] = vec
+            self.ids[gid] = oldest
+            return
+        self.ids[gid] = len(self.entries)
+        self.entries.append(entry)
+        self.vectors = np.vstack([self.vectors, vec[None, :]])
+
+    def candidates(self, vec, threshold: float) -> List[Tuple[Dict[str, Any], float]]:
+        """Entries at or above `threshold`, most similar first."""
+        if not self.entries:
+            return []
+        sims = self.vectors @ vec
+        order = np.argsort(-sims)
+        return [(self.entries[int(i)], float(sims[i])) for i in order if sims[i] >= threshold]
+
+
+def _load_scope(key: str, r=None, now: Optional[float] = None) -> '_ScopeIndex':
+    now = now or time.time()
+    with _lock:
+        index = _scopes.get(key)
+    if index is not None and now - index.loaded_at < REFRESH_S:
+        return index
+    if index is None:
+        index = _ScopeIndex()
+    index.loaded_at = now
+    entries = []
+    if _redis_ok():
+        try:
+            for raw in (r or _get_client()).hgetall(key).values():
+                try:
+                    entry = fastjson.loads(raw)
+                except ValueError:
+                    continue
+                if isinstance(entry, dict) and entry.get('goal') and entry.get('final_text'):
+                    entries.append(entry)
+        except Exception:
+            _backoff()
+    with _lock:
+        for entry in sorted(entries, key=lambda e: e.get('ts') or 0):
+            index.add(entry)
+        _scopes[key] = index
+    return index
+
+
+def lookup(repo: str, persona: str, goal: str, r=None, threshold: Optional[float] = None,
+           now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """Cached answer for a near-duplicate goal: {final_text, reasoning, goal, similarity}, else None."""
+    if np is None:
+        return None
+    vec = vectorize(goal)
+    if vec is None:
+        return None
+    _bump('lookups')
+    index = _load_scope(scope_key(repo, persona), r=r, now=now)
+    with _lock:
+        found = index.candidates(vec, THRESHOLD if threshold is None else threshold)
+    if not found:
+        _bump('misses')
+        return None
+    exact, kind = exact_tokens(goal), question_kind(goal)
+    match = next(((e, sim) for e, sim in found
+                  if exact_tokens(e['goal']) == exact and question_kind(e['goal']) == kind), None)
+    if match is None:
+        _bump('low_confidence')
+        return None
+    entry, sim = match
+    _bump('hits')
+    return {'final_text': entry['final_text'], 'reasoning': entry.get('reasoning') or '',
+            'goal': entry['goal'], 'similarity': round(sim, 4)}
+
+
+def store(repo: str, persona: str, goal: str, final_text: str, reasoning: str = '', r=None,
+          now: Optional[float] = None) -> bool:
+    """Remember a finished answer for `goal`; returns False when nothing was stored."""
+    if np is None or not final_text or vectorize(goal) is None:
+        return False
+    now = now or time.time()
+    key = scope_key(repo, persona)
+    entry = {'id': _goal_id(goal), 'goal': goal, 'final_text': final_text, 'reasoning': reasoning or '', 'ts': now}
+    index = _load_scope(key, r=r, now=now)
+    with _lock:
+        index.add(entry)
+    _bump('stores')
+    if _redis_ok():
+        try:
+            if r is None:
+                r, script = _get_script()
+            else:
+                script = r.register_script(_STORE_LUA)
+            script(keys=[key, ts_key(key)], args=[entry['id'], fastjson.dumps(entry), now, MAX_PER_SCOPE, TTL_S],
+                   client=r)
+        except Exception:
+            _backoff()
+    return True
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        out = dict(_STATS)
+        out['scopes'] = len(_scopes)
+        out['entries'] = sum(len(index.entries) for index in _scopes.values())
+    out['hit_rate'] = round(out['hits'] / out['lookups'], 4) if out['lookups'] else 0.0
+    return out
+
+
+def reset() -> None:
+    """Drop the in-memory indexes (they reload from Redis on next use) and the Redis backoff."""
+    global _client, _script, _disabled_until
+    with _lock:
+        _scopes.clear()
+    _client = None
+    _script = None
+    _disabled_until = 0.0
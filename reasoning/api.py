@@ -5,11 +5,66 @@ import os
 from datetime import datetime
 import requests
 import json
+import random
+import re
 import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from reasoning import answer_cache
+from reasoning import circuit
+from reasoning import fastjson
+from reasoning import hedging
+from reasoning import logstore
+from reasoning import ratelimit
+from reasoning import replay
+from reasoning import search_loop
+from reasoning import search_memo
+from reasoning import tokens
+from reasoning import tool_index
 
 # --- Logging ---
 _REASONING_LOG_STDOUT = os.environ.get('REASONING_LOG_STDOUT', '1') not in ('0', '', 'false', 'False')
 _REASONING_LOG_FILE = os.environ.get('REASONING_LOG_FILE')  # e.g., 'logs/reasoning.log'
+_REASONING_LOG_DIR = os.environ.get('REASONING_LOG_DIR')  # segmented, indexed store (see reasoning/logstore.py)
+# Fraction of routine events written (REASONING_LOG_SAMPLE, adjustable live via reasoning/control.py);
+# events whose name mentions an error or failure are always kept.
+_LOG_SAMPLE_RATE = float(os.environ.get('REASONING_LOG_SAMPLE', '1'))
+_log_store = None
+_log_store_lock = threading.Lock()
+
+# session_id/correlation_id of the intent being computed; merged into every event.
+_LOG_CONTEXT: ContextVar[Dict[str, Any]] = ContextVar('reasoning_log_context', default={})
+
+# --- Providers ---
+# Overridable so load tests can point the worker at a local fake server.
+_GOOGLE_API_BASE_URL = os.environ.get('GOOGLE_API_BASE_URL', 'https://generativelanguage.googleapis.com').rstrip('/')
+
+def _get_log_store():
+    global _log_store
+    if _log_store is None:
+        with _log_store_lock:
+            if _log_store is None:
+                _log_store = logstore.LogStore(
+                    _REASONING_LOG_DIR,
+                    segment_max_bytes=int(float(os.environ.get('REASONING_LOG_SEGMENT_MB', '64')) * (1 << 20)),
+                    segment_max_age_s=float(os.environ.get('REASONING_LOG_SEGMENT_S', '3600')),
+                    block_records=int(os.environ.get('REASONING_LOG_BLOCK_RECORDS', '256')),
+                    flush_interval_s=float(os.environ.get('REASONING_LOG_FLUSH_S', '2')),
+                    retention_days=float(os.environ.get('REASONING_LOG_RETENTION_DAYS', '7')),
+                    retention_max_bytes=int(float(os.environ.get('REASONING_LOG_RETENTION_MB', '2048')) * (1 << 20)),
+                )
+    return _log_store
+
+
+@contextmanager
+def _log_context(**fields):
+    token = _LOG_CONTEXT.set({**_LOG_CONTEXT.get(), **{k: v for k, v in fields.items() if v}})
+    try:
+        yield
+    finally:
+        _LOG_CONTEXT.reset(token)
+
 
 def _write_local_log(doc: Dict[str, Any]):
     try:
@@ -17,7 +72,7 @@ def _write_local_log(doc: Dict[str, Any]):
         ts = line_doc.get('timestamp')
         if isinstance(ts, datetime):
             line_doc['timestamp'] = ts.isoformat() + 'Z'
-        line = json.dumps(line_doc, default=str)
+        line = fastjson.dumps(line_doc, default=str)
         # Always mirror to stdout for visibility
         print(line, flush=True)
         if _REASONING_LOG_FILE:
@@ -27,16 +82,27 @@ def _write_local_log(doc: Dict[str, Any]):
                 pass
             with open(_REASONING_LOG_FILE, 'a', encoding='utf-8') as f:
                 f.write(line + "\n")
+        if _REASONING_LOG_DIR:
+            _get_log_store().append(line_doc, line)
     except Exception:
         pass
 
+def _log_sampled_out(event: str) -> bool:
+    if _LOG_SAMPLE_RATE >= 1.0 or 'error' in event or 'fail' in event:
+        return False
+    return random.random() >= _LOG_SAMPLE_RATE
+
+
 def log_event(event: str, **kwargs):
+    if _log_sampled_out(event):
+        return
     doc = {
         'service': 'reasoning',
         'mcp': 'reasoning',
         'event': event,
         'timestamp': datetime.utcnow(),
     }
+    doc.update(_LOG_CONTEXT.get())
     doc.update(kwargs or {})
     # Only local logging (Redis/File based architecture)
     _write_local_log(doc)
@@ -108,18 +174,59 @@ def _extract_search_history(history: Optional[List[Dict[str, Any]]]):
     return searches, pairs, tried_queries, tried_tools
 
 
+_QUERY_STOPWORDS = {
+    'the', 'a', 'an', 'to', 'for', 'and', 'or', 'in', 'of', 'on', 'with', 'by', 'from', 'about', 'into', 'over',
+    'how', 'what', 'where', 'when', 'why', 'which', 'who', 'whom', 'whose',
+    'find', 'search', 'look', 'lookup', 'locate', 'show', 'give', 'me', 'all', 'any', 'some', 'is', 'are', 'was', 'were',
+    'repo', 'project', 'code', 'file', 'files', 'docs', 'documentation'
+}
+
+# Candidates above this similarity to a query already tried with the same tool are skipped.
+_QUERY_SIM_THRESHOLD = float(os.environ.get('REASONING_QUERY_SIM_THRESHOLD', '0.8'))
+
+
 def _keywords_variant(text: str) -> str:
     """Generate a simple keyword-only variant of a query by removing common stopwords."""
-    stop = {
-        'the', 'a', 'an', 'to', 'for', 'and', 'or', 'in', 'of', 'on', 'with', 'by', 'from', 'about', 'into', 'over',
-        'how', 'what', 'where', 'when', 'why', 'which', 'who', 'whom', 'whose',
-        'find', 'search', 'look', 'lookup', 'locate', 'show', 'give', 'me', 'all', 'any', 'some', 'is', 'are', 'was', 'were',
-        'repo', 'project', 'code', 'file', 'files', 'docs', 'documentation'
-    }
-    toks = [t for t in _normalize_query(text).split() if t not in stop]
+    toks = [t for t in _normalize_query(text).split() if t not in _QUERY_STOPWORDS]
     # Keep top 8 tokens for brevity
     return ' '.join(toks[:8]) if toks else _normalize_query(text)
 
+
+def _query_tokens(text: str) -> List[str]:
+    toks = [t for t in _normalize_query(text).split() if t not in _QUERY_STOPWORDS]
+    return sorted(set(toks))
+
+
+def _token_match(a: str, b: str) -> bool:
+    if a == b:
+        return True
+    # "auth" ~ "authentication", "middleware" ~ "middlewares"
+    short, long_ = (a, b) if len(a) <= len(b) else (b, a)
+    return len(short) >= 4 and long_.startswith(short)
+
+
+def _shingles(text: str, n: int = 3) -> set:
+    text = f" {text} "
+    return {text[i:i + n] for i in range(max(1, len(text) - n + 1))}
+
+
+def _query_similarity(a: str, b: str) -> float:
+    """Similarity in [0, 1]: max of soft token-set overlap and char-shingle Jaccard."""
+    ta, tb = _query_tokens(a), _query_tokens(b)
+    if not ta or not tb:
+        return 1.0 if _normalize_query(a) == _normalize_query(b) else 0.0
+    matched = sum(1 for x in ta if any(_token_match(x, y) for y in tb)) \
+        + sum(1 for y in tb if any(_token_match(y, x) for x in ta))
+    token_sim = matched / float(len(ta) + len(tb))
+    sa, sb = _shingles(' '.join(ta)), _shingles(' '.join(tb))
+    shingle_sim = len(sa & sb) / float(len(sa | sb))
+    return max(token_sim, shingle_sim)
+
+
+def _max_similarity(query: str, others) -> float:
+    return max((_query_similarity(query, o) for o in others), default=0.0)
+
+
 def _filter_search_tools(tools: Optional[List[str]]) -> Optional[List[str]]:
     if tools is None:
         return None
@@ -198,15 +305,17 @@ def _history_context_with_weights(history: Optional[List[Dict[str, Any]]]) -> st
 def _candidate_search_tools(goal_text: str, preferred: Optional[str] = None, available_tools: Optional[List[str]] = None) -> List[str]:
     goal = _normalize_query(goal_text)
     tools = []
-    if preferred:
-        tools.append(preferred)
     if available_tools is not None:
-        # If explicitly provided, only consider allowed tools.
+        # If explicitly provided, only consider allowed tools (the preferred one too).
         allowed = [t for t in available_tools if isinstance(t, str) and t.strip()]
+        if preferred and preferred.replace('/', '.') in {t.replace('/', '.') for t in allowed}:
+            tools.append(preferred)
         for t in allowed:
             if t not in tools:
                 tools.append(t)
         return tools
+    if preferred:
+        tools.append(preferred)
     # Default search tools when no allowlist is supplied
     if 'context.fts_search' not in tools:
         tools.append('context.fts_search')
@@ -275,22 +384,52 @@ def _pick_search_action(goal_text: str,
         return (None, None, True, "No tools available.")
     queries = _candidate_queries(goal_text, llm_query=suggested_query)
 
-    # Try to find a new (tool, query) combination not yet tried
-    for tool in tools:
-        for q in queries:
+    tried_by_tool: Dict[str, List[str]] = {}
+    for entry in searches:
+        if entry['query']:
+            tried_by_tool.setdefault(entry['tool'], []).append(entry['query'])
+
+    # Skip exact and near-duplicate repeats per tool; rank what is left by novelty.
+    # The model's own suggestion wins whenever it is not a near-duplicate or known to come back empty.
+    fresh = []
+    for ti, tool in enumerate(tools):
+        for qi, q in enumerate(queries):
             nq = _normalize_query(q)
             if (tool, nq) in tried_pairs:
                 continue
-            # Build args; include repo if provided
-            if tool == 'jira.jira_search':
-                args = { 'jql': q }
-            else:
-                args = { 'query': q }
-            if isinstance(repo_context, dict):
-                repo = repo_context.get('repo') or repo_context.get('repos')
-                if repo:
-                    args['repo'] = repo
-            return (tool, args, False, None)
+            same_tool_sim = _max_similarity(nq, tried_by_tool.get(tool, ()))
+            if same_tool_sim > _QUERY_SIM_THRESHOLD:
+                log_event('search_near_duplicate', tool=tool, query=nq, similarity=round(same_tool_sim, 3))
+                continue
+            fresh.append((ti, qi, tool, q, nq, same_tool_sim))
+
+    known_empty = search_memo.lookup(search_memo.repo_scope(repo_context), [(c[2], c[4]) for c in fresh])
+    ranked = []
+    for ti, qi, tool, q, nq, same_tool_sim in fresh:
+        is_empty = known_empty.get((tool, nq), False)
+        if is_empty:
+            log_event('search_known_empty', tool=tool, query=nq)
+        elif suggested_tool and tool == suggested_tool and (not suggested_query or qi == 0):
+            ranked = [(-2.0, ti, qi, tool, q)]
+            break
+        novelty = 0.6 * (1.0 - same_tool_sim) \
+            + 0.2 * (1.0 - _max_similarity(nq, tried_queries)) \
+            + (0.2 if tool not in tried_tools else 0.0) \
+            - (1.0 if is_empty else 0.0)
+        ranked.append((-novelty, ti, qi, tool, q))
+
+    if ranked:
+        _, _, _, tool, q = min(ranked)
+        # Build args; include repo if provided
+        if tool == 'jira.jira_search':
+            args = { 'jql': q }
+        else:
+            args = { 'query': q }
+        if isinstance(repo_context, dict):
+            repo = repo_context.get('repo') or repo_context.get('repos')
+            if repo:
+                args['repo'] = repo
+        return (tool, args, False, None)
 
     # If all combinations exhausted but we still under limit, finish to avoid loops
     exhausted_msg = _build_simple_summary_from_history(history, prefix="No new search combinations left. ")
@@ -376,36 +515,126 @@ class AgentIntentResponse(BaseModel):
     trace: Optional[List[Dict[str, Any]]] = None
 
 
-def _call_google_api(model: str, goal: str, instructions: Optional[str], api_key: str, history: Optional[List[Dict[str, Any]]] = None, persona: Optional[Dict[str, Any]] = None, driver: Optional[Dict[str, Any]] = None) -> str:
-    """Call Google Generative AI API directly."""
+_DEFAULT_TOOLS_LINE = "context.fts_search, context.memory_search, jira.jira_search"
+_LLM_TIMEOUT_S = float(os.environ.get('REASONING_LLM_TIMEOUT_S', '30'))
+
+# --- Structured output ---
+# Opt-in JSON decision mode (env default; per request via llm.structured_output).
+_STRUCTURED_OUTPUT = os.environ.get('REASONING_STRUCTURED_OUTPUT', '0') not in ('0', '', 'false', 'False')
+
+_DECISION_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "action": {"type": "string", "description": "'finish' or the exact tool name to call"},
+        "result": {"type": "string", "description": "final answer when finishing, otherwise the tool query or JQL"},
+        "reasoning": {"type": "string", "description": "short explanation of the decision"},
+    },
+    "required": ["action", "result", "reasoning"],
+}
+
+# Google's responseSchema uses the OpenAPI subset with upper-case type names.
+_GOOGLE_DECISION_SCHEMA: Dict[str, Any] = {
+    "type": "OBJECT",
+    "properties": {
+        "action": {"type": "STRING"},
+        "result": {"type": "STRING"},
+        "reasoning": {"type": "STRING"},
+    },
+    "required": ["action", "result", "reasoning"],
+}
+
+_STRUCTURED_RETRY_NOTE = (
+    "\n\nYour previous reply was not a valid JSON object. Reply with ONLY one JSON object with the "
+    "string keys \"action\", \"result\" and \"reasoning\" and nothing else."
+)
+
+
+class IntentDecision(BaseModel):
+    action: str
+    result: str = ''
+    reasoning: str = ''
+
+
+_structured_stats_lock = threading.Lock()
+_STRUCTURED_STATS: Dict[str, int] = {'requests': 0, 'parsed': 0, 'retried': 0, 'fallback': 0}
+
+
+def _note_structured_outcome(outcome: str, meta: Optional[Dict[str, Any]] = None) -> None:
+    """Count a structured-output outcome (parsed|retried|fallback) and report the running fallback rate."""
+    with _structured_stats_lock:
+        _STRUCTURED_STATS['requests'] += 1
+        _STRUCTURED_STATS[outcome] = _STRUCTURED_STATS.get(outcome, 0) + 1
+        stats = dict(_STRUCTURED_STATS)
+    if meta is not None:
+        meta['structured'] = outcome
+    try:
+        log_event('structured_output', outcome=outcome,
+                  fallback_rate=round(stats['fallback'] / stats['requests'], 4),
+                  retry_rate=round(stats['retried'] / stats['requests'], 4))
+    except Exception:
+        pass
+
+
+def structured_output_stats() -> Dict[str, Any]:
+    with _structured_stats_lock:
+        stats = dict(_STRUCTURED_STATS)
+    total = stats['requests'] or 1
+    stats['fallback_rate'] = stats['fallback'] / total
+    stats['retry_rate'] = stats['retried'] / total
+    return stats
+
+
+def _build_system_prompt(instructions: Optional[str], persona: Optional[Dict[str, Any]], driver: Optional[Dict[str, Any]]) -> str:
     # Combine instructions, persona, and driver for a comprehensive system prompt
     system_parts = []
-    if persona and (persona.get('prompt_md') or persona.get('summary')):
-        system_parts.append(f"## Persona\n{persona.get('prompt_md') or persona.get('summary')}")
-    if driver and driver.get('prompt_md'):
-        system_parts.append(f"## Driver\n{driver.get('prompt_md')}")
+    persona_text = (persona.get('prompt_md') or persona.get('summary')) if persona else None
+    driver_text = driver.get('prompt_md') if driver else None
+    if persona_text:
+        system_parts.append(f"## Persona\n{persona_text}")
+    if driver_text:
+        system_parts.append(f"## Driver\n{driver_text}")
     if instructions:
         system_parts.append(f"## Additional Instructions\n{instructions}")
-    
-    system_prompt = "\n\n".join(system_parts) or "You are a helpful agent. Provide concise responses."
+    tokens.note_sections(persona=persona_text, driver=driver_text, instructions=instructions)
+    return "\n\n".join(system_parts) or "You are a helpful agent. Provide concise responses."
+
 
+def _history_context_logged(history: Optional[List[Dict[str, Any]]], goal: str) -> str:
+    if not (history and isinstance(history, list) and len(history) > 0):
+        return ""
     try:
-        log_event('google_api_called', goal=goal, history_is_none=(history is None), history_len=len(history) if history else 0)
-    except:
-        pass
+        first_item = history[0] if len(history) > 0 else {}
+        first_item_type = type(first_item).__name__
+        first_item_str = str(first_item)[:300] if first_item else "empty"
+        log_event('history_received', history_count=len(history), goal_text=goal, first_item_type=first_item_type, first_item_preview=first_item_str)
+    except Exception as e:
+        log_event('history_received_error', history_count=len(history), goal_text=goal, error=str(e))
+    return _history_context_with_weights(history)
 
-    history_context = ""
-    if history and isinstance(history, list) and len(history) > 0:
-        try:
-            first_item = history[0] if len(history) > 0 else {}
-            first_item_type = type(first_item).__name__
-            first_item_str = str(first_item)[:300] if first_item else "empty"
-            log_event('history_received', history_count=len(history), goal_text=goal, first_item_type=first_item_type, first_item_preview=first_item_str)
-        except Exception as e:
-            log_event('history_received_error', history_count=len(history), goal_text=goal, error=str(e))
-        history_context = _history_context_with_weights(history)
 
-    prompt = f"""{system_prompt}
+_LINE_RESPONSE_FORMAT = """Respond with ONLY these exact lines:
+ACTION: finish
+RESULT: your final answer
+REASONING: short explanation of your decision
+
+OR
+
+ACTION: tool_name
+RESULT: tool arguments (query or JQL)
+REASONING: why you need this tool"""
+
+_JSON_RESPONSE_FORMAT = """Respond with ONLY a JSON object:
+{"action": "finish", "result": "your final answer", "reasoning": "short explanation of your decision"}
+
+OR
+
+{"action": "tool_name", "result": "tool arguments (query or JQL)", "reasoning": "why you need this tool"}"""
+
+
+def _build_reasoning_prompt(goal: str, system_prompt: str, history_context: str, tools_line: Optional[str] = None, structured: bool = False) -> str:
+    response_format = _JSON_RESPONSE_FORMAT if structured else _LINE_RESPONSE_FORMAT
+    tokens.note_sections(history=history_context, goal=goal, tools=tools_line or _DEFAULT_TOOLS_LINE)
+    return f"""{system_prompt}
 
 You are analyzing a task and deciding how to proceed.
 
@@ -415,24 +644,33 @@ Decision Rules:
 3. NEVER repeat the same tool+query combination.
 4. Use at most 4 steps total.
 
-Available Tools: context.fts_search, context.memory_search, jira.jira_search
+Available Tools: {tools_line or _DEFAULT_TOOLS_LINE}
 
 {history_context}
 
 Goal: {goal}
 
-Respond with ONLY these exact lines:
-ACTION: finish
-RESULT: your final answer
-REASONING: short explanation of your decision
+{response_format}"""
 
-OR
 
-ACTION: tool_name
-RESULT: tool arguments (query or JQL)
-REASONING: why you need this tool"""
+def _tools_line(available_tools: Optional[List[str]]) -> Optional[str]:
+    if available_tools is None:
+        return None
+    return ", ".join(available_tools) if available_tools else "none"
+
+
+def _google_prompt(model: str, goal: str, instructions: Optional[str], history: Optional[List[Dict[str, Any]]], persona: Optional[Dict[str, Any]], driver: Optional[Dict[str, Any]], structured: bool = False, available_tools: Optional[List[str]] = None) -> str:
+    system_prompt = _build_system_prompt(instructions, persona, driver)
+    try:
+        log_event('google_api_called', goal=goal, history_is_none=(history is None), history_len=len(history) if history else 0)
+    except:
+        pass
+    history_context = _history_context_logged(history, goal)
+    return _build_reasoning_prompt(goal, system_prompt, history_context, _tools_line(available_tools), structured=structured)
+
 
-    url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={api_key}"
+def _google_request(model: str, prompt: str, api_key: str, structured: bool = False):
+    url = f"{_GOOGLE_API_BASE_URL}/v1beta/models/{model}:generateContent?key={api_key}"
     payload = {
         "contents": [
             {
@@ -448,190 +686,723 @@ REASONING: why you need this tool"""
             "maxOutputTokens": 500
         }
     }
+    if structured:
+        payload["generationConfig"]["responseMimeType"] = "application/json"
+        payload["generationConfig"]["responseSchema"] = _GOOGLE_DECISION_SCHEMA
+    return url, payload
+
+
+def _google_response_text(result: Dict[str, Any]) -> str:
+    if 'candidates' in result and len(result['candidates']) > 0:
+        candidate = result['candidates'][0]
+        if 'content' in candidate and 'parts' in candidate['content']:
+            text_parts = candidate['content']['parts']
+            if len(text_parts) > 0 and 'text' in text_parts[0]:
+                tokens.note_usage(*tokens.google_usage(result))
+                return text_parts[0]['text']
+
+    raise Exception(f"Unexpected Google API response: {result}")
+
+
+class ProviderRequestError(Exception):
+    """An HTTP call to a provider failed. `unhealthy` is True for connection errors,
+    timeouts and 5xx responses, the failures the circuit breaker counts. A 4xx (a model
+    that is not pulled, a bad request or key) says nothing about the endpoint's health."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, unhealthy: bool = False):
+        super().__init__(message)
+        self.status_code = status_code
+        self.unhealthy = unhealthy
+
+
+def _provider_error(label: str, e: Exception) -> ProviderRequestError:
+    """Wrap a requests/httpx error, keeping the "<label> request failed: ..." message."""
+    import httpx
+
+    response = getattr(e, 'response', None) if isinstance(e, (requests.exceptions.HTTPError, httpx.HTTPStatusError)) else None
+    status_code = getattr(response, 'status_code', None)
+    transport = isinstance(e, (requests.exceptions.ConnectionError, requests.exceptions.Timeout, httpx.TransportError))
+    unhealthy = transport or (status_code is not None and status_code >= 500)
+    return ProviderRequestError(f"{label} request failed: {str(e)}", status_code=status_code, unhealthy=unhealthy)
+
+
+def _raise_if_rate_limited(label: str, status_code: int, headers, body_text: str) -> None:
+    if status_code == 429:
+        raise ratelimit.ProviderRateLimited(f"{label} request failed: 429 Too Many Requests",
+                                            retry_after=ratelimit.parse_retry_after(dict(headers or {}), body_text))
+
 
+def _google_generate(model: str, prompt: str, api_key: str, structured: bool = False) -> str:
+    url, payload = _google_request(model, prompt, api_key, structured)
     try:
-        response = requests.post(url, json=payload, timeout=30)
+        response = requests.post(url, json=payload, timeout=_LLM_TIMEOUT_S)
+        _raise_if_rate_limited('Google API', response.status_code, response.headers, response.text)
         response.raise_for_status()
         result = response.json()
+    except requests.exceptions.RequestException as e:
+        raise _provider_error('Google API', e)
+    return _google_response_text(result)
+
+
+def _call_google_api(model: str, goal: str, instructions: Optional[str], api_key: str, history: Optional[List[Dict[str, Any]]] = None, persona: Optional[Dict[str, Any]] = None, driver: Optional[Dict[str, Any]] = None) -> str:
+    """Call Google Generative AI API directly."""
+    prompt = _google_prompt(model, goal, instructions, history, persona, driver)
+    return _google_generate(model, prompt, api_key)
+
+
+def _ollama_request(model: str, prompt: str, structured: bool = False, base_url: Optional[str] = None):
+    llm_base_url = base_url or os.environ.get('OLLAMA_BASE_URL', 'http://localhost:11434').rstrip('/')
+    payload = {
+        "model": model,
+        "prompt": prompt,
+        "stream": False,
+        "options": {"temperature": 0.3},
+    }
+    if structured:
+        payload["format"] = _DECISION_SCHEMA
+    return f"{llm_base_url}/api/generate", payload
 
-        if 'candidates' in result and len(result['candidates']) > 0:
-            candidate = result['candidates'][0]
-            if 'content' in candidate and 'parts' in candidate['content']:
-                text_parts = candidate['content']['parts']
-                if len(text_parts) > 0 and 'text' in text_parts[0]:
-                    return text_parts[0]['text']
 
-        raise Exception(f"Unexpected Google API response: {result}")
+def _ollama_response_text(result: Dict[str, Any]) -> str:
+    if isinstance(result, dict) and isinstance(result.get('response'), str):
+        tokens.note_usage(*tokens.ollama_usage(result))
+        return result['response']
+    raise Exception(f"Unexpected Ollama response: {result}")
+
+
+def _call_ollama_api(model: str, prompt: str, structured: bool = False, base_url: Optional[str] = None) -> str:
+    """Call the Ollama generate endpoint (non-streaming)."""
+    url, payload = _ollama_request(model, prompt, structured, base_url)
+    try:
+        response = requests.post(url, json=payload, timeout=_LLM_TIMEOUT_S)
+        response.raise_for_status()
+        result = response.json()
     except requests.exceptions.RequestException as e:
-        raise Exception(f"Google API request failed: {str(e)}")
+        raise _provider_error('Ollama', e)
+    return _ollama_response_text(result)
+
+
+def _ollama_prompt(goal_text: str, instructions: Optional[str], history: Optional[List[Dict[str, Any]]], available_tools: Optional[List[str]], persona: Optional[Dict[str, Any]], driver: Optional[Dict[str, Any]], structured: bool = False) -> str:
+    history_context = _history_context_logged(history, goal_text)
+    system_prompt = _build_system_prompt(instructions, persona, driver)
+    return _build_reasoning_prompt(goal_text, system_prompt, history_context, _tools_line(available_tools), structured=structured)
+
+
+def _action_decision(action: str, result: Optional[str], reasoning: Optional[str], goal_text: str) -> tuple:
+    """Map a parsed ACTION/RESULT pair to the decision tuple."""
+    if action.lower() == 'finish':
+        return (None, None, result or goal_text, reasoning, True)
+    a = action.lower()
+    if a.startswith('context.fts_search'):
+        return ("context.fts_search", {"query": result or goal_text}, None, reasoning, False)
+    if a.startswith('context.memory_search'):
+        return ("context.memory_search", {"query": result or goal_text}, None, reasoning, False)
+    if a.startswith('jira.jira_search'):
+        return ("jira.jira_search", {"jql": result or goal_text}, None, reasoning, False)
+
+    # Generic tool fallback
+    return (action, {"query": result or goal_text}, None, reasoning, False)
+
+
+def _parse_llm_response(response: str, goal_text: str) -> tuple:
+    """Turn the line-formatted (or JSON) model reply into a decision tuple."""
+    lines = response.strip().split('\n')
+    action = None
+    result = None
+    reasoning = response[:200]
+
+    for line in lines:
+        if line.startswith('ACTION:'):
+            action = line.replace('ACTION:', '').strip()
+        elif line.startswith('RESULT:'):
+            result = line.replace('RESULT:', '').strip()
+        elif line.startswith('REASONING:'):
+            reasoning = line.replace('REASONING:', '').strip()
+
+    if action:
+        return _action_decision(action, result, reasoning, goal_text)
+    else:
+        # Fallback: Check if response is JSON despite line-based instructions
+        try:
+            # Find JSON block
+            s = response.strip()
+            if '```json' in s:
+                s = s.split('```json')[1].split('```')[0].strip()
+            elif '{' in s:
+                s = s[s.find('{'):s.rfind('}')+1]
+
+            data = json.loads(s)
+            action_val = data.get('action') or data.get('tool_name') or data.get('tool')
+            result_val = data.get('result') or data.get('final') or data.get('args', {}).get('query') or data.get('args', {}).get('q')
+            reason_val = data.get('reasoning') or data.get('reason') or "Parsed from JSON fallback"
+
+            if action_val:
+                if str(action_val).lower() == 'finish':
+                    return (None, None, result_val or goal_text, reason_val, True)
+                return (str(action_val), {"query": result_val or goal_text}, None, reason_val, False)
+        except:
+            pass
+
+        return (None, None, result or response[:500], reasoning, True)
+
+
+def _parse_structured_decision(response: str, goal_text: str) -> Optional[tuple]:
+    """Validate a JSON-mode reply against IntentDecision; None when it does not conform."""
+    try:
+        s = (response or '').strip()
+        if s.startswith('```'):
+            s = s.strip('`')
+            if s.lower().startswith('json'):
+                s = s[4:]
+        decision = IntentDecision.model_validate(json.loads(s))
+    except Exception:
+        return None
+    action = decision.action.strip()
+    if not action:
+        return None
+    return _action_decision(action, decision.result.strip() or None, decision.reasoning.strip() or None, goal_text)
+
+
+def _llm_error_decision(e: Exception, goal_text: str) -> tuple:
+    try:
+        log_event('llm_reasoning_error', error=str(e), goal_text=goal_text)
+    except:
+        pass
+    return (None, None, None, f"LLM error: {str(e)}", False)
+
+
+def _structured_enabled(structured: Optional[bool]) -> bool:
+    return _STRUCTURED_OUTPUT if structured is None else bool(structured)
+
+
+def _reasoning_prompt_for(provider_name: str, model_name: str, goal_text: str, instructions: Optional[str], history: Optional[List[Dict[str, Any]]], available_tools: Optional[List[str]], persona: Optional[Dict[str, Any]], driver: Optional[Dict[str, Any]], structured: bool) -> str:
+    if provider_name == 'google api':
+        return _google_prompt(model_name, goal_text, instructions, history, persona, driver, structured=structured, available_tools=available_tools)
+    return _ollama_prompt(goal_text, instructions, history, available_tools, persona, driver, structured=structured)
+
+
+def _llm_dispatch(provider_name: str, model_name: str, prompt: str, api_key: Optional[str], structured: bool = False) -> str:
+    if provider_name == 'google api':
+        return _google_generate(model_name, prompt, api_key, structured)
+    return _call_ollama_api(model_name, prompt, structured)
+
+
+def _hedge_dispatch(provider_name: str, model_name: str, prompt: str, api_key: Optional[str], structured: bool = False) -> str:
+    """The backup request of a hedge: same call, sent to the alternate Ollama endpoint when one is configured."""
+    if provider_name != 'google api' and hedging.ALT_OLLAMA_URL:
+        return _call_ollama_api(model_name, prompt, structured, hedging.ALT_OLLAMA_URL)
+    return _llm_dispatch(provider_name, model_name, prompt, api_key, structured)
+
+
+def _hedge_allowed(provider_name: str, model_name: str, api_key: Optional[str], prompt: str) -> bool:
+    """A hedge is an extra request, so rate-limited providers must have quota for it right now."""
+    if not ratelimit.applies(provider_name):
+        return True
+    return ratelimit.try_acquire(provider_name, model_name, api_key, ratelimit.estimate_tokens(prompt)) <= 0
+
+
+def _log_hedge(provider_name: str, model_name: str, winner: str, delay_s: float) -> None:
+    stats = hedging.POLICY.snapshot()
+    log_event('llm_hedge', provider=provider_name, model=model_name, winner=winner, delay_ms=round(delay_s * 1000.0, 1),
+              hedged=stats['hedged'], hedge_wins=stats['hedge_wins'], hedge_rate=stats['hedge_rate'], saved_ms=stats['saved_ms'])
+
+
+def _llm_dispatch_hedged(provider_name: str, model_name: str, prompt: str, api_key: Optional[str], structured: bool = False) -> str:
+    if not hedging.HEDGE_ENABLED:
+        return _llm_dispatch(provider_name, model_name, prompt, api_key, structured)
+    return hedging.run_sync(
+        (provider_name, model_name),
+        lambda: _llm_dispatch(provider_name, model_name, prompt, api_key, structured),
+        lambda: _hedge_dispatch(provider_name, model_name, prompt, api_key, structured),
+        can_hedge=lambda: _hedge_allowed(provider_name, model_name, api_key, prompt),
+        on_event=lambda **kw: _log_hedge(provider_name, model_name, **kw),
+    )
+
+
+def _check_circuit(provider_name: str) -> None:
+    """Fail fast, before any rate-limit wait, while the provider's breaker is open."""
+    breaker = circuit.get(provider_name)
+    if breaker is not None:
+        breaker.check()
+
+
+def _record_circuit(breaker, ok: bool, started: float) -> None:
+    if breaker.record(ok, time.monotonic() - started):
+        log_event('circuit_open', provider=breaker.name, open_s=breaker.open_s, trips=breaker.trips)
+
+
+def _record_circuit_error(breaker, e: Exception, started: float) -> None:
+    """Count connection errors, timeouts and 5xx against the provider; anything else
+    (4xx, missing key, a response that does not parse) passes with no verdict."""
+    if isinstance(e, ProviderRequestError) and e.unhealthy:
+        _record_circuit(breaker, False, started)
+    else:
+        breaker.release()
 
 
-def _use_llm_for_reasoning(goal_text: str, instructions: Optional[str], llm_provider: Optional[str], llm_model: Optional[str], api_key: Optional[str] = None, history: Optional[List[Dict[str, Any]]] = None, available_tools: Optional[List[str]] = None, persona: Optional[Dict[str, Any]] = None, driver: Optional[Dict[str, Any]] = None) -> tuple:
-    """Use LLM to reason about what tool to call or action to take."""
+def _llm_dispatch_guarded(provider_name: str, model_name: str, prompt: str, api_key: Optional[str], structured: bool = False) -> str:
+    """`_llm_dispatch_hedged` behind the provider's circuit breaker."""
+    breaker = circuit.get(provider_name)
+    if breaker is None:
+        return _llm_dispatch_hedged(provider_name, model_name, prompt, api_key, structured)
+    breaker.before_call()
+    started = time.monotonic()
     try:
-        from langchain.prompts import PromptTemplate
+        result = _llm_dispatch_hedged(provider_name, model_name, prompt, api_key, structured)
+    except ratelimit.ProviderRateLimited:
+        breaker.release()  # a 429 is quota, not provider health; the rate-limit loop waits and retries
+        raise
+    except Exception as e:
+        _record_circuit_error(breaker, e, started)
+        raise
+    _record_circuit(breaker, True, started)
+    return result
+
+
+def _note_rate_limited(provider_name: str, model_name: str, api_key: Optional[str], e, deadline: float) -> float:
+    """Hold the pair fleet-wide after a 429; re-raises when the hold would outlast the wait budget."""
+    held = ratelimit.hold(provider_name, model_name, api_key, e.retry_after)
+    log_event('llm_rate_limited', provider=provider_name, model=model_name, retry_after=e.retry_after, hold_s=held)
+    if time.monotonic() + held > deadline:
+        raise e
+    return held
+
+
+def _llm_generate(provider_name: str, model_name: str, prompt: str, api_key: Optional[str], structured: bool = False) -> str:
+    """Single provider dispatch point for a fully built prompt (captured while `replay.RECORDER` records the job)."""
+    if replay.capturing():
+        return replay.capture_call(provider_name, model_name, prompt, structured,
+                                   lambda: _llm_generate_live(provider_name, model_name, prompt, api_key, structured))
+    return _llm_generate_live(provider_name, model_name, prompt, api_key, structured)
+
+
+def _llm_generate_live(provider_name: str, model_name: str, prompt: str, api_key: Optional[str], structured: bool = False) -> str:
+    """Remote providers go through the shared rate limiter."""
+    _check_circuit(provider_name)
+    tokens.note_prompt(prompt)
+    if not ratelimit.applies(provider_name):
+        return _llm_dispatch_guarded(provider_name, model_name, prompt, api_key, structured)
+    cost = ratelimit.estimate_tokens(prompt)
+    deadline = time.monotonic() + ratelimit.MAX_WAIT_S
+    while True:
+        waited = ratelimit.acquire(provider_name, model_name, api_key, cost, deadline)
+        if waited:
+            log_event('llm_rate_wait', provider=provider_name, model=model_name, waited_s=round(waited, 3))
+        try:
+            return _llm_dispatch_guarded(provider_name, model_name, prompt, api_key, structured)
+        except ratelimit.ProviderRateLimited as e:
+            time.sleep(_note_rate_limited(provider_name, model_name, api_key, e, deadline))
+
+
+def _fallback_api_key(target, provider_name: str, api_key: Optional[str]) -> Optional[str]:
+    if target.provider == provider_name:
+        return api_key
+    return circuit.FALLBACK_GOOGLE_API_KEY if target.provider == 'google api' else None
+
+
+def _note_fallback(meta: Optional[Dict[str, Any]], target, error: Exception) -> None:
+    reason = 'circuit_open' if isinstance(error, circuit.CircuitOpen) else str(error)[:200]
+    log_event('llm_fallback', target=target.label(), reason=reason)
+    if meta is not None:
+        meta.setdefault('fallbacks', []).append({'target': target.label(), 'reason': reason})
+
+
+def _deterministic_decision(error: Optional[Exception]) -> tuple:
+    """End of a fallback chain: no tool, not finished, so `_finalize_intent` applies its heuristics."""
+    return (None, None, None, f"Deterministic fallback; LLM unavailable ({error})", False)
+
 
+def _llm_target_meta(meta: Optional[Dict[str, Any]], target) -> None:
+    if meta is not None:
+        meta['llm_target'] = target.label()
+
+
+def _reason_with(provider_name: str, model_name: str, api_key: Optional[str], goal_text: str, instructions: Optional[str], history: Optional[List[Dict[str, Any]]], available_tools: Optional[List[str]], persona: Optional[Dict[str, Any]], driver: Optional[Dict[str, Any]], structured: bool, meta: Optional[Dict[str, Any]]) -> tuple:
+    """One provider/model attempt; raises on provider errors so the caller can fall back."""
+    if provider_name == 'google api' and not api_key:
+        raise Exception('API key not provided for Google API provider')
+    prompt = _reasoning_prompt_for(provider_name, model_name, goal_text, instructions, history, available_tools, persona, driver, structured)
+    response = _llm_generate(provider_name, model_name, prompt, api_key, structured)
+    if not structured:
+        return _parse_llm_response(response, goal_text)
+
+    decision = _parse_structured_decision(response, goal_text)
+    if decision is not None:
+        _note_structured_outcome('parsed', meta)
+        return decision
+    # One constrained retry before falling back to free-text parsing
+    response = _llm_generate(provider_name, model_name, prompt + _STRUCTURED_RETRY_NOTE, api_key, structured)
+    decision = _parse_structured_decision(response, goal_text)
+    if decision is not None:
+        _note_structured_outcome('retried', meta)
+        return decision
+    _note_structured_outcome('fallback', meta)
+    return _parse_llm_response(response, goal_text)
+
+
+def _use_llm_for_reasoning(goal_text: str, instructions: Optional[str], llm_provider: Optional[str], llm_model: Optional[str], api_key: Optional[str] = None, history: Optional[List[Dict[str, Any]]] = None, available_tools: Optional[List[str]] = None, persona: Optional[Dict[str, Any]] = None, driver: Optional[Dict[str, Any]] = None, structured: Optional[bool] = None, meta: Optional[Dict[str, Any]] = None) -> tuple:
+    """Use LLM to reason about what tool to call or action to take, walking the fallback chain on failure."""
+    try:
         model_name = llm_model or 'phi3.5:latest'
         provider_name = (llm_provider or '').lower().strip()
-
-        history_context = ""
-        if history and isinstance(history, list) and len(history) > 0:
+        structured = _structured_enabled(structured)
+
+        chain = circuit.chain_for(provider_name, model_name)
+        error: Optional[Exception] = None
+        for i, target in enumerate(chain):
+            if target.deterministic:
+                _llm_target_meta(meta, target)
+                return _deterministic_decision(error)
             try:
-                first_item = history[0] if len(history) > 0 else {}
-                first_item_type = type(first_item).__name__
-                first_item_str = str(first_item)[:300] if first_item else "empty"
-                log_event('history_received', history_count=len(history), goal_text=goal_text, first_item_type=first_item_type, first_item_preview=first_item_str)
+                decision = _reason_with(target.provider, target.model, _fallback_api_key(target, provider_name, api_key),
+                                        goal_text, instructions, history, available_tools, persona, driver, structured, meta)
             except Exception as e:
-                log_event('history_received_error', history_count=len(history), goal_text=goal_text, error=str(e))
-            history_context = _history_context_with_weights(history)
+                error = e
+                if i + 1 < len(chain):
+                    _note_fallback(meta, target, e)
+                continue
+            if i:
+                _llm_target_meta(meta, target)
+            return decision
+        raise error
 
-        if provider_name == 'google api':
-            if not api_key:
-                raise Exception('API key not provided for Google API provider')
-            response = _call_google_api(model_name, goal_text, instructions, api_key, history, persona, driver)
-        else:
-            from langchain_community.llms import Ollama
-            llm_base_url = os.environ.get('OLLAMA_BASE_URL', 'http://localhost:11434')
-            llm = Ollama(base_url=llm_base_url, model=model_name, temperature=0.3)
-
-            # Combine instructions, persona, and driver for a comprehensive system prompt
-            system_parts = []
-            if persona and (persona.get('prompt_md') or persona.get('summary')):
-                system_parts.append(f"## Persona\n{persona.get('prompt_md') or persona.get('summary')}")
-            if driver and driver.get('prompt_md'):
-                system_parts.append(f"## Driver\n{driver.get('prompt_md')}")
-            if instructions:
-                system_parts.append(f"## Additional Instructions\n{instructions}")
-            
-            system_prompt = "\n\n".join(system_parts) or "You are a helpful agent. Provide concise responses."
-
-            tools_line = None
-            if available_tools is not None:
-                tools_line = ", ".join(available_tools) if available_tools else "none"
-
-            prompt_template = PromptTemplate(
-                input_variables=["goal"],
-                template=f"""{system_prompt}
+    except Exception as e:
+        return _llm_error_decision(e, goal_text)
 
-You are analyzing a task and deciding how to proceed.
 
-Decision Rules:
-1. If you can answer the goal directly from the Goal text or history, choose ACTION: finish.
-2. If you need more information, choose a tool from the "Available Tools" list.
-3. NEVER repeat the same tool+query combination.
-4. Use at most 4 steps total.
+# ---------------------
+# Async provider clients
+# ---------------------
 
-Available Tools: {tools_line or "context.fts_search, context.memory_search, jira.jira_search"}
+_ASYNC_HTTP_MAX_CONNECTIONS = int(os.environ.get('REASONING_ASYNC_HTTP_MAX_CONNECTIONS', '256'))
+_async_http_clients: Dict[int, Any] = {}
 
-{history_context}
 
-Goal: {{goal}}
+def _get_async_http_client():
+    """Shared pooled httpx.AsyncClient for the running event loop."""
+    import asyncio
+    import httpx
 
-Respond with ONLY these exact lines:
-ACTION: finish
-RESULT: your final answer
-REASONING: short explanation of your decision
+    loop = asyncio.get_running_loop()
+    client = _async_http_clients.get(id(loop))
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=_LLM_TIMEOUT_S,
+            limits=httpx.Limits(max_connections=_ASYNC_HTTP_MAX_CONNECTIONS, max_keepalive_connections=_ASYNC_HTTP_MAX_CONNECTIONS),
+        )
+        _async_http_clients[id(loop)] = client
+    return client
 
-OR
 
-ACTION: tool_name
-RESULT: tool arguments (query or JQL)
-REASONING: why you need this tool"""
-            )
-
-            chain = prompt_template | llm
-            response = chain.invoke({"goal": goal_text})
-
-        lines = response.strip().split('\n')
-        action = None
-        result = None
-        reasoning = response[:200]
-
-        for line in lines:
-            if line.startswith('ACTION:'):
-                action = line.replace('ACTION:', '').strip()
-            elif line.startswith('RESULT:'):
-                result = line.replace('RESULT:', '').strip()
-            elif line.startswith('REASONING:'):
-                reasoning = line.replace('REASONING:', '').strip()
-
-        if action and action.lower() == 'finish':
-            return (None, None, result or goal_text, reasoning, True)
-        elif action:
-            a = action.lower()
-            if a.startswith('context.fts_search'):
-                return ("context.fts_search", {"query": result or goal_text}, None, reasoning, False)
-            if a.startswith('context.memory_search'):
-                return ("context.memory_search", {"query": result or goal_text}, None, reasoning, False)
-            if a.startswith('jira.jira_search'):
-                return ("jira.jira_search", {"jql": result or goal_text}, None, reasoning, False)
-            
-            # Generic tool fallback
-            return (action, {"query": result or goal_text}, None, reasoning, False)
-        else:
-            # Fallback: Check if response is JSON despite line-based instructions
-            try:
-                import json
-                # Find JSON block
-                s = response.strip()
-                if '```json' in s:
-                    s = s.split('```json')[1].split('```')[0].strip()
-                elif '{' in s:
-                    s = s[s.find('{'):s.rfind('}')+1]
-                
-                data = json.loads(s)
-                action_val = data.get('action') or data.get('tool_name') or data.get('tool')
-                result_val = data.get('result') or data.get('final') or data.get('args', {}).get('query') or data.get('args', {}).get('q')
-                reason_val = data.get('reasoning') or data.get('reason') or "Parsed from JSON fallback"
-                
-                if action_val:
-                    if str(action_val).lower() == 'finish':
-                        return (None, None, result_val or goal_text, reason_val, True)
-                    return (str(action_val), {"query": result_val or goal_text}, None, reason_val, False)
-            except:
-                pass
+async def _close_async_http_client():
+    import asyncio
+
+    client = _async_http_clients.pop(id(asyncio.get_running_loop()), None)
+    if client is not None:
+        await client.aclose()
+
+
+async def _async_post_json(url: str, payload: Dict[str, Any], label: str) -> Dict[str, Any]:
+    import httpx
+
+    try:
+        response = await _get_async_http_client().post(url, json=payload, timeout=_LLM_TIMEOUT_S)
+        _raise_if_rate_limited(label, response.status_code, response.headers, response.text)
+        response.raise_for_status()
+        return response.json()
+    except httpx.HTTPError as e:
+        raise _provider_error(label, e)
+
+
+async def _google_generate_async(model: str, prompt: str, api_key: str, structured: bool = False) -> str:
+    """Async variant of `_google_generate`."""
+    url, payload = _google_request(model, prompt, api_key, structured)
+    result = await _async_post_json(url, payload, 'Google API')
+    return _google_response_text(result)
+
+
+async def _call_google_api_async(model: str, goal: str, instructions: Optional[str], api_key: str, history: Optional[List[Dict[str, Any]]] = None, persona: Optional[Dict[str, Any]] = None, driver: Optional[Dict[str, Any]] = None) -> str:
+    """Async variant of `_call_google_api`."""
+    prompt = _google_prompt(model, goal, instructions, history, persona, driver)
+    return await _google_generate_async(model, prompt, api_key)
+
+
+async def _call_ollama_api_async(model: str, prompt: str, structured: bool = False, base_url: Optional[str] = None) -> str:
+    """Async variant of `_call_ollama_api`."""
+    url, payload = _ollama_request(model, prompt, structured, base_url)
+    result = await _async_post_json(url, payload, 'Ollama')
+    return _ollama_response_text(result)
 
-            return (None, None, result or response[:500], reasoning, True)
 
+async def _llm_dispatch_async(provider_name: str, model_name: str, prompt: str, api_key: Optional[str], structured: bool = False) -> str:
+    if provider_name == 'google api':
+        return await _google_generate_async(model_name, prompt, api_key, structured)
+    return await _call_ollama_api_async(model_name, prompt, structured)
+
+
+async def _hedge_dispatch_async(provider_name: str, model_name: str, prompt: str, api_key: Optional[str], structured: bool = False) -> str:
+    if provider_name != 'google api' and hedging.ALT_OLLAMA_URL:
+        return await _call_ollama_api_async(model_name, prompt, structured, hedging.ALT_OLLAMA_URL)
+    return await _llm_dispatch_async(provider_name, model_name, prompt, api_key, structured)
+
+
+async def _llm_dispatch_hedged_async(provider_name: str, model_name: str, prompt: str, api_key: Optional[str], structured: bool = False) -> str:
+    """Async variant of `_llm_dispatch_hedged`; the losing request is cancelled."""
+    import asyncio
+
+    if not hedging.HEDGE_ENABLED:
+        return await _llm_dispatch_async(provider_name, model_name, prompt, api_key, structured)
+
+    async def can_hedge():
+        return await asyncio.to_thread(_hedge_allowed, provider_name, model_name, api_key, prompt)
+
+    return await hedging.run_async(
+        (provider_name, model_name),
+        lambda: _llm_dispatch_async(provider_name, model_name, prompt, api_key, structured),
+        lambda: _hedge_dispatch_async(provider_name, model_name, prompt, api_key, structured),
+        can_hedge=can_hedge,
+        on_event=lambda **kw: _log_hedge(provider_name, model_name, **kw),
+    )
+
+
+async def _llm_dispatch_guarded_async(provider_name: str, model_name: str, prompt: str, api_key: Optional[str], structured: bool = False) -> str:
+    """Async variant of `_llm_dispatch_guarded`; a cancelled call gives back its probe slot."""
+    breaker = circuit.get(provider_name)
+    if breaker is None:
+        return await _llm_dispatch_hedged_async(provider_name, model_name, prompt, api_key, structured)
+    breaker.before_call()
+    started = time.monotonic()
+    try:
+        result = await _llm_dispatch_hedged_async(provider_name, model_name, prompt, api_key, structured)
+    except ratelimit.ProviderRateLimited:
+        breaker.release()
+        raise
     except Exception as e:
+        _record_circuit_error(breaker, e, started)
+        raise
+    except BaseException:
+        breaker.release()
+        raise
+    _record_circuit(breaker, True, started)
+    return result
+
+
+async def _llm_generate_async(provider_name: str, model_name: str, prompt: str, api_key: Optional[str], structured: bool = False) -> str:
+    """Async variant of `_llm_generate`."""
+    if replay.capturing():
+        return await replay.capture_call_async(provider_name, model_name, prompt, structured,
+                                               lambda: _llm_generate_live_async(provider_name, model_name, prompt, api_key, structured))
+    return await _llm_generate_live_async(provider_name, model_name, prompt, api_key, structured)
+
+
+async def _llm_generate_live_async(provider_name: str, model_name: str, prompt: str, api_key: Optional[str], structured: bool = False) -> str:
+    """Async variant of `_llm_generate_live`; limiter round trips run off the event loop."""
+    import asyncio
+
+    _check_circuit(provider_name)
+    tokens.note_prompt(prompt)
+    if not ratelimit.applies(provider_name):
+        return await _llm_dispatch_guarded_async(provider_name, model_name, prompt, api_key, structured)
+    cost = ratelimit.estimate_tokens(prompt)
+    deadline = time.monotonic() + ratelimit.MAX_WAIT_S
+    while True:
+        waited = 0.0
+        while True:
+            wait = await asyncio.to_thread(ratelimit.next_wait, provider_name, model_name, api_key, cost, deadline)
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+            waited += wait
+        if waited:
+            log_event('llm_rate_wait', provider=provider_name, model=model_name, waited_s=round(waited, 3))
         try:
-            log_event('llm_reasoning_error', error=str(e), goal_text=goal_text)
-        except:
-            pass
-        return (None, None, None, f"LLM error: {str(e)}", False)
+            return await _llm_dispatch_guarded_async(provider_name, model_name, prompt, api_key, structured)
+        except ratelimit.ProviderRateLimited as e:
+            held = await asyncio.to_thread(_note_rate_limited, provider_name, model_name, api_key, e, deadline)
+            await asyncio.sleep(held)
+
+
+async def _reason_with_async(provider_name: str, model_name: str, api_key: Optional[str], goal_text: str, instructions: Optional[str], history: Optional[List[Dict[str, Any]]], available_tools: Optional[List[str]], persona: Optional[Dict[str, Any]], driver: Optional[Dict[str, Any]], structured: bool, meta: Optional[Dict[str, Any]]) -> tuple:
+    """Async variant of `_reason_with`."""
+    if provider_name == 'google api' and not api_key:
+        raise Exception('API key not provided for Google API provider')
+    prompt = _reasoning_prompt_for(provider_name, model_name, goal_text, instructions, history, available_tools, persona, driver, structured)
+    response = await _llm_generate_async(provider_name, model_name, prompt, api_key, structured)
+    if not structured:
+        return _parse_llm_response(response, goal_text)
+
+    decision = _parse_structured_decision(response, goal_text)
+    if decision is not None:
+        _note_structured_outcome('parsed', meta)
+        return decision
+    response = await _llm_generate_async(provider_name, model_name, prompt + _STRUCTURED_RETRY_NOTE, api_key, structured)
+    decision = _parse_structured_decision(response, goal_text)
+    if decision is not None:
+        _note_structured_outcome('retried', meta)
+        return decision
+    _note_structured_outcome('fallback', meta)
+    return _parse_llm_response(response, goal_text)
+
+
+async def _use_llm_for_reasoning_async(goal_text: str, instructions: Optional[str], llm_provider: Optional[str], llm_model: Optional[str], api_key: Optional[str] = None, history: Optional[List[Dict[str, Any]]] = None, available_tools: Optional[List[str]] = None, persona: Optional[Dict[str, Any]] = None, driver: Optional[Dict[str, Any]] = None, structured: Optional[bool] = None, meta: Optional[Dict[str, Any]] = None) -> tuple:
+    """Async variant of `_use_llm_for_reasoning`; same decision tuple."""
+    try:
+        model_name = llm_model or 'phi3.5:latest'
+        provider_name = (llm_provider or '').lower().strip()
+        structured = _structured_enabled(structured)
+
+        chain = circuit.chain_for(provider_name, model_name)
+        error: Optional[Exception] = None
+        for i, target in enumerate(chain):
+            if target.deterministic:
+                _llm_target_meta(meta, target)
+                return _deterministic_decision(error)
+            try:
+                decision = await _reason_with_async(target.provider, target.model, _fallback_api_key(target, provider_name, api_key),
+                                                    goal_text, instructions, history, available_tools, persona, driver, structured, meta)
+            except Exception as e:
+                error = e
+                if i + 1 < len(chain):
+                    _note_fallback(meta, target, e)
+                continue
+            if i:
+                _llm_target_meta(meta, target)
+            return decision
+        raise error
 
+    except Exception as e:
+        return _llm_error_decision(e, goal_text)
+
+
+# ---------------------
+# Intent computation
+# ---------------------
+
+def _prompt_tools(req: AgentIntentRequest, tools_available: Optional[List[str]]) -> Optional[List[str]]:
+    """The most relevant tools for the prompt (see reasoning/tool_index.py); the planner still sees every tool."""
+    try:
+        selected = tool_index.select(tools_available, req.tools_catalog, req.goal_text, req.history)
+    except Exception as e:
+        log_event('tool_preselect_error', error=str(e))
+        return tools_available
+    if selected is not tools_available:
+        log_event('tool_preselect', offered=len(tools_available), kept=len(selected), tools=selected)
+    return selected
+
+
+def _llm_call_args(req: AgentIntentRequest, tools_available: Optional[List[str]]) -> tuple:
+    llm_provider = (req.llm or {}).get('provider') if isinstance(req.llm, dict) else None
+    llm_model = (req.llm or {}).get('model') if isinstance(req.llm, dict) else None
+
+    llm_api_key = (req.llm or {}).get('api_key') if isinstance(req.llm, dict) else None
+    return (
+        req.goal_text,
+        req.instructions,
+        llm_provider,
+        llm_model,
+        llm_api_key,
+        req.history,
+        _prompt_tools(req, tools_available),
+        req.persona,
+        req.driver
+    )
+
+
+def _llm_structured_flag(req: AgentIntentRequest) -> Optional[bool]:
+    """Per-request structured-output override (`llm.structured_output`); None means env default."""
+    if isinstance(req.llm, dict) and req.llm.get('structured_output') is not None:
+        return bool(req.llm.get('structured_output'))
+    return None
+
+
+def _llm_trace(meta: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [dict(stage='llm', **meta)] if meta else []
+
+
+def _forced_tool_decision(req: AgentIntentRequest) -> tuple:
+    return (req.forced_tool, {"echo": True}, None, f"Forced tool: {req.forced_tool}", False)
+
+
+# ---------------------
+# Pre-LLM decision layer
+# ---------------------
+
+_PRE_DECISION = os.environ.get('REASONING_PRE_DECISION', '1') not in ('0', '', 'false', 'False')
+
+# A goal that is nothing but a flat arithmetic expression (no parentheses: `_math_fallback`
+# only evaluates the first flat sub-expression), optionally phrased as a question.
+_PURE_MATH_RE = re.compile(r"^\s*(?:what\s+is|what's|calculate|compute|evaluate|solve)?\s*(-?\d[\d\.\s\+\-\*\/]*)[\s=\?]*$", re.IGNORECASE)
+
+
+def _pre_decide(req: AgentIntentRequest, tools_available: Optional[List[str]], tools_disabled: bool) -> Optional[tuple]:
+    """Return (decision, rule) when the outcome is known without the LLM, else None.
+
+    Only conditions that the later stages would enforce regardless of the model's
+    reply are decided here; `_finalize_intent` still owns everything else.
+    """
+    if not _PRE_DECISION:
+        return None
+
+    m = _PURE_MATH_RE.match(req.goal_text or '')
+    if m and re.search(r'[\+\-\*\/]', m.group(1).strip().lstrip('-')):
+        answer = _math_fallback(req.goal_text)
+        if answer is not None:
+            return ((None, None, answer, "Arithmetic goal evaluated directly.", True), 'pure_math')
+
+    return None
+
+
+def _pre_decision_trace(rule: str) -> List[Dict[str, Any]]:
+    try:
+        log_event('pre_decision', rule=rule)
+    except Exception:
+        pass
+    return [{'stage': 'pre_decision', 'rule': rule}]
+
+
+def _record_search_outcome(req: AgentIntentRequest) -> None:
+    """Feed the newest history item into the search memo; older items were recorded on earlier steps.
+
+    The item is identified by the run (`correlation_id`) and its history position, so a retried
+    job does not count it twice. `session_id` is shared by many runs and cannot tell them apart.
+    """
+    if not (req.history and isinstance(req.history, list)):
+        return
+    latest, _, _, _ = _extract_search_history(req.history[-1:])
+    if latest:
+        entry = latest[0]
+        step_id = f"{req.correlation_id}:{len(req.history) - 1}" if req.correlation_id else None
+        search_memo.record(search_memo.repo_scope(req.repo_context), entry['tool'], entry['query'], entry['had_output'],
+                           step_id=step_id)
 
-def _compute_intent_sync(req: AgentIntentRequest) -> Dict[str, Any]:
-    tool_name = None
-    tool_args: Optional[Dict[str, Any]] = None
-    final_text = None
-    reasoning = None
-    finish = False
-    tools_available = _filter_search_tools(req.tools_available)
-    tools_disabled = req.tools_available is not None and not tools_available
-
-    if req.forced_tool:
-        tool_name = req.forced_tool
-        tool_args = {"echo": True}
-        reasoning = f"Forced tool: {req.forced_tool}"
-        finish = False
-    else:
-        llm_provider = (req.llm or {}).get('provider') if isinstance(req.llm, dict) else None
-        llm_model = (req.llm or {}).get('model') if isinstance(req.llm, dict) else None
-
-        llm_api_key = (req.llm or {}).get('api_key') if isinstance(req.llm, dict) else None
-        tool_name, tool_args, final_text, reasoning, finish = _use_llm_for_reasoning(
-            req.goal_text,
-            req.instructions,
-            llm_provider,
-            llm_model,
-            llm_api_key,
-            req.history,
-            tools_available,
-            req.persona,
-            req.driver
-        )
 
+def _note_token_usage(req: AgentIntentRequest, usage: Dict[str, Any], meta: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Summarize the intent's token usage into the trace meta and the log; None when no LLM call was made."""
+    if not usage['llm_calls']:
+        return None
+    summary = tokens.summary(usage)
+    meta['tokens'] = summary
+    try:
+        persona = req.persona if isinstance(req.persona, dict) else {}
+        log_event('llm_usage', persona=persona.get('name'), llm_calls=summary['llm_calls'],
+                  prompt_tokens_est=summary['prompt_tokens_est'], sections=summary['sections'],
+                  prompt_tokens=summary.get('prompt_tokens'), completion_tokens=summary.get('completion_tokens'))
+    except Exception:
+        pass
+    return summary
+
+
+def _with_usage(result: Dict[str, Any], usage: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if usage is not None:
+        result['usage'] = usage
+    return result
+
+
+def _finalize_intent(req: AgentIntentRequest, decision: tuple, tools_available: Optional[List[str]], tools_disabled: bool, final: bool = False, trace: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Apply search heuristics and math correction to an LLM decision (`final` skips the heuristics)."""
+    tool_name, tool_args, final_text, reasoning, finish = decision
+
+    if not final:
         if tool_name is None and not finish and not tools_disabled:
             has_search_results = False
             if req.history and isinstance(req.history, list):
@@ -648,7 +1419,7 @@ def _compute_intent_sync(req: AgentIntentRequest) -> Dict[str, Any]:
                 # Only force search if it's CLEARLY a search intent and tools are available
                 lower_goal = req.goal_text.lower()
                 is_search_query = any(word in lower_goal for word in ["search", "find", "fts", "lookup"])
-                
+
                 if is_search_query and (tools_available is None or "context.fts_search" in tools_available):
                     tool_name = "context.fts_search"
                     tool_args = {"query": req.goal_text}
@@ -725,5 +1496,132 @@ def _compute_intent_sync(req: AgentIntentRequest) -> Dict[str, Any]:
         "reasoning": reasoning,
         "finish": finish,
         "final_text": final_text,
-        "trace": []
+        "trace": trace or []
     }
+
+
+# ---------------------
+# Semantic answer cache (see reasoning/answer_cache.py)
+# ---------------------
+
+def _answer_cache_scope(req: AgentIntentRequest) -> Optional[tuple]:
+    """(repo, persona) when `req` may use the answer cache, else None.
+
+    Only first-step goals qualify: once there is history, the answer depends on what the searches returned.
+    """
+    llm = req.llm if isinstance(req.llm, dict) else {}
+    enabled = llm.get('answer_cache')
+    if enabled is None:
+        enabled = answer_cache.CACHE_ENABLED
+    if not enabled or req.history or req.forced_tool or not answer_cache.available():
+        return None
+    persona = req.persona if isinstance(req.persona, dict) else {}
+    return search_memo.repo_scope(req.repo_context), str(persona.get('name') or '')
+
+
+def _answer_cache_hit(req: AgentIntentRequest, scope: Optional[tuple], tools_available: Optional[List[str]], tools_disabled: bool) -> Optional[Dict[str, Any]]:
+    if scope is None:
+        return None
+    try:
+        hit = answer_cache.lookup(scope[0], scope[1], req.goal_text)
+    except Exception as e:
+        log_event('answer_cache_error', error=str(e))
+        return None
+    log_event('answer_cache', outcome='hit' if hit else 'miss', hit_rate=answer_cache.stats()['hit_rate'],
+              **({'similarity': hit['similarity'], 'matched_goal': hit['goal'][:200]} if hit else {}))
+    if hit is None:
+        return None
+    decision = (None, None, hit['final_text'], hit['reasoning'] or 'Answered from the semantic answer cache.', True)
+    trace = [{'stage': 'answer_cache', 'similarity': hit['similarity'], 'matched_goal': hit['goal']}]
+    return _finalize_intent(req, decision, tools_available, tools_disabled, final=True, trace=trace)
+
+
+def _answer_cache_store(req: AgentIntentRequest, scope: Optional[tuple], decision: tuple, meta: Dict[str, Any], result: Dict[str, Any]) -> None:
+    """Remember the answer when the model itself finished with a real answer (not a fallback or an echo)."""
+    if scope is None or not (decision[4] and decision[2]) or meta.get('llm_target') == circuit.DETERMINISTIC:
+        return
+    final_text = result.get('final_text')
+    if not result.get('finish') or not final_text or final_text.strip() == (req.goal_text or '').strip():
+        return
+    try:
+        answer_cache.store(scope[0], scope[1], req.goal_text, final_text, result.get('reasoning') or '')
+    except Exception as e:
+        log_event('answer_cache_error', error=str(e))
+
+
+def _compute_intent_sync(req: AgentIntentRequest) -> Dict[str, Any]:
+    result = _compute_step_sync(req)
+    if not search_loop.enabled(req):
+        return result
+    with _log_context(session_id=req.session_id, correlation_id=req.correlation_id):
+        return search_loop.run(req, result, _compute_step_sync)
+
+
+async def _compute_intent_async(req: AgentIntentRequest) -> Dict[str, Any]:
+    """Async variant of `_compute_intent_sync`."""
+    result = await _compute_step_async(req)
+    if not search_loop.enabled(req):
+        return result
+    with _log_context(session_id=req.session_id, correlation_id=req.correlation_id):
+        return await search_loop.run_async(req, result, _compute_step_async)
+
+
+def _compute_step_sync(req: AgentIntentRequest) -> Dict[str, Any]:
+    """One reasoning step; `_compute_intent_sync` may chain several (see reasoning/search_loop.py)."""
+    with _log_context(session_id=req.session_id, correlation_id=req.correlation_id):
+        tools_available = _filter_search_tools(req.tools_available)
+        tools_disabled = req.tools_available is not None and not tools_available
+        _record_search_outcome(req)
+
+        if req.forced_tool:
+            return _finalize_intent(req, _forced_tool_decision(req), tools_available, tools_disabled, final=True)
+
+        pre = _pre_decide(req, tools_available, tools_disabled)
+        if pre is not None:
+            decision, rule = pre
+            return _finalize_intent(req, decision, tools_available, tools_disabled, final=True, trace=_pre_decision_trace(rule))
+
+        scope = _answer_cache_scope(req)
+        cached = _answer_cache_hit(req, scope, tools_available, tools_disabled)
+        if cached is not None:
+            return cached
+
+        meta: Dict[str, Any] = {}
+        with tokens.collect() as usage:
+            decision = _use_llm_for_reasoning(*_llm_call_args(req, tools_available), structured=_llm_structured_flag(req), meta=meta)
+        usage = _note_token_usage(req, usage, meta)
+        result = _with_usage(_finalize_intent(req, decision, tools_available, tools_disabled, trace=_llm_trace(meta)), usage)
+        _answer_cache_store(req, scope, decision, meta, result)
+        return result
+
+
+async def _compute_step_async(req: AgentIntentRequest) -> Dict[str, Any]:
+    """Async variant of `_compute_step_sync`; the LLM call and memo write are awaited."""
+    import asyncio
+
+    with _log_context(session_id=req.session_id, correlation_id=req.correlation_id):
+        tools_available = _filter_search_tools(req.tools_available)
+        tools_disabled = req.tools_available is not None and not tools_available
+        await asyncio.to_thread(_record_search_outcome, req)
+
+        if req.forced_tool:
+            return _finalize_intent(req, _forced_tool_decision(req), tools_available, tools_disabled, final=True)
+
+        pre = _pre_decide(req, tools_available, tools_disabled)
+        if pre is not None:
+            decision, rule = pre
+            return _finalize_intent(req, decision, tools_available, tools_disabled, final=True, trace=_pre_decision_trace(rule))
+
+        scope = _answer_cache_scope(req)
+        cached = await asyncio.to_thread(_answer_cache_hit, req, scope, tools_available, tools_disabled) if scope else None
+        if cached is not None:
+            return cached
+
+        meta: Dict[str, Any] = {}
+        with tokens.collect() as usage:
+            decision = await _use_llm_for_reasoning_async(*_llm_call_args(req, tools_available), structured=_llm_structured_flag(req), meta=meta)
+        usage = _note_token_usage(req, usage, meta)
+        result = _with_usage(_finalize_intent(req, decision, tools_available, tools_disabled, trace=_llm_trace(meta)), usage)
+        if scope:
+            await asyncio.to_thread(_answer_cache_store, req, scope, decision, meta, result)
+        return result
@@ -0,0 +1,444 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Asyncio Reasoning queue worker (Redis-backed).
+
+Same queue and result protocol as `reasoning.worker`, but a single process
+keeps many jobs in flight: a semaphore bounds concurrency, LLM calls go
+through the async provider clients in `reasoning.api`, and Redis is accessed
+with `redis.asyncio`. The sync worker stays the default entry point.
+
+It publishes to the worker registry and, with REASONING_MODEL_AFFINITY=1,
+serves model lanes like the sync worker (reasoning/affinity.py): warm lanes
+are BLPOPed before the shared queue, shared-queue jobs warm on a peer are
+handed to that peer's lane, and an idle worker steals from the longest lane.
+
+Env:
+  - REDIS_URL
+  - REASONING_ASYNC_CONCURRENCY (default 64): max in-flight jobs
+"""
+
+import asyncio
+import collections
+import os
+import signal
+import sys
+import time
+
+import redis.asyncio as aioredis
+
+from reasoning import worker as sync_worker
+from reasoning.worker import (
+    QUEUE_KEY,
+    PROCESSING_KEY,
+    COMPLETED_KEY,
+    FAILED_KEY,
+    REDIS_URL,
+    build_intent_request,
+    log,
+)
+from reasoning import affinity
+from reasoning import batching
+from reasoning import control
+from reasoning import fanout
+from reasoning import fastjson
+from reasoning import ledger
+from reasoning import profiling
+from reasoning import recycling
+from reasoning import replay
+
+api_mod = sync_worker.api_mod
+
+CONCURRENCY = int(os.environ.get('REASONING_ASYNC_CONCURRENCY', '64'))
+HEARTBEAT_INTERVAL_S = 10
+REGISTRY_PUBLISH_S = 1.0
+
+
+def get_redis_client():
+    return aioredis.Redis.from_url(REDIS_URL, decode_responses=True)
+
+
+async def _post_callback(callback_url, body):
+    resp = await api_mod._get_async_http_client().post(
+        callback_url, content=fastjson.dumps(body), headers={'Content-Type': 'application/json'}, timeout=5)
+    return resp
+
+
+async def process_job_async(r, job_json):
+    """Async counterpart of `reasoning.worker.process_job`; `job_json` may already be decoded."""
+    try:
+        job = job_json if isinstance(job_json, dict) else fastjson.loads(job_json)
+        if not isinstance(job, dict):
+            raise ValueError('job envelope is not an object')
+    except ValueError as e:
+        preview = str(job_json)
+        log("error: invalid json", payload=preview if len(preview) <= 500 else preview[:500] + '...')
+        pipe = r.pipeline(transaction=False)
+        pipe.lpush(FAILED_KEY, fastjson.dumps({'job_id': None, 'ts': time.time(), 'error': f"invalid json: {e}"}))
+        pipe.ltrim(FAILED_KEY, 0, 99)
+        await pipe.execute()
+        return
+
+    if fanout.is_batch(job):
+        return await process_batch_job_async(r, job, job_json)
+
+    job_id = job.get('job_id')
+    callback_url = job.get('callback_url')
+    result_key = f"savant:result:{job_id}" if job_id else None
+
+    started_at = time.time()
+    mem = recycling.RECYCLER.job_started()
+    prof = profiling.PROFILER.job_started(job_id)
+    log("job_started", job_id=job_id)
+    if job_id:
+        await r.sadd(PROCESSING_KEY, job_id)
+
+    try:
+        payload = job.get('payload') or {}
+        with replay.RECORDER.job(job_id, payload) as rec:
+            req = build_intent_request(payload)
+            result = await api_mod._compute_intent_async(req)
+            replay.note_result(rec, result)
+
+        result['status'] = 'ok'
+        result['job_id'] = job_id or ''
+        result['started_at'] = started_at
+        result['finished_at'] = time.time()
+
+        if callback_url:
+            try:
+                await _post_callback(callback_url, result)
+                log("callback_sent", url=callback_url, status="ok")
+            except Exception as e:
+                log("callback_failed", url=callback_url, error=str(e))
+
+        pipe = r.pipeline(transaction=False)
+        if result_key:
+            pipe.setex(result_key, 60, fastjson.dumps(result))
+        pipe.lpush(COMPLETED_KEY, fastjson.dumps({'job_id': job_id, 'ts': time.time(), 'status': 'ok'}))
+        pipe.ltrim(COMPLETED_KEY, 0, 99)
+        await pipe.execute()
+
+        memory = recycling.RECYCLER.job_finished(mem)
+        await _record_ledger(r, ledger.build_entry(job, ledger.payload_size(job_json, job), started_at,
+                                                   result['finished_at'], 'ok', usage=result.get('usage'),
+                                                   memory=memory))
+
+        log("job_completed", job_id=job_id, **memory)
+
+    except Exception as e:
+        error_msg = str(e)
+        log("job_failed", job_id=job_id, error=error_msg)
+
+        error_result = {
+            "status": "error",
+            "error": error_msg,
+            "job_id": job_id,
+            "started_at": started_at,
+            "finished_at": time.time()
+        }
+
+        if callback_url:
+            try:
+                await _post_callback(callback_url, error_result)
+            except Exception:
+                pass
+
+        pipe = r.pipeline(transaction=False)
+        if result_key:
+            pipe.setex(result_key, 60, fastjson.dumps(error_result))
+        pipe.lpush(FAILED_KEY, fastjson.dumps({'job_id': job_id, 'ts': time.time(), 'error': error_msg}))
+        pipe.ltrim(FAILED_KEY, 0, 99)
+        await pipe.execute()
+
+        memory = recycling.RECYCLER.job_finished(mem)
+        await _record_ledger(r, ledger.build_entry(job, ledger.payload_size(job_json, job), started_at,
+                                                   error_result['finished_at'], 'error', error=error_msg,
+                                                   memory=memory))
+    finally:
+        recycling.RECYCLER.job_finished(mem)
+        profiling.PROFILER.job_finished(prof)
+        if job_id:
+            await r.srem(PROCESSING_KEY, job_id)
+
+
+async def _run_batch_item_async(r, sem, job_id, item_id, payload, stream, emitted):
+    async with sem:
+        try:
+            with replay.RECORDER.job(f"{job_id}:{item_id}", payload) as rec:
+                result = await api_mod._compute_intent_async(build_intent_request(payload))
+                replay.note_result(rec, result)
+            doc = fanout.item_ok(item_id, result)
+        except Exception as e:
+            log("batch_item_failed", job_id=job_id, item_id=item_id, error=str(e))
+            doc = fanout.item_error(item_id, e)
+    if stream and job_id:
+        try:
+            pipe = r.pipeline(transaction=False)
+            fanout.push_item(pipe, job_id, doc)
+            await pipe.execute()
+            emitted.add(item_id)
+        except Exception as e:
+            log("batch_item_push_failed", job_id=job_id, item_id=item_id, error=str(e))
+    return doc
+
+
+async def process_batch_job_async(r, job, job_json):
+    """Async counterpart of `reasoning.worker.process_batch_job`; items run as concurrent tasks."""
+    job_id = job.get('job_id')
+    callback_url = job.get('callback_url')
+    result_key = f"savant:result:{job_id}" if job_id else None
+    started_at = time.time()
+    emitted = set()  # item ids already streamed to the caller
+    mem = recycling.RECYCLER.job_started()
+    prof = profiling.PROFILER.job_started(job_id)
+    if job_id:
+        await r.sadd(PROCESSING_KEY, job_id)
+    try:
+        try:
+            items = fanout.item_payloads(job)
+        except ValueError as e:
+            items = []
+            result = fanout.failure(job_id, job, e, started_at)
+        if items:
+            stream = fanout.mode(job) == 'stream'
+            log("batch_started", job_id=job_id, items=len(items), mode=fanout.mode(job))
+            sem = asyncio.Semaphore(max(1, fanout.CONCURRENCY))
+            docs = await asyncio.gather(*(_run_batch_item_async(r, sem, job_id, item_id, payload, stream, emitted)
+                                          for item_id, payload in items))
+            result = fanout.combined(job_id, list(docs), started_at)
+
+        if callback_url:
+            try:
+                await _post_callback(callback_url, result)
+                log("callback_sent", url=callback_url, status="ok")
+            except Exception as e:
+                log("callback_failed", url=callback_url, error=str(e))
+
+        pipe = r.pipeline(transaction=False)
+        if result_key:
+            pipe.setex(result_key, fanout.RESULT_TTL_S, fastjson.dumps(result))
+            if not items and fanout.mode(job) == 'stream':
+                for doc in result['items']:
+                    fanout.push_item(pipe, job_id, doc)
+        if result['status'] == 'error':
+            pipe.lpush(FAILED_KEY, fastjson.dumps({'job_id': job_id, 'ts': time.time(), 'error': result.get('error') or 'all batch items failed'}))
+            pipe.ltrim(FAILED_KEY, 0, 99)
+        else:
+            pipe.lpush(COMPLETED_KEY, fastjson.dumps({'job_id': job_id, 'ts': time.time(), 'status': result['status']}))
+            pipe.ltrim(COMPLETED_KEY, 0, 99)
+        await pipe.execute()
+
+        error = result.get('error') or (f"{result['failed']} of {len(result['items'])} items failed" if result['failed'] else None)
+        memory = recycling.RECYCLER.job_finished(mem)
+        await _record_ledger(r, ledger.build_entry(job, ledger.payload_size(job_json, job), started_at, result['finished_at'],
+                                                   'ok' if result['status'] == 'ok' else 'error', error=error,
+                                                   usage=fanout.merged_usage(result['items']),
+                                                   memory=memory))
+        log("batch_completed", job_id=job_id, status=result['status'], items=len(result['items']), failed=result['failed'],
+            **memory)
+    except Exception as e:
+        log("job_failed", job_id=job_id, error=str(e))
+        try:
+            pipe = r.pipeline(transaction=False)
+            fanout.add_failure(pipe, job_id, job, e, emitted, started_at)
+            await pipe.execute()
+        except Exception as store_error:
+            log("batch_failure_store_failed", job_id=job_id, error=str(store_error))
+    finally:
+        recycling.RECYCLER.job_finished(mem)
+        profiling.PROFILER.job_finished(prof)
+        if job_id:
+            await r.srem(PROCESSING_KEY, job_id)
+
+
+async def _record_ledger(r, entry):
+    if not ledger.LEDGER_ENABLED:
+        return
+    try:
+        pipe = r.pipeline(transaction=False)
+        ledger.add_to_pipeline(pipe, entry)
+        await pipe.execute()
+    except Exception as e:
+        log("ledger_write_failed", error=str(e))
+
+
+async def _heartbeat_loop(r, worker_id, stop):
+    while not stop.is_set():
+        try:
+            await r.setex(f"savant:workers:heartbeat:{worker_id}", 30, str(time.time()))
+        except Exception as e:
+            log("heartbeat_failed", error=str(e))
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=HEARTBEAT_INTERVAL_S)
+        except asyncio.TimeoutError:
+            pass
+
+
+class _Slots:
+    """In-flight job limit; unlike asyncio.Semaphore it can be resized while jobs run."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.used = 0
+        self._waiters = collections.deque()
+
+    async def acquire(self):
+        while self.used >= self.limit:
+            waiter = asyncio.get_running_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._waiters:
+                    self._waiters.remove(waiter)
+        self.used += 1
+
+    def release(self):
+        self.used -= 1
+        self._wake()
+
+    def resize(self, limit: int):
+        self.limit = limit
+        self._wake()
+
+    def _wake(self):
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+
+
+async def _run_bounded(sem, r, job_json):
+    try:
+        await process_job_async(r, job_json)
+    except Exception as e:
+        log("job_task_error", error=str(e))
+    finally:
+        sem.release()
+
+
+async def _route_popped(r, router, source, job_json):
+    """The job to run here (decoded when affinity needs its model), or None when it went to a peer's lane."""
+    if not router.enabled:
+        return job_json
+    job = batching.decode_job(job_json)
+    if job is None:
+        return job_json  # process_job_async records it as invalid
+    # Only shared-queue jobs are re-routed; lane jobs always run where they land.
+    if source == QUEUE_KEY:
+        lane = await router.route_target_async(r, job)
+        if lane:
+            await router.push_to_lane_async(r, lane, job_json if isinstance(job_json, str) else fastjson.dumps(job_json))
+            log("job_routed", job_id=job.get('job_id'), lane=lane)
+            return None
+    router.note_model(*batching.batch_key(job))
+    return job
+
+
+async def run(concurrency: int = CONCURRENCY, stop: asyncio.Event = None, r=None) -> int:
+    """Consume the queue until `stop` is set, keeping up to `concurrency` jobs in flight."""
+    stop = stop or asyncio.Event()
+    log("worker_starting", pid=os.getpid(), mode="async", concurrency=concurrency)
+    r = r or get_redis_client()
+    try:
+        await r.ping()
+        log("redis_connected")
+    except Exception as e:
+        log("redis_connection_failed", error=str(e))
+        return 1
+
+    worker_id = f"{os.uname().nodename}:{os.getpid()}"
+    profiling.PROFILER.mark_async_loop()
+    heartbeat = asyncio.create_task(_heartbeat_loop(r, worker_id, stop))
+    sem = _Slots(concurrency)
+    in_flight = set()
+    router = affinity.AffinityRouter(worker_id, QUEUE_KEY, enabled=affinity.AFFINITY_ENABLED, concurrency=concurrency)
+    if router.enabled:
+        log("model_affinity_enabled", warm_ttl_s=router.warm_ttl_s, max_warm=router.max_warm)
+    published_at = 0.0
+
+    def _resize(n):
+        sem.resize(n)
+        router.concurrency = n
+
+    ctl = control.WorkerControl(worker_id, 'async', concurrency, on_concurrency=_resize,
+                                status=lambda: {'in_flight': len(in_flight)})
+    listener = asyncio.create_task(control.listen_async(r, ctl, stop, log=log))
+    recycler = recycling.RECYCLER
+    exit_code = 0
+    if recycler.enabled:
+        log("recycling_enabled", max_jobs=recycler.max_jobs, max_rss_mb=recycler.max_rss_mb, max_age_s=recycler.max_age_s)
+
+    log("waiting_for_jobs", queue=QUEUE_KEY)
+    while not stop.is_set():
+        # Past a recycle limit: stop dequeuing, drain in-flight jobs below and exit for a fresh process
+        reason = recycler.reason()
+        if reason:
+            log("worker_recycling", reason=reason, **recycler.snapshot())
+            exit_code = recycling.RECYCLE_EXIT_CODE
+            break
+        await profiling.PROFILER.poll_async(r, log=log)
+        if time.monotonic() - published_at >= REGISTRY_PUBLISH_S:
+            await router.publish_async(r, load=len(in_flight))
+            published_at = time.monotonic()
+        if ctl.paused:
+            await asyncio.sleep(0.5)
+            continue
+        # Only dequeue when a slot is free so queued jobs stay visible to other workers.
+        await sem.acquire()
+        if stop.is_set():
+            sem.release()
+            break
+        try:
+            # Warm-model lanes come before the shared queue; when idle, take work from another model's lane
+            item = await r.blpop(router.pop_keys(), timeout=1)
+            if not item:
+                item = await router.steal_async(r)
+            job_json = await _route_popped(r, router, *item) if item else None
+        except Exception as e:
+            sem.release()
+            log("worker_loop_error", error=str(e))
+            await asyncio.sleep(1)
+            continue
+        if job_json is None:
+            sem.release()
+            continue
+        task = asyncio.create_task(_run_bounded(sem, r, job_json))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    log("worker_stopping", in_flight=len(in_flight))
+    if in_flight:
+        await asyncio.gather(*in_flight, return_exceptions=True)
+    await router.unregister_async(r)
+    profiling.PROFILER.stop()
+    heartbeat.cancel()
+    listener.cancel()
+    await api_mod._close_async_http_client()
+    return exit_code
+
+
+async def _main_async() -> int:
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+    if hasattr(signal, 'SIGUSR1'):
+        try:
+            loop.add_signal_handler(signal.SIGUSR1, profiling.PROFILER.request_toggle)
+        except NotImplementedError:
+            pass
+    return await run(stop=stop)
+
+
+def main() -> int:
+    return asyncio.run(_main_async())
+
+
+if __name__ == "__main__":
+    sys.exit(main())
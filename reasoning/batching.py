@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Micro-batching helpers for the Redis reasoning worker.
+
+After the worker pops one job it may keep draining the queue for a short
+window (or until a max batch size), group the jobs by (provider, model),
+and dispatch each group concurrently so the local model serves them as one
+parallel batch instead of one request at a time. Results still fan out per
+job_id because each job is processed (and stored) individually.
+
+Env:
+  - REASONING_BATCH_WINDOW_MS (default 0 = disabled)
+  - REASONING_BATCH_MAX (default 8)
+"""
+
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Tuple
+
+from reasoning import fastjson
+
+BATCH_WINDOW_MS = int(os.environ.get('REASONING_BATCH_WINDOW_MS', '0'))
+BATCH_MAX = int(os.environ.get('REASONING_BATCH_MAX', '8'))
+
+
+def batch_key(job: Dict[str, Any]) -> Tuple[str, str]:
+    """(provider, model) a job will be dispatched to; mirrors `_use_llm_for_reasoning` defaults."""
+    payload = job.get('payload') if isinstance(job, dict) else None
+    llm = (payload or {}).get('llm') if isinstance(payload, dict) else None
+    if llm is None and isinstance(payload, dict) and isinstance(payload.get('shared'), dict):
+        llm = payload['shared'].get('llm')  # fan-out batch envelope
+    if not isinstance(llm, dict):
+        llm = {}
+    provider = (llm.get('provider') or 'ollama').lower().strip()
+    model = llm.get('model') or 'phi3.5:latest'
+    return provider, model
+
+
+def decode_job(job_json):
+    if isinstance(job_json, dict):
+        return job_json
+    try:
+        job = fastjson.loads(job_json)
+        return job if isinstance(job, dict) else None
+    except Exception:
+        return None
+
+
+def collect_batch(r, queue_key: str, first, window_ms: int = BATCH_WINDOW_MS, max_size: int = BATCH_MAX) -> List[Any]:
+    """Drain up to `max_size` queued jobs (including `first`) within `window_ms`."""
+    items = [first]
+    if window_ms <= 0 or max_size <= 1:
+        return items
+    deadline = time.monotonic() + window_ms / 1000.0
+    while len(items) < max_size:
+        more = r.lpop(queue_key, max_size - len(items))
+        if more:
+            items.extend(more if isinstance(more, list) else [more])
+            continue
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        time.sleep(min(0.005, remaining))
+    return items
+
+
+def group_jobs(items: List[Any]) -> "OrderedDict[Tuple[str, str], List[Any]]":
+    """Group raw job payloads by batch key, keeping first-arrival order of groups and jobs."""
+    groups: "OrderedDict[Tuple[str, str], List[Any]]" = OrderedDict()
+    for raw in items:
+        job = decode_job(raw)
+        key = batch_key(job) if job is not None else ('invalid', '')
+        groups.setdefault(key, []).append(job if job is not None else raw)
+    return groups
+
+
+def dispatch_groups(groups, handler: Callable[[Any], None], executor: ThreadPoolExecutor, log=None) -> None:
+    """Run each group's jobs concurrently; groups run one after another so a model stays warm."""
+    for key, jobs in groups.items():
+        if log:
+            log("batch_dispatch", provider=key[0], model=key[1], size=len(jobs))
+        if len(jobs) == 1:
+            handler(jobs[0])
+            continue
+        wait([executor.submit(handler, job) for job in jobs])
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Per-provider circuit breakers and ordered LLM fallback chains.
+
+Each provider endpoint (`ollama`, `google api`) has a breaker fed with the
+outcome and latency of every call. While closed, it trips open once the
+recent window has enough calls and either the failure rate or the
+slow-call rate crosses its threshold. Only connection errors, timeouts
+and 5xx responses are failures. A 4xx (e.g. a model that is not pulled)
+or an unparseable response says nothing about the endpoint and is not
+counted. Neither is a 429: the rate-limit loop (reasoning/ratelimit.py)
+waits and retries it. While open, calls are refused
+immediately with `CircuitOpen`, so a dead host costs microseconds instead
+of a connect timeout per job. After `open_s` it goes half-open and lets one
+probe through: success closes it, failure re-opens it.
+
+Breakers are per process; each worker learns about a dead host from its
+own first few failures.
+
+A fallback chain lists what to try after the requested model, keyed by
+`provider:model`, `model`, `provider` or `*` (first match wins):
+  {"phi3.5:latest": ["google api:gemini-1.5-flash", "deterministic"]}
+`deterministic` ends the chain with the heuristic decision path instead of
+an LLM error.
+
+Env:
+  - REASONING_BREAKER=0 disables breakers (default on)
+  - REASONING_BREAKER_WINDOW_S (30), REASONING_BREAKER_MIN_CALLS (5)
+  - REASONING_BREAKER_FAILURE_RATE (0.5), REASONING_BREAKER_SLOW_RATE (0.5)
+  - REASONING_BREAKER_SLOW_CALL_S (default 0: slow calls never trip;
+    set it above the provider timeout's normal range, e.g. 15 for Google)
+  - REASONING_BREAKER_OPEN_S (15)
+  - REASONING_FALLBACK_CHAINS (JSON, default {})
+  - REASONING_FALLBACK_GOOGLE_API_KEY: key for Google entries when the job has none
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, NamedTuple, Optional, Tuple
+
+BREAKER_ENABLED = os.environ.get('REASONING_BREAKER', '1') not in ('0', '', 'false', 'False')
+WINDOW_S = float(os.environ.get('REASONING_BREAKER_WINDOW_S', '30'))
+MIN_CALLS = int(os.environ.get('REASONING_BREAKER_MIN_CALLS', '5'))
+FAILURE_RATE = float(os.environ.get('REASONING_BREAKER_FAILURE_RATE', '0.5'))
+SLOW_RATE = float(os.environ.get('REASONING_BREAKER_SLOW_RATE', '0.5'))
+SLOW_CALL_S = float(os.environ.get('REASONING_BREAKER_SLOW_CALL_S', '0'))
+OPEN_S = float(os.environ.get('REASONING_BREAKER_OPEN_S', '15'))
+FALLBACK_GOOGLE_API_KEY = os.environ.get('REASONING_FALLBACK_GOOGLE_API_KEY') or None
+
+try:
+    CHAINS: Dict[str, List[str]] = json.loads(os.environ.get('REASONING_FALLBACK_CHAINS') or '{}')
+except ValueError:
+    CHAINS = {}
+
+DETERMINISTIC = 'deterministic'
+CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+
+class CircuitOpen(Exception):
+    """Refused without calling the provider because its breaker is open."""
+
+
+class CircuitBreaker:
+    """Rolling-window breaker; thread-safe and cheap enough to call from the event loop."""
+
+    def __init__(self, name: str, window_s: float = WINDOW_S, min_calls: int = MIN_CALLS,
+                 failure_rate: float = FAILURE_RATE, slow_rate: float = SLOW_RATE,
+                 slow_call_s: float = SLOW_CALL_S, open_s: float = OPEN_S):
+        self.name = name
+        self.window_s = window_s
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_rate = slow_rate
+        self.slow_call_s = slow_call_s
+        self.open_s = open_s
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.trips = 0
+        self.rejected = 0
+        self._probe_in_flight = False
+        self._calls: Deque[Tuple[float, bool, bool]] = deque()  # (ts, failed, slow)
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float) -> None:
+        while self._calls and now - self._calls[0][0] > self.window_s:
+            self._calls.popleft()
+
+    def _trip(self, now: float) -> None:
+        self.state = OPEN
+        self.opened_at = now
+        self.trips += 1
+        self._probe_in_flight = False
+        self._calls.clear()
+
+    def available(self, now: Optional[float] = None) -> bool:
+        """True when a call could be admitted now; does not take the half-open probe slot."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.state == OPEN:
+                return now - self.opened_at >= self.open_s
+            if self.state == HALF_OPEN:
+                return not self._probe_in_flight
+            return True
+
+    def check(self) -> None:
+        """Raise `CircuitOpen` when no call could be admitted now; takes nothing."""
+        if not self.available():
+            with self._lock:
+                self.rejected += 1
+            raise CircuitOpen(f"circuit open for {self.name}")
+
+    def before_call(self, now: Optional[float] = None) -> None:
+        """Admit a call or raise `CircuitOpen`; a half-open breaker admits a single probe."""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if self.state == OPEN and now - self.opened_at >= self.open_s:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            if self.state != CLOSED:
+                self.rejected += 1
+                raise CircuitOpen(f"circuit open for {self.name}")
+
+    def record(self, ok: bool, elapsed_s: float, now: Optional[float] = None) -> bool:
+        """Feed one call outcome; returns True when this call tripped the breaker open."""
+        now = time.monotonic() if now is None else now
+        slow = self.slow_call_s > 0 and elapsed_s >= self.slow_call_s
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if ok and not slow:
+                    self.state = CLOSED
+                    self._probe_in_flight = False
+                    self._calls.clear()
+                    return False
+                self._trip(now)
+                return True
+            if self.state == OPEN:
+                return False  # a call admitted before the trip finished late
+            self._calls.append((now, not ok, slow))
+            self._prune(now)
+            n = len(self._calls)
+            if n < self.min_calls:
+                return False
+            failed = sum(1 for _, f, _ in self._calls if f)
+            slowed = sum(1 for _, _, s in self._calls if s)
+            if failed / n >= self.failure_rate or slowed / n >= self.slow_rate:
+                self._trip(now)
+                return True
+            return False
+
+    def release(self) -> None:
+        """The admitted call ended without a verdict on provider health (e.g. local rate-limit wait)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            self._prune(time.monotonic())
+            return {'state': self.state, 'calls': len(self._calls),
+                    'failures': sum(1 for _, f, _ in self._calls if f),
+                    'slow': sum(1 for _, _, s in self._calls if s),
+                    'trips': self.trips, 'rejected': self.rejected}
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker_name(provider: str) -> str:
+    return 'google api' if provider == 'google api' else 'ollama'
+
+
+def get(provider: str) -> Optional[CircuitBreaker]:
+    """The breaker for `provider`, or None when breakers are disabled."""
+    if not BREAKER_ENABLED:
+        return None
+    name = breaker_name(provider)
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.setdefault(name, CircuitBreaker(name))
+    return breaker
+
+
+def reset() -> None:
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def snapshot() -> Dict[str, Dict[str, Any]]:
+    return {name: b.snapshot() for name, b in list(_breakers.items())}
+
+
+class Target(NamedTuple):
+    provider: str
+    model: str
+
+    @property
+    def deterministic(self) -> bool:
+        return self.provider == DETERMINISTIC
+
+    def label(self) -> str:
+        return DETERMINISTIC if self.deterministic else f"{self.provider}:{self.model}"
+
+
+def parse_target(entry: str) -> Optional[Target]:
+    """`provider:model` (the model may itself contain ':') or `deterministic`."""
+    entry = str(entry or '').strip()
+    if entry.lower() == DETERMINISTIC:
+        return Target(DETERMINISTIC, '')
+    provider, sep, model = entry.partition(':')
+    if not sep or not model:
+        return None
+    return Target(provider.strip().lower(), model.strip())
+
+
+def chain_for(provider: str, model: str, chains: Optional[Dict[str, List[str]]] = None) -> List[Target]:
+    """The requested target followed by its configured fallbacks, without duplicates."""
+    chains = CHAINS if chains is None else chains
+    entries: List[str] = []
+    for key in (f"{provider}:{model}", model, provider, '*'):
+        if key in chains:
+            entries = chains[key] or []
+            break
+    out = [Target(provider, model)]
+    for entry in entries:
+        target = parse_target(entry)
+        if target is not None and target not in out:
+            out.append(target)
+    return out
@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Python client for the Redis reasoning worker.
+
+It speaks the same protocol as `Savant::Reasoning::Client`. A job
+envelope `{"job_id", "payload", "created_at"[, "callback_url"]}` is
+RPUSHed onto `savant:queue:reasoning`. The worker stores the result at
+`savant:result:{job_id}` with a short TTL (60s): `{"status": "ok", ...}`
+or `{"status": "error", "error": ...}`.
+
+- One pooled connection set per client, shared by every thread
+  (BlockingConnectionPool, so callers queue instead of failing when all
+  connections are busy).
+- `submit_many` pushes any number of jobs in one pipeline round trip.
+- `wait_many` waits for many job ids at once. One MGET per poll covers
+  every job still pending; the poll interval backs off from POLL_MIN_S to
+  POLL_MAX_S.
+- Waits take `timeout_s` or an absolute `deadline` (time.monotonic()).
+  Jobs that are not done by then are reported as ReasoningTimeout.
+  Read results before the worker's TTL expires them.
+
+    client = ReasoningClient()
+    intents = client.agent_intents([{'session_id': 's', 'persona': {...}, 'goal_text': '...'}, ...])
+
+`AsyncReasoningClient` is the same API on redis.asyncio.
+
+Env:
+  - REDIS_URL (default redis://localhost:6379/0)
+  - REASONING_API_TIMEOUT_MS (default 30000), as in the Ruby client
+"""
+
+import os
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from reasoning import fastjson
+
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+QUEUE_KEY = 'savant:queue:reasoning'
+RESULT_PREFIX = 'savant:result:'
+DEFAULT_TIMEOUT_S = int(os.environ.get('REASONING_API_TIMEOUT_MS', '30000')) / 1000.0
+MAX_CONNECTIONS = 32
+POLL_MIN_S = 0.01
+POLL_MAX_S = 0.25
+
+
+class ReasoningError(RuntimeError):
+    """A job the worker finished with status "error"."""
+
+    def __init__(self, job_id: str, message: str):
+        super().__init__(message)
+        self.job_id = job_id
+
+
+class ReasoningTimeout(ReasoningError):
+    """No result before the deadline."""
+
+
+def result_key(job_id: str) -> str:
+    return f"{RESULT_PREFIX}{job_id}"
+
+
+def new_job_id(prefix: str = 'agent') -> str:
+    return f"{prefix}-{int(time.time())}-{uuid.uuid4().hex[:10]}"
+
+
+def envelope(payload: Dict[str, Any], job_id: Optional[str] = None, callback_url: Optional[str] = None) -> Dict[str, Any]:
+    job = {'job_id': job_id or new_job_id(), 'payload': payload,
+           'created_at': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')}
+    if callback_url:
+        job['callback_url'] = callback_url
+    return job
+
+
+def _deadline(timeout_s: Optional[float], deadline: Optional[float], default: float) -> float:
+    if deadline is not None:
+        return deadline
+    return time.monotonic() + (default if timeout_s is None else timeout_s)
+
+
+def _decode_results(pending: List[str], raws: List[Optional[str]], out: Dict[str, Dict[str, Any]]) -> List[str]:
+    """Move finished jobs into `out`; returns the ids still pending."""
+    still = []
+    for job_id, raw in zip(pending, raws):
+        if raw is None:
+            still.append(job_id)
+            continue
+        try:
+            doc = fastjson.loads(raw)
+        except ValueError:
+            doc = {'status': 'error', 'error': 'undecodable result'}
+        out[job_id] = doc if isinstance(doc, dict) else {'status': 'error', 'error': 'result is not an object'}
+    return still
+
+
+def _next_poll(interval: float, end: float) -> float:
+    return max(0.0, min(interval, end - time.monotonic()))
+
+
+def _unwrap(job_id: str, doc: Optional[Dict[str, Any]]) -> Union[Dict[str, Any], ReasoningError]:
+    if doc is None:
+        return ReasoningTimeout(job_id, 'timeout')
+    if doc.get('status') == 'error':
+        return ReasoningError(job_id, doc.get('error') or 'unknown_worker_error')
+    return doc
+
+
+class ReasoningClient:
+    """Sync client; safe to share between threads."""
+
+    def __init__(self, redis_url: str = REDIS_URL, timeout_s: float = DEFAULT_TIMEOUT_S,
+                 max_connections: int = MAX_CONNECTIONS, redis_client=None):
+        if redis_client is None:
+            import redis
+            pool = redis.BlockingConnectionPool.from_url(redis_url, max_connections=max_connections,
+                                                         timeout=timeout_s, decode_responses=True)
+            redis_client = redis.Redis(connection_pool=pool)
+        self.r = redis_client
+        self.timeout_s = timeout_s
+
+    def close(self) -> None:
+        self.r.close()
+
+    def submit(self, payload: Dict[str, Any], job_id: Optional[str] = None, callback_url: Optional[str] = None) -> str:
+        job = envelope(payload, job_id, callback_url)
+        self.r.rpush(QUEUE_KEY, fastjson.dumps(job))
+        return job['job_id']
+
+    def submit_many(self, payloads: Iterable[Dict[str, Any]], callback_url: Optional[str] = None) -> List[str]:
+        """Queue every payload in one pipeline; job ids in payload order."""
+        jobs = [envelope(p, callback_url=callback_url) for p in payloads]
+        if jobs:
+            pipe = self.r.pipeline(transaction=False)
+            pipe.rpush(QUEUE_KEY, *[fastjson.dumps(job) for job in jobs])
+            pipe.execute()
+        return [job['job_id'] for job in jobs]
+
+    def wait_many(self, job_ids: Iterable[str], timeout_s: Optional[float] = None,
+                  deadline: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        """Result documents (ok or error) for the jobs that finished before the deadline."""
+        end = _deadline(timeout_s, deadline, self.timeout_s)
+        pending = list(dict.fromkeys(job_ids))
+        out: Dict[str, Dict[str, Any]] = {}
+        interval = POLL_MIN_S
+        while pending:
+            pending = _decode_results(pending, self.r.mget([result_key(j) for j in pending]), out)
+            if not pending or time.monotonic() >= end:
+                break
+            time.sleep(_next_poll(interval, end))
+            interval = min(POLL_MAX_S, interval * 1.5)
+        return out
+
+    def wait(self, job_id: str, timeout_s: Optional[float] = None, deadline: Optional[float] = None) -> Dict[str, Any]:
+        """The job's result; raises ReasoningTimeout or ReasoningError."""
+        result = _unwrap(job_id, self.wait_many([job_id], timeout_s, deadline).get(job_id))
+        if isinstance(result, ReasoningError):
+            raise result
+        return result
+
+    def agent_intent(self, payload: Dict[str, Any], timeout_s: Optional[float] = None) -> Dict[str, Any]:
+        return self.wait(self.submit(payload), timeout_s)
+
+    def agent_intents(self, payloads: Iterable[Dict[str, Any]], timeout_s: Optional[float] = None,
+                      deadline: Optional[float] = None) -> List[Union[Dict[str, Any], ReasoningError]]:
+        """Submit all, wait under one deadline; each element is a result or the ReasoningError for it."""
+        end = _deadline(timeout_s, deadline, self.timeout_s)
+        job_ids = self.submit_many(payloads)
+        done = self.wait_many(job_ids, deadline=end)
+        return [_unwrap(j, done.get(j)) for j in job_ids]
+
+
+class AsyncReasoningClient:
+    """`ReasoningClient` on redis.asyncio; use one per event loop."""
+
+    def __init__(self, redis_url: str = REDIS_URL, timeout_s: float = DEFAULT_TIMEOUT_S,
+                 max_connections: int = MAX_CONNECTIONS, redis_client=None):
+        if redis_client is None:
+            import redis.asyncio as aioredis
+            pool = aioredis.BlockingConnectionPool.from_url(redis_url, max_connections=max_connections,
+                                                            timeout=timeout_s, decode_responses=True)
+            redis_client = aioredis.Redis(connection_pool=pool)
+        self.r = redis_client
+        self.timeout_s = timeout_s
+
+    async def close(self) -> None:
+        await (self.r.aclose() if hasattr(self.r, 'aclose') else self.r.close())
+
+    async def submit(self, payload: Dict[str, Any], job_id: Optional[str] = None,
+                     callback_url: Optional[str] = None) -> str:
+        job = envelope(payload, job_id, callback_url)
+        await self.r.rpush(QUEUE_KEY, fastjson.dumps(job))
+        return job['job_id']
+
+    async def submit_many(self, payloads: Iterable[Dict[str, Any]], callback_url: Optional[str] = None) -> List[str]:
+        jobs = [envelope(p, callback_url=callback_url) for p in payloads]
+        if jobs:
+            pipe = self.r.pipeline(transaction=False)
+            pipe.rpush(QUEUE_KEY, *[fastjson.dumps(job) for job in jobs])
+            await pipe.execute()
+        return [job['job_id'] for job in jobs]
+
+    async def wait_many(self, job_ids: Iterable[str], timeout_s: Optional[float] = None,
+                        deadline: Optional[float] = None) -> Dict[str, Dict[str, Any]]:
+        import asyncio
+
+        end = _deadline(timeout_s, deadline, self.timeout_s)
+        pending = list(dict.fromkeys(job_ids))
+        out: Dict[str, Dict[str, Any]] = {}
+        interval = POLL_MIN_S
+        while pending:
+            pending = _decode_results(pending, await self.r.mget([result_key(j) for j in pending]), out)
+            if not pending or time.monotonic() >= end:
+                break
+            await asyncio.sleep(_next_poll(interval, end))
+            interval = min(POLL_MAX_S, interval * 1.5)
+        return out
+
+    async def wait(self, job_id: str, timeout_s: Optional[float] = None,
+                   deadline: Optional[float] = None) -> Dict[str, Any]:
+        result = _unwrap(job_id, (await self.wait_many([job_id], timeout_s, deadline)).get(job_id))
+        if isinstance(result, ReasoningError):
+            raise result
+        return result
+
+    async def agent_intent(self, payload: Dict[str, Any], timeout_s: Optional[float] = None) -> Dict[str, Any]:
+        return await self.wait(await self.submit(payload), timeout_s)
+
+    async def agent_intents(self, payloads: Iterable[Dict[str, Any]], timeout_s: Optional[float] = None,
+                            deadline: Optional[float] = None) -> List[Union[Dict[str, Any], ReasoningError]]:
+        end = _deadline(timeout_s, deadline, self.timeout_s)
+        job_ids = await self.submit_many(payloads)
+        done = await self.wait_many(job_ids, deadline=end)
+        return [_unwrap(j, done.get(j)) for j in job_ids]
@@ -0,0 +1,293 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Runtime control plane for reasoning workers.
+
+Every worker subscribes to the pub/sub channel `savant:control`. A command
+is one JSON message:
+
+  {"id": "c-1a2b", "cmd": "concurrency", "args": {"value": 16}, "target": "*"}
+
+`target` is "*" (default), a worker id (host:pid), or a list of them.
+Each worker that applies a command acknowledges it by RPUSHing to
+`savant:control:acks:{id}` (kept ACK_TTL_S):
+
+  {"id": ..., "worker_id": ..., "cmd": ..., "ok": true, "result": {...}}
+
+Commands:
+  - pause / resume: stop or restart dequeuing. In-flight jobs finish, and
+    heartbeats continue.
+  - concurrency {"value": n}: the async worker's in-flight limit, or the
+    sync worker's micro-batch size (which needs REASONING_BATCH_WINDOW_MS > 0).
+  - timeout {"value": seconds}: LLM HTTP timeout.
+  - log_sample {"value": 0..1}: fraction of routine log events written.
+    Errors and failures are always kept.
+  - flush_caches {"names": [...]}: reset in-process caches (all by default; see FLUSHERS)
+  - status: current settings plus the worker's own counters
+
+Settings changed here last until the process exits. A recycled or
+restarted worker starts again from its env. scripts/reasoning_ctl.py
+publishes commands and collects the acks.
+"""
+
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from reasoning import answer_cache
+from reasoning import api as api_mod
+from reasoning import circuit
+from reasoning import fastjson
+from reasoning import hedging
+from reasoning import profiling
+from reasoning import recycling
+from reasoning import search_memo
+from reasoning import tool_index
+
+CHANNEL = 'savant:control'
+ACK_PREFIX = 'savant:control:acks:'
+ACK_TTL_S = 300
+COMMANDS = ('pause', 'resume', 'concurrency', 'timeout', 'log_sample', 'flush_caches', 'status')
+
+# name -> reset function for the in-process caches `flush_caches` knows about
+FLUSHERS: Dict[str, Callable[[], None]] = {
+    'answer_cache': answer_cache.reset,
+    'circuit': circuit.reset,
+    'hedge': hedging.reset,
+    'search_memo': search_memo.reset,
+    'tool_index': tool_index.reset,
+}
+
+
+def ack_key(command_id: str) -> str:
+    return f"{ACK_PREFIX}{command_id}"
+
+
+def command(cmd: str, args: Optional[Dict[str, Any]] = None, target: Any = '*') -> Dict[str, Any]:
+    """Message for `cmd`; raises ValueError for an unknown command."""
+    if cmd not in COMMANDS:
+        raise ValueError(f"unknown control command {cmd!r}; expected one of {', '.join(COMMANDS)}")
+    return {'id': f"c-{uuid.uuid4().hex[:12]}", 'cmd': cmd, 'args': args or {}, 'target': target, 'ts': time.time()}
+
+
+def process_status() -> Dict[str, Any]:
+    """Counters every worker mode reports in reply to `status`."""
+    session = profiling.PROFILER.session
+    return {
+        'process': recycling.RECYCLER.snapshot(),
+        'profiling': session.mode if session else None,
+        'breakers': circuit.snapshot(),
+        'hedge': hedging.POLICY.snapshot(),
+        'answer_cache': answer_cache.stats(),
+        'tool_index': tool_index.stats(),
+    }
+
+
+def _positive_number(args: Dict[str, Any], cast=float, upper: Optional[float] = None):
+    value = cast(args.get('value'))
+    if value <= 0 or (upper is not None and value > upper):
+        raise ValueError(f"value must be in (0, {upper if upper is not None else 'inf'}]")
+    return value
+
+
+class WorkerControl:
+    """One worker's live settings and the handlers that change them.
+
+    `on_concurrency(n)` applies a new concurrency (raise ValueError to refuse it);
+    `status()` adds the worker's own counters to the `status` reply.
+    """
+
+    def __init__(self, worker_id: str, mode: str, concurrency: int,
+                 on_concurrency: Optional[Callable[[int], None]] = None,
+                 status: Optional[Callable[[], Dict[str, Any]]] = None):
+        self.worker_id = worker_id
+        self.mode = mode
+        self.concurrency = concurrency
+        self._on_concurrency = on_concurrency
+        self._status = status
+        self._resumed = threading.Event()
+        self._resumed.set()
+
+    @property
+    def paused(self) -> bool:
+        return not self._resumed.is_set()
+
+    def wait_resumed(self, timeout: float) -> bool:
+        """Block up to `timeout` while paused (sync worker); True once consuming is allowed."""
+        return self._resumed.wait(timeout)
+
+    def targets_me(self, msg: Dict[str, Any]) -> bool:
+        target = msg.get('target') or '*'
+        if isinstance(target, list):
+            return self.worker_id in target or '*' in target
+        return target in ('*', self.worker_id)
+
+    def handle(self, msg: Dict[str, Any]) -> Dict[str, Any]:
+        """Apply one command message; returns the ack document (never raises)."""
+        cmd = msg.get('cmd')
+        args = msg.get('args') if isinstance(msg.get('args'), dict) else {}
+        ack = {'id': msg.get('id'), 'worker_id': self.worker_id, 'cmd': cmd, 'ts': time.time()}
+        handler = getattr(self, f"_cmd_{cmd}", None) if cmd in COMMANDS else None
+        if handler is None:
+            ack.update(ok=False, error=f"unknown command {cmd!r}")
+            return ack
+        try:
+            ack.update(ok=True, result=handler(args))
+        except Exception as e:
+            ack.update(ok=False, error=str(e))
+        return ack
+
+    def _cmd_pause(self, args):
+        self._resumed.clear()
+        return {'paused': True}
+
+    def _cmd_resume(self, args):
+        self._resumed.set()
+        return {'paused': False}
+
+    def _cmd_concurrency(self, args):
+        value = _positive_number(args, int)
+        if self._on_concurrency:
+            self._on_concurrency(value)
+        previous, self.concurrency = self.concurrency, value
+        return {'concurrency': value, 'previous': previous}
+
+    def _cmd_timeout(self, args):
+        value = _positive_number(args)
+        previous, api_mod._LLM_TIMEOUT_S = api_mod._LLM_TIMEOUT_S, value
+        return {'timeout_s': value, 'previous': previous}
+
+    def _cmd_log_sample(self, args):
+        value = _positive_number(args, upper=1.0)
+        previous, api_mod._LOG_SAMPLE_RATE = api_mod._LOG_SAMPLE_RATE, value
+        return {'log_sample': value, 'previous': previous}
+
+    def _cmd_flush_caches(self, args):
+        names = args.get('names') or sorted(FLUSHERS)
+        unknown = [n for n in names if n not in FLUSHERS]
+        if unknown:
+            raise ValueError(f"unknown caches {unknown}; known: {', '.join(sorted(FLUSHERS))}")
+        for name in names:
+            FLUSHERS[name]()
+        return {'flushed': list(names)}
+
+    def _cmd_status(self, args):
+        out = self.settings()
+        out.update(process_status())
+        if self._status:
+            out.update(self._status())
+        return out
+
+    def settings(self) -> Dict[str, Any]:
+        return {
+            'mode': self.mode,
+            'paused': self.paused,
+            'concurrency': self.concurrency,
+            'timeout_s': api_mod._LLM_TIMEOUT_S,
+            'log_sample': api_mod._LOG_SAMPLE_RATE,
+        }
+
+
+def _decode(message) -> Optional[Dict[str, Any]]:
+    if not message or message.get('type') != 'message':
+        return None
+    try:
+        msg = fastjson.loads(message.get('data'))
+    except ValueError:
+        return None
+    return msg if isinstance(msg, dict) else None
+
+
+def _queue_ack(pipe, ack: Dict[str, Any]) -> None:
+    key = ack_key(ack.get('id') or 'none')
+    pipe.rpush(key, fastjson.dumps(ack))
+    pipe.expire(key, ACK_TTL_S)
+
+
+def listen(r, control: WorkerControl, stop: threading.Event, log=None) -> None:
+    """Sync subscriber loop (run it in a daemon thread); reconnects after errors."""
+    while not stop.is_set():
+        pubsub = None
+        try:
+            pubsub = r.pubsub(ignore_subscribe_messages=True)
+            pubsub.subscribe(CHANNEL)
+            while not stop.is_set():
+                msg = _decode(pubsub.get_message(timeout=1.0))
+                if msg is None or not control.targets_me(msg):
+                    continue
+                ack = control.handle(msg)
+                if log:
+                    log("control_command", **{k: v for k, v in ack.items() if k != 'worker_id'})
+                pipe = r.pipeline(transaction=False)
+                _queue_ack(pipe, ack)
+                pipe.execute()
+        except Exception as e:
+            if log:
+                log("control_listener_error", error=str(e))
+            stop.wait(1.0)
+        finally:
+            if pubsub is not None:
+                try:
+                    pubsub.close()
+                except Exception:
+                    pass
+
+
+def start_listener(r, control: WorkerControl, log=None) -> threading.Event:
+    """Start `listen` in a daemon thread; set the returned event to stop it."""
+    stop = threading.Event()
+    threading.Thread(target=listen, args=(r, control, stop, log), name='reasoning-control', daemon=True).start()
+    return stop
+
+
+async def listen_async(r, control: WorkerControl, stop, log=None) -> None:
+    """Async subscriber loop for `reasoning.async_worker`; `stop` is an asyncio.Event."""
+    import asyncio
+
+    while not stop.is_set():
+        pubsub = None
+        try:
+            pubsub = r.pubsub(ignore_subscribe_messages=True)
+            await pubsub.subscribe(CHANNEL)
+            while not stop.is_set():
+                msg = _decode(await pubsub.get_message(timeout=1.0))
+                if msg is None or not control.targets_me(msg):
+                    continue
+                ack = control.handle(msg)
+                if log:
+                    log("control_command", **{k: v for k, v in ack.items() if k != 'worker_id'})
+                pipe = r.pipeline(transaction=False)
+                _queue_ack(pipe, ack)
+                await pipe.execute()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if log:
+                log("control_listener_error", error=str(e))
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+        finally:
+            if pubsub is not None:
+                try:
+                    await pubsub.aclose() if hasattr(pubsub, 'aclose') else await pubsub.close()
+                except Exception:
+                    pass
+
+
+def collect_acks(r, command_id: str, expected: int, timeout_s: float = 3.0) -> List[Dict[str, Any]]:
+    """Wait up to `timeout_s` for `expected` acks (sync Redis); returns what arrived."""
+    acks = []
+    deadline = time.monotonic() + timeout_s
+    while len(acks) < expected:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        item = r.blpop(ack_key(command_id), timeout=max(1, int(remaining + 0.999)))
+        if not item:
+            break
+        acks.append(fastjson.loads(item[1]))
+    return acks
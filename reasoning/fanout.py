@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Fan-out batch jobs.
+
+One queue envelope carries every intent of a multi-agent round:
+
+  {"job_id": "council-...", "type": "batch", "created_at": "...",
+   "payload": {"shared": {"session_id": "...", "llm": {...}, "repo_context": {...}},
+               "items": [{"item_id": "alice", "payload": {"persona": {...}, "goal_text": "..."}}, ...],
+               "mode": "combined" | "stream"}}
+
+Each item's payload is laid over `shared`. The shared sections are decoded
+once, and every item request holds a reference to the same objects. The
+worker runs the items in parallel. In both modes the combined result
+(`{"status", "job_id", "items": [...]}`, items in request order) is stored
+at `savant:result:{job_id}` and sent to the callback. `stream` also pushes
+each item result to the list `savant:result:{job_id}:items` as soon as it
+finishes, so a caller can BLPOP results in completion order. A batch that
+fails as a whole (a malformed envelope, or an error outside its items)
+still stores an error result and streams an error for every item not yet
+pushed, so the caller falls back at once instead of at its deadline.
+
+Env:
+  - REASONING_FANOUT_MAX_ITEMS (default 32)
+  - REASONING_FANOUT_CONCURRENCY (default 8): items in flight per batch job
+"""
+
+import os
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from reasoning import fastjson
+
+BATCH_TYPE = 'batch'
+MODES = ('combined', 'stream')
+MAX_ITEMS = int(os.environ.get('REASONING_FANOUT_MAX_ITEMS', '32'))
+CONCURRENCY = int(os.environ.get('REASONING_FANOUT_CONCURRENCY', '8'))
+RESULT_TTL_S = 60
+
+
+def is_batch(job: Dict[str, Any]) -> bool:
+    return isinstance(job, dict) and job.get('type') == BATCH_TYPE
+
+
+def items_key(job_id: str) -> str:
+    return f"savant:result:{job_id}:items"
+
+
+def mode(job: Dict[str, Any]) -> str:
+    value = ((job.get('payload') or {}).get('mode') or 'combined') if isinstance(job.get('payload'), dict) else 'combined'
+    return value if value in MODES else 'combined'
+
+
+def item_payloads(job: Dict[str, Any], max_items: int = MAX_ITEMS) -> List[Tuple[str, Dict[str, Any]]]:
+    """(item_id, merged payload) per item; raises ValueError for a malformed envelope."""
+    payload = job.get('payload')
+    if not isinstance(payload, dict):
+        raise ValueError("batch job needs an object payload")
+    shared = payload.get('shared') or {}
+    items = payload.get('items')
+    if not isinstance(shared, dict):
+        raise ValueError("invalid batch field 'shared': expected object")
+    if not isinstance(items, list) or not items:
+        raise ValueError("invalid batch field 'items': expected a non-empty array")
+    if len(items) > max_items:
+        raise ValueError(f"batch has {len(items)} items; the limit is {max_items}")
+    out = []
+    seen = set()
+    for i, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise ValueError(f"invalid batch item {i}: expected object")
+        item_payload = item.get('payload') if isinstance(item.get('payload'), dict) else item
+        item_id = str(item.get('item_id') or i)
+        if item_id in seen:
+            raise ValueError(f"duplicate batch item_id {item_id!r}")
+        seen.add(item_id)
+        merged = dict(shared)
+        merged.update({k: v for k, v in item_payload.items() if k != 'item_id'})
+        out.append((item_id, merged))
+    return out
+
+
+def item_ok(item_id: str, result: Dict[str, Any]) -> Dict[str, Any]:
+    doc = dict(result)
+    doc['item_id'] = item_id
+    doc['status'] = 'ok'
+    return doc
+
+
+def item_error(item_id: str, error: Exception) -> Dict[str, Any]:
+    return {'item_id': item_id, 'status': 'error', 'error': str(error)}
+
+
+def combined(job_id: str, docs: List[Dict[str, Any]], started_at: float, finished_at: Optional[float] = None) -> Dict[str, Any]:
+    failed = sum(1 for d in docs if d.get('status') != 'ok')
+    return {
+        'status': 'ok' if not failed else ('error' if failed == len(docs) else 'partial'),
+        'job_id': job_id or '',
+        'type': BATCH_TYPE,
+        'items': docs,
+        'failed': failed,
+        'started_at': started_at,
+        'finished_at': finished_at or time.time(),
+    }
+
+
+def merged_usage(docs: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Item token usage summed for the ledger; None when no item called an LLM."""
+    usages = [d['usage'] for d in docs if isinstance(d.get('usage'), dict)]
+    if not usages:
+        return None
+    out = {'llm_calls': 0, 'prompt_tokens_est': 0}
+    for u in usages:
+        out['llm_calls'] += u.get('llm_calls') or 0
+        out['prompt_tokens_est'] += u.get('prompt_tokens_est') or 0
+        if u.get('prompt_tokens') is not None:
+            out['prompt_tokens'] = out.get('prompt_tokens', 0) + u['prompt_tokens']
+            out['completion_tokens'] = out.get('completion_tokens', 0) + (u.get('completion_tokens') or 0)
+    return out
+
+
+def declared_item_ids(job: Dict[str, Any]) -> List[str]:
+    """Item ids a caller may be waiting on, read leniently so a malformed envelope can still be answered."""
+    payload = job.get('payload') if isinstance(job, dict) else None
+    items = payload.get('items') if isinstance(payload, dict) else None
+    if not isinstance(items, list):
+        return []
+    ids = [str((item.get('item_id') if isinstance(item, dict) else None) or i) for i, item in enumerate(items)]
+    return list(dict.fromkeys(ids))
+
+
+def unanswered(job: Dict[str, Any], error: Exception, emitted=()) -> List[Dict[str, Any]]:
+    """An error doc for every declared item not in `emitted`."""
+    return [item_error(item_id, error) for item_id in declared_item_ids(job) if item_id not in emitted]
+
+
+def failure(job_id: str, job: Dict[str, Any], error: Exception, started_at: float) -> Dict[str, Any]:
+    """Combined result of a batch that failed outside its items: every item carries the error."""
+    result = combined(job_id, unanswered(job, error), started_at)
+    result.update(status='error', error=str(error))
+    return result
+
+
+def add_failure(pipe, job_id: str, job: Dict[str, Any], error: Exception, emitted, started_at: float) -> Dict[str, Any]:
+    """Queue on `pipe` what a failed batch owes its caller: the error result and, in stream
+    mode, an error for each item not streamed yet. Without them a streaming caller waits
+    out its whole deadline."""
+    result = failure(job_id, job, error, started_at)
+    if job_id:
+        if mode(job) == 'stream':
+            for doc in unanswered(job, error, emitted):
+                push_item(pipe, job_id, doc)
+        pipe.setex(f"savant:result:{job_id}", RESULT_TTL_S, fastjson.dumps(result))
+    return result
+
+
+def push_item(pipe, job_id: str, doc: Dict[str, Any]) -> None:
+    """Queue one streamed item result on `pipe` (sync or async pipeline)."""
+    key = items_key(job_id)
+    pipe.rpush(key, fastjson.dumps(doc))
+    pipe.expire(key, RESULT_TTL_S)
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+JSON encode/decode for the reasoning worker hot path.
+
+Uses orjson when it is installed and falls back to the stdlib `json` module
+otherwise (or when orjson rejects a value, e.g. non-string dict keys or
+integers beyond 64 bits). `dumps` always returns `str`, so callers and Redis
+fakes see the same type either way.
+"""
+
+import json
+from typing import Any, Callable, Optional
+
+try:
+    import orjson
+except Exception:  # pragma: no cover - optional dependency
+    orjson = None
+
+JSONDecodeError = ValueError  # both json.JSONDecodeError and orjson.JSONDecodeError subclass it
+
+
+def loads(data) -> Any:
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        data = bytes(data).decode('utf-8')
+    return json.loads(data)
+
+
+def dumps(obj: Any, default: Optional[Callable[[Any], Any]] = None) -> str:
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, default=default).decode('utf-8')
+        except TypeError:
+            pass
+    return json.dumps(obj, default=default)
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Hedged LLM requests.
+
+When a call has not answered within a delay learned from recent latencies
+(a high percentile per provider/model), a second identical request is
+fired, optionally at an alternate endpoint. The first to succeed wins. This
+trims the tail, where one stuck request would otherwise hold a job for most
+of the timeout. A budget caps hedges to a small fraction of calls, so
+overall load only grows by that fraction.
+
+The async path cancels the losing task. The sync path runs both attempts
+in a small thread pool and abandons the loser: its result is ignored, but
+the HTTP request itself runs to completion in the background.
+
+Every attempt's latency feeds the percentile window, failures and timeouts
+included, so slow errors keep the delay honest. A cancelled async primary
+counts with the time it had run when it was given up.
+
+`saved_ms` is the effect of winning hedges: how much sooner the call
+returned than the primary would have. The sync path measures it when the
+abandoned primary finishes. The async path cancels the primary, so it
+estimates the remaining time from the recorded latencies that exceeded the
+point where the hedge won.
+
+Env:
+  - REASONING_HEDGE=1 enables hedging (default off)
+  - REASONING_HEDGE_PERCENTILE (default 95): latency percentile used as the delay
+  - REASONING_HEDGE_MIN_DELAY_MS (default 250), REASONING_HEDGE_MIN_SAMPLES (default 20)
+  - REASONING_HEDGE_BUDGET (default 0.05): max hedged fraction of calls
+  - REASONING_HEDGE_THREADS (default 16): sync worker pool size
+  - REASONING_HEDGE_OLLAMA_URL: alternate Ollama base URL for hedges (default: same endpoint)
+"""
+
+import contextvars
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, Dict, Optional, Tuple
+
+HEDGE_ENABLED = os.environ.get('REASONING_HEDGE', '0') not in ('0', '', 'false', 'False')
+HEDGE_PERCENTILE = float(os.environ.get('REASONING_HEDGE_PERCENTILE', '95'))
+MIN_DELAY_S = float(os.environ.get('REASONING_HEDGE_MIN_DELAY_MS', '250')) / 1000.0
+MIN_SAMPLES = int(os.environ.get('REASONING_HEDGE_MIN_SAMPLES', '20'))
+HEDGE_BUDGET = float(os.environ.get('REASONING_HEDGE_BUDGET', '0.05'))
+HEDGE_THREADS = int(os.environ.get('REASONING_HEDGE_THREADS', '16'))
+ALT_OLLAMA_URL = (os.environ.get('REASONING_HEDGE_OLLAMA_URL') or '').rstrip('/') or None
+
+LATENCY_WINDOW = 200
+BUDGET_WINDOW = 1000  # counters are halved past this many calls so the budget tracks recent traffic
+
+
+class HedgePolicy:
+    """Per-key latency windows, the hedge delay derived from them, and the hedge budget."""
+
+    def __init__(self, percentile: float = HEDGE_PERCENTILE, min_delay_s: float = MIN_DELAY_S,
+                 min_samples: int = MIN_SAMPLES, budget: float = HEDGE_BUDGET):
+        self.percentile = percentile
+        self.min_delay_s = min_delay_s
+        self.min_samples = min_samples
+        self.budget = budget
+        self._lock = threading.Lock()
+        self._latencies: Dict[Tuple[str, str], Deque[float]] = {}
+        self._calls = 0.0
+        self._hedges = 0.0
+        self.stats = {'calls': 0, 'hedged': 0, 'hedge_wins': 0, 'budget_denied': 0, 'rate_denied': 0, 'saved_ms': 0.0}
+
+    def observe(self, key: Tuple[str, str], seconds: float) -> None:
+        with self._lock:
+            self._latencies.setdefault(key, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+
+    def delay_for(self, key: Tuple[str, str]) -> Optional[float]:
+        """Hedge delay in seconds, or None until enough samples exist."""
+        with self._lock:
+            samples = sorted(self._latencies.get(key) or ())
+        if len(samples) < self.min_samples:
+            return None
+        idx = min(len(samples) - 1, int(round(self.percentile / 100.0 * (len(samples) - 1))))
+        return max(self.min_delay_s, samples[idx])
+
+    def note_call(self) -> None:
+        with self._lock:
+            self.stats['calls'] += 1
+            self._calls += 1
+            if self._calls > BUDGET_WINDOW:
+                self._calls /= 2.0
+                self._hedges /= 2.0
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self._hedges + 1 > self.budget * self._calls:
+                self.stats['budget_denied'] += 1
+                return False
+            self._hedges += 1
+            self.stats['hedged'] += 1
+            return True
+
+    def refund(self) -> None:
+        """Give back a spent hedge that was not sent (no provider quota for it)."""
+        with self._lock:
+            self._hedges -= 1
+            self.stats['hedged'] -= 1
+            self.stats['rate_denied'] += 1
+
+    def note_hedge_win(self) -> None:
+        with self._lock:
+            self.stats['hedge_wins'] += 1
+
+    def note_saved(self, saved_s: float) -> None:
+        with self._lock:
+            self.stats['saved_ms'] += max(0.0, saved_s) * 1000.0
+
+    def expected_remaining(self, key: Tuple[str, str], elapsed_s: float) -> float:
+        """Mean recorded latency beyond `elapsed_s`, among calls that ran longer (0 when none did)."""
+        with self._lock:
+            longer = [x for x in self._latencies.get(key) or () if x > elapsed_s]
+        return sum(longer) / len(longer) - elapsed_s if longer else 0.0
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            out = dict(self.stats)
+            keys = list(self._latencies)
+        out['saved_ms'] = round(out['saved_ms'], 1)
+        out['hedge_rate'] = round(out['hedged'] / out['calls'], 4) if out['calls'] else 0.0
+        out['delays_ms'] = {f"{p}:{m}": round(d * 1000.0, 1) for p, m in keys
+                            for d in [self.delay_for((p, m))] if d is not None}
+        return out
+
+
+POLICY = HedgePolicy()
+
+
+def reset() -> None:
+    """Forget learned latencies, budget and stats (the policy starts cold again)."""
+    global POLICY
+    POLICY = HedgePolicy()
+
+_pool: Optional[ThreadPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=HEDGE_THREADS, thread_name_prefix='llm-hedge')
+    return _pool
+
+
+def _observer(policy: HedgePolicy, key: Tuple[str, str], started: float, cancelled_too: bool = False):
+    """Done-callback that feeds an attempt's latency to `policy`, whether it succeeded or failed."""
+    def done(fut) -> None:
+        if fut.cancelled() and not cancelled_too:
+            return
+        policy.observe(key, time.monotonic() - started)
+    return done
+
+
+def _spend(policy: HedgePolicy, can_hedge: Callable[[], bool]) -> bool:
+    # Budget first: `can_hedge` may take a provider rate-limit token, which a denied hedge must not use up.
+    if not policy.try_spend():
+        return False
+    if can_hedge():
+        return True
+    policy.refund()
+    return False
+
+
+def run_sync(key: Tuple[str, str], primary: Callable[[], Any], hedge: Callable[[], Any],
+             can_hedge: Callable[[], bool] = lambda: True, policy: HedgePolicy = None,
+             on_event: Callable[..., None] = None):
+    """Run `primary`; after the learned delay also run `hedge`; return the first success."""
+    policy = policy or POLICY
+    policy.note_call()
+    delay = policy.delay_for(key)
+    started = time.monotonic()
+    if delay is None:
+        try:
+            return primary()
+        finally:
+            policy.observe(key, time.monotonic() - started)
+
+    pool = _get_pool()
+    first = pool.submit(contextvars.copy_context().run, primary)
+    first.add_done_callback(_observer(policy, key, started))
+    done, _ = wait([first], timeout=delay)
+    if done or not _spend(policy, can_hedge):
+        return first.result()
+
+    second = pool.submit(contextvars.copy_context().run, hedge)
+    second.add_done_callback(_observer(policy, key, time.monotonic()))
+    pending = {first, second}
+    error = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            if fut.exception() is not None:
+                error = error or fut.exception()
+                continue
+            for loser in pending:
+                loser.cancel()  # only prevents a not-yet-started call; a running request is abandoned
+            if fut is second:
+                won_at = time.monotonic()
+                # The abandoned primary keeps running, so the time saved is measured when it ends.
+                first.add_done_callback(lambda _f: policy.note_saved(time.monotonic() - won_at))
+                policy.note_hedge_win()
+            if on_event:
+                on_event(winner='hedge' if fut is second else 'primary', delay_s=delay)
+            return fut.result()
+    raise error
+
+
+async def run_async(key: Tuple[str, str], primary: Callable[[], Any], hedge: Callable[[], Any],
+                    can_hedge: Callable[[], Any] = None, policy: HedgePolicy = None,
+                    on_event: Callable[..., None] = None):
+    """Async variant of `run_sync`; `primary`/`hedge` return coroutines and the loser is cancelled."""
+    import asyncio
+
+    policy = policy or POLICY
+    policy.note_call()
+    delay = policy.delay_for(key)
+    started = time.monotonic()
+    if delay is None:
+        try:
+            return await primary()
+        finally:
+            policy.observe(key, time.monotonic() - started)
+
+    first = asyncio.ensure_future(primary())
+    # A cancelled primary is recorded at the time it was given up: a lower bound, but it keeps the tail visible.
+    first.add_done_callback(_observer(policy, key, started, cancelled_too=True))
+    done, _ = await asyncio.wait({first}, timeout=delay)
+    if done or not policy.try_spend():  # budget first, as in `_spend`
+        return await first
+    if can_hedge and not await can_hedge():
+        policy.refund()
+        return await first
+
+    second = asyncio.ensure_future(hedge())
+    second.add_done_callback(_observer(policy, key, time.monotonic()))
+    pending = {first, second}
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is not None:
+                    error = error or task.exception()
+                    continue
+                if task is second:
+                    # The primary is cancelled, so its remaining time is estimated from the latencies seen.
+                    policy.note_hedge_win()
+                    policy.note_saved(policy.expected_remaining(key, time.monotonic() - started))
+                if on_event:
+                    on_event(winner='hedge' if task is second else 'primary', delay_s=delay)
+                return task.result()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
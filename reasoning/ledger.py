@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Job ledger for the Redis reasoning workers.
+
+Every processed job appends one entry to a capped Redis Stream
+(`savant:jobs:ledger`) with its enqueue/start/finish timestamps,
+provider/model, payload size and outcome. Workers also fold each job into
+per-minute rollup hashes (`savant:jobs:rollup:{YYYYMMDDHHMM}`) holding a
+count, an error count, time and token sums and a fixed-bucket latency
+histogram. The rollups exist overall (`all|...`), per model
+(`{provider}:{model}|...`) and per persona (`persona:{name}|...`). Rollups expire
+after a few days. p50/p95 are estimated from the histograms, so any time
+range can be aggregated without keeping every sample.
+
+All writes for a job go out in one pipeline, and errors are logged rather
+than raised, so the ledger cannot fail a job.
+
+Env:
+  - REASONING_LEDGER=0 disables recording (default on)
+  - REASONING_LEDGER_MAXLEN (default 100000): approximate stream cap
+  - REASONING_LEDGER_ROLLUP_TTL_S (default 691200, 8 days)
+"""
+
+import os
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from reasoning import fastjson
+from reasoning.batching import batch_key
+
+STREAM_KEY = 'savant:jobs:ledger'
+ROLLUP_PREFIX = 'savant:jobs:rollup:'
+PERSONA_SCOPE = 'persona:'
+
+LEDGER_ENABLED = os.environ.get('REASONING_LEDGER', '1') not in ('0', '', 'false', 'False')
+STREAM_MAXLEN = int(os.environ.get('REASONING_LEDGER_MAXLEN', '100000'))
+ROLLUP_TTL_S = int(os.environ.get('REASONING_LEDGER_ROLLUP_TTL_S', str(8 * 24 * 3600)))
+
+# Upper bounds (ms) of the end-to-end latency histogram; the last bucket is open-ended.
+LATENCY_BUCKETS_MS = [50, 100, 250, 500, 1000, 2500, 5000, 10000, 20000, 30000, 60000, 120000]
+
+
+def minute_key(ts: float) -> str:
+    return ROLLUP_PREFIX + datetime.fromtimestamp(ts, tz=timezone.utc).strftime('%Y%m%d%H%M')
+
+
+def bucket_label(ms: float) -> str:
+    for le in LATENCY_BUCKETS_MS:
+        if ms <= le:
+            return str(le)
+    return 'inf'
+
+
+def _enqueued_at(job: Dict[str, Any]) -> Optional[float]:
+    value = job.get('created_at')
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
+
+
+def _persona_name(job: Dict[str, Any]) -> str:
+    payload = job.get('payload') if isinstance(job.get('payload'), dict) else {}
+    persona = payload.get('persona') if isinstance(payload.get('persona'), dict) else {}
+    return str(persona.get('name') or '')
+
+
+def build_entry(job: Dict[str, Any], payload_bytes: int, started_at: float, finished_at: float,
+                status: str, error: Optional[str] = None, worker_id: Optional[str] = None,
+                usage: Optional[Dict[str, Any]] = None, memory: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """Flat ledger entry for one processed job.
+
+    `usage` is the intent result's token summary; `memory` the worker's RSS figures (reasoning/recycling.py).
+    """
+    provider, model = batch_key(job)
+    payload = job.get('payload') if isinstance(job.get('payload'), dict) else {}
+    enqueued_at = _enqueued_at(job)
+    run_ms = max(0.0, (finished_at - started_at) * 1000.0)
+    queue_ms = max(0.0, (started_at - enqueued_at) * 1000.0) if enqueued_at else None
+    entry = {
+        'job_id': job.get('job_id') or '',
+        'status': status,
+        'provider': provider,
+        'model': model,
+        'payload_bytes': int(payload_bytes or 0),
+        'enqueued_at': enqueued_at,
+        'started_at': started_at,
+        'finished_at': finished_at,
+        'queue_ms': queue_ms,
+        'run_ms': run_ms,
+        'total_ms': run_ms + (queue_ms or 0.0),
+        'worker': worker_id or f"{os.uname().nodename}:{os.getpid()}",
+        'session_id': str(payload.get('session_id') or ''),
+        'persona': _persona_name(job),
+    }
+    if usage:
+        entry['prompt_tokens_est'] = int(usage.get('prompt_tokens_est') or 0)
+        if usage.get('prompt_tokens') is not None:
+            entry['prompt_tokens'] = int(usage['prompt_tokens'])
+            entry['completion_tokens'] = int(usage.get('completion_tokens') or 0)
+    if memory:
+        entry.update(memory)
+    if error:
+        entry['error'] = str(error)[:300]
+    return entry
+
+
+def add_to_pipeline(pipe, entry: Dict[str, Any]) -> None:
+    """Queue the stream append and rollup increments for `entry` on `pipe`."""
+    if not LEDGER_ENABLED:
+        return
+    fields = {k: ('' if v is None else (round(v, 3) if isinstance(v, float) else v)) for k, v in entry.items()}
+    pipe.xadd(STREAM_KEY, fields, maxlen=STREAM_MAXLEN, approximate=True)
+
+    key = minute_key(entry['finished_at'])
+    bucket = bucket_label(entry['total_ms'])
+    scopes = ['all', f"{entry['provider']}:{entry['model']}"]
+    if entry.get('persona'):
+        scopes.append(PERSONA_SCOPE + entry['persona'])
+    for scope in scopes:
+        pipe.hincrby(key, f"{scope}|count", 1)
+        if entry['status'] != 'ok':
+            pipe.hincrby(key, f"{scope}|errors", 1)
+        pipe.hincrby(key, f"{scope}|h|{bucket}", 1)
+        pipe.hincrbyfloat(key, f"{scope}|total_ms", round(entry['total_ms'], 3))
+        pipe.hincrbyfloat(key, f"{scope}|run_ms", round(entry['run_ms'], 3))
+        pipe.hincrby(key, f"{scope}|payload_bytes", entry['payload_bytes'])
+        if 'prompt_tokens_est' in entry:
+            pipe.hincrby(key, f"{scope}|llm_jobs", 1)
+            pipe.hincrby(key, f"{scope}|prompt_tokens_est", entry['prompt_tokens_est'])
+        if 'prompt_tokens' in entry:
+            pipe.hincrby(key, f"{scope}|usage_jobs", 1)
+            pipe.hincrby(key, f"{scope}|prompt_tokens", entry['prompt_tokens'])
+            pipe.hincrby(key, f"{scope}|completion_tokens", entry['completion_tokens'])
+    pipe.expire(key, ROLLUP_TTL_S)
+
+
+def record(r, entry: Dict[str, Any], log=None) -> None:
+    """Write `entry` in one round trip (sync Redis client); errors are logged, never raised."""
+    if not LEDGER_ENABLED:
+        return
+    try:
+        pipe = r.pipeline(transaction=False)
+        add_to_pipeline(pipe, entry)
+        pipe.execute()
+    except Exception as e:
+        if log:
+            log("ledger_write_failed", error=str(e))
+
+
+def payload_size(job_json, job: Dict[str, Any]) -> int:
+    if isinstance(job_json, (str, bytes)):
+        return len(job_json)
+    try:
+        return len(fastjson.dumps(job))
+    except Exception:
+        return 0
+
+
+# --- Reading ---
+
+def read_rollups(r, start_ts: float, end_ts: float) -> List[Dict[str, Any]]:
+    """Non-empty rollup hashes in [start_ts, end_ts], oldest first, as {'ts', 'fields'}."""
+    minutes = []
+    t = int(start_ts // 60) * 60
+    while t <= end_ts:
+        minutes.append(t)
+        t += 60
+    pipe = r.pipeline(transaction=False)
+    for t in minutes:
+        pipe.hgetall(minute_key(t))
+    out = []
+    for t, doc in zip(minutes, pipe.execute()):
+        if doc:
+            out.append({'ts': float(t), 'fields': doc})
+    return out
+
+
+def merge(rollups: Iterable[Dict[str, Any]], scope: str = 'all') -> Dict[str, float]:
+    """Sum one scope's counters across rollup hashes."""
+    prefix = f"{scope}|"
+    total: Dict[str, float] = {}
+    for rollup in rollups:
+        for field, value in rollup['fields'].items():
+            if field.startswith(prefix):
+                name = field[len(prefix):]
+                total[name] = total.get(name, 0.0) + float(value)
+    return total
+
+
+def scopes(rollups: Iterable[Dict[str, Any]]) -> List[str]:
+    names = set()
+    for rollup in rollups:
+        for field in rollup['fields']:
+            names.add(field.split('|', 1)[0])
+    return sorted(names)
+
+
+def percentile_from_histogram(counters: Dict[str, float], pct: float) -> Optional[float]:
+    """Estimate a latency percentile (ms) by interpolating inside the bucket that holds it."""
+    count = counters.get('count') or 0.0
+    if count <= 0:
+        return None
+    target = count * pct / 100.0
+    seen = 0.0
+    lower = 0.0
+    for le in LATENCY_BUCKETS_MS:
+        n = counters.get(f"h|{le}", 0.0)
+        if n and seen + n >= target:
+            return lower + (le - lower) * ((target - seen) / n)
+        seen += n
+        lower = float(le)
+    return lower  # open-ended bucket: report its lower bound
+
+
+def summarize(counters: Dict[str, float], minutes: float) -> Dict[str, Any]:
+    count = counters.get('count') or 0.0
+    errors = counters.get('errors') or 0.0
+    return {
+        'count': int(count),
+        'per_min': round(count / minutes, 2) if minutes else None,
+        'errors': int(errors),
+        'error_rate': round(errors / count, 4) if count else None,
+        'p50_ms': _round(percentile_from_histogram(counters, 50)),
+        'p95_ms': _round(percentile_from_histogram(counters, 95)),
+        'mean_total_ms': _round(counters.get('total_ms', 0.0) / count) if count else None,
+        'mean_run_ms': _round(counters.get('run_ms', 0.0) / count) if count else None,
+        'mean_payload_bytes': int(counters.get('payload_bytes', 0.0) / count) if count else None,
+        'mean_prompt_tokens_est': _mean(counters, 'prompt_tokens_est', 'llm_jobs'),
+        'mean_prompt_tokens': _mean(counters, 'prompt_tokens', 'usage_jobs'),
+        'mean_completion_tokens': _mean(counters, 'completion_tokens', 'usage_jobs'),
+    }
+
+
+def _mean(counters: Dict[str, float], field: str, per: str) -> Optional[float]:
+    n = counters.get(per) or 0.0
+    return _round(counters.get(field, 0.0) / n) if n else None
+
+
+def _round(value: Optional[float]) -> Optional[float]:
+    return None if value is None else round(value, 1)
+
+
+def read_entries(r, count: int = 20, start: str = '+', end: str = '-') -> List[Dict[str, Any]]:
+    """Most recent stream entries, newest first."""
+    out = []
+    for entry_id, fields in r.xrevrange(STREAM_KEY, max=start, min=end, count=count):
+        doc = dict(fields)
+        doc['id'] = entry_id
+        out.append(doc)
+    return out
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Segmented, compressed local log store for reasoning events.
+
+Records are JSON lines buffered into blocks. Each block is written as one
+gzip member appended to the current segment file, and one line describing
+the block goes to a sidecar `.idx` file: byte offset, compressed length,
+record count, time range, and the distinct session_id / correlation_id /
+event values inside it. A query reads only the small index files, then
+seeks straight to matching blocks and decompresses just those.
+
+Segments are per process (`reasoning-{start}-{pid}-{seq}.log.gz`, so concurrent
+workers never interleave writes). They roll on size or age. On every roll,
+segments past the retention age are deleted, then the oldest ones until the
+directory fits the size budget.
+
+Env (read by `reasoning.api` when REASONING_LOG_DIR is set):
+  - REASONING_LOG_DIR: enables the store
+  - REASONING_LOG_SEGMENT_MB (default 64), REASONING_LOG_SEGMENT_S (default 3600)
+  - REASONING_LOG_BLOCK_RECORDS (default 256), REASONING_LOG_FLUSH_S (default 2)
+  - REASONING_LOG_RETENTION_DAYS (default 7), REASONING_LOG_RETENTION_MB (default 2048)
+"""
+
+import atexit
+import glob
+import gzip
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional
+
+SEGMENT_GLOB = 'reasoning-*.log.gz'
+INDEX_FIELDS = {'session_id': 's', 'correlation_id': 'c', 'event': 'e'}
+
+
+class LogStore:
+    """Append-only writer for one process; thread-safe."""
+
+    def __init__(self, directory: str, segment_max_bytes: int = 64 << 20, segment_max_age_s: float = 3600.0,
+                 block_records: int = 256, flush_interval_s: float = 2.0,
+                 retention_days: float = 7.0, retention_max_bytes: int = 2048 << 20):
+        self.directory = directory
+        self.segment_max_bytes = segment_max_bytes
+        self.segment_max_age_s = segment_max_age_s
+        self.block_records = max(1, block_records)
+        self.flush_interval_s = flush_interval_s
+        self.retention_s = retention_days * 86400.0
+        self.retention_max_bytes = retention_max_bytes
+        self._lock = threading.Lock()
+        self._lines: List[str] = []
+        self._keys = {short: set() for short in INDEX_FIELDS.values()}
+        self._t0 = self._t1 = None
+        self._segment_path: Optional[str] = None
+        self._segment_started = 0.0
+        self._segment_size = 0
+        self._segment_seq = 0
+        self._flusher: Optional[threading.Thread] = None
+        os.makedirs(directory, exist_ok=True)
+
+    # --- writing ---
+
+    def append(self, doc: Dict[str, Any], line: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._lines.append(line)
+            for field, short in INDEX_FIELDS.items():
+                value = doc.get(field)
+                if value:
+                    self._keys[short].add(str(value))
+            self._t0 = self._t0 or now
+            self._t1 = now
+            if len(self._lines) >= self.block_records:
+                self._flush_locked()
+        self._ensure_flusher()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self._lines:
+            return
+        if self._segment_path is None or self._should_roll():
+            self._roll()
+        data = gzip.compress(("\n".join(self._lines) + "\n").encode('utf-8'))
+        entry = {'off': self._segment_size, 'len': len(data), 'n': len(self._lines),
+                 't0': round(self._t0, 3), 't1': round(self._t1, 3)}
+        entry.update({short: sorted(values) for short, values in self._keys.items() if values})
+        with open(self._segment_path, 'ab') as f:
+            f.write(data)
+        with open(self._segment_path + '.idx', 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, separators=(',', ':')) + "\n")
+        self._segment_size += len(data)
+        self._lines = []
+        self._keys = {short: set() for short in INDEX_FIELDS.values()}
+        self._t0 = self._t1 = None
+
+    def _should_roll(self) -> bool:
+        return (self._segment_size >= self.segment_max_bytes
+                or time.time() - self._segment_started >= self.segment_max_age_s)
+
+    def _roll(self) -> None:
+        self._segment_started = time.time()
+        stamp = time.strftime('%Y%m%dT%H%M%S', time.gmtime(self._segment_started))
+        self._segment_seq += 1
+        self._segment_path = os.path.join(self.directory, f"reasoning-{stamp}-{os.getpid()}-{self._segment_seq}.log.gz")
+        self._segment_size = 0
+        try:
+            apply_retention(self.directory, self.retention_s, self.retention_max_bytes,
+                            keep={self._segment_path}, idle_s=self.segment_max_age_s)
+        except Exception:
+            pass
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is not None or self.flush_interval_s <= 0:
+            return
+        self._flusher = threading.Thread(target=self._flush_loop, name='logstore-flush', daemon=True)
+        self._flusher.start()
+        atexit.register(self.flush)
+
+    def _flush_loop(self) -> None:
+        while True:
+            time.sleep(self.flush_interval_s)
+            try:
+                self.flush()
+            except Exception:
+                pass
+
+
+def segments(directory: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(directory, SEGMENT_GLOB)))
+
+
+def apply_retention(directory: str, retention_s: float, max_bytes: int, keep=(), idle_s: float = 3600.0) -> List[str]:
+    """Delete expired segments, then the oldest idle ones until the store fits `max_bytes`."""
+    now = time.time()
+    removed = []
+    infos = []
+    for path in segments(directory):
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        infos.append((st.st_mtime, path, st.st_size))
+    infos.sort()
+    total = sum(size for _, _, size in infos)
+    for mtime, path, size in infos:
+        if path in keep:
+            continue
+        expired = now - mtime > retention_s
+        # Only segments nobody has written to recently may go for size; others may be live.
+        over_budget = total > max_bytes and now - mtime > idle_s
+        if expired or over_budget:
+            for p in (path, path + '.idx'):
+                try:
+                    os.remove(p)
+                except OSError:
+                    pass
+            total -= size
+            removed.append(path)
+    return removed
+
+
+# --- reading ---
+
+def _read_index(path: str) -> Iterator[Dict[str, Any]]:
+    try:
+        with open(path + '.idx', 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue  # torn write at the tail
+    except OSError:
+        return
+
+
+def _in_range(doc: Dict[str, Any], since: Optional[float], until: Optional[float]) -> bool:
+    try:
+        ts = datetime.fromisoformat(str(doc.get('timestamp')).replace('Z', '+00:00'))
+        ts = (ts if ts.tzinfo else ts.replace(tzinfo=timezone.utc)).timestamp()
+    except ValueError:
+        return True  # unknown time: the block range already matched
+    return (since is None or ts >= since) and (until is None or ts <= until)
+
+
+def query(directory: str, session_id: Optional[str] = None, correlation_id: Optional[str] = None,
+          event: Optional[str] = None, since: Optional[float] = None, until: Optional[float] = None,
+          limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """Yield matching records oldest-first, decompressing only blocks whose index can match."""
+    wanted = {'s': session_id, 'c': correlation_id, 'e': event}
+    emitted = 0
+    for path in segments(directory):
+        blocks = []
+        for entry in _read_index(path):
+            if since is not None and entry.get('t1', 0) < since:
+                continue
+            if until is not None and entry.get('t0', 0) > until:
+                continue
+            if any(v is not None and v not in entry.get(k, ()) for k, v in wanted.items()):
+                continue
+            blocks.append(entry)
+        if not blocks:
+            continue
+        with open(path, 'rb') as f:
+            for entry in blocks:
+                f.seek(entry['off'])
+                try:
+                    raw = gzip.decompress(f.read(entry['len']))
+                except (OSError, EOFError):
+                    continue
+                for line in raw.decode('utf-8', errors='replace').splitlines():
+                    try:
+                        doc = json.loads(line)
+                    except ValueError:
+                        continue
+                    if session_id is not None and doc.get('session_id') != session_id:
+                        continue
+                    if correlation_id is not None and doc.get('correlation_id') != correlation_id:
+                        continue
+                    if event is not None and doc.get('event') != event:
+                        continue
+                    if (since is not None or until is not None) and not _in_range(doc, since, until):
+                        continue
+                    yield doc
+                    emitted += 1
+                    if limit is not None and emitted >= limit:
+                        return
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+On-demand profiling of a running worker.
+
+A profiling session covers the next N jobs or T seconds, whichever comes
+first, then writes its files under REASONING_PROFILE_DIR:
+
+  {worker}-{YYYYmmdd-HHMMSS}.collapsed  (mode "sample")
+  {worker}-{YYYYmmdd-HHMMSS}.pstats     (mode "cprofile")
+  {worker}-{YYYYmmdd-HHMMSS}.json       (worker_id, job_ids, mode, timings)
+
+- `sample`: a background thread snapshots every thread's stack each
+  `interval_ms`. Stacks are written in collapsed format (flamegraph.pl,
+  speedscope), rooted at `job:{id}` for a thread running a job and at
+  `thread:{name}` otherwise. The overhead is the same for the whole process
+  whatever the job mix. The async worker interleaves all its jobs on one
+  event-loop thread, so a stack there cannot be tied to one job: that
+  thread (marked with `Profiler.mark_async_loop`) is rooted at
+  `async-loop`, and its job ids are only listed in the `.json` summary.
+- `cprofile`: deterministic; enabled in the thread running a job. Only one
+  job is profiled at a time. Jobs that overlap it are listed as
+  `skipped_job_ids`. In the async worker every coroutine shares the loop
+  thread, so interleaved jobs show up in the profile too.
+
+Triggers, polled by the worker loop every POLL_INTERVAL_S:
+  - Redis key `savant:profile:request` (every worker, each request id runs
+    once) or `savant:profile:request:{worker_id}` (one worker, consumed).
+    The value is JSON: {"id", "mode", "jobs", "seconds", "interval_ms"};
+    mode "stop" ends a running session. scripts/reasoning_profile.py writes it.
+  - SIGUSR1 starts a session with the env defaults, or stops the running one.
+
+Finished sessions are summarised on the Redis list `savant:profile:results`.
+While no session runs, the job hooks cost one attribute check.
+
+Env:
+  - REASONING_PROFILE_DIR (default logs/profiles)
+  - REASONING_PROFILE_MODE (default sample), REASONING_PROFILE_JOBS (default 20),
+    REASONING_PROFILE_SECONDS (default 60), REASONING_PROFILE_INTERVAL_MS (default 10)
+"""
+
+import cProfile
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from reasoning import fastjson
+
+REQUEST_KEY = 'savant:profile:request'
+RESULTS_KEY = 'savant:profile:results'
+RESULTS_MAX = 50
+MODES = ('sample', 'cprofile')
+POLL_INTERVAL_S = 2.0
+
+PROFILE_DIR = os.environ.get('REASONING_PROFILE_DIR', 'logs/profiles')
+DEFAULT_MODE = os.environ.get('REASONING_PROFILE_MODE', 'sample')
+DEFAULT_JOBS = int(os.environ.get('REASONING_PROFILE_JOBS', '20'))
+DEFAULT_SECONDS = float(os.environ.get('REASONING_PROFILE_SECONDS', '60'))
+DEFAULT_INTERVAL_MS = float(os.environ.get('REASONING_PROFILE_INTERVAL_MS', '10'))
+
+
+def worker_key(worker_id: str) -> str:
+    return f"{REQUEST_KEY}:{worker_id}"
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(';', ':')
+
+
+class ProfileSession:
+    """One profiling window: collects samples or a cProfile and writes them out when finished."""
+
+    def __init__(self, worker_id: str, mode: str = DEFAULT_MODE, jobs: int = DEFAULT_JOBS,
+                 seconds: float = DEFAULT_SECONDS, interval_ms: float = DEFAULT_INTERVAL_MS,
+                 request_id: Optional[str] = None, out_dir: str = PROFILE_DIR,
+                 loop_thread: Optional[int] = None):
+        if mode not in MODES:
+            raise ValueError(f"unknown profile mode {mode!r}; expected one of {', '.join(MODES)}")
+        self.worker_id = worker_id
+        self.mode = mode
+        self.max_jobs = max(0, int(jobs or 0))
+        self.seconds = max(0.0, float(seconds or 0))
+        self.interval_s = max(0.001, float(interval_ms or DEFAULT_INTERVAL_MS) / 1000.0)
+        self.request_id = request_id
+        self.out_dir = out_dir
+        self.loop_thread = loop_thread  # async worker's event-loop thread: jobs there share one label
+        self.started_at = time.time()
+        self.job_ids: List[str] = []
+        self.skipped_job_ids: List[str] = []
+        self.samples = 0
+        self._lock = threading.Lock()
+        self._threads: Dict[int, str] = {}  # thread ident -> job id
+        self._stacks: Counter = Counter()
+        self._profile = cProfile.Profile() if mode == 'cprofile' else None
+        self._profiling = False
+        self._stopped = threading.Event()
+        self._sampler = None
+        if mode == 'sample':
+            self._sampler = threading.Thread(target=self._sample_loop, name='reasoning-profiler', daemon=True)
+            self._sampler.start()
+
+    def expired(self, now: Optional[float] = None) -> bool:
+        if self.max_jobs and len(self.job_ids) + len(self.skipped_job_ids) >= self.max_jobs:
+            return True
+        return bool(self.seconds) and (now or time.time()) - self.started_at >= self.seconds
+
+    def job_started(self, job_id: str) -> Tuple[str, bool]:
+        owner = False
+        with self._lock:
+            if self._profile is not None:
+                if not self._profiling:
+                    self._profiling = owner = True
+            elif threading.get_ident() != self.loop_thread:
+                self._threads[threading.get_ident()] = job_id
+        if owner:
+            self._profile.enable()
+        return job_id, owner
+
+    def job_finished(self, token: Tuple[str, bool]) -> None:
+        job_id, owner = token
+        if owner:
+            self._profile.disable()
+        with self._lock:
+            if self._profile is None:
+                self._threads.pop(threading.get_ident(), None)
+                self.job_ids.append(job_id)
+            elif owner:
+                self._profiling = False
+                self.job_ids.append(job_id)
+            else:
+                self.skipped_job_ids.append(job_id)
+
+    def _sample_loop(self) -> None:
+        me = threading.get_ident()
+        while not self._stopped.wait(self.interval_s):
+            names = {t.ident: t.name for t in threading.enumerate()}
+            with self._lock:
+                jobs = dict(self._threads)
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if ident == self.loop_thread:
+                    root = 'async-loop'
+                else:
+                    root = f"job:{jobs[ident]}" if ident in jobs else f"thread:{names.get(ident, ident)}"
+                self._stacks[';'.join([root] + stack[::-1])] += 1
+            self.samples += 1
+
+    def finish(self) -> Dict[str, Any]:
+        """Stop collecting and write the profile files; returns the session summary."""
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join(timeout=5)
+        finished_at = time.time()
+        os.makedirs(self.out_dir, exist_ok=True)
+        safe_worker = self.worker_id.replace(':', '-').replace('/', '-')
+        base = os.path.join(self.out_dir, f"{safe_worker}-{datetime.fromtimestamp(self.started_at).strftime('%Y%m%d-%H%M%S')}")
+        files = []
+        if self._profile is not None:
+            self._profile.dump_stats(base + '.pstats')
+            files.append(base + '.pstats')
+        else:
+            with open(base + '.collapsed', 'w') as f:
+                for stack, count in sorted(self._stacks.items()):
+                    f.write(f"{stack} {count}\n")
+            files.append(base + '.collapsed')
+        summary = {
+            'worker_id': self.worker_id,
+            'request_id': self.request_id,
+            'mode': self.mode,
+            'started_at': self.started_at,
+            'finished_at': finished_at,
+            'job_ids': list(self.job_ids),
+            'skipped_job_ids': list(self.skipped_job_ids),
+            'samples': self.samples,
+            'files': files + [base + '.json'],
+        }
+        with open(base + '.json', 'w') as f:
+            f.write(fastjson.dumps(summary))
+        return summary
+
+
+class Profiler:
+    """Per-process switch: polls for requests, hands job hooks to the active session, finishes it."""
+
+    def __init__(self, out_dir: str = PROFILE_DIR):
+        self.out_dir = out_dir
+        self.worker_id = f"{os.uname().nodename}:{os.getpid()}"
+        self.session: Optional[ProfileSession] = None
+        self._lock = threading.Lock()
+        self._seen = set()
+        self._toggle = False
+        self._next_poll = 0.0
+        self._results: List[Dict[str, Any]] = []
+        self.loop_thread: Optional[int] = None
+
+    def mark_async_loop(self) -> None:
+        """Called from the async worker's loop thread: its samples are rooted at `async-loop`."""
+        self.loop_thread = threading.get_ident()
+
+    def request_toggle(self, *_args) -> None:
+        """Signal handler: start a default session, or stop the running one, at the next poll."""
+        self._toggle = True
+
+    def start(self, mode: str = DEFAULT_MODE, jobs: int = DEFAULT_JOBS, seconds: float = DEFAULT_SECONDS,
+              interval_ms: float = DEFAULT_INTERVAL_MS, request_id: Optional[str] = None) -> ProfileSession:
+        with self._lock:
+            if self.session is None:
+                self.session = ProfileSession(self.worker_id, mode, jobs, seconds, interval_ms, request_id, self.out_dir,
+                                              loop_thread=self.loop_thread)
+            return self.session
+
+    def stop(self) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            session, self.session = self.session, None
+        if session is None:
+            return None
+        summary = session.finish()
+        self._results.append(summary)
+        return summary
+
+    def job_started(self, job_id: Optional[str]):
+        session = self.session
+        if session is None:
+            return None
+        return session, session.job_started(job_id or '')
+
+    def job_finished(self, token) -> None:
+        if token is None:
+            return
+        session, inner = token
+        session.job_finished(inner)
+        if session.expired() and self.session is session:
+            self.stop()
+
+    def poll(self, r, log=None, now: Optional[float] = None) -> None:
+        """Pick up Redis/signal requests, end an expired session, publish finished summaries (sync Redis)."""
+        now = now or time.time()
+        if self._due(now, log):
+            try:
+                pipe = r.pipeline(transaction=False)
+                self._queue_reads(pipe)
+                replies = pipe.execute()
+            except Exception as e:
+                if log:
+                    log("profile_poll_failed", error=str(e))
+                replies = (None, None)
+            self._take_requests(replies[:2], log)
+        results = self._drain(now, log)
+        if results:
+            try:
+                pipe = r.pipeline(transaction=False)
+                self._queue_results(pipe, results)
+                pipe.execute()
+            except Exception as e:
+                if log:
+                    log("profile_publish_failed", error=str(e))
+
+    async def poll_async(self, r, log=None, now: Optional[float] = None) -> None:
+        """`poll` for the async worker's Redis client."""
+        now = now or time.time()
+        if self._due(now, log):
+            try:
+                pipe = r.pipeline(transaction=False)
+                self._queue_reads(pipe)
+                replies = await pipe.execute()
+            except Exception as e:
+                if log:
+                    log("profile_poll_failed", error=str(e))
+                replies = (None, None)
+            self._take_requests(replies[:2], log)
+        results = self._drain(now, log)
+        if results:
+            try:
+                pipe = r.pipeline(transaction=False)
+                self._queue_results(pipe, results)
+                await pipe.execute()
+            except Exception as e:
+                if log:
+                    log("profile_publish_failed", error=str(e))
+
+    def _due(self, now: float, log) -> bool:
+        if self._toggle:
+            self._toggle = False
+            self._apply({'mode': 'stop'} if self.session is not None else {}, log)
+        if now < self._next_poll:
+            return False
+        self._next_poll = now + POLL_INTERVAL_S
+        return True
+
+    def _queue_reads(self, pipe) -> None:
+        pipe.get(REQUEST_KEY)
+        pipe.get(worker_key(self.worker_id))
+        pipe.delete(worker_key(self.worker_id))
+
+    def _queue_results(self, pipe, results: List[Dict[str, Any]]) -> None:
+        for summary in results:
+            pipe.lpush(RESULTS_KEY, fastjson.dumps(summary))
+        pipe.ltrim(RESULTS_KEY, 0, RESULTS_MAX - 1)
+
+    def _drain(self, now: float, log) -> List[Dict[str, Any]]:
+        session = self.session
+        if session is not None and session.expired(now):
+            self.stop()
+        results, self._results = self._results, []
+        for summary in results:
+            if log:
+                log("profile_finished", **summary)
+        return results
+
+    def _take_requests(self, raws, log) -> None:
+        for raw in raws:
+            self._take_request(raw, log)
+
+    def _take_request(self, raw, log) -> None:
+        if not raw:
+            return
+        try:
+            req = fastjson.loads(raw)
+        except ValueError:
+            if log:
+                log("profile_request_invalid", value=str(raw)[:200])
+            return
+        if not isinstance(req, dict):
+            return
+        request_id = str(req.get('id') or '')
+        if request_id:
+            if request_id in self._seen:
+                return
+            self._seen.add(request_id)
+        self._apply(req, log)
+
+    def _apply(self, req: Dict[str, Any], log) -> None:
+        if req.get('mode') == 'stop':
+            self.stop()
+            return
+        if self.session is not None:
+            return
+        try:
+            session = self.start(mode=req.get('mode') or DEFAULT_MODE,
+                                 jobs=req.get('jobs', DEFAULT_JOBS),
+                                 seconds=req.get('seconds', DEFAULT_SECONDS),
+                                 interval_ms=req.get('interval_ms', DEFAULT_INTERVAL_MS),
+                                 request_id=req.get('id'))
+        except (TypeError, ValueError) as e:
+            if log:
+                log("profile_request_invalid", error=str(e))
+            return
+        if log:
+            log("profile_started", mode=session.mode, jobs=session.max_jobs, seconds=session.seconds,
+                request_id=session.request_id)
+
+
+PROFILER = Profiler()
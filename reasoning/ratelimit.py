@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Fleet-wide LLM rate limiting backed by Redis.
+
+Each (provider, model, api key) pair gets two token buckets, one for
+requests per minute and one for tokens per minute. A Lua script checks and
+takes from both atomically, so every worker process shares the same
+quota. Refill is timed by the Redis server clock, not the callers'. When a bucket is short, the caller waits for the refill time the
+script reports (bounded by `REASONING_RATE_LIMIT_MAX_WAIT_S`) instead of
+sending a request the provider will reject.
+
+When a provider still answers 429, its retry hint (`Retry-After` header or
+Google's `RetryInfo.retryDelay`) is stored as a hold key. Every worker then
+pauses that pair until the hold expires.
+
+Limits come from `REASONING_RATE_LIMITS` (JSON). A `provider:model` entry
+wins over a `provider` entry:
+  {"google api": {"rpm": 60, "tpm": 1000000},
+   "google api:gemini-1.5-pro": {"rpm": 5, "tpm": 32000}}
+Pairs without an entry are not bucketed, but still honor 429 holds.
+
+Redis errors fail open: requests go straight through.
+
+Env:
+  - REASONING_RATE_LIMITS (default {})
+  - REASONING_RATE_LIMIT_MAX_WAIT_S (default 20)
+  - REDIS_URL
+"""
+
+import hashlib
+import json
+import os
+import random
+import re
+import time
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Optional, Tuple
+
+KEY_PREFIX = 'savant:ratelimit:'
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+MAX_WAIT_S = float(os.environ.get('REASONING_RATE_LIMIT_MAX_WAIT_S', '20'))
+RETRY_AFTER_ERROR_S = 30.0
+DEFAULT_HOLD_S = 5.0
+MAX_HOLD_S = 120.0
+
+try:
+    LIMITS: Dict[str, Dict[str, float]] = json.loads(os.environ.get('REASONING_RATE_LIMITS') or '{}')
+except ValueError:
+    LIMITS = {}
+
+# KEYS: rpm bucket, tpm bucket, hold key. ARGV: rpm, tpm, tokens.
+# Refill time comes from the Redis server clock, so host clock skew between workers cannot
+# over-refill or starve the shared buckets (needs Redis >= 5 for TIME before writes).
+# Returns {1, 0} when both buckets were debited, else {0, wait_ms}; nothing is taken on refusal.
+_ACQUIRE_LUA = """
+local hold = redis.call('PTTL', KEYS[3])
+if hold > 0 then
+  return {0, hold}
+end
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) * 1000 + math.floor(tonumber(clock[2]) / 1000)
+local limits = {tonumber(ARGV[1]), tonumber(ARGV[2])}
+local costs = {1, tonumber(ARGV[3])}
+local levels = {}
+local wait = 0
+for i = 1, 2 do
+  local limit = limits[i]
+  if limit > 0 then
+    local cost = math.min(costs[i], limit)
+    local state = redis.call('HMGET', KEYS[i], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or limit
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(limit, tokens + (now - ts) * limit / 60000.0)
+    levels[i] = tokens - cost
+    if tokens < cost then
+      wait = math.max(wait, math.ceil((cost - tokens) * 60000.0 / limit))
+    end
+  end
+end
+if wait > 0 then
+  return {0, wait}
+end
+for i = 1, 2 do
+  if limits[i] > 0 then
+    redis.call('HSET', KEYS[i], 'tokens', tostring(levels[i]), 'ts', tostring(now))
+    redis.call('PEXPIRE', KEYS[i], 120000)
+  end
+end
+return {1, 0}
+"""
+
+
+class ProviderRateLimited(Exception):
+    """The provider answered 429; `retry_after` is its hint in seconds, if any."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class RateLimitWaitExceeded(Exception):
+    pass
+
+
+# Remote providers always honor 429 holds, even without configured buckets.
+REMOTE_PROVIDERS = {'google api'}
+
+_client = None
+_script = None
+_disabled_until = 0.0
+
+
+def _get_script():
+    global _client, _script
+    if _script is None:
+        import redis
+        _client = redis.Redis.from_url(REDIS_URL, decode_responses=True,
+                                       socket_timeout=0.5, socket_connect_timeout=0.5)
+        _script = _client.register_script(_ACQUIRE_LUA)
+    return _client, _script
+
+
+def applies(provider: str) -> bool:
+    return provider in REMOTE_PROVIDERS or any(k == provider or k.startswith(provider + ':') for k in LIMITS)
+
+
+def limits_for(provider: str, model: str) -> Tuple[float, float]:
+    conf = LIMITS.get(f"{provider}:{model}") or LIMITS.get(provider) or {}
+    return float(conf.get('rpm') or 0), float(conf.get('tpm') or 0)
+
+
+def bucket_keys(provider: str, model: str, api_key: Optional[str]) -> Tuple[str, str, str]:
+    key_id = hashlib.sha1((api_key or '').encode('utf-8')).hexdigest()[:12] if api_key else 'nokey'
+    base = f"{KEY_PREFIX}{provider.replace(' ', '_')}:{model}:{key_id}"
+    return f"{base}:rpm", f"{base}:tpm", f"{base}:hold"
+
+
+def estimate_tokens(prompt: str, max_output_tokens: int = 500) -> int:
+    """Rough request cost for the tpm bucket: ~4 chars per input token plus the output cap."""
+    return len(prompt or '') // 4 + max_output_tokens
+
+
+def try_acquire(provider: str, model: str, api_key: Optional[str], tokens: int, r=None) -> float:
+    """One atomic attempt; returns 0 when granted, else the seconds to wait before retrying."""
+    global _disabled_until
+    if r is None and time.time() < _disabled_until:
+        return 0.0
+    rpm, tpm = limits_for(provider, model)
+    try:
+        if r is None:
+            r, script = _get_script()
+        else:
+            script = r.register_script(_ACQUIRE_LUA)
+        allowed, wait_ms = script(keys=list(bucket_keys(provider, model, api_key)),
+                                  args=[rpm, tpm, int(tokens)], client=r)
+    except Exception:
+        _disabled_until = time.time() + RETRY_AFTER_ERROR_S
+        return 0.0
+    return 0.0 if int(allowed) else max(0.001, int(wait_ms) / 1000.0)
+
+
+def next_wait(provider: str, model: str, api_key: Optional[str], tokens: int, deadline: float, r=None) -> float:
+    """Seconds to sleep before the next attempt (0 = go now); raises once the wait would pass `deadline`."""
+    wait = try_acquire(provider, model, api_key, tokens, r=r)
+    if wait <= 0:
+        return 0.0
+    if time.monotonic() + wait > deadline:
+        raise RateLimitWaitExceeded(f"rate limit for {provider}:{model} needs {wait:.1f}s more than the wait budget")
+    # Small jitter so workers released by the same refill do not stampede the script.
+    return wait + random.uniform(0, min(0.25, wait * 0.1))
+
+
+def acquire(provider: str, model: str, api_key: Optional[str], tokens: int, deadline: float, r=None) -> float:
+    """Block until both buckets grant the request; returns the time spent waiting."""
+    waited = 0.0
+    while True:
+        wait = next_wait(provider, model, api_key, tokens, deadline, r=r)
+        if wait <= 0:
+            return waited
+        time.sleep(wait)
+        waited += wait
+
+
+def hold(provider: str, model: str, api_key: Optional[str], retry_after: Optional[float], r=None) -> float:
+    """Pause this pair fleet-wide after a 429; returns the hold applied in seconds."""
+    global _disabled_until
+    seconds = min(MAX_HOLD_S, retry_after if retry_after and retry_after > 0 else DEFAULT_HOLD_S)
+    try:
+        client = r if r is not None else _get_script()[0]
+        client.set(bucket_keys(provider, model, api_key)[2], '1', px=int(seconds * 1000))
+    except Exception:
+        _disabled_until = time.time() + RETRY_AFTER_ERROR_S
+    return seconds
+
+
+def parse_retry_after(headers: Optional[Dict[str, str]], body: Any = None) -> Optional[float]:
+    """Seconds from a `Retry-After` header (delta or HTTP date) or Google `RetryInfo.retryDelay`."""
+    value = None
+    for name, v in (headers or {}).items():
+        if name.lower() == 'retry-after':
+            value = v
+            break
+    if value:
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            try:
+                return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+            except (TypeError, ValueError):
+                pass
+    if isinstance(body, str):
+        try:
+            body = json.loads(body)
+        except ValueError:
+            body = None
+    details = ((body or {}).get('error') or {}).get('details') if isinstance(body, dict) else None
+    for detail in details or []:
+        if isinstance(detail, dict) and str(detail.get('@type', '')).endswith('RetryInfo'):
+            m = re.match(r'^\s*([\d.]+)s\s*$', str(detail.get('retryDelay') or ''))
+            if m:
+                return float(m.group(1))
+    return None
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Per-job memory high-water tracking and worker recycling.
+
+Long-lived workers grow over time. Langchain objects, long histories and
+decoded payloads fragment the heap, and CPython rarely gives that memory
+back. Each job records the process RSS at its end, the change over the
+job, and the process RSS high-water mark. Optionally it also records the
+tracemalloc peak of Python allocations while the job ran. These go into
+the job log line and the ledger.
+
+A worker whose limits are hit stops taking jobs, lets its in-flight jobs
+finish, and exits with RECYCLE_EXIT_CODE (75, EX_TEMPFAIL). The supervisor
+then starts a fresh process: scripts/run_reasoning_worker.sh loops on that
+code, and under systemd use `Restart=always`.
+
+With several jobs in flight (micro-batching, fan-out, async worker) RSS
+figures are process-wide. A job's delta and tracemalloc peak include
+whatever overlapped it.
+
+Env:
+  - REASONING_RECYCLE_MAX_JOBS (default 0 = off): jobs per process
+  - REASONING_RECYCLE_MAX_RSS_MB (default 0 = off): RSS checked after each job
+  - REASONING_RECYCLE_MAX_AGE_S (default 0 = off): process age
+  - REASONING_TRACEMALLOC=1 records the Python allocation peak per job (slows allocation-heavy code)
+"""
+
+import os
+import threading
+import time
+import tracemalloc
+from typing import Any, Dict, Optional
+
+MAX_JOBS = int(os.environ.get('REASONING_RECYCLE_MAX_JOBS', '0'))
+MAX_RSS_MB = float(os.environ.get('REASONING_RECYCLE_MAX_RSS_MB', '0'))
+MAX_AGE_S = float(os.environ.get('REASONING_RECYCLE_MAX_AGE_S', '0'))
+TRACEMALLOC = os.environ.get('REASONING_TRACEMALLOC', '0') not in ('0', '', 'false', 'False')
+RECYCLE_EXIT_CODE = 75
+
+_MB = 1024.0 * 1024.0
+
+
+def rss_bytes() -> int:
+    """Current resident set size; falls back to the high-water mark where /proc is missing."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes() -> int:
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except Exception:
+        return 0
+    # ru_maxrss is kilobytes on Linux and bytes on macOS
+    return peak if os.uname().sysname == 'Darwin' else peak * 1024
+
+
+class Recycler:
+    """Counts jobs, measures their memory, and decides when this process should be replaced."""
+
+    def __init__(self, max_jobs: int = MAX_JOBS, max_rss_mb: float = MAX_RSS_MB, max_age_s: float = MAX_AGE_S,
+                 trace: bool = TRACEMALLOC, rss=rss_bytes, clock=time.monotonic):
+        self.max_jobs = max_jobs
+        self.max_rss_mb = max_rss_mb
+        self.max_age_s = max_age_s
+        self.trace = trace
+        self._rss = rss
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.started = clock()
+        self.jobs = 0
+        self.in_flight = 0
+        self.last_rss = 0
+        if trace and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_jobs or self.max_rss_mb or self.max_age_s)
+
+    def job_started(self) -> Dict[str, Any]:
+        """Snapshot to hand back to `job_finished`."""
+        with self._lock:
+            self.in_flight += 1
+            if self.trace and self.in_flight == 1:
+                tracemalloc.reset_peak()
+        return {'rss': self._rss()}
+
+    def job_finished(self, snap: Dict[str, Any]) -> Dict[str, Any]:
+        """Memory fields for the job's log line and ledger entry; counts the job once toward MAX_JOBS."""
+        if 'fields' in snap:
+            return snap['fields']
+        rss = self._rss()
+        with self._lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            self.jobs += 1
+            self.last_rss = rss
+        out = {
+            'rss_mb': round(rss / _MB, 1),
+            'rss_delta_mb': round((rss - snap.get('rss', rss)) / _MB, 1),
+            'rss_hwm_mb': round(max(rss, peak_rss_bytes()) / _MB, 1),
+        }
+        if self.trace and tracemalloc.is_tracing():
+            out['py_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / _MB, 1)
+        snap['fields'] = out
+        return out
+
+    def age_s(self) -> float:
+        return self._clock() - self.started
+
+    def reason(self) -> Optional[str]:
+        """Why this worker should recycle now, or None."""
+        if self.max_jobs and self.jobs >= self.max_jobs:
+            return 'max_jobs'
+        if self.max_rss_mb and self.last_rss / _MB >= self.max_rss_mb:
+            return 'max_rss'
+        if self.max_age_s and self.age_s() >= self.max_age_s:
+            return 'max_age'
+        return None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            'jobs': self.jobs,
+            'in_flight': self.in_flight,
+            'age_s': round(self.age_s(), 1),
+            'rss_mb': round(self._rss() / _MB, 1),
+            'rss_hwm_mb': round(peak_rss_bytes() / _MB, 1),
+            'limits': {'max_jobs': self.max_jobs, 'max_rss_mb': self.max_rss_mb, 'max_age_s': self.max_age_s},
+        }
+
+
+RECYCLER = Recycler()
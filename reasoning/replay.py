@@ -0,0 +1,381 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Record production jobs and replay them offline.
+
+Recording: with REASONING_RECORD_DIR set, the worker writes one record per
+intent it computes (single jobs and fan-out items, sync and async):
+
+  {"v": 1, "job_id": ..., "ts": ..., "payload": {...},
+   "llm": [{"provider", "model", "structured", "prompt_sha", "prompt_chars",
+            "latency_ms", "response" | "error"}, ...],
+   "result": {"tool_name", "tool_args", "finish", "final_text", "stages"},
+   "wall_ms": ..., "error": null}
+
+Every `_llm_generate` call made for the intent is captured in order. This
+includes structured-output retries and fallback attempts, and failed calls
+keep their error text. Prompts are stored only as a hash and a length. The
+`llm.api_key` in payloads is redacted. Records are buffered and appended
+as gzip members to `{dir}/reasoning-{host}-{pid}-{start}.jsonl.gz`, so a
+crashed worker loses at most one buffer. Files rotate after
+REASONING_RECORD_MAX_JOBS records.
+
+Replay: `replay()` feeds each payload back through `_compute_intent_sync`.
+`_llm_generate` is stubbed with the recorded responses and errors, and can
+optionally sleep for the recorded latency. The search memo, answer cache
+and worker-side search loop are off during replay, and jobs that used the
+answer cache or local searches are skipped. Each job reports:
+
+  - thread CPU and wall time
+  - replayed vs recorded LLM calls, and prompts whose hash changed
+  - drift: the decision fields that differ from the recorded result
+
+Run it before and after a planner, prompt or parser change to measure the
+change on real traffic (scripts/reasoning_replay.py).
+
+Env:
+  - REASONING_RECORD_DIR: enables recording (default off)
+  - REASONING_RECORD_SAMPLE (default 1): fraction of intents recorded
+  - REASONING_RECORD_MAX_JOBS (default 5000): records per file
+"""
+
+import atexit
+import glob
+import gzip
+import hashlib
+import os
+import random
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+
+from reasoning import fastjson
+from reasoning import tokens
+
+RECORD_DIR = os.environ.get('REASONING_RECORD_DIR') or None
+RECORD_SAMPLE = float(os.environ.get('REASONING_RECORD_SAMPLE', '1'))
+RECORD_MAX_JOBS = int(os.environ.get('REASONING_RECORD_MAX_JOBS', '5000'))
+FLUSH_EVERY = 50
+VERSION = 1
+DECISION_FIELDS = ('tool_name', 'tool_args', 'finish', 'final_text')
+
+_CURRENT: ContextVar[Optional[Dict[str, Any]]] = ContextVar('reasoning_replay_record', default=None)
+
+
+def prompt_sha(prompt: str) -> str:
+    return hashlib.sha1((prompt or '').encode('utf-8')).hexdigest()[:16]
+
+
+def _redact(payload: Any) -> Any:
+    if not isinstance(payload, dict) or not isinstance(payload.get('llm'), dict) or not payload['llm'].get('api_key'):
+        return payload
+    return dict(payload, llm=dict(payload['llm'], api_key='redacted'))
+
+
+def _result_fields(result: Dict[str, Any]) -> Dict[str, Any]:
+    out = {k: result.get(k) for k in DECISION_FIELDS}
+    out['stages'] = [t.get('stage') for t in result.get('trace') or [] if isinstance(t, dict)]
+    return out
+
+
+# ---------------------
+# Recording
+# ---------------------
+
+def capturing() -> bool:
+    return _CURRENT.get() is not None
+
+
+def _note_call(provider: str, model: str, prompt: str, structured: bool, started: float,
+               response: Optional[str] = None, error: Optional[BaseException] = None) -> None:
+    call = {'provider': provider, 'model': model, 'structured': bool(structured), 'prompt_sha': prompt_sha(prompt),
+            'prompt_chars': len(prompt or ''), 'latency_ms': round((time.monotonic() - started) * 1000, 1)}
+    if error is not None:
+        call['error'] = str(error)[:500]
+    else:
+        call['response'] = response
+    _CURRENT.get()['llm'].append(call)
+
+
+def capture_call(provider: str, model: str, prompt: str, structured: bool, call: Callable[[], str]) -> str:
+    """Run one LLM call and append it (response or error, latency) to the current record."""
+    started = time.monotonic()
+    try:
+        response = call()
+    except Exception as e:
+        _note_call(provider, model, prompt, structured, started, error=e)
+        raise
+    _note_call(provider, model, prompt, structured, started, response=response)
+    return response
+
+
+async def capture_call_async(provider: str, model: str, prompt: str, structured: bool, call) -> str:
+    """Async `capture_call`; `call` returns the awaitable to time."""
+    started = time.monotonic()
+    try:
+        response = await call()
+    except Exception as e:
+        _note_call(provider, model, prompt, structured, started, error=e)
+        raise
+    _note_call(provider, model, prompt, structured, started, response=response)
+    return response
+
+
+def note_result(rec: Optional[Dict[str, Any]], result: Dict[str, Any]) -> None:
+    if rec is not None:
+        rec['result'] = _result_fields(result)
+
+
+class Recorder:
+    """Buffers job records and appends them to gzip session files."""
+
+    def __init__(self, directory: Optional[str] = RECORD_DIR, sample: float = RECORD_SAMPLE,
+                 max_jobs: int = RECORD_MAX_JOBS, flush_every: int = FLUSH_EVERY):
+        self.directory = directory
+        self.sample = sample
+        self.max_jobs = max_jobs
+        self.flush_every = flush_every
+        self._lock = threading.Lock()
+        self._buffer: List[str] = []
+        self._path: Optional[str] = None
+        self._in_file = 0
+        self._atexit = False
+        self.recorded = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.directory) and self.sample > 0
+
+    @contextmanager
+    def job(self, job_id: Optional[str], payload: Any) -> Iterator[Optional[Dict[str, Any]]]:
+        """Record the intent computed inside the block; yields None when this job is not recorded."""
+        if not self.enabled or (self.sample < 1 and random.random() >= self.sample):
+            yield None
+            return
+        rec = {'v': VERSION, 'job_id': job_id, 'ts': time.time(), 'payload': _redact(payload), 'llm': [],
+               'result': None, 'error': None}
+        token = _CURRENT.set(rec)
+        started = time.monotonic()
+        try:
+            yield rec
+        except Exception as e:
+            rec['error'] = str(e)[:500]
+            raise
+        finally:
+            _CURRENT.reset(token)
+            rec['wall_ms'] = round((time.monotonic() - started) * 1000, 1)
+            self._append(rec)
+
+    def _append(self, rec: Dict[str, Any]) -> None:
+        try:
+            line = fastjson.dumps(rec, default=str)
+        except Exception:
+            return
+        with self._lock:
+            self._buffer.append(line)
+            self.recorded += 1
+            if not self._atexit:
+                atexit.register(self.flush)
+                self._atexit = True
+            if len(self._buffer) >= self.flush_every:
+                self._flush_locked()
+
+    def flush(self) -> Optional[str]:
+        """Write buffered records; returns the file written to."""
+        with self._lock:
+            return self._flush_locked()
+
+    def _flush_locked(self) -> Optional[str]:
+        if not self._buffer:
+            return self._path
+        if self._path is None or self._in_file >= self.max_jobs:
+            os.makedirs(self.directory, exist_ok=True)
+            name = f"reasoning-{socket.gethostname()}-{os.getpid()}-{time.strftime('%Y%m%d-%H%M%S')}-{self.recorded}.jsonl.gz"
+            self._path = os.path.join(self.directory, name)
+            self._in_file = 0
+        data = gzip.compress(('\n'.join(self._buffer) + '\n').encode('utf-8'))
+        try:
+            with open(self._path, 'ab') as f:
+                f.write(data)
+        except OSError:
+            pass
+        self._in_file += len(self._buffer)
+        self._buffer = []
+        return self._path
+
+
+RECORDER = Recorder()
+
+
+def load(paths: Iterable[str]) -> Iterator[Dict[str, Any]]:
+    """Records from session files; directories expand to their *.jsonl[.gz] files in name order."""
+    for path in paths:
+        files = sorted(glob.glob(os.path.join(path, '*.jsonl*'))) if os.path.isdir(path) else [path]
+        for name in files:
+            opener = gzip.open if name.endswith('.gz') else open
+            with opener(name, 'rt', encoding='utf-8') as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        rec = fastjson.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(rec, dict) and isinstance(rec.get('payload'), dict):
+                        yield rec
+
+
+# ---------------------
+# Replay
+# ---------------------
+
+class RecordedError(RuntimeError):
+    """An LLM call that failed when it was recorded."""
+
+
+class ReplayExhausted(RuntimeError):
+    """The code under test made more LLM calls than the recording has."""
+
+
+class _Playback:
+    def __init__(self, calls: List[Dict[str, Any]], latency_scale: float = 0.0):
+        self.calls = calls
+        self.latency_scale = latency_scale
+        self.played = 0
+        self.extra = 0
+        self.prompt_changed = 0
+
+    def generate(self, provider_name: str, model_name: str, prompt: str, api_key: Optional[str],
+                 structured: bool = False) -> str:
+        if self.played >= len(self.calls):
+            self.extra += 1
+            raise ReplayExhausted('no recorded LLM response left')
+        call = self.calls[self.played]
+        self.played += 1
+        if call.get('prompt_sha') != prompt_sha(prompt):
+            self.prompt_changed += 1
+        if self.latency_scale:
+            time.sleep(float(call.get('latency_ms') or 0) / 1000.0 * self.latency_scale)
+        if 'error' in call:
+            raise RecordedError(call['error'])
+        return call.get('response') or ''
+
+
+_PLAYBACK: ContextVar[Optional[_Playback]] = ContextVar('reasoning_replay_playback', default=None)
+
+
+def _replay_generate(provider_name: str, model_name: str, prompt: str, api_key: Optional[str],
+                     structured: bool = False) -> str:
+    playback = _PLAYBACK.get()
+    if playback is None:
+        raise ReplayExhausted('LLM called outside a replayed job')
+    tokens.note_prompt(prompt)  # as `_llm_generate` does, so usage and the 'llm' trace stage match production
+    return playback.generate(provider_name, model_name, prompt, api_key, structured)
+
+
+@contextmanager
+def offline():
+    """Stub `_llm_generate` with the playback and turn off Redis-backed memo/cache lookups."""
+    from reasoning import api as api_mod
+    from reasoning import search_loop
+    from reasoning import search_memo
+
+    saved = (api_mod._llm_generate, api_mod._answer_cache_scope, search_memo.MEMO_ENABLED, search_loop.enabled)
+    api_mod._llm_generate = _replay_generate
+    api_mod._answer_cache_scope = lambda req: None
+    search_memo.MEMO_ENABLED = False
+    search_loop.enabled = lambda req: False
+    try:
+        yield
+    finally:
+        api_mod._llm_generate, api_mod._answer_cache_scope, search_memo.MEMO_ENABLED, search_loop.enabled = saved
+
+
+def drift(recorded: Optional[Dict[str, Any]], replayed: Optional[Dict[str, Any]]) -> List[str]:
+    """Decision fields (plus 'stages') that differ between two `_result_fields` dicts."""
+    if recorded is None or replayed is None:
+        return [] if recorded is replayed else ['result']
+    return [k for k in DECISION_FIELDS + ('stages',) if recorded.get(k) != replayed.get(k)]
+
+
+def replay_record(rec: Dict[str, Any], latency_scale: float = 0.0) -> Dict[str, Any]:
+    """Replay one record (inside `offline()`); returns its measurements and drift."""
+    from reasoning import api as api_mod
+    from reasoning.worker import build_intent_request
+
+    recorded = rec.get('result')
+    out: Dict[str, Any] = {'job_id': rec.get('job_id')}
+    stages = (recorded or {}).get('stages') or []
+    if stages[:1] == ['answer_cache'] or 'local_search' in stages:
+        # served from Redis / needed live Hub tool calls; neither is in the recording
+        out['skipped'] = 'answer_cache' if stages[:1] == ['answer_cache'] else 'local_search'
+        return out
+    playback = _Playback(rec.get('llm') or [], latency_scale)
+    token = _PLAYBACK.set(playback)
+    wall0, cpu0 = time.perf_counter(), time.thread_time()
+    replayed, error = None, None
+    try:
+        replayed = _result_fields(api_mod._compute_intent_sync(build_intent_request(rec['payload'])))
+    except Exception as e:
+        error = str(e)[:500]
+    finally:
+        _PLAYBACK.reset(token)
+    out.update(
+        cpu_ms=round((time.thread_time() - cpu0) * 1000, 3),
+        wall_ms=round((time.perf_counter() - wall0) * 1000, 3),
+        llm_calls=playback.played,
+        recorded_llm_calls=len(playback.calls),
+        extra_llm_calls=playback.extra,
+        prompt_changed=playback.prompt_changed,
+        drift=drift(recorded, replayed) if error is None or rec.get('error') else ['error'],
+        error=error,
+    )
+    if out['drift']:
+        out['recorded'], out['replayed'] = recorded, replayed
+    return out
+
+
+def _pct(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p * (len(values) - 1))))]
+
+
+def summarize(results: List[Dict[str, Any]]) -> Dict[str, Any]:
+    ran = [r for r in results if 'skipped' not in r]
+    cpu = [r['cpu_ms'] for r in ran]
+    wall = [r['wall_ms'] for r in ran]
+    fields: Dict[str, int] = {}
+    for r in ran:
+        for name in r['drift']:
+            fields[name] = fields.get(name, 0) + 1
+    return {
+        'jobs': len(ran),
+        'skipped': len(results) - len(ran),
+        'drifted': sum(1 for r in ran if r['drift']),
+        'drift_fields': fields,
+        'prompt_changed_jobs': sum(1 for r in ran if r['prompt_changed']),
+        'llm_calls': sum(r['llm_calls'] for r in ran),
+        'recorded_llm_calls': sum(r['recorded_llm_calls'] for r in ran),
+        'extra_llm_calls': sum(r['extra_llm_calls'] for r in ran),
+        'errors': sum(1 for r in ran if r['error']),
+        'cpu_ms': {'total': round(sum(cpu), 3), 'p50': _pct(cpu, 0.5), 'p95': _pct(cpu, 0.95), 'max': max(cpu or [0])},
+        'wall_ms': {'total': round(sum(wall), 3), 'p50': _pct(wall, 0.5), 'p95': _pct(wall, 0.95)},
+    }
+
+
+def replay(records: Iterable[Dict[str, Any]], latency_scale: float = 0.0, limit: int = 0) -> Dict[str, Any]:
+    """Replay records in order; returns {'summary': ..., 'jobs': [...]}."""
+    results = []
+    with offline():
+        for rec in records:
+            if limit and len(results) >= limit:
+                break
+            results.append(replay_record(rec, latency_scale))
+    return {'summary': summarize(results), 'jobs': results}
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Worker-side multi-step search loop.
+
+Normally every search step is a full round trip: the worker returns a
+tool intent, the Ruby runtime calls the Hub tool, and a new job comes
+back with the whole history. In this mode the worker calls read-only
+search tools itself, through the Hub route `POST /{engine}/tools/{tool}/call`
+(body `{"params": {...}}`, header `x-savant-user-id`), and keeps going
+until a step needs the caller.
+
+Loop, starting from the first step's result:
+
+  - While that result is a tool intent for a LOCAL_TOOLS tool that the
+    request also offers (`tools_available`, which already reflects the
+    runtime's disable_search / AGENT_DISABLE_TOOLS policy) and fewer than
+    the local budget (REASONING_LOCAL_SEARCH_STEPS, default 4) calls were
+    made, call the tool and append `{action, output}` to the history.
+  - If the output is empty, `_pick_search_action` chooses the next search
+    directly, with no LLM call.
+  - Otherwise the full step (pre-decisions, LLM, heuristics) runs again
+    on the extended history.
+  - The loop stops on `finish`, on a tool it may not call, at the budget,
+    or on a Hub error. A Hub error returns the pending tool intent so the
+    runtime makes the call itself.
+
+The runtime sends `max_steps: 1`, which `_pick_search_action` reads as the
+search budget. The follow-up steps are given a budget that covers the
+searches already in the history plus the local budget, so the loop is not
+cut short after its first call.
+
+The returned result is the final decision plus:
+
+  - `trace`: every step's trace, with a `local_search` stage per call
+  - `local_steps`: the history items the worker added
+  - `usage`: summed over the steps
+
+Env:
+  - REASONING_LOCAL_SEARCH=1 enables it for every request (default off;
+    a request can opt in or out with `llm.local_search`)
+  - REASONING_HUB_URL (default http://localhost:9999)
+  - REASONING_HUB_USER (default "default"; `llm.hub_user` overrides it)
+  - REASONING_LOCAL_SEARCH_TOOLS (default context.fts_search,context.memory_search,jira.jira_search)
+  - REASONING_LOCAL_SEARCH_STEPS (default 4; `llm.local_search_steps` overrides it)
+  - REASONING_LOCAL_SEARCH_TIMEOUT_S (default 10)
+"""
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+ENABLED = os.environ.get('REASONING_LOCAL_SEARCH', '0') not in ('0', '', 'false', 'False')
+HUB_URL = os.environ.get('REASONING_HUB_URL', 'http://localhost:9999').rstrip('/')
+HUB_USER = os.environ.get('REASONING_HUB_USER', 'default')
+LOCAL_TOOLS = frozenset(t.strip() for t in os.environ.get(
+    'REASONING_LOCAL_SEARCH_TOOLS', 'context.fts_search,context.memory_search,jira.jira_search').split(',') if t.strip())
+TIMEOUT_S = float(os.environ.get('REASONING_LOCAL_SEARCH_TIMEOUT_S', '10'))
+MAX_STEPS = int(os.environ.get('REASONING_LOCAL_SEARCH_STEPS', '4'))
+POOL_SIZE = 16
+USER_HEADER = 'x-savant-user-id'
+
+_EMPTY_KEYS = ('content', 'results', 'hits', 'items', 'issues', 'matches')
+
+
+def canonical(tool: Optional[str]) -> str:
+    return (tool or '').strip().replace('/', '.')
+
+
+def split_tool(tool: str) -> Tuple[str, str]:
+    """('context', 'fts_search') for context.fts_search or context/fts_search."""
+    engine, _, name = canonical(tool).partition('.')
+    if not engine or not name:
+        raise ValueError(f"tool {tool!r} has no engine prefix")
+    return engine, name
+
+
+def enabled(req) -> bool:
+    llm = req.llm if isinstance(req.llm, dict) else {}
+    if llm.get('local_search') is not None:
+        return bool(llm.get('local_search'))
+    return ENABLED
+
+
+def has_output(output: Any) -> bool:
+    """False for empty tool results: nothing, empty lists, or MCP/search envelopes with no entries."""
+    if not output:
+        return False
+    if isinstance(output, dict):
+        for key in _EMPTY_KEYS:
+            if key in output:
+                return bool(output[key])
+    return True
+
+
+class HubClient:
+    """Pooled HTTP client for Hub tool calls."""
+
+    def __init__(self, base_url: str = HUB_URL, timeout_s: float = TIMEOUT_S):
+        self.base_url = base_url.rstrip('/')
+        self.timeout_s = timeout_s
+        self._session = None
+        self._lock = threading.Lock()
+
+    def url(self, tool: str) -> str:
+        engine, name = split_tool(tool)
+        return f"{self.base_url}/{engine}/tools/{name}/call"
+
+    def _get_session(self):
+        with self._lock:
+            if self._session is None:
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                session = requests.Session()
+                session.mount('http://', HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE))
+                session.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE))
+                self._session = session
+            return self._session
+
+    def call(self, tool: str, params: Dict[str, Any], user: str = HUB_USER) -> Any:
+        response = self._get_session().post(self.url(tool), json={'params': params}, headers={USER_HEADER: user},
+                                            timeout=self.timeout_s)
+        response.raise_for_status()
+        return response.json()
+
+    async def call_async(self, tool: str, params: Dict[str, Any], user: str = HUB_USER) -> Any:
+        from reasoning import api as api_mod
+
+        response = await api_mod._get_async_http_client().post(
+            self.url(tool), json={'params': params}, headers={USER_HEADER: user}, timeout=self.timeout_s)
+        response.raise_for_status()
+        return response.json()
+
+
+HUB = HubClient()
+
+
+def _sum_usage(total: Optional[Dict[str, Any]], usage: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if not usage:
+        return total
+    if not total:
+        return dict(usage)
+    out = dict(total)
+    for key, value in usage.items():
+        if isinstance(value, (int, float)) and isinstance(out.get(key), (int, float)):
+            out[key] = out[key] + value
+    return out
+
+
+class SearchLoop:
+    """One intent's local iterations: pending call, extended history, accumulated trace."""
+
+    def __init__(self, req):
+        self.req = req
+        self.history: List[Dict[str, Any]] = list(req.history or [])
+        self.steps: List[Dict[str, Any]] = []
+        self.trace: List[Dict[str, Any]] = []
+        self.usage: Optional[Dict[str, Any]] = None
+        llm = req.llm if isinstance(req.llm, dict) else {}
+        self.max_steps = int(llm.get('local_search_steps') or MAX_STEPS)
+        self.user = llm.get('hub_user') or HUB_USER
+        self.allowed = frozenset(canonical(t) for t in req.tools_available or [] if isinstance(t, str))
+        from reasoning import api as api_mod
+
+        prior = len(api_mod._extract_search_history(req.history)[0])
+        self.search_budget = max(int(req.max_steps or 0), prior + self.max_steps)
+
+    def may_call(self, tool: Optional[str]) -> bool:
+        """Only read-only search tools that the request itself offers."""
+        return canonical(tool) in LOCAL_TOOLS and canonical(tool) in self.allowed
+
+    def next_call(self, result: Dict[str, Any]) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """(tool, args) to run locally after `result`, or None when it goes back to the caller."""
+        self.trace.extend(result.get('trace') or [])
+        self.usage = _sum_usage(self.usage, result.get('usage'))
+        tool = result.get('tool_name')
+        if result.get('finish') or not self.may_call(tool) or len(self.steps) >= self.max_steps:
+            return None
+        return tool, dict(result.get('tool_args') or {})
+
+    def absorb(self, tool: str, args: Dict[str, Any], output: Any, started: float) -> None:
+        item = {'action': {'action': 'tool', 'tool_name': tool, 'args': args}, 'output': output}
+        self.history.append(item)
+        self.steps.append(item)
+        self.trace.append({'stage': 'local_search', 'tool': tool, 'query': args.get('query') or args.get('jql'),
+                           'had_output': has_output(output), 'ms': round((time.monotonic() - started) * 1000, 1)})
+
+    def failed(self, tool: str, error: Exception) -> None:
+        from reasoning import api as api_mod
+
+        api_mod.log_event('local_search_failed', tool=tool, error=str(error)[:200])
+        self.trace.append({'stage': 'local_search', 'tool': tool, 'error': str(error)[:200]})
+
+    def next_request(self):
+        return self.req.model_copy(update={'history': list(self.history), 'max_steps': self.search_budget})
+
+    def planner_step(self) -> Optional[Dict[str, Any]]:
+        """After an empty search, the planner's next search without an LLM call (None: run the full step)."""
+        if not self.steps or has_output(self.steps[-1]['output']):
+            return None
+        from reasoning import api as api_mod
+
+        req = self.next_request()
+        tools_available = api_mod._filter_search_tools(req.tools_available)
+        tool, args, must_finish, _ = api_mod._pick_search_action(
+            req.goal_text, req.history, None, None, req.repo_context, max_searches=self.search_budget,
+            available_tools=tools_available)
+        if must_finish or not self.may_call(tool):
+            return None
+        decision = (tool, args, None, 'Previous search was empty; trying the next search.', False)
+        return api_mod._finalize_intent(req, decision, tools_available, False, final=True, trace=[{'stage': 'planner'}])
+
+    def finish(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        if not self.steps and len(self.trace) == len(result.get('trace') or []):
+            return result
+        result['trace'] = self.trace
+        result['local_steps'] = self.steps
+        if self.usage is not None:
+            result['usage'] = self.usage
+        from reasoning import api as api_mod
+
+        api_mod.log_event('local_search', steps=len(self.steps), finish=bool(result.get('finish')),
+                          tool_name=result.get('tool_name'))
+        return result
+
+
+def run(req, result: Dict[str, Any], step: Callable[[Any], Dict[str, Any]], hub: Optional[HubClient] = None) -> Dict[str, Any]:
+    """Iterate from the first step's `result`; `step(req)` computes one full step."""
+    hub = hub or HUB
+    loop = SearchLoop(req)
+    while True:
+        call = loop.next_call(result)
+        if call is None:
+            break
+        tool, args = call
+        started = time.monotonic()
+        try:
+            output = hub.call(tool, args, loop.user)
+        except Exception as e:
+            loop.failed(tool, e)
+            break
+        loop.absorb(tool, args, output, started)
+        result = loop.planner_step() or step(loop.next_request())
+    return loop.finish(result)
+
+
+async def run_async(req, result: Dict[str, Any], step, hub: Optional[HubClient] = None) -> Dict[str, Any]:
+    """Async `run`; `step(req)` is a coroutine function."""
+    hub = hub or HUB
+    loop = SearchLoop(req)
+    while True:
+        call = loop.next_call(result)
+        if call is None:
+            break
+        tool, args = call
+        started = time.monotonic()
+        try:
+            output = await hub.call_async(tool, args, loop.user)
+        except Exception as e:
+            loop.failed(tool, e)
+            break
+        loop.absorb(tool, args, output, started)
+        result = loop.planner_step() or await step(loop.next_request())
+    return loop.finish(result)
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cross-session memo of search outcomes per (repo, tool, normalized query).
+
+Each reasoning step records whether the search it just saw in history
+produced output. Counts decay with a half-life, so a query that was empty
+last week gets another chance. Keys also expire after a TTL. The planner
+uses `lookup` to push known-empty combinations to the back of its ranking.
+
+The read-decay-increment runs in one Lua script, so concurrent workers do
+not lose each other's updates. A record that names the step it comes from
+(`step_id`: the run's correlation id and the history position) is counted
+once per (repo, tool, query), even when a retried job records it again. The
+marker only lives as long as a run (`REASONING_SEARCH_MEMO_STEP_TTL_S`).
+
+All Redis access fails open: if Redis is missing or slow, the memo reports
+nothing and stops trying for a short backoff.
+
+Env:
+  - REASONING_SEARCH_MEMO=0 disables the memo (default on)
+  - REASONING_SEARCH_MEMO_TTL_S (default 604800, 7 days)
+  - REASONING_SEARCH_MEMO_HALF_LIFE_S (default 86400, 1 day)
+  - REASONING_SEARCH_MEMO_STEP_TTL_S (default 3600): how long a recorded step is remembered
+  - REDIS_URL
+"""
+
+import hashlib
+import os
+import time
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+MEMO_PREFIX = 'savant:search_memo:'
+MEMO_ENABLED = os.environ.get('REASONING_SEARCH_MEMO', '1') not in ('0', '', 'false', 'False')
+MEMO_TTL_S = int(os.environ.get('REASONING_SEARCH_MEMO_TTL_S', str(7 * 24 * 3600)))
+STEP_TTL_S = int(os.environ.get('REASONING_SEARCH_MEMO_STEP_TTL_S', '3600'))
+HALF_LIFE_S = float(os.environ.get('REASONING_SEARCH_MEMO_HALF_LIFE_S', str(24 * 3600)))
+REDIS_URL = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+
+# A combination counts as known-empty while its decayed empty count is at least
+# this (one empty result stays known for one half-life) and outweighs useful ones.
+KNOWN_EMPTY_MIN = 0.5
+RETRY_AFTER_ERROR_S = 30.0
+
+# KEYS: memo hash, per-step marker (optional). ARGV: now, had_output (0/1), half-life s, ttl s, step ttl s.
+_RECORD_LUA = """
+if KEYS[2] and redis.call('SET', KEYS[2], '1', 'NX', 'EX', tonumber(ARGV[5])) == false then
+  return 0
+end
+local now = tonumber(ARGV[1])
+local half_life = tonumber(ARGV[3])
+local state = redis.call('HMGET', KEYS[1], 'empty', 'useful', 'ts')
+local empty = tonumber(state[1]) or 0
+local useful = tonumber(state[2]) or 0
+local ts = tonumber(state[3]) or now
+local factor = 1
+if half_life > 0 then
+  factor = 0.5 ^ (math.max(0, now - ts) / half_life)
+end
+empty = empty * factor
+useful = useful * factor
+if ARGV[2] == '1' then
+  useful = useful + 1
+else
+  empty = empty + 1
+end
+redis.call('HSET', KEYS[1], 'empty', string.format('%.4f', empty), 'useful', string.format('%.4f', useful),
+           'ts', ARGV[1])
+redis.call('EXPIRE', KEYS[1], tonumber(ARGV[4]))
+return 1
+"""
+
+_client = None
+_script = None
+_disabled_until = 0.0
+
+
+def _get_client():
+    global _client
+    if _client is None:
+        import redis
+        _client = redis.Redis.from_url(REDIS_URL, decode_responses=True,
+                                       socket_timeout=0.2, socket_connect_timeout=0.2)
+    return _client
+
+
+def _get_script():
+    global _script
+    if _script is None:
+        _script = _get_client().register_script(_RECORD_LUA)
+    return _client, _script
+
+
+def _available() -> bool:
+    return MEMO_ENABLED and time.time() >= _disabled_until
+
+
+def _backoff() -> None:
+    global _disabled_until
+    _disabled_until = time.time() + RETRY_AFTER_ERROR_S
+
+
+def reset() -> None:
+    """Drop the Redis client and any error backoff, e.g. after Redis was restarted."""
+    global _client, _script, _disabled_until
+    _client = None
+    _script = None
+    _disabled_until = 0.0
+
+
+def repo_scope(repo_context: Optional[Dict[str, Any]]) -> str:
+    if not isinstance(repo_context, dict):
+        return ''
+    repo = repo_context.get('repo') or repo_context.get('repos') or ''
+    if isinstance(repo, (list, tuple)):
+        repo = ','.join(sorted(str(x) for x in repo))
+    return str(repo).strip().lower()
+
+
+def memo_key(repo: str, tool: str, query: str) -> str:
+    digest = hashlib.sha1(f"{repo}\x1f{tool}\x1f{query}".encode('utf-8')).hexdigest()[:20]
+    return f"{MEMO_PREFIX}{digest}"
+
+
+def _decayed(doc: Dict[str, Any], now: float) -> Tuple[float, float]:
+    try:
+        empty = float(doc.get('empty') or 0)
+        useful = float(doc.get('useful') or 0)
+        ts = float(doc.get('ts') or now)
+    except (TypeError, ValueError):
+        return 0.0, 0.0
+    factor = 0.5 ** (max(0.0, now - ts) / HALF_LIFE_S) if HALF_LIFE_S > 0 else 1.0
+    return empty * factor, useful * factor
+
+
+def step_key(repo: str, tool: str, query: str, step_id: str) -> str:
+    """Replay marker for one run step's outcome on (repo, tool, query)."""
+    digest = hashlib.sha1(f"{step_id}\x1f{repo}\x1f{tool}\x1f{query}".encode('utf-8')).hexdigest()[:20]
+    return f"{MEMO_PREFIX}seen:{digest}"
+
+
+def record(repo: str, tool: str, query: str, had_output: bool, r=None, now: Optional[float] = None,
+           step_id: Optional[str] = None) -> bool:
+    """Fold one search outcome into the decayed counts for (repo, tool, query).
+
+    Returns False when nothing was counted: disabled, Redis unavailable, or
+    `step_id` was already recorded.
+    """
+    if not (tool and query) or (r is None and not _available()):
+        return False
+    now = now or time.time()
+    keys = [memo_key(repo, tool, query)]
+    if step_id:
+        keys.append(step_key(repo, tool, query, step_id))
+    try:
+        if r is None:
+            r, script = _get_script()
+        else:
+            script = r.register_script(_RECORD_LUA)
+        return bool(int(script(keys=keys, args=[now, 1 if had_output else 0, HALF_LIFE_S, MEMO_TTL_S, STEP_TTL_S], client=r)))
+    except Exception:
+        _backoff()
+        return False
+
+
+def lookup(repo: str, pairs: Iterable[Tuple[str, str]], r=None, now: Optional[float] = None) -> Dict[Tuple[str, str], bool]:
+    """Map each (tool, query) pair to True when it is known to come back empty."""
+    pairs = [p for p in dict.fromkeys(pairs) if p[0] and p[1]]
+    if not pairs or (r is None and not _available()):
+        return {}
+    now = now or time.time()
+    try:
+        r = r or _get_client()
+        pipe = r.pipeline(transaction=False)
+        for tool, query in pairs:
+            pipe.hgetall(memo_key(repo, tool, query))
+        docs = pipe.execute()
+    except Exception:
+        _backoff()
+        return {}
+    out = {}
+    for pair, doc in zip(pairs, docs):
+        empty, useful = _decayed(doc or {}, now)
+        out[pair] = empty >= KNOWN_EMPTY_MIN and empty > useful
+    return out
@@ -0,0 +1,129 @@
+"""
+Tests for model-affinity routing and the worker registry
+"""
+import asyncio
+import json
+import time
+from unittest.mock import patch
+
+import pytest
+
+from reasoning import affinity
+from reasoning import api
+from reasoning import async_worker
+from reasoning import recycling
+from reasoning import worker
+
+
+class HashRedis:
+    def __init__(self):
+        self.hashes = {}
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = value
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def hdel(self, key, field):
+        self.hashes.get(key, {}).pop(field, None)
+
+
+def _job(model='phi3.5:latest', provider='ollama'):
+    return {'job_id': 'j', 'payload': {'llm': {'provider': provider, 'model': model}}}
+
+
+def test_pop_keys_prefers_warm_lanes():
+    router = affinity.AffinityRouter('w1', 'q', enabled=True)
+    router.note_model('ollama', 'phi3.5:latest', now=time.time() - 1)
+    router.note_model('ollama', 'llama3:8b')
+    assert router.pop_keys() == [
+        affinity.lane_key('ollama', 'llama3:8b'),
+        affinity.lane_key('ollama', 'phi3.5:latest'),
+        'q',
+    ]
+
+
+def test_route_target_hands_off_to_warm_peer():
+    r = HashRedis()
+    peer = affinity.AffinityRouter('w2', 'q', enabled=True)
+    peer.note_model('ollama', 'llama3:8b')
+    peer.publish(r, load=0)
+
+    router = affinity.AffinityRouter('w1', 'q', enabled=True)
+    assert router.route_target(r, _job('llama3:8b')) == affinity.lane_key('ollama', 'llama3:8b')
+    # Unknown model or remote provider: process locally
+    assert router.route_target(r, _job('phi3.5:latest')) is None
+    assert router.route_target(r, _job('gemini', provider='google api')) is None
+
+
+def test_route_target_skips_saturated_or_stale_peers():
+    r = HashRedis()
+    r.hset(affinity.REGISTRY_KEY, 'busy', json.dumps({'models': ['ollama:m'], 'load': 1, 'concurrency': 1, 'ts': time.time()}))
+    r.hset(affinity.REGISTRY_KEY, 'gone', json.dumps({'models': ['ollama:m'], 'load': 0, 'concurrency': 1, 'ts': time.time() - 600}))
+    router = affinity.AffinityRouter('w1', 'q', enabled=True)
+    assert router.route_target(r, _job('m')) is None
+
+
+def test_disabled_router_uses_shared_queue_only():
+    router = affinity.AffinityRouter('w1', 'q', enabled=False)
+    router.note_model('ollama', 'm')
+    assert router.pop_keys() == ['q']
+    assert router.route_target(HashRedis(), _job('m')) is None
+
+
+def test_peers_without_affinity_get_no_routed_jobs():
+    r = HashRedis()
+    plain = affinity.AffinityRouter('w2', 'q', enabled=False)
+    plain.note_model('ollama', 'm')
+    plain.publish(r, load=0)
+    assert affinity.AffinityRouter('w1', 'q', enabled=True).route_target(r, _job('m')) is None
+
+
+def test_async_worker_routes_steals_and_registers():
+    fakeredis = pytest.importorskip('fakeredis')
+    r = fakeredis.FakeAsyncRedis(decode_responses=True)
+    rec = recycling.Recycler(max_jobs=1, max_rss_mb=0, max_age_s=0)
+    job = dict(_job('m'), payload={'session_id': 's', 'persona': {}, 'goal_text': 'hi', 'llm': {'provider': 'ollama', 'model': 'm'}})
+    seen = {}
+
+    async def compute(req):
+        seen['registry'] = await r.hgetall(affinity.REGISTRY_KEY)
+        return {'final_text': 'ok', 'finish': True}
+
+    async def run():
+        peer = affinity.AffinityRouter('peer', async_worker.QUEUE_KEY, enabled=True)
+        peer.note_model('ollama', 'm')
+        await peer.publish_async(r, load=0)
+        await r.rpush(async_worker.QUEUE_KEY, json.dumps(job))
+        code = await asyncio.wait_for(async_worker.run(concurrency=2, r=r), timeout=10)
+        return code, await r.hgetall(affinity.REGISTRY_KEY), await r.llen(async_worker.COMPLETED_KEY)
+
+    with patch.object(affinity, 'AFFINITY_ENABLED', True), patch.object(recycling, 'RECYCLER', rec), \
+            patch.object(api, '_compute_intent_async', side_effect=compute):
+        code, registry, completed = asyncio.run(run())
+    # the shared-queue job went to the warm peer's lane, then this idle worker stole it back
+    assert code == recycling.RECYCLE_EXIT_CODE and completed == 1
+    me = [w for w in seen['registry'] if w != 'peer']
+    assert len(me) == 1 and json.loads(seen['registry'][me[0]])['affinity'] is True
+    assert list(registry) == ['peer']  # unregistered on exit
+
+
+def test_sync_routing_registers_lane_and_steal_reads_the_lane_set():
+    fakeredis = pytest.importorskip('fakeredis')
+    r = fakeredis.FakeRedis(decode_responses=True)
+    peer = affinity.AffinityRouter('peer', worker.QUEUE_KEY, enabled=True)
+    peer.note_model('ollama', 'm')
+    peer.publish(r, load=0)
+    router = affinity.AffinityRouter('w1', worker.QUEUE_KEY, enabled=True)
+    with patch.object(worker, 'process_job') as process:
+        worker.dispatch_popped(r, worker.QUEUE_KEY, json.dumps(_job('m')), router)
+    process.assert_not_called()
+    lane = affinity.lane_key('ollama', 'm')
+    assert r.smembers(affinity.LANES_KEY) == {lane}
+
+    r.rpush(affinity.LANE_PREFIX + 'ollama:unregistered', 'stray')  # not in the lane set: never scanned for
+    with patch.object(r, 'scan_iter', side_effect=AssertionError('keyspace scan')):
+        stolen_lane, job_json = router.steal(r)
+    assert stolen_lane == lane and json.loads(job_json)['job_id'] == _job('m')['job_id']
+    assert router.steal(r) is None
@@ -0,0 +1,109 @@
+"""
+Tests for the semantic answer cache
+"""
+from unittest.mock import patch
+
+import pytest
+
+from reasoning import answer_cache
+from reasoning import api
+
+fakeredis = pytest.importorskip('fakeredis')
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache(monkeypatch):
+    r = fakeredis.FakeRedis(decode_responses=True)
+    answer_cache.reset()
+    monkeypatch.setattr(answer_cache, '_get_client', lambda: r)
+    monkeypatch.setattr(answer_cache, '_STATS', {k: 0 for k in answer_cache._STATS})
+    yield r
+    answer_cache.reset()
+
+
+def test_rewordings_hit_within_scope_only():
+    assert answer_cache.store('repo-a', 'dev', 'what does the rate limiter do?', 'It throttles LLM calls.')
+    hit = answer_cache.lookup('repo-a', 'dev', 'Explain the rate limiters')
+    assert hit['final_text'] == 'It throttles LLM calls.' and hit['similarity'] >= answer_cache.THRESHOLD
+    assert answer_cache.lookup('repo-b', 'dev', 'explain the rate limiter') is None
+    assert answer_cache.lookup('repo-a', 'reviewer', 'explain the rate limiter') is None
+    assert answer_cache.lookup('repo-a', 'dev', 'what does the circuit breaker do?') is None
+    stats = answer_cache.stats()
+    assert (stats['hits'], stats['misses'], stats['hit_rate']) == (1, 3, 0.25)
+
+
+def test_exact_tokens_must_match():
+    answer_cache.store('r', 'p', 'explain the timeout in api.py', 'In api.py it is 30s.')
+    assert answer_cache.lookup('r', 'p', 'explain the timeout in worker.py', threshold=0.0) is None
+    assert answer_cache.stats()['low_confidence'] == 1
+    assert answer_cache.lookup('r', 'p', 'what is the timeout in api.py') is not None
+
+
+@pytest.mark.parametrize('stored,asked', [
+    ('where is the rate limiter configured', 'why is the rate limiter configured'),
+    ('how does the worker fail', 'why does the worker fail'),
+    ('does the worker retry', 'can the worker retry'),
+    ('when is the ledger trimmed', 'who trims the ledger'),
+])
+def test_different_questions_about_the_same_subject_miss(stored, asked):
+    answer_cache.store('r', 'p', stored, f"answer to: {stored}")
+    assert answer_cache.lookup('r', 'p', asked, threshold=0.0) is None
+    assert answer_cache.lookup('r', 'p', stored)['final_text'] == f"answer to: {stored}"
+    # with both stored, each question finds its own answer despite the identical vectors
+    answer_cache.store('r', 'p', asked, f"answer to: {asked}")
+    assert answer_cache.lookup('r', 'p', asked)['final_text'] == f"answer to: {asked}"
+    assert answer_cache.lookup('r', 'p', stored)['final_text'] == f"answer to: {stored}"
+
+
+def test_entries_persist_in_redis_and_reload(fresh_cache):
+    answer_cache.store('r', 'p', 'how does the ledger work', 'It appends to a stream.')
+    assert len(fresh_cache.hgetall(answer_cache.scope_key('r', 'p'))) == 1
+    answer_cache.reset()  # a fresh process: nothing in memory
+    answer_cache._get_client = lambda: fresh_cache
+    assert answer_cache.lookup('r', 'p', 'describe how the ledger works')['final_text'] == 'It appends to a stream.'
+
+
+def test_capacity_evicts_oldest():
+    index = answer_cache._ScopeIndex(capacity=2)
+    for i, goal in enumerate(['alpha module', 'beta module', 'gamma module']):
+        index.add({'id': goal, 'goal': goal, 'final_text': goal.upper(), 'ts': i})
+    assert sorted(e['goal'] for e in index.entries) == ['beta module', 'gamma module']
+    (entry, sim), = index.candidates(answer_cache.vectorize('gamma module'), 0.99)
+    assert entry['final_text'] == 'GAMMA MODULE' and sim > 0.99
+
+
+def test_redis_scope_is_trimmed_to_capacity(fresh_cache, monkeypatch):
+    monkeypatch.setattr(answer_cache, 'MAX_PER_SCOPE', 5)
+    key = answer_cache.scope_key('r', 'p')
+    fresh_cache.hset(key, 'legacy', '{"goal": "old goal", "final_text": "old", "ts": 1}')  # written before the ZSET
+    for i in range(20):
+        answer_cache.store('r', 'p', f"explain module {i}", f"answer {i}", now=1000.0 + i)
+    fields = fresh_cache.hgetall(key)
+    assert len(fields) == 5 and fresh_cache.zcard(answer_cache.ts_key(key)) == 5
+    assert sorted(answer_cache.fastjson.loads(v)['final_text'] for v in fields.values()) == [
+        f"answer {i}" for i in range(15, 20)]
+    assert 0 < fresh_cache.ttl(answer_cache.ts_key(key)) <= answer_cache.TTL_S
+
+
+def _req(goal, **kw):
+    return api.AgentIntentRequest(session_id='s', persona={'name': 'dev'}, goal_text=goal,
+                                  llm={'provider': 'ollama', 'answer_cache': True}, **kw)
+
+
+def test_compute_intent_serves_near_duplicates_without_llm():
+    reply = 'ACTION: finish\nRESULT: It retries with backoff.\nREASONING: known'
+    with patch.object(api, '_call_ollama_api', return_value=reply) as call:
+        first = api._compute_intent_sync(_req('how does the worker retry failed jobs?'))
+        second = api._compute_intent_sync(_req('explain how workers retry failed jobs'))
+        with_history = api._compute_intent_sync(_req('explain how workers retry failed jobs',
+                                                     history=[{'action': {'action': 'reason'}, 'output': 'x'}]))
+    assert first['final_text'] == second['final_text'] == 'It retries with backoff.'
+    assert second['trace'][0]['stage'] == 'answer_cache' and second['finish'] is True
+    assert with_history['trace'][0]['stage'] == 'llm'
+    assert call.call_count == 2  # the second goal never reached the model
+
+
+def test_fallback_answers_are_not_cached():
+    with patch.object(api, '_call_ollama_api', side_effect=RuntimeError('down')):
+        api._compute_intent_sync(_req('what is the purpose of the ledger?'))
+    assert answer_cache.stats()['stores'] == 0
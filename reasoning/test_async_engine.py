@@ -0,0 +1,113 @@
+"""
+Tests for the asyncio reasoning engine and worker
+"""
+import asyncio
+import json
+from unittest.mock import patch
+
+from reasoning import api
+from reasoning import async_worker
+
+
+def _req(**overrides):
+    data = {'session_id': 's1', 'persona': {}, 'goal_text': 'find the agent runtime'}
+    data.update(overrides)
+    return api.AgentIntentRequest(**data)
+
+
+def test_parse_llm_response_matches_line_format():
+    decision = api._parse_llm_response("ACTION: context.fts_search\nRESULT: runtime\nREASONING: look", "goal")
+    assert decision == ("context.fts_search", {"query": "runtime"}, None, "look", False)
+
+    finish = api._parse_llm_response("ACTION: finish\nRESULT: done\nREASONING: ok", "goal")
+    assert finish == (None, None, "done", "ok", True)
+
+
+def test_compute_intent_async_matches_sync():
+    reply = "ACTION: context.fts_search\nRESULT: agent runtime\nREASONING: need code"
+
+    async def fake_ollama(model, prompt, structured=False):
+        return reply
+
+    with patch.object(api, '_call_ollama_api', return_value=reply), \
+            patch.object(api, '_call_ollama_api_async', side_effect=fake_ollama):
+        sync_res = api._compute_intent_sync(_req())
+        async_res = asyncio.run(api._compute_intent_async(_req()))
+
+    for key in ('tool_name', 'tool_args', 'finish', 'final_text', 'reasoning'):
+        assert sync_res[key] == async_res[key]
+    assert async_res['tool_name'] == 'context.fts_search'
+
+
+def test_compute_intent_async_forced_tool_skips_llm():
+    async def boom(*_args, **_kwargs):
+        raise AssertionError('LLM should not be called')
+
+    with patch.object(api, '_use_llm_for_reasoning_async', side_effect=boom):
+        res = asyncio.run(api._compute_intent_async(_req(forced_tool='context.fts_search')))
+    assert res['tool_name'] == 'context.fts_search'
+    assert res['finish'] is False
+
+
+class FakeAsyncPipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def setex(self, key, ttl, value):
+        self.ops.append(('setex', key, value))
+
+    def lpush(self, key, value):
+        self.ops.append(('lpush', key, value))
+
+    def ltrim(self, key, start, stop):
+        pass
+
+    async def execute(self):
+        for op, key, value in self.ops:
+            if op == 'setex':
+                self.redis.data[key] = value
+            else:
+                self.redis.lists.setdefault(key, []).insert(0, value)
+
+
+class FakeAsyncRedis:
+    def __init__(self):
+        self.data = {}
+        self.lists = {}
+        self.running = set()
+
+    async def sadd(self, key, value):
+        self.running.add(value)
+
+    async def srem(self, key, value):
+        self.running.discard(value)
+
+    def pipeline(self, transaction=False):
+        return FakeAsyncPipeline(self)
+
+
+def test_process_job_async_stores_result():
+    r = FakeAsyncRedis()
+    job = {'job_id': 'j1', 'payload': {'session_id': 's', 'persona': {}, 'goal_text': 'what is 2 + 2'}}
+
+    async def fake_llm(*_args, **_kwargs):
+        return (None, None, '4', 'math', True)
+
+    with patch.object(api, '_use_llm_for_reasoning_async', side_effect=fake_llm):
+        asyncio.run(async_worker.process_job_async(r, json.dumps(job)))
+
+    result = json.loads(r.data['savant:result:j1'])
+    assert result['status'] == 'ok'
+    assert result['final_text'] == '4'
+    assert 'started_at' in result and 'finished_at' in result
+    assert json.loads(r.lists['savant:jobs:completed'][0])['job_id'] == 'j1'
+    assert 'j1' not in r.running
+
+
+def test_process_job_async_records_invalid_json():
+    r = FakeAsyncRedis()
+    asyncio.run(async_worker.process_job_async(r, '{not json'))
+    failed = json.loads(r.lists['savant:jobs:failed'][0])
+    assert failed['job_id'] is None
+    assert failed['error'].startswith('invalid json')
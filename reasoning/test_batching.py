@@ -0,0 +1,51 @@
+"""
+Tests for worker micro-batching helpers
+"""
+import json
+
+from reasoning import batching
+
+
+class ListRedis:
+    def __init__(self, items):
+        self.items = list(items)
+
+    def lpop(self, key, count=None):
+        if not self.items:
+            return None
+        out, self.items = self.items[:count], self.items[count:]
+        return out
+
+
+def _job(job_id, provider=None, model=None):
+    llm = {}
+    if provider:
+        llm['provider'] = provider
+    if model:
+        llm['model'] = model
+    return json.dumps({'job_id': job_id, 'payload': {'goal_text': 'g', 'llm': llm}})
+
+
+def test_batch_key_defaults_to_local_model():
+    assert batching.batch_key({'payload': {}}) == ('ollama', 'phi3.5:latest')
+    assert batching.batch_key({'payload': {'llm': {'provider': 'Google API', 'model': 'gemini'}}}) == ('google api', 'gemini')
+
+
+def test_group_jobs_keeps_arrival_order():
+    items = [_job('a'), _job('b', 'google api', 'gemini'), _job('c'), 'not json']
+    groups = batching.group_jobs(items)
+    assert list(groups.keys()) == [('ollama', 'phi3.5:latest'), ('google api', 'gemini'), ('invalid', '')]
+    assert [j['job_id'] for j in groups[('ollama', 'phi3.5:latest')]] == ['a', 'c']
+    assert groups[('invalid', '')] == ['not json']
+
+
+def test_collect_batch_respects_max_size():
+    r = ListRedis([_job(str(i)) for i in range(10)])
+    items = batching.collect_batch(r, 'q', _job('first'), window_ms=10, max_size=4)
+    assert len(items) == 4
+    assert len(r.items) == 7
+
+
+def test_collect_batch_disabled_returns_first_only():
+    r = ListRedis([_job('x')])
+    assert batching.collect_batch(r, 'q', 'first', window_ms=0, max_size=4) == ['first']
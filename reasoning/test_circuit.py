@@ -0,0 +1,141 @@
+"""
+Tests for provider circuit breakers and fallback chains
+"""
+import asyncio
+import time
+from unittest.mock import patch
+
+import pytest
+
+from reasoning import api
+from reasoning import circuit
+
+
+@pytest.fixture(autouse=True)
+def fresh_breakers():
+    circuit.reset()
+    yield
+    circuit.reset()
+
+
+def test_breaker_trips_on_failure_rate_and_probes_half_open():
+    b = circuit.CircuitBreaker('ollama', window_s=30, min_calls=4, failure_rate=0.5, open_s=10)
+    for ok in (True, False, True):
+        assert b.record(ok, 0.1, now=0.0) is False
+    assert b.record(False, 0.1, now=1.0) is True
+    assert b.state == circuit.OPEN
+    with pytest.raises(circuit.CircuitOpen):
+        b.before_call(now=5.0)
+    b.before_call(now=11.0)  # the single half-open probe
+    with pytest.raises(circuit.CircuitOpen):
+        b.before_call(now=11.5)
+    b.record(False, 0.1, now=12.0)
+    assert b.state == circuit.OPEN and b.trips == 2
+    b.before_call(now=23.0)
+    b.record(True, 0.1, now=23.5)
+    assert b.state == circuit.CLOSED
+
+
+def test_breaker_trips_on_slow_calls_and_forgets_old_ones():
+    b = circuit.CircuitBreaker('google api', window_s=10, min_calls=3, slow_rate=0.6, slow_call_s=5)
+    b.record(True, 9.0, now=0.0)
+    b.record(True, 9.0, now=1.0)
+    b.record(True, 0.1, now=20.0)  # the slow calls have left the window
+    assert b.state == circuit.CLOSED
+    b.record(True, 9.0, now=21.0)
+    assert b.record(True, 9.0, now=22.0) is True
+
+
+def test_slow_calls_do_not_trip_by_default():
+    b = circuit.CircuitBreaker('ollama', min_calls=2)
+    for i in range(5):
+        assert b.record(True, 29.0, now=float(i)) is False
+    assert b.state == circuit.CLOSED
+
+
+def test_rate_limited_calls_do_not_open_the_breaker():
+    def limited(*_a, **_k):
+        raise api.ratelimit.ProviderRateLimited('429 Too Many Requests', retry_after=1)
+
+    circuit._breakers['google api'] = circuit.CircuitBreaker('google api', min_calls=2)
+    with patch.object(api.ratelimit, 'applies', return_value=False), \
+            patch.object(api, '_google_generate', side_effect=limited):
+        for _ in range(5):
+            with pytest.raises(api.ratelimit.ProviderRateLimited):
+                api._llm_dispatch_guarded('google api', 'g', 'hi', 'k')
+    snap = circuit.get('google api').snapshot()
+    assert snap['state'] == circuit.CLOSED and snap['failures'] == 0
+
+
+def test_client_errors_do_not_open_the_breaker():
+    import requests
+
+    def response(status):
+        resp = requests.Response()
+        resp.status_code = status
+        resp.url = 'http://localhost:11434/api/generate'
+        return resp
+
+    circuit._breakers['ollama'] = circuit.CircuitBreaker('ollama', min_calls=2)
+    with patch.object(api.requests, 'post', return_value=response(404)):
+        for _ in range(5):
+            with pytest.raises(api.ProviderRequestError, match='404') as err:
+                api._llm_dispatch_guarded('ollama', 'not-pulled', 'hi', None)
+    assert err.value.status_code == 404 and not err.value.unhealthy
+    snap = circuit.get('ollama').snapshot()
+    assert snap['state'] == circuit.CLOSED and snap['failures'] == 0
+
+    with patch.object(api.requests, 'post', return_value=response(503)):
+        for _ in range(2):
+            with pytest.raises(api.ProviderRequestError):
+                api._llm_dispatch_guarded('ollama', 'phi', 'hi', None)
+    assert circuit.get('ollama').state == circuit.OPEN
+
+
+def test_chain_resolution():
+    chains = {'phi3.5:latest': ['google api:gemini-1.5-flash', 'deterministic', 'bogus'], '*': ['deterministic']}
+    chain = circuit.chain_for('ollama', 'phi3.5:latest', chains)
+    assert [t.label() for t in chain] == ['ollama:phi3.5:latest', 'google api:gemini-1.5-flash', 'deterministic']
+    assert [t.label() for t in circuit.chain_for('google api', 'g', chains)] == ['google api:g', 'deterministic']
+    assert circuit.chain_for('ollama', 'x', {}) == [circuit.Target('ollama', 'x')]
+    assert circuit.parse_target('ollama:llama3:8b') == circuit.Target('ollama', 'llama3:8b')
+
+
+def test_open_circuit_fails_over_without_calling_the_dead_host():
+    chains = {'phi3.5:latest': ['google api:gemini-1.5-flash']}
+    ollama_calls = []
+
+    def dead(*_a, **_k):
+        ollama_calls.append(1)
+        raise api.ProviderRequestError('Ollama request failed: connection refused', unhealthy=True)
+
+    circuit._breakers['ollama'] = circuit.CircuitBreaker('ollama', min_calls=2)
+    with patch.object(circuit, 'CHAINS', chains), \
+            patch.object(circuit, 'FALLBACK_GOOGLE_API_KEY', 'k'), \
+            patch.object(api.ratelimit, 'applies', return_value=False), \
+            patch.object(api, '_call_ollama_api', side_effect=dead), \
+            patch.object(api, '_google_generate', return_value='ACTION: finish\nRESULT: from gemini\nREASONING: ok'):
+        for _ in range(2):
+            api._use_llm_for_reasoning('hi', None, 'ollama', 'phi3.5:latest')
+        assert circuit.get('ollama').state == circuit.OPEN
+        meta = {}
+        started = time.monotonic()
+        decision = api._use_llm_for_reasoning('hi', None, 'ollama', 'phi3.5:latest', meta=meta)
+        assert time.monotonic() - started < 0.1
+    assert len(ollama_calls) == 2
+    assert decision[2] == 'from gemini' and decision[4] is True
+    assert meta['llm_target'] == 'google api:gemini-1.5-flash'
+    assert meta['fallbacks'] == [{'target': 'ollama:phi3.5:latest', 'reason': 'circuit_open'}]
+
+
+def test_deterministic_end_of_chain_async():
+    async def dead(*_a, **_k):
+        raise Exception('Ollama request failed: timeout')
+
+    meta = {}
+    with patch.object(circuit, 'CHAINS', {'*': ['deterministic']}), \
+            patch.object(api, '_call_ollama_api_async', side_effect=dead):
+        decision = asyncio.run(api._use_llm_for_reasoning_async('hi', None, 'ollama', 'm', meta=meta))
+    assert decision[0] is None and decision[4] is False
+    assert decision[3].startswith('Deterministic fallback')
+    assert meta['llm_target'] == 'deterministic'
@@ -0,0 +1,79 @@
+"""
+Tests for the Python reasoning client
+"""
+import asyncio
+import json
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from reasoning import api
+from reasoning import client
+from reasoning import worker
+
+fakeredis = pytest.importorskip('fakeredis')
+
+REPLY = 'ACTION: finish\nRESULT: done\nREASONING: ok'
+
+
+def _payload(goal):
+    return {'session_id': 's', 'persona': {'name': 'dev'}, 'goal_text': goal, 'llm': {'provider': 'ollama'}}
+
+
+def _drain(r, n):
+    for _ in range(n):
+        _, job_json = r.blpop(client.QUEUE_KEY, timeout=5)
+        worker.process_job(r, job_json)
+
+
+def test_submit_many_queues_one_envelope_per_payload():
+    r = fakeredis.FakeRedis(decode_responses=True)
+    ids = client.ReasoningClient(redis_client=r).submit_many([_payload('a'), _payload('b')], callback_url='http://cb')
+    jobs = [json.loads(raw) for raw in r.lrange(client.QUEUE_KEY, 0, -1)]
+    assert [j['job_id'] for j in jobs] == ids and len(set(ids)) == 2
+    assert jobs[0]['payload']['goal_text'] == 'a' and jobs[1]['callback_url'] == 'http://cb'
+
+
+def test_agent_intents_round_trip_through_the_worker():
+    r = fakeredis.FakeRedis(decode_responses=True)
+    c = client.ReasoningClient(redis_client=r)
+    with patch.object(api, '_call_ollama_api', return_value=REPLY):
+        t = threading.Thread(target=_drain, args=(r, 3))
+        t.start()
+        results = c.agent_intents([_payload('one'), _payload('two'), dict(_payload('bad'), persona='not an object')], timeout_s=5)
+        t.join()
+    assert [res['final_text'] for res in results[:2]] == ['done', 'done']
+    assert isinstance(results[2], client.ReasoningError) and results[2].job_id
+
+
+def test_wait_many_returns_finished_jobs_and_honours_the_deadline():
+    r = fakeredis.FakeRedis(decode_responses=True)
+    c = client.ReasoningClient(redis_client=r)
+    r.set(client.result_key('done'), json.dumps({'status': 'ok', 'final_text': 'x'}))
+    started = time.monotonic()
+    out = c.wait_many(['done', 'missing'], timeout_s=0.2)
+    assert list(out) == ['done'] and 0.2 <= time.monotonic() - started < 1.0
+    with pytest.raises(client.ReasoningTimeout):
+        c.wait('missing', deadline=time.monotonic())
+    r.set(client.result_key('bad'), json.dumps({'status': 'error', 'error': 'boom'}))
+    with pytest.raises(client.ReasoningError, match='boom'):
+        c.wait('bad', timeout_s=0)
+
+
+def test_async_client_submits_and_waits():
+    server = fakeredis.FakeServer()
+    r = fakeredis.FakeRedis(server=server, decode_responses=True)
+    ar = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+
+    async def run():
+        c = client.AsyncReasoningClient(redis_client=ar)
+        ids = await c.submit_many([_payload('one'), _payload('two')])
+        for job_id in ids:
+            await ar.set(client.result_key(job_id), json.dumps({'status': 'ok', 'job_id': job_id}))
+        return ids, await c.agent_intents([], timeout_s=0), await c.wait_many(ids, timeout_s=1)
+
+    ids, empty, out = asyncio.run(run())
+    assert empty == [] and [out[j]['job_id'] for j in ids] == ids
+    assert r.llen(client.QUEUE_KEY) == 2
@@ -0,0 +1,132 @@
+"""
+Tests for the worker control plane
+"""
+import asyncio
+import json
+import time
+
+import pytest
+
+from reasoning import api
+from reasoning import async_worker
+from reasoning import control
+
+
+@pytest.fixture
+def restore_api_settings():
+    saved = (api._LLM_TIMEOUT_S, api._LOG_SAMPLE_RATE)
+    yield
+    api._LLM_TIMEOUT_S, api._LOG_SAMPLE_RATE = saved
+
+
+def test_commands_change_settings_and_ack(restore_api_settings):
+    applied = []
+    ctl = control.WorkerControl('h:1', 'async', 8, on_concurrency=applied.append)
+    assert ctl.handle(control.command('pause'))['result'] == {'paused': True} and ctl.paused
+    ctl.handle(control.command('resume'))
+    assert not ctl.paused
+
+    ack = ctl.handle(control.command('concurrency', {'value': 16}))
+    assert ack['ok'] and ack['result'] == {'concurrency': 16, 'previous': 8} and applied == [16]
+    assert ctl.handle(control.command('timeout', {'value': 45}))['ok'] and api._LLM_TIMEOUT_S == 45.0
+    assert ctl.handle(control.command('log_sample', {'value': 0.25}))['ok'] and api._LOG_SAMPLE_RATE == 0.25
+
+    status = ctl.handle(control.command('status'))['result']
+    assert status['concurrency'] == 16 and status['timeout_s'] == 45.0 and 'rss_mb' in status['process']
+
+
+@pytest.mark.parametrize('cmd, args, error', [
+    ('concurrency', {'value': 0}, 'value must be'),
+    ('log_sample', {'value': 2}, 'value must be'),
+    ('timeout', {}, ''),
+    ('flush_caches', {'names': ['nope']}, 'unknown caches'),
+])
+def test_bad_arguments_are_refused_in_the_ack(cmd, args, error):
+    ack = control.WorkerControl('h:1', 'sync', 1).handle(control.command(cmd, args))
+    assert ack['ok'] is False and error in ack['error']
+
+
+def test_concurrency_callback_can_refuse():
+    def refuse(n):
+        raise ValueError('needs micro-batching')
+    ctl = control.WorkerControl('h:1', 'sync', 1, on_concurrency=refuse)
+    ack = ctl.handle(control.command('concurrency', {'value': 4}))
+    assert ack['error'] == 'needs micro-batching' and ctl.concurrency == 1
+
+
+def test_flush_caches_runs_named_flushers(monkeypatch):
+    calls = []
+    monkeypatch.setattr(control, 'FLUSHERS', {'a': lambda: calls.append('a'), 'b': lambda: calls.append('b')})
+    ctl = control.WorkerControl('h:1', 'sync', 1)
+    assert ctl.handle(control.command('flush_caches'))['result'] == {'flushed': ['a', 'b']}
+    ctl.handle(control.command('flush_caches', {'names': ['b']}))
+    assert calls == ['a', 'b', 'b']
+
+
+def test_log_sampling_keeps_failures(restore_api_settings):
+    api._LOG_SAMPLE_RATE = 0.0001
+    assert api._log_sampled_out('job_started')
+    assert not api._log_sampled_out('job_failed') and not api._log_sampled_out('worker_loop_error')
+
+
+def test_sync_listener_acks_targeted_commands():
+    fakeredis = pytest.importorskip('fakeredis')
+    r = fakeredis.FakeRedis(decode_responses=True)
+    ctl = control.WorkerControl('h:1', 'sync', 1)
+    stop = control.start_listener(r, ctl)
+    try:
+        deadline = time.time() + 2
+        while not r.pubsub_numsub(control.CHANNEL)[0][1] and time.time() < deadline:
+            time.sleep(0.01)
+        other = control.command('pause', target='h:2')
+        r.publish(control.CHANNEL, json.dumps(other))
+        msg = control.command('pause', target=['h:1'])
+        assert r.publish(control.CHANNEL, json.dumps(msg)) == 1
+        acks = control.collect_acks(r, msg['id'], 1, timeout_s=2)
+    finally:
+        stop.set()
+    assert [(a['worker_id'], a['ok']) for a in acks] == [('h:1', True)]
+    assert ctl.paused and not r.exists(control.ack_key(other['id']))
+
+
+def test_async_slots_resize_wakes_waiter():
+    async def run():
+        slots = async_worker._Slots(1)
+        await slots.acquire()
+        waiter = asyncio.ensure_future(slots.acquire())
+        await asyncio.sleep(0.01)
+        assert not waiter.done()
+        slots.resize(2)
+        await asyncio.wait_for(waiter, timeout=1)
+        assert slots.used == 2
+        slots.resize(1)
+        slots.release()
+        blocked = asyncio.ensure_future(slots.acquire())
+        await asyncio.sleep(0.01)
+        assert not blocked.done()  # 1 in use, limit 1
+        slots.release()
+        await asyncio.wait_for(blocked, timeout=1)
+
+    asyncio.run(run())
+
+
+def test_async_listener_applies_and_acks():
+    fakeredis = pytest.importorskip('fakeredis')
+    r = fakeredis.FakeAsyncRedis(decode_responses=True)
+    ctl = control.WorkerControl('h:1', 'async', 4)
+
+    async def run():
+        stop = asyncio.Event()
+        task = asyncio.create_task(control.listen_async(r, ctl, stop))
+        msg = control.command('concurrency', {'value': 2})
+        for _ in range(200):
+            if await r.publish(control.CHANNEL, json.dumps(msg)):
+                break
+            await asyncio.sleep(0.01)
+        item = await r.blpop(control.ack_key(msg['id']), timeout=2)
+        stop.set()
+        await asyncio.wait_for(task, timeout=3)
+        return json.loads(item[1])
+
+    ack = asyncio.run(run())
+    assert ack['ok'] and ctl.concurrency == 2
@@ -0,0 +1,162 @@
+"""
+Tests for fan-out batch jobs
+"""
+import asyncio
+import json
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from reasoning import api
+from reasoning import async_worker
+from reasoning import batching
+from reasoning import fanout
+from reasoning import worker
+
+
+def _batch(mode='combined', n=3):
+    return {
+        'job_id': 'b1',
+        'type': 'batch',
+        'payload': {
+            'shared': {'session_id': 'council-1', 'persona': {'name': 'shared'}, 'llm': {'provider': 'ollama', 'model': 'phi'}},
+            'items': [{'item_id': f"agent-{i}", 'payload': {'goal_text': f"position {i}"}} for i in range(n)],
+            'mode': mode,
+        },
+    }
+
+
+def test_item_payloads_merge_shared_sections_by_reference():
+    job = _batch()
+    job['payload']['items'][1]['payload']['persona'] = {'name': 'own'}
+    items = fanout.item_payloads(job)
+    assert [i for i, _ in items] == ['agent-0', 'agent-1', 'agent-2']
+    assert items[0][1]['goal_text'] == 'position 0'
+    assert items[0][1]['persona'] is items[2][1]['persona'] is job['payload']['shared']['persona']
+    assert items[1][1]['persona'] == {'name': 'own'}
+    assert batching.batch_key(job) == ('ollama', 'phi')
+
+
+@pytest.mark.parametrize('payload, message', [
+    ({'items': []}, 'non-empty'),
+    ({'items': [{'item_id': 'a'}, {'item_id': 'a'}]}, 'duplicate'),
+    ({'items': [{}] * 3}, 'limit'),
+])
+def test_item_payloads_rejects_bad_envelopes(payload, message):
+    with pytest.raises(ValueError, match=message):
+        fanout.item_payloads({'type': 'batch', 'payload': payload}, max_items=2)
+
+
+def _fake_compute(req):
+    if req.goal_text == 'position 1':
+        raise RuntimeError('model exploded')
+    return {'status': 'ok', 'final_text': req.goal_text.upper(), 'finish': True,
+            'usage': {'llm_calls': 1, 'prompt_tokens_est': 100}}
+
+
+def test_sync_batch_runs_items_in_parallel_and_streams():
+    fakeredis = pytest.importorskip('fakeredis')
+    r = fakeredis.FakeRedis(decode_responses=True)
+    barrier = threading.Barrier(3, timeout=2)
+
+    def compute(req):
+        barrier.wait()  # all three items must be in flight at once
+        return _fake_compute(req)
+
+    with patch.object(api, '_compute_intent_sync', side_effect=compute):
+        worker.process_job(r, json.dumps(_batch(mode='stream')))
+
+    result = json.loads(r.get('savant:result:b1'))
+    assert result['status'] == 'partial' and result['failed'] == 1
+    assert [d['item_id'] for d in result['items']] == ['agent-0', 'agent-1', 'agent-2']
+    assert result['items'][0]['final_text'] == 'POSITION 0'
+    assert result['items'][1] == {'item_id': 'agent-1', 'status': 'error', 'error': 'model exploded'}
+    streamed = [json.loads(x)['item_id'] for x in r.lrange(fanout.items_key('b1'), 0, -1)]
+    assert sorted(streamed) == ['agent-0', 'agent-1', 'agent-2']
+    entry = r.xrevrange('savant:jobs:ledger', count=1)[0][1]
+    assert entry['status'] == 'error' and entry['prompt_tokens_est'] == '200'
+    assert not r.smembers('savant:jobs:running')
+
+
+def test_async_batch_combined_only():
+    fakeredis = pytest.importorskip('fakeredis')
+    r = fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    async def compute(req):
+        await asyncio.sleep(0.05)
+        return _fake_compute(req)
+
+    async def run():
+        started = time.monotonic()
+        await async_worker.process_job_async(r, json.dumps(_batch(n=3)))
+        elapsed = time.monotonic() - started
+        return elapsed, json.loads(await r.get('savant:result:b1')), await r.exists(fanout.items_key('b1'))
+
+    with patch.object(api, '_compute_intent_async', side_effect=compute):
+        elapsed, result, streamed = asyncio.run(run())
+    assert elapsed < 0.15
+    assert result['status'] == 'partial' and len(result['items']) == 3
+    assert streamed == 0
+
+
+def _drain_like_client(r, job_id, n, timeout=1):
+    """Read streamed items the way Reasoning::Client#agent_intent_batch does: BLPOP until all arrived."""
+    started = time.monotonic()
+    docs = []
+    while len(docs) < n:
+        res = r.blpop(fanout.items_key(job_id), timeout=timeout)
+        if not res:
+            break
+        docs.append(json.loads(res[1]))
+    return docs, time.monotonic() - started
+
+
+def test_bad_batch_envelope_answers_streaming_caller_at_once():
+    fakeredis = pytest.importorskip('fakeredis')
+    r = fakeredis.FakeRedis(decode_responses=True)
+    job = _batch(mode='stream')
+    job['payload']['items'].append({'item_id': 'agent-0', 'payload': {}})  # duplicate id: rejected envelope
+    worker.process_job(r, json.dumps(job))
+
+    docs, elapsed = _drain_like_client(r, 'b1', 3)
+    assert elapsed < 0.5
+    assert [d['item_id'] for d in docs] == ['agent-0', 'agent-1', 'agent-2']
+    assert all(d['status'] == 'error' and 'duplicate' in d['error'] for d in docs)
+    result = json.loads(r.get('savant:result:b1'))
+    assert result['status'] == 'error' and 'duplicate' in result['error']
+
+
+def test_failure_outside_items_still_answers_every_item():
+    fakeredis = pytest.importorskip('fakeredis')
+    r = fakeredis.FakeRedis(decode_responses=True)
+    with patch.object(worker, 'ThreadPoolExecutor', side_effect=RuntimeError("can't start new thread")):
+        worker.process_job(r, json.dumps(_batch(mode='stream')))
+
+    docs, elapsed = _drain_like_client(r, 'b1', 3)
+    assert elapsed < 0.5 and len(docs) == 3
+    assert {d['error'] for d in docs} == {"can't start new thread"}
+    assert json.loads(r.get('savant:result:b1'))['status'] == 'error'
+    assert not r.smembers('savant:jobs:running')
+
+    # Items already streamed are not answered twice.
+    pipe = r.pipeline(transaction=False)
+    fanout.add_failure(pipe, 'b2', _batch(mode='stream'), RuntimeError('late'), {'agent-0', 'agent-2'}, time.time())
+    pipe.execute()
+    assert [json.loads(x)['item_id'] for x in r.lrange(fanout.items_key('b2'), 0, -1)] == ['agent-1']
+
+
+def test_async_bad_batch_envelope_answers_streaming_caller():
+    fakeredis = pytest.importorskip('fakeredis')
+    r = fakeredis.FakeAsyncRedis(decode_responses=True)
+    job = _batch(mode='stream')
+    job['payload']['items'] = [{'item_id': 'a'}, 'oops']
+
+    async def run():
+        await async_worker.process_job_async(r, json.dumps(job))
+        return [json.loads(x) for x in await r.lrange(fanout.items_key('b1'), 0, -1)], json.loads(await r.get('savant:result:b1'))
+
+    docs, result = asyncio.run(run())
+    assert [d['item_id'] for d in docs] == ['a', '1']
+    assert all(d['status'] == 'error' for d in docs) and result['status'] == 'error'
@@ -0,0 +1,61 @@
+"""
+Tests for the fast job decode path
+"""
+import json
+from unittest.mock import patch
+
+import pytest
+
+from reasoning import fastjson
+from reasoning import worker
+
+
+def _payload(**overrides):
+    data = {
+        'session_id': 's1',
+        'persona': {'name': 'p'},
+        'goal_text': 'find the agent runtime',
+        'history': [{'action': {'action': 'tool', 'tool_name': 'context.fts_search', 'args': {'query': 'q'}},
+                     'output': {'content': [{'type': 'text', 'text': 'x' * 100}]}}] * 20,
+        'memory_state': {'notes': ['a'] * 50},
+        'max_steps': 4,
+    }
+    data.update(overrides)
+    return data
+
+
+def test_fast_request_matches_validated_request():
+    with patch.object(worker, 'FAST_DECODE', False):
+        slow = worker.build_intent_request(_payload())
+    fast = worker.build_intent_request(_payload())
+    assert fast.model_dump() == slow.model_dump()
+
+
+def test_fast_request_keeps_nested_sections_as_decoded():
+    payload = _payload()
+    req = worker.build_intent_request(payload)
+    assert req.history is payload['history']
+    assert req.memory_state is payload['memory_state']
+
+
+@pytest.mark.parametrize('field,value', [('goal_text', 5), ('persona', 'dev'), ('history', {}), ('llm', 'ollama'),
+                                         ('max_steps', 'lots'), ('max_steps', 2.5)])
+def test_fast_request_rejects_bad_top_level_types(field, value):
+    with pytest.raises(ValueError, match=field):
+        worker.build_intent_request(_payload(**{field: value}))
+
+
+def test_fast_request_coerces_numeric_max_steps():
+    assert worker.build_intent_request(_payload(max_steps='6')).max_steps == 6
+
+
+def test_fastjson_round_trip_and_stdlib_fallback():
+    doc = {'a': [1, 2.5, None, True], 'b': 'é'}
+    assert fastjson.loads(fastjson.dumps(doc)) == doc
+    assert fastjson.loads(fastjson.dumps(doc).encode('utf-8')) == doc
+    # orjson rejects non-string keys; the stdlib fallback handles them
+    assert json.loads(fastjson.dumps({1: 'x'})) == {'1': 'x'}
+    with patch.object(fastjson, 'orjson', None):
+        assert fastjson.loads(fastjson.dumps(doc)) == doc
+    with pytest.raises(fastjson.JSONDecodeError):
+        fastjson.loads('invalid json{')
@@ -0,0 +1,195 @@
+"""
+Tests for hedged LLM requests
+"""
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+from reasoning import api
+from reasoning import hedging
+
+
+def _warm(policy, key, seconds=0.01, n=20):
+    for _ in range(n):
+        policy.observe(key, seconds)
+
+
+def test_delay_needs_samples_and_respects_floor():
+    policy = hedging.HedgePolicy(percentile=95, min_delay_s=0.05, min_samples=5, budget=1.0)
+    key = ('ollama', 'm')
+    assert policy.delay_for(key) is None
+    for ms in (10, 20, 30, 40, 200):
+        policy.observe(key, ms / 1000.0)
+    assert policy.delay_for(key) == 0.2
+    policy = hedging.HedgePolicy(percentile=50, min_delay_s=0.05, min_samples=1, budget=1.0)
+    policy.observe(key, 0.001)
+    assert policy.delay_for(key) == 0.05
+
+
+def test_budget_caps_hedges_to_fraction_of_calls():
+    policy = hedging.HedgePolicy(budget=0.1)
+    granted = 0
+    for _ in range(100):
+        policy.note_call()
+        granted += policy.try_spend()
+    assert granted == 10
+    assert policy.snapshot()['budget_denied'] == 90
+
+
+def test_sync_hedge_wins_over_stuck_primary():
+    policy = hedging.HedgePolicy(percentile=95, min_delay_s=0.01, min_samples=20, budget=1.0)
+    key = ('ollama', 'm')
+    _warm(policy, key)
+    release = threading.Event()
+
+    def stuck():
+        release.wait(2)
+        return 'slow'
+
+    events = []
+    started = time.monotonic()
+    out = hedging.run_sync(key, stuck, lambda: 'fast', policy=policy, on_event=lambda **kw: events.append(kw))
+    release.set()
+    assert out == 'fast'
+    assert time.monotonic() - started < 1.0
+    assert events[0]['winner'] == 'hedge'
+    stats = policy.snapshot()
+    assert stats['hedged'] == 1 and stats['hedge_wins'] == 1
+
+
+def test_sync_no_hedge_when_denied_or_fast():
+    policy = hedging.HedgePolicy(percentile=95, min_delay_s=0.01, min_samples=20, budget=1.0)
+    key = ('ollama', 'm')
+    _warm(policy, key)
+    hedge_calls = []
+
+    def slow():
+        time.sleep(0.05)
+        return 'primary'
+
+    assert hedging.run_sync(key, slow, lambda: hedge_calls.append(1), can_hedge=lambda: False, policy=policy) == 'primary'
+    assert hedging.run_sync(key, lambda: 'quick', lambda: hedge_calls.append(1), policy=policy) == 'quick'
+    assert hedge_calls == []
+
+
+def test_sync_failed_hedge_falls_back_to_primary():
+    policy = hedging.HedgePolicy(percentile=95, min_delay_s=0.01, min_samples=20, budget=1.0)
+    key = ('ollama', 'm')
+    _warm(policy, key)
+
+    def slow():
+        time.sleep(0.1)
+        return 'primary'
+
+    def broken():
+        raise Exception('Ollama request failed: boom')
+
+    assert hedging.run_sync(key, slow, broken, policy=policy) == 'primary'
+
+
+def test_async_hedge_cancels_loser():
+    policy = hedging.HedgePolicy(percentile=95, min_delay_s=0.01, min_samples=20, budget=1.0)
+    key = ('google api', 'g')
+    _warm(policy, key)
+    cancelled = []
+
+    async def stuck():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+        return 'slow'
+
+    async def fast():
+        return 'fast'
+
+    async def run():
+        out = await hedging.run_async(key, stuck, fast, policy=policy)
+        await asyncio.sleep(0)
+        return out
+
+    assert asyncio.run(run()) == 'fast'
+    assert cancelled == [True]
+
+
+def test_llm_generate_hedges_to_alternate_ollama_url():
+    policy = hedging.HedgePolicy(percentile=95, min_delay_s=0.01, min_samples=20, budget=1.0)
+    _warm(policy, ('ollama', 'phi'))
+    release = threading.Event()
+    seen = []
+
+    def fake_call(model, prompt, structured=False, base_url=None):
+        seen.append(base_url)
+        if base_url is None:
+            release.wait(2)
+            return 'slow'
+        return 'ACTION: finish\nRESULT: ok\nREASONING: hedged'
+
+    with patch.object(hedging, 'HEDGE_ENABLED', True), \
+            patch.object(hedging, 'POLICY', policy), \
+            patch.object(hedging, 'ALT_OLLAMA_URL', 'http://backup:11434'), \
+            patch.object(api, '_call_ollama_api', side_effect=fake_call), \
+            patch.object(api, 'log_event') as log:
+        out = api._llm_generate('ollama', 'phi', 'prompt', None)
+    release.set()
+    assert out.startswith('ACTION: finish')
+    assert seen == [None, 'http://backup:11434']
+    assert log.call_args[0][0] == 'llm_hedge'
+    assert log.call_args[1]['winner'] == 'hedge'
+
+
+def test_budget_is_checked_before_rate_limit_quota():
+    policy = hedging.HedgePolicy(percentile=95, min_delay_s=0.01, min_samples=20, budget=0.0)
+    key = ('google api', 'g')
+    _warm(policy, key)
+    quota_checks = []
+
+    def slow():
+        time.sleep(0.05)
+        return 'primary'
+
+    assert hedging.run_sync(key, slow, lambda: 'hedge', can_hedge=lambda: quota_checks.append(1) or True,
+                            policy=policy) == 'primary'
+    assert quota_checks == [] and policy.snapshot()['budget_denied'] == 1
+
+    policy.budget = 1.0
+    assert hedging.run_sync(key, slow, lambda: 'hedge', can_hedge=lambda: False, policy=policy) == 'primary'
+    stats = policy.snapshot()
+    assert stats['hedged'] == 0 and stats['rate_denied'] == 1
+
+    async def slow_async():
+        await asyncio.sleep(0.2)  # well past the delay, which the sync calls above raised to ~50ms
+        return 'primary'
+
+    async def no_quota():
+        return False
+
+    assert asyncio.run(hedging.run_async(key, slow_async, slow_async, can_hedge=no_quota, policy=policy)) == 'primary'
+    assert policy.snapshot()['rate_denied'] == 2
+
+
+def test_failures_feed_latencies_and_saved_time_is_measured():
+    policy = hedging.HedgePolicy(percentile=95, min_delay_s=0.01, min_samples=20, budget=1.0)
+    key = ('ollama', 'm')
+
+    def timeout():
+        time.sleep(0.02)
+        raise Exception('Ollama request failed: timeout')
+
+    for _ in range(20):
+        try:
+            hedging.run_sync(key, timeout, timeout, policy=policy)
+        except Exception:
+            pass
+    assert policy.delay_for(key) >= 0.02  # failed calls count, the delay is not learned from successes only
+
+    def stuck():
+        time.sleep(0.3)
+        return 'slow'
+
+    assert hedging.run_sync(key, stuck, lambda: 'fast', policy=policy) == 'fast'
+    time.sleep(0.4)  # the abandoned primary finishes and reports the time it would have cost
+    saved = policy.snapshot()['saved_ms']
+    assert 150 <= saved <= 300
@@ -0,0 +1,71 @@
+"""
+Tests for the job ledger and its rollups
+"""
+from reasoning import ledger
+
+
+class RecordingPipeline:
+    def __init__(self):
+        self.ops = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.ops.append((name, args, kwargs))
+
+
+def _job(model='phi3.5:latest', created_at='2026-01-01T00:00:00Z'):
+    return {'job_id': 'j1', 'created_at': created_at, 'payload': {'llm': {'provider': 'ollama', 'model': model}}}
+
+
+def test_build_entry_computes_queue_and_run_times():
+    start = ledger._enqueued_at(_job()) + 2.0
+    entry = ledger.build_entry(_job(), 1234, start, start + 0.5, 'ok', worker_id='w1')
+    assert entry['provider'] == 'ollama' and entry['model'] == 'phi3.5:latest'
+    assert entry['queue_ms'] == 2000.0
+    assert entry['run_ms'] == 500.0
+    assert entry['total_ms'] == 2500.0
+    assert entry['payload_bytes'] == 1234 and 'error' not in entry
+
+
+def test_add_to_pipeline_writes_stream_and_both_scopes():
+    entry = ledger.build_entry(_job(created_at=None), 10, 1000.0, 1000.3, 'error', error='boom', worker_id='w1')
+    pipe = RecordingPipeline()
+    ledger.add_to_pipeline(pipe, entry)
+    names = [op[0] for op in pipe.ops]
+    assert names[0] == 'xadd'
+    assert pipe.ops[0][1][1]['enqueued_at'] == ''
+    fields = {op[1][1] for op in pipe.ops if op[0] == 'hincrby'}
+    for scope in ('all', 'ollama:phi3.5:latest'):
+        assert {f"{scope}|count", f"{scope}|errors", f"{scope}|h|500"} <= fields
+    assert names[-1] == 'expire'
+
+
+def test_percentiles_from_merged_rollups():
+    rollups = [
+        {'ts': 0.0, 'fields': {'all|count': '50', 'all|h|100': '50'}},
+        {'ts': 60.0, 'fields': {'all|count': '50', 'all|h|1000': '40', 'all|h|5000': '10', 'all|errors': '5',
+                                'ollama:m|count': '1'}},
+    ]
+    counters = ledger.merge(rollups)
+    assert counters['count'] == 100
+    assert ledger.percentile_from_histogram(counters, 50) == 100.0
+    assert 500 < ledger.percentile_from_histogram(counters, 95) <= 5000
+    summary = ledger.summarize(counters, 2)
+    assert summary['per_min'] == 50 and summary['error_rate'] == 0.05
+    assert ledger.scopes(rollups) == ['all', 'ollama:m']
+
+
+def test_usage_fields_and_persona_scope():
+    job = _job(created_at=None)
+    job['payload'].update({'session_id': 's9', 'persona': {'name': 'dev', 'version': 1}})
+    usage = {'llm_calls': 1, 'prompt_tokens_est': 800, 'prompt_tokens': 760, 'completion_tokens': 40}
+    entry = ledger.build_entry(job, 10, 1000.0, 1000.3, 'ok', worker_id='w1', usage=usage)
+    assert (entry['session_id'], entry['persona']) == ('s9', 'dev')
+    assert (entry['prompt_tokens_est'], entry['prompt_tokens'], entry['completion_tokens']) == (800, 760, 40)
+    pipe = RecordingPipeline()
+    ledger.add_to_pipeline(pipe, entry)
+    incr = {op[1][1]: op[1][2] for op in pipe.ops if op[0] == 'hincrby'}
+    assert incr['persona:dev|prompt_tokens_est'] == 800
+    assert incr['ollama:phi3.5:latest|completion_tokens'] == 40
+    rollups = [{'ts': 0.0, 'fields': {k: str(v) for k, v in incr.items()}}]
+    summary = ledger.summarize(ledger.merge(rollups, 'persona:dev'), 1)
+    assert summary['mean_prompt_tokens_est'] == 800.0 and summary['mean_completion_tokens'] == 40.0
@@ -0,0 +1,57 @@
+"""
+Tests for the segmented reasoning log store
+"""
+import json
+import os
+import time
+
+from reasoning import api
+from reasoning import logstore
+
+
+def _write(store, n, **fields):
+    for i in range(n):
+        doc = dict(fields, i=i)
+        store.append(doc, json.dumps(doc))
+
+
+def test_query_reads_only_matching_blocks(tmp_path):
+    store = logstore.LogStore(str(tmp_path), block_records=10, flush_interval_s=0)
+    _write(store, 25, session_id='a', event='x')
+    _write(store, 10, session_id='b', correlation_id='c1', event='y')
+    store.flush()
+
+    seg = logstore.segments(str(tmp_path))[0]
+    blocks = list(logstore._read_index(seg))
+    assert [b['n'] for b in blocks] == [10, 10, 10, 5]
+    assert blocks[-1]['s'] == ['b']
+
+    hits = list(logstore.query(str(tmp_path), session_id='b'))
+    assert len(hits) == 10 and all(h['session_id'] == 'b' for h in hits)
+    assert len(list(logstore.query(str(tmp_path), correlation_id='c1', event='y', limit=3))) == 3
+    assert list(logstore.query(str(tmp_path), session_id='zzz')) == []
+
+
+def test_segments_roll_and_retention_prunes(tmp_path):
+    store = logstore.LogStore(str(tmp_path), segment_max_bytes=1, block_records=1, flush_interval_s=0)
+    _write(store, 1, session_id='a')
+    old = logstore.segments(str(tmp_path))[0]
+    past = time.time() - 10 * 86400
+    os.utime(old, (past, past))
+    _write(store, 1, session_id='b')  # segment is over size: roll, then prune the expired one
+    remaining = logstore.segments(str(tmp_path))
+    assert old not in remaining and len(remaining) == 1
+    assert not os.path.exists(old + '.idx')
+    assert [h['session_id'] for h in logstore.query(str(tmp_path))] == ['b']
+
+
+def test_log_event_carries_intent_context(tmp_path, monkeypatch):
+    store = logstore.LogStore(str(tmp_path), flush_interval_s=0)
+    monkeypatch.setattr(api, '_REASONING_LOG_DIR', str(tmp_path))
+    monkeypatch.setattr(api, '_log_store', store)
+    with api._log_context(session_id='s9', correlation_id='c9'):
+        api.log_event('pre_decision', rule='pure_math')
+    api.log_event('outside')
+    store.flush()
+    hits = list(logstore.query(str(tmp_path), session_id='s9'))
+    assert [(h['event'], h['correlation_id']) for h in hits] == [('pre_decision', 'c9')]
@@ -0,0 +1,66 @@
+"""
+Tests for the deterministic pre-LLM decision layer
+"""
+from unittest.mock import patch
+
+import pytest
+
+from reasoning import api
+
+
+def _req(goal, **overrides):
+    data = {'session_id': 's', 'persona': {}, 'goal_text': goal}
+    data.update(overrides)
+    return api.AgentIntentRequest(**data)
+
+
+def _search(query, text='hit'):
+    return {'action': {'action': 'tool', 'tool_name': 'context.fts_search', 'args': {'query': query}},
+            'output': {'content': [{'type': 'text', 'text': text}]}}
+
+
+def _no_llm(*_args, **_kwargs):
+    raise AssertionError('LLM should not be called')
+
+
+@pytest.mark.parametrize('goal,answer', [('2 + 2', '4'), ('What is 12 * 3?', '36'), ('calculate 10 / 4 =', '2.5')])
+def test_pure_math_skips_llm(goal, answer):
+    with patch.object(api, '_use_llm_for_reasoning', side_effect=_no_llm):
+        res = api._compute_intent_sync(_req(goal))
+    assert res['finish'] is True
+    assert res['final_text'] == answer
+    assert res['trace'] == [{'stage': 'pre_decision', 'rule': 'pure_math'}]
+
+
+def test_math_inside_prose_still_uses_llm():
+    assert api._pre_decide(_req('if I have 3 + 4 apples, which file defines Apple?'), None, False) is None
+    assert api._pre_decide(_req('(2 + 3) * 4'), None, False) is None
+
+
+def test_search_budget_keeps_llm_final_answer():
+    history = [_search('limiter', 'RateLimiter in ratelimit.py'), _search('throttle')]
+    answer = 'The limiter lives in ratelimit.py and is configured per provider.'
+    with patch.object(api, '_use_llm_for_reasoning', return_value=(None, None, answer, 'r', True)) as llm:
+        res = api._compute_intent_sync(_req('where is the rate limiter', history=history, max_steps=1))
+    assert llm.called
+    assert res['finish'] is True
+    assert res['final_text'] == answer
+    assert not any(t.get('stage') == 'pre_decision' for t in res['trace'])
+
+
+def test_search_budget_replaces_further_tool_pick():
+    history = [_search('auth'), _search('middleware')]
+    with patch.object(api, '_use_llm_for_reasoning',
+                      return_value=('context.fts_search', {'query': 'session'}, None, 'r', False)) as llm:
+        res = api._compute_intent_sync(_req('find auth middleware', history=history, max_steps=2))
+    assert llm.called
+    assert res['finish'] is True
+    assert res['tool_name'] is None
+
+
+def test_under_budget_calls_llm():
+    history = [_search('auth')]
+    with patch.object(api, '_use_llm_for_reasoning', return_value=(None, None, 'done', 'r', True)) as llm:
+        res = api._compute_intent_sync(_req('find auth middleware', history=history, max_steps=2))
+    assert llm.called
+    assert res['final_text'] == 'done'
@@ -0,0 +1,122 @@
+"""
+Tests for on-demand worker profiling
+"""
+import json
+import os
+import pstats
+import time
+from unittest.mock import patch
+
+import pytest
+
+from reasoning import api
+from reasoning import profiling
+from reasoning import worker
+
+
+def _busy(n=20000):
+    total = 0
+    for i in range(n):
+        total += i
+    return total
+
+
+def test_sample_session_tags_stacks_with_job_and_stops_after_jobs(tmp_path):
+    p = profiling.Profiler(out_dir=str(tmp_path))
+    p.start(mode='sample', jobs=2, seconds=0, interval_ms=1)
+    for job_id in ('j1', 'j2'):
+        token = p.job_started(job_id)
+        deadline = time.time() + 0.05
+        while time.time() < deadline:
+            _busy()
+        p.job_finished(token)
+    assert p.session is None  # two jobs -> finished
+    summary = p._results[0]
+    assert summary['job_ids'] == ['j1', 'j2'] and summary['samples'] > 0
+    lines = open(summary['files'][0]).read().splitlines()
+    assert any(line.startswith('job:j1;') and '_busy (test_profiling.py' in line for line in lines)
+    assert json.load(open(summary['files'][1]))['worker_id'] == p.worker_id
+
+
+def test_async_loop_jobs_share_one_root_and_are_listed_in_summary(tmp_path):
+    import asyncio
+
+    p = profiling.Profiler(out_dir=str(tmp_path))
+
+    async def job(job_id, spin_s):
+        token = p.job_started(job_id)
+        deadline = time.time() + spin_s
+        while time.time() < deadline:
+            _busy()
+            await asyncio.sleep(0)
+        p.job_finished(token)
+
+    async def run():
+        p.mark_async_loop()
+        p.start(mode='sample', jobs=0, seconds=0, interval_ms=1)
+        await asyncio.gather(job('a1', 0.03), job('a2', 0.08))
+        return p.stop()
+
+    summary = asyncio.run(run())
+    assert sorted(summary['job_ids']) == ['a1', 'a2']
+    roots = {line.split(';', 1)[0] for line in open(summary['files'][0]).read().splitlines()}
+    assert 'async-loop' in roots and not any(root.startswith('job:') for root in roots)
+    assert json.load(open(summary['files'][1]))['job_ids'] == summary['job_ids']
+
+
+def test_cprofile_session_profiles_one_job_at_a_time(tmp_path):
+    p = profiling.Profiler(out_dir=str(tmp_path))
+    p.start(mode='cprofile', jobs=0, seconds=0)
+    first = p.job_started('a')
+    overlapping = p.job_started('b')
+    _busy()
+    p.job_finished(overlapping)
+    p.job_finished(first)
+    summary = p.stop()
+    assert summary['job_ids'] == ['a'] and summary['skipped_job_ids'] == ['b']
+    stats = pstats.Stats(summary['files'][0])
+    assert any(fn == '_busy' for _, _, fn in stats.stats)
+
+
+def test_hooks_are_inert_without_session():
+    p = profiling.Profiler()
+    assert p.job_started('x') is None
+    p.job_finished(None)
+    with pytest.raises(ValueError, match='unknown profile mode'):
+        p.start(mode='perf')
+
+
+def test_poll_takes_redis_requests_and_publishes_results(tmp_path):
+    fakeredis = pytest.importorskip('fakeredis')
+    r = fakeredis.FakeRedis(decode_responses=True)
+    p = profiling.Profiler(out_dir=str(tmp_path))
+    r.set(profiling.REQUEST_KEY, json.dumps({'id': 'req-1', 'mode': 'sample', 'jobs': 1, 'interval_ms': 1}))
+    p.poll(r, now=1000.0)
+    assert p.session is not None and p.session.request_id == 'req-1'
+
+    p.job_finished(p.job_started('j1'))
+    p.poll(r, now=1001.0)  # the shared request is still there but already seen
+    assert p.session is None
+    results = [json.loads(x) for x in r.lrange(profiling.RESULTS_KEY, 0, -1)]
+    assert [(x['request_id'], x['job_ids']) for x in results] == [('req-1', ['j1'])]
+
+    r.set(profiling.worker_key(p.worker_id), json.dumps({'mode': 'cprofile', 'seconds': 5}))
+    p.poll(r, now=1010.0)
+    assert p.session.mode == 'cprofile' and not r.exists(profiling.worker_key(p.worker_id))
+    p.request_toggle()
+    p.poll(r, now=1011.0)
+    assert p.session is None
+
+
+def test_worker_jobs_are_profiled(tmp_path):
+    fakeredis = pytest.importorskip('fakeredis')
+    r = fakeredis.FakeRedis(decode_responses=True)
+    p = profiling.Profiler(out_dir=str(tmp_path))
+    p.start(mode='cprofile', jobs=1, seconds=0)
+    job = {'job_id': 'job-7', 'payload': {'session_id': 's', 'persona': {}, 'goal_text': 'hi'}}
+    with patch.object(profiling, 'PROFILER', p), \
+            patch.object(api, '_compute_intent_sync', side_effect=lambda req: {'final_text': str(_busy())}):
+        worker.process_job(r, json.dumps(job))
+    summary = p._results[0]
+    assert summary['job_ids'] == ['job-7']
+    assert os.path.exists(summary['files'][0])
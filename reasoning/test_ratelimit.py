@@ -0,0 +1,104 @@
+"""
+Tests for the shared LLM rate limiter
+"""
+import time
+import types
+from unittest.mock import patch
+
+import pytest
+
+from reasoning import api
+from reasoning import ratelimit
+
+
+def test_parse_retry_after_variants():
+    assert ratelimit.parse_retry_after({'Retry-After': '7'}) == 7.0
+    body = {'error': {'code': 429, 'details': [
+        {'@type': 'type.googleapis.com/google.rpc.QuotaFailure'},
+        {'@type': 'type.googleapis.com/google.rpc.RetryInfo', 'retryDelay': '17.5s'},
+    ]}}
+    assert ratelimit.parse_retry_after({}, body) == 17.5
+    assert ratelimit.parse_retry_after({'content-type': 'x'}, '{"error": {}}') is None
+    assert ratelimit.parse_retry_after({'retry-after': 'Wed, 21 Oct 2015 07:28:00 GMT'}) == 0.0
+
+
+def test_limits_resolution_and_scope():
+    limits = {'google api': {'rpm': 60}, 'google api:gemini-pro': {'rpm': 5, 'tpm': 1000}, 'ollama:big': {'rpm': 1}}
+    with patch.object(ratelimit, 'LIMITS', limits):
+        assert ratelimit.limits_for('google api', 'gemini-pro') == (5.0, 1000.0)
+        assert ratelimit.limits_for('google api', 'flash') == (60.0, 0.0)
+        assert ratelimit.applies('ollama') and ratelimit.applies('google api')
+        assert not ratelimit.applies('')
+    assert ratelimit.bucket_keys('google api', 'm', 'secret')[0].startswith('savant:ratelimit:google_api:m:')
+    assert 'secret' not in ratelimit.bucket_keys('google api', 'm', 'secret')[0]
+
+
+def test_lua_buckets_share_quota_and_report_wait():
+    fakeredis = pytest.importorskip('fakeredis')
+    pytest.importorskip('lupa')
+    r = fakeredis.FakeRedis(decode_responses=True)
+    with patch.object(ratelimit, 'LIMITS', {'google api': {'rpm': 2, 'tpm': 10000}}):
+        assert ratelimit.try_acquire('google api', 'm', 'k', 100, r=r) == 0.0
+        assert ratelimit.try_acquire('google api', 'm', 'k', 100, r=r) == 0.0
+        wait = ratelimit.try_acquire('google api', 'm', 'k', 100, r=r)
+        assert 25.0 < wait <= 30.0
+        # Another key has its own buckets
+        assert ratelimit.try_acquire('google api', 'm', 'other', 100, r=r) == 0.0
+        ratelimit.hold('google api', 'm', 'other', 3, r=r)
+        assert 2.0 < ratelimit.try_acquire('google api', 'm', 'other', 1, r=r) <= 3.0
+
+
+def test_lua_buckets_ignore_the_callers_clock():
+    fakeredis = pytest.importorskip('fakeredis')
+    pytest.importorskip('lupa')
+    r = fakeredis.FakeRedis(decode_responses=True)
+    skewed = types.SimpleNamespace(time=lambda: time.time() + 3600, monotonic=time.monotonic)
+    with patch.object(ratelimit, 'LIMITS', {'google api': {'rpm': 1}}):
+        assert ratelimit.try_acquire('google api', 'm', 'k', 1, r=r) == 0.0
+        # A worker whose clock runs an hour ahead must not see a refilled bucket.
+        with patch.object(ratelimit, 'time', skewed):
+            assert ratelimit.try_acquire('google api', 'm', 'k', 1, r=r) > 50.0
+
+
+def test_llm_generate_waits_out_a_429_then_succeeds():
+    calls = []
+
+    def flaky(*_args, **_kwargs):
+        calls.append(1)
+        if len(calls) == 1:
+            raise ratelimit.ProviderRateLimited('Google API request failed: 429', retry_after=0.01)
+        return 'ACTION: finish\nRESULT: ok\nREASONING: done'
+
+    with patch.object(ratelimit, 'try_acquire', return_value=0.0), \
+            patch.object(ratelimit, 'hold', return_value=0.01) as hold, \
+            patch.object(api, '_google_generate', side_effect=flaky):
+        text = api._llm_generate('google api', 'm', 'prompt', 'key')
+    assert text.startswith('ACTION: finish') and len(calls) == 2
+    hold.assert_called_once_with('google api', 'm', 'key', 0.01)
+
+
+def test_llm_generate_gives_up_past_the_wait_budget():
+    with patch.object(ratelimit, 'try_acquire', return_value=60.0), \
+            patch.object(api, '_google_generate') as generate:
+        with pytest.raises(ratelimit.RateLimitWaitExceeded):
+            api._llm_generate('google api', 'm', 'prompt', 'key')
+    generate.assert_not_called()
+
+
+def test_local_provider_bypasses_limiter():
+    with patch.object(ratelimit, 'try_acquire', side_effect=AssertionError('no limiter')), \
+            patch.object(api, '_call_ollama_api', return_value='x'):
+        assert api._llm_generate('ollama', 'phi3.5:latest', 'prompt', None) == 'x'
+
+
+def test_llm_generate_async_waits_for_capacity():
+    import asyncio
+    waits = [0.01, 0.0]
+
+    async def fake_google(*_args, **_kwargs):
+        return 'ok'
+
+    with patch.object(ratelimit, 'try_acquire', side_effect=lambda *a, **k: waits.pop(0)), \
+            patch.object(api, '_google_generate_async', side_effect=fake_google):
+        assert asyncio.run(api._llm_generate_async('google api', 'm', 'prompt', 'key')) == 'ok'
+    assert waits == []
@@ -0,0 +1,98 @@
+"""
+Tests for per-job memory tracking and worker recycling
+"""
+import asyncio
+import json
+from unittest.mock import patch
+
+import pytest
+
+from reasoning import api
+from reasoning import async_worker
+from reasoning import ledger
+from reasoning import recycling
+from reasoning import worker
+
+MB = 1024 * 1024
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_job_memory_fields_and_limits():
+    rss = iter([100 * MB, 130 * MB, 130 * MB])
+    clock = FakeClock()
+    rec = recycling.Recycler(max_jobs=3, max_rss_mb=128, max_age_s=60, rss=lambda: next(rss), clock=clock)
+    snap = rec.job_started()
+    assert rec.reason() is None
+    fields = rec.job_finished(snap)
+    assert fields['rss_mb'] == 130.0 and fields['rss_delta_mb'] == 30.0 and fields['rss_hwm_mb'] >= 130.0
+    assert rec.job_finished(snap) is fields  # counted once even if asked again
+    assert (rec.jobs, rec.in_flight) == (1, 0)
+    assert rec.reason() == 'max_rss'
+
+    rec.max_rss_mb = 0
+    clock.now += 61
+    assert rec.reason() == 'max_age'
+    rec.jobs = 3
+    assert rec.reason() == 'max_jobs'
+
+
+def test_disabled_by_default():
+    rec = recycling.Recycler(max_jobs=0, max_rss_mb=0, max_age_s=0)
+    rec.job_finished(rec.job_started())
+    assert not rec.enabled and rec.reason() is None
+    assert recycling.rss_bytes() > 0
+
+
+def test_ledger_entry_carries_memory():
+    entry = ledger.build_entry({'job_id': 'j'}, 10, 1.0, 2.0, 'ok', memory={'rss_mb': 210.5, 'rss_delta_mb': 3.0})
+    assert entry['rss_mb'] == 210.5 and entry['rss_delta_mb'] == 3.0
+
+
+def _jobs(n):
+    return [json.dumps({'job_id': f"j{i}", 'payload': {'session_id': 's', 'persona': {}, 'goal_text': 'hi'}}) for i in range(n)]
+
+
+def _ok(req):
+    return {'final_text': 'ok', 'finish': True}
+
+
+def test_sync_worker_exits_for_recycling_after_max_jobs():
+    fakeredis = pytest.importorskip('fakeredis')
+    r = fakeredis.FakeRedis(decode_responses=True)
+    r.rpush(worker.QUEUE_KEY, *_jobs(3))
+    rec = recycling.Recycler(max_jobs=2, max_rss_mb=0, max_age_s=0)
+    with patch.object(worker, 'get_redis_client', return_value=r), \
+            patch.object(recycling, 'RECYCLER', rec), \
+            patch.object(api, '_compute_intent_sync', side_effect=_ok):
+        assert worker.main() == recycling.RECYCLE_EXIT_CODE
+    assert rec.jobs == 2
+    assert r.llen(worker.QUEUE_KEY) == 1  # the third job is left for the replacement worker
+    entry = r.xrevrange('savant:jobs:ledger', count=1)[0][1]
+    assert float(entry['rss_mb']) > 0
+
+
+def test_async_worker_drains_and_exits_for_recycling():
+    fakeredis = pytest.importorskip('fakeredis')
+    r = fakeredis.FakeAsyncRedis(decode_responses=True)
+    rec = recycling.Recycler(max_jobs=2, max_rss_mb=0, max_age_s=0)
+
+    async def compute(req):
+        await asyncio.sleep(0.01)
+        return _ok(req)
+
+    async def run():
+        await r.rpush(worker.QUEUE_KEY, *_jobs(2))
+        code = await asyncio.wait_for(async_worker.run(concurrency=2, r=r), timeout=5)
+        return code, await r.llen(worker.COMPLETED_KEY)
+
+    with patch.object(recycling, 'RECYCLER', rec), patch.object(api, '_compute_intent_async', side_effect=compute):
+        code, completed = asyncio.run(run())
+    assert code == recycling.RECYCLE_EXIT_CODE
+    assert completed == 2 and rec.in_flight == 0
@@ -0,0 +1,81 @@
+"""
+Tests for job recording and offline replay
+"""
+import json
+from unittest.mock import patch
+
+import pytest
+
+from reasoning import api
+from reasoning import replay
+from reasoning import worker
+
+fakeredis = pytest.importorskip('fakeredis')
+
+REPLY = 'ACTION: finish\nRESULT: The ledger is a Redis stream.\nREASONING: known'
+
+
+def _job(job_id, goal='what is the ledger?', **payload):
+    body = {'session_id': 's', 'persona': {'name': 'dev'}, 'goal_text': goal,
+            'llm': {'provider': 'ollama', 'model': 'phi3.5:latest'}}
+    body.update(payload)
+    return json.dumps({'job_id': job_id, 'payload': body})
+
+
+def _record(tmp_path, jobs, reply=REPLY, **kw):
+    recorder = replay.Recorder(directory=str(tmp_path), **kw)
+    r = fakeredis.FakeRedis(decode_responses=True)
+    side = {'side_effect': reply} if isinstance(reply, Exception) else {'return_value': reply}
+    with patch.object(replay, 'RECORDER', recorder), patch.object(api, '_call_ollama_api', **side):
+        for job in jobs:
+            worker.process_job(r, job)
+    recorder.flush()
+    return list(replay.load([str(tmp_path)]))
+
+
+def test_worker_records_payload_llm_calls_and_result(tmp_path):
+    secret = {'provider': 'google api', 'model': 'gemini', 'api_key': 'sk-123'}
+    with patch.object(api, '_google_generate', return_value=REPLY):
+        [rec] = _record(tmp_path, [_job('j1', llm=secret)])
+    assert rec['job_id'] == 'j1' and rec['payload']['llm']['api_key'] == 'redacted'
+    [call] = rec['llm']
+    assert call['response'] == REPLY and call['provider'] == 'google api' and call['latency_ms'] >= 0
+    assert rec['result']['final_text'] == 'The ledger is a Redis stream.' and rec['result']['stages'] == ['llm']
+
+
+def test_replay_matches_recording_and_reports_drift(tmp_path):
+    records = _record(tmp_path, [_job('j1'), _job('j2', goal='what is 2 + 2')])
+    with patch.object(api, '_call_ollama_api', side_effect=AssertionError('live LLM called')):
+        report = replay.replay(records)
+    summary = report['summary']
+    assert summary['jobs'] == 2 and summary['drifted'] == 0 and summary['errors'] == 0
+    assert summary['llm_calls'] == summary['recorded_llm_calls'] == 1  # the math goal is pre-decided
+    assert report['jobs'][0]['cpu_ms'] >= 0
+
+    original = api._parse_llm_response
+    with patch.object(api, '_parse_llm_response', lambda resp, goal: original(resp.replace('Redis', 'Mongo'), goal)):
+        drifted = replay.replay(records)
+    assert drifted['summary']['drifted'] == 1 and drifted['summary']['drift_fields'] == {'final_text': 1}
+    assert drifted['jobs'][0]['replayed']['final_text'] == 'The ledger is a Mongo stream.'
+
+
+def test_prompt_changes_and_extra_calls_are_counted(tmp_path):
+    records = _record(tmp_path, [_job('j1')])
+    with patch.object(api, '_LINE_RESPONSE_FORMAT', api._LINE_RESPONSE_FORMAT + '\nBe brief.'):
+        changed = replay.replay(records)['summary']
+    assert changed['prompt_changed_jobs'] == 1 and changed['drifted'] == 0
+    records[0]['llm'] = []
+    exhausted = replay.replay(records)['summary']
+    assert exhausted['extra_llm_calls'] == 1 and exhausted['drifted'] == 1
+
+
+def test_recorded_errors_replay_the_same_fallback(tmp_path):
+    [rec] = _record(tmp_path, [_job('j1')], reply=RuntimeError('connection refused'))
+    assert 'connection refused' in rec['llm'][0]['error']
+    assert replay.replay([rec])['summary']['drifted'] == 0
+
+
+def test_records_are_buffered_and_files_rotate(tmp_path):
+    records = _record(tmp_path, [_job(f"j{i}") for i in range(5)], flush_every=2, max_jobs=2)
+    assert [r['job_id'] for r in records] == ['j0', 'j1', 'j2', 'j3', 'j4']
+    assert len(list(tmp_path.glob('*.jsonl.gz'))) == 3
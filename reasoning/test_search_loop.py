@@ -0,0 +1,133 @@
+"""
+Tests for the worker-side search loop
+"""
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import pytest
+
+from reasoning import api
+from reasoning import search_loop
+
+SEARCH = 'ACTION: context.fts_search\nRESULT: retry policy\nREASONING: need code'
+FINISH = 'ACTION: finish\nRESULT: The retry policy lives in worker.py.\nREASONING: found it'
+
+
+class FakeHub:
+    """Stands in for the Hub's `/{engine}/tools/{tool}/call` route; the first `empty` calls return no hits."""
+
+    def __init__(self, empty=1):
+        self.calls = []
+        self.empty = empty
+        hub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *_args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+                hub.calls.append((self.path, body['params'], self.headers.get('x-savant-user-id')))
+                hits = [] if len(hub.calls) <= hub.empty else [{'type': 'text', 'text': 'worker.py: RETRY_POLICY = ...'}]
+                data = json.dumps({'content': hits}).encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.client = search_loop.HubClient(f"http://127.0.0.1:{self.server.server_address[1]}", timeout_s=2)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def hub():
+    h = FakeHub()
+    with patch.object(search_loop, 'HUB', h.client):
+        yield h
+    h.close()
+
+
+def _req(tools=('context.fts_search', 'context.memory_search'), **llm):
+    # max_steps=1 as the Ruby runtime sends it
+    return api.AgentIntentRequest(session_id='s', persona={'name': 'dev'}, goal_text='find where the retry policy is defined',
+                                  tools_available=list(tools), max_steps=1,
+                                  llm={'provider': 'ollama', 'local_search': True, **llm})
+
+
+def test_loop_searches_locally_until_the_llm_finishes(hub):
+    with patch.object(api, '_call_ollama_api', side_effect=[SEARCH, FINISH]) as llm:
+        result = api._compute_intent_sync(_req(hub_user='alice'))
+    assert result['finish'] is True and result['final_text'] == 'The retry policy lives in worker.py.'
+    assert llm.call_count == 2  # the empty first search was followed up by the planner, not the LLM
+    assert [c[0].rsplit('/tools/', 1)[0] for c in hub.calls] == ['/context', '/context'] and hub.calls[0][2] == 'alice'
+    assert hub.calls[0][1]['query'] == 'retry policy' and hub.calls[1][1] != hub.calls[0][1]
+    stages = [t['stage'] for t in result['trace']]
+    assert stages == ['llm', 'local_search', 'planner', 'local_search', 'llm']
+    assert len(result['local_steps']) == 2 and result['local_steps'][1]['output']['content']
+    assert result['usage']['llm_calls'] == 2
+
+
+def test_budget_ends_the_loop_and_hub_errors_hand_the_tool_intent_back(hub):
+    with patch.object(api, '_call_ollama_api', return_value=SEARCH) as llm:
+        result = api._compute_intent_sync(_req(local_search_steps=1))
+    # one local search spends the budget: the model is asked again, and its next search is replaced by the summary
+    assert len(hub.calls) == 1 and llm.call_count == 2
+    assert result['finish'] is True and len(result['local_steps']) == 1
+
+    with patch.object(search_loop, 'HUB', search_loop.HubClient('http://127.0.0.1:9', timeout_s=0.5)), \
+            patch.object(api, '_call_ollama_api', return_value=SEARCH) as llm:
+        result = api._compute_intent_sync(_req())
+    assert result['tool_name'] == 'context.fts_search' and llm.call_count == 1
+    assert 'error' in result['trace'][-1] and result['local_steps'] == []
+
+
+def test_only_offered_tools_are_called_locally(hub):
+    loop = search_loop.SearchLoop(_req(tools=['context/memory_search']))
+    assert loop.may_call('context.memory_search') and not loop.may_call('context.fts_search')
+    assert not search_loop.SearchLoop(_req(tools=[])).may_call('context.fts_search')
+
+    with patch.object(api, '_call_ollama_api', return_value=SEARCH):
+        result = api._compute_intent_sync(_req(tools=['workflow.workflow_run']))
+    assert hub.calls == [] and result.get('tool_name') != 'context.fts_search'
+
+
+def test_loop_is_opt_in(hub):
+    with patch.object(api, '_call_ollama_api', return_value=SEARCH):
+        result = api._compute_intent_sync(_req(local_search=False))
+    assert result['tool_name'] == 'context.fts_search' and 'local_steps' not in result and hub.calls == []
+
+
+def test_async_loop_uses_the_pooled_client(hub):
+    pytest.importorskip('httpx')
+    replies = iter([SEARCH, FINISH])
+
+    async def fake_llm(*_args, **_kwargs):
+        return next(replies)
+
+    async def run():
+        try:
+            return await api._compute_intent_async(_req())
+        finally:
+            await api._close_async_http_client()
+
+    with patch.object(api, '_call_ollama_api_async', side_effect=fake_llm):
+        result = asyncio.run(run())
+    assert result['finish'] is True and len(hub.calls) == 2
+
+
+def test_tool_names_and_empty_outputs():
+    assert search_loop.split_tool('context/fts_search') == ('context', 'fts_search')
+    assert search_loop.HubClient('http://hub').url('jira.jira_search') == 'http://hub/jira/tools/jira_search/call'
+    with pytest.raises(ValueError):
+        search_loop.split_tool('fts_search')
+    assert not search_loop.has_output({'content': []}) and not search_loop.has_output(None)
+    assert search_loop.has_output({'content': [{'text': 'x'}]}) and search_loop.has_output('text')
@@ -0,0 +1,110 @@
+"""
+Tests for the cross-session search outcome memo
+"""
+import threading
+from unittest.mock import patch
+
+import pytest
+
+from reasoning import api
+from reasoning import search_memo
+
+
+fakeredis = pytest.importorskip('fakeredis')
+
+
+class BrokenRedis:
+    def register_script(self, script):
+        raise ConnectionError('down')
+
+    def pipeline(self, transaction=False):
+        raise ConnectionError('down')
+
+
+def _redis():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def _search(query, output=None):
+    return {'action': {'action': 'tool', 'tool_name': 'context.fts_search', 'args': {'query': query}},
+            'output': output}
+
+
+def test_record_and_lookup_with_decay():
+    r = _redis()
+    search_memo.record('repo', 'context.fts_search', 'auth flow', False, r=r, now=1000.0)
+    assert search_memo.lookup('repo', [('context.fts_search', 'auth flow')], r=r, now=1000.0) == {
+        ('context.fts_search', 'auth flow'): True}
+    assert r.ttl(search_memo.memo_key('repo', 'context.fts_search', 'auth flow')) == search_memo.MEMO_TTL_S
+
+    later = 1000.0 + 2 * search_memo.HALF_LIFE_S
+    assert search_memo.lookup('repo', [('context.fts_search', 'auth flow')], r=r, now=later) == {
+        ('context.fts_search', 'auth flow'): False}
+    # Other repos are unaffected
+    assert search_memo.lookup('other', [('context.fts_search', 'auth flow')], r=r, now=1000.0) == {
+        ('context.fts_search', 'auth flow'): False}
+
+
+def test_useful_outcome_clears_known_empty():
+    r = _redis()
+    search_memo.record('repo', 'context.fts_search', 'auth flow', False, r=r, now=1000.0)
+    search_memo.record('repo', 'context.fts_search', 'auth flow', True, r=r, now=1000.0)
+    assert search_memo.lookup('repo', [('context.fts_search', 'auth flow')], r=r, now=1000.0)[
+        ('context.fts_search', 'auth flow')] is False
+
+
+def test_memo_fails_open():
+    with patch.object(search_memo, '_disabled_until', 0.0):
+        assert search_memo.lookup('repo', [('context.fts_search', 'q')], r=BrokenRedis()) == {}
+        search_memo.record('repo', 'context.fts_search', 'q', False, r=BrokenRedis())
+
+
+def test_retried_step_is_counted_once():
+    r = _redis()
+    key = search_memo.memo_key('repo', 'context.fts_search', 'auth flow')
+    assert search_memo.record('repo', 'context.fts_search', 'auth flow', False, r=r, now=1000.0, step_id='s:3')
+    assert not search_memo.record('repo', 'context.fts_search', 'auth flow', False, r=r, now=1000.0, step_id='s:3')
+    assert float(r.hget(key, 'empty')) == 1.0
+
+
+def test_same_step_of_other_runs_or_queries_still_counts():
+    r = _redis()
+    assert search_memo.record('repo', 'context.fts_search', 'rate limiter', False, r=r, now=1000.0, step_id='run-1:0')
+    assert search_memo.record('repo', 'context.fts_search', 'circuit breaker', False, r=r, now=1000.0, step_id='run-1:0')
+    assert search_memo.record('repo', 'context.fts_search', 'rate limiter', False, r=r, now=1000.0, step_id='run-2:0')
+    key = search_memo.memo_key('repo', 'context.fts_search', 'rate limiter')
+    assert float(r.hget(key, 'empty')) == 2.0
+    marker = search_memo.step_key('repo', 'context.fts_search', 'rate limiter', 'run-1:0')
+    assert 0 < r.ttl(marker) <= search_memo.STEP_TTL_S
+
+
+def test_concurrent_records_are_not_lost():
+    r = _redis()
+    key = search_memo.memo_key('repo', 'context.fts_search', 'auth flow')
+
+    def worker(i):
+        for j in range(10):
+            search_memo.record('repo', 'context.fts_search', 'auth flow', True, r=r, now=1000.0, step_id=f"{i}:{j}")
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert float(r.hget(key, 'useful')) == 80.0
+
+
+def test_only_newest_history_item_is_recorded():
+    req = api.AgentIntentRequest(session_id='s', persona={}, goal_text='auth', repo_context={'repo': 'Repo'},
+                                 correlation_id='run-1', history=[_search('old query'), _search('auth flow')])
+    with patch.object(search_memo, 'record') as record:
+        api._record_search_outcome(req)
+    record.assert_called_once_with('repo', 'context.fts_search', 'auth flow', False, step_id='run-1:1')
+
+
+def test_planner_deprioritizes_known_empty_suggestion():
+    known = {('context.fts_search', 'auth flow'): True}
+    with patch.object(search_memo, 'lookup', return_value=known):
+        tool, args, finish, _ = api._pick_search_action('explain auth', [], 'context.fts_search', 'auth flow')
+    assert finish is False
+    assert (tool, args['query']) != ('context.fts_search', 'auth flow')
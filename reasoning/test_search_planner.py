@@ -0,0 +1,53 @@
+"""
+Tests for near-duplicate query detection in the search planner
+"""
+import pytest
+
+from reasoning import api
+from reasoning import search_memo
+
+
+@pytest.fixture(autouse=True)
+def _no_memo(monkeypatch):
+    monkeypatch.setattr(search_memo, 'MEMO_ENABLED', False)
+
+
+def _search(tool, query):
+    return {'action': {'action': 'tool', 'tool_name': tool, 'args': {'query': query}},
+            'output': {'content': [{'type': 'text', 'text': 'hit'}]}}
+
+
+def test_query_similarity_catches_reordering_and_prefixes():
+    assert api._query_similarity('find auth middleware', 'auth middleware find') == 1.0
+    assert api._query_similarity('auth middleware', 'authentication middleware') > api._QUERY_SIM_THRESHOLD
+    assert api._query_similarity('agent runtime', 'agent state machine') < api._QUERY_SIM_THRESHOLD
+
+
+def test_near_duplicate_suggestion_is_rejected_for_same_tool():
+    history = [_search('context.fts_search', 'auth middleware')]
+    tool, args, finish, _ = api._pick_search_action(
+        'find auth middleware', history, 'context.fts_search', 'authentication middleware')
+    assert finish is False
+    assert (tool, args['query']) != ('context.fts_search', 'authentication middleware')
+    assert tool == 'context.memory_search'
+
+
+def test_novel_suggestion_is_kept():
+    history = [_search('context.fts_search', 'auth middleware')]
+    tool, args, finish, _ = api._pick_search_action(
+        'find auth middleware', history, 'context.fts_search', 'session store')
+    assert (tool, args['query'], finish) == ('context.fts_search', 'session store', False)
+
+
+def test_no_history_keeps_original_order():
+    tool, args, finish, _ = api._pick_search_action('agent runtime', [], None, None)
+    assert (tool, args['query'], finish) == ('context.fts_search', 'agent runtime', False)
+
+
+def test_all_near_duplicates_finishes():
+    history = [_search('context.fts_search', 'auth middleware'),
+               _search('context.memory_search', 'authentication middleware')]
+    tool, _, finish, summary = api._pick_search_action(
+        'find auth middleware', history, None, None, available_tools=['context.fts_search', 'context.memory_search'])
+    assert tool is None and finish is True
+    assert 'No new search combinations left' in summary
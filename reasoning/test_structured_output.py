@@ -0,0 +1,59 @@
+"""
+Tests for the structured-output (JSON schema) decision mode
+"""
+from unittest.mock import patch
+
+from reasoning import api
+
+
+def test_parse_structured_decision_maps_tools():
+    text = '{"action": "jira.jira_search", "result": "project = SAV", "reasoning": "need tickets"}'
+    assert api._parse_structured_decision(text, 'goal') == ("jira.jira_search", {"jql": "project = SAV"}, None, "need tickets", False)
+    assert api._parse_structured_decision('{"action": "finish", "result": "42", "reasoning": "r"}', 'g') == (None, None, "42", "r", True)
+
+
+def test_parse_structured_decision_rejects_malformed():
+    assert api._parse_structured_decision('ACTION: finish', 'g') is None
+    assert api._parse_structured_decision('{"result": "x"}', 'g') is None
+    assert api._parse_structured_decision('{"action": "  ", "result": "x", "reasoning": ""}', 'g') is None
+
+
+def test_structured_request_payloads_carry_schema():
+    _, ollama = api._ollama_request('phi3.5:latest', 'p', structured=True)
+    assert ollama['format'] == api._DECISION_SCHEMA
+    _, google = api._google_request('gemini', 'p', 'k', structured=True)
+    assert google['generationConfig']['responseMimeType'] == 'application/json'
+    assert 'responseSchema' in google['generationConfig']
+    _, plain = api._ollama_request('phi3.5:latest', 'p')
+    assert 'format' not in plain
+
+
+def test_structured_mode_retries_once_then_succeeds():
+    replies = iter(['not json at all', '{"action": "finish", "result": "done", "reasoning": "ok"}'])
+    meta = {}
+    with patch.object(api, '_call_ollama_api', side_effect=lambda *a, **k: next(replies)) as call:
+        decision = api._use_llm_for_reasoning('goal', None, 'ollama', None, structured=True, meta=meta)
+    assert decision == (None, None, 'done', 'ok', True)
+    assert call.call_count == 2
+    assert api._STRUCTURED_RETRY_NOTE.strip() in call.call_args_list[1][0][1]
+    assert meta['structured'] == 'retried'
+
+
+def test_structured_mode_falls_back_to_line_parsing():
+    meta = {}
+    before = api.structured_output_stats()['fallback']
+    with patch.object(api, '_call_ollama_api', return_value='ACTION: context.fts_search\nRESULT: q\nREASONING: r'):
+        decision = api._use_llm_for_reasoning('goal', None, 'ollama', None, structured=True, meta=meta)
+    assert decision[0] == 'context.fts_search'
+    assert meta['structured'] == 'fallback'
+    assert api.structured_output_stats()['fallback'] == before + 1
+
+
+def test_compute_intent_records_structured_outcome_in_trace():
+    req = api.AgentIntentRequest(session_id='s', persona={}, goal_text='explain the runtime',
+                                 llm={'provider': 'ollama', 'structured_output': True})
+    with patch.object(api, '_call_ollama_api', return_value='{"action": "finish", "result": "It loops.", "reasoning": "known"}'):
+        res = api._compute_intent_sync(req)
+    assert res['final_text'] == 'It loops.'
+    assert [(t['stage'], t['structured']) for t in res['trace']] == [('llm', 'parsed')]
+    assert res['trace'][0]['tokens']['llm_calls'] == 1
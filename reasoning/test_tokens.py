@@ -0,0 +1,53 @@
+"""
+Tests for per-intent token accounting
+"""
+from unittest.mock import patch
+
+from reasoning import api
+from reasoning import tokens
+
+
+class FakeResponse:
+    status_code = 200
+    headers = {}
+    text = ''
+
+    def __init__(self, doc):
+        self.doc = doc
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.doc
+
+
+def test_sections_sum_to_prompt_estimate():
+    with tokens.collect() as usage:
+        system = api._build_system_prompt('be brief', {'prompt_md': 'P' * 400}, {'prompt_md': 'D' * 80})
+        prompt = api._build_reasoning_prompt('find the runtime', system, 'H' * 1200)
+        tokens.note_prompt(prompt)
+    sections = usage['sections']
+    assert sections['persona'] == 100 and sections['driver'] == 20 and sections['history'] == 300
+    assert sum(sections.values()) == usage['prompt_tokens_est'] == tokens.estimate(prompt)
+    assert 'prompt_tokens' not in tokens.summary(usage)
+
+
+def test_intent_result_carries_provider_usage():
+    reply = {'response': 'ACTION: finish\nRESULT: done\nREASONING: ok', 'prompt_eval_count': 612, 'eval_count': 17}
+    req = api.AgentIntentRequest(session_id='s', persona={'name': 'dev', 'prompt_md': 'Be helpful.'},
+                                 goal_text='explain the runtime', llm={'provider': 'ollama'})
+    with patch.object(api.requests, 'post', return_value=FakeResponse(reply)):
+        res = api._compute_intent_sync(req)
+    usage = res['usage']
+    assert usage['llm_calls'] == 1
+    assert (usage['prompt_tokens'], usage['completion_tokens']) == (612, 17)
+    assert usage['sections']['persona'] == tokens.estimate('Be helpful.')
+    assert res['trace'][0]['tokens'] == usage
+
+
+def test_google_usage_metadata():
+    doc = {'usageMetadata': {'promptTokenCount': 120, 'candidatesTokenCount': 9, 'totalTokenCount': 129}}
+    assert tokens.google_usage(doc) == (120, 9)
+    assert tokens.google_usage({}) == (None, None)
+    assert tokens.ollama_usage({'eval_count': 3}) == (None, 3)
@@ -0,0 +1,74 @@
+"""
+Tests for tool relevance pre-selection
+"""
+from unittest.mock import patch
+
+import pytest
+
+from reasoning import api
+from reasoning import tool_index
+
+CATALOG = [
+    "- context/fts_search — Full-text search over indexed repository code and docs (required: query)",
+    "- context/memory_search — Search the memory bank of project notes",
+    "- jira/jira_search — Search Jira issues with JQL (required: jql)",
+    "- github/code_search — Search GitHub code across organisations",
+    "- github/issue_search — Search GitHub issues and pull requests",
+    "- confluence/page_search — Search Confluence wiki pages",
+    "- slack/message_search — Search Slack messages and threads",
+    "- sentry/event_search — Search Sentry error events and stack traces",
+    "- datadog/log_search — Search Datadog logs",
+    "- pagerduty/incident_search — Search PagerDuty incidents",
+]
+TOOLS = [line.split()[1] for line in CATALOG]
+
+
+@pytest.fixture(autouse=True)
+def fresh_index():
+    tool_index.reset()
+    yield
+    tool_index.reset()
+
+
+def test_parse_catalog_strips_required_hint():
+    parsed = tool_index.parse_catalog(CATALOG[:1])
+    assert parsed == {'context.fts_search': 'Full-text search over indexed repository code and docs'}
+
+
+def test_select_ranks_by_goal_and_keeps_one_spelling_per_tool():
+    tools = TOOLS + [t.replace('/', '.') for t in TOOLS]
+    picked = tool_index.select(tools, CATALOG, 'why is the checkout page throwing errors in sentry', k=3)
+    assert picked[0] == 'sentry.event_search' and len(picked) == 3
+    assert tool_index.select(tools, CATALOG, 'find the jira issues for the billing epic', k=2)[0] == 'jira.jira_search'
+    assert tool_index.stats()['index_builds'] == 1 and tool_index.stats()['index_hits'] == 1
+
+
+def test_recent_history_keeps_the_tool_in_use():
+    history = [{'action': {'action': 'tool', 'tool_name': 'datadog/log_search', 'args': {'query': 'timeout'}}, 'output': ''}]
+    picked = tool_index.select(TOOLS, CATALOG, 'what went wrong last night', history=history, k=2)
+    assert picked[0] == 'datadog/log_search'
+
+
+def test_short_lists_and_disabled_selection_pass_through():
+    assert tool_index.select(TOOLS[:3], CATALOG, 'anything', k=8) == TOOLS[:3]
+    assert tool_index.select(TOOLS, CATALOG, 'anything', k=0) == TOOLS
+    assert tool_index.select(None, CATALOG, 'anything') is None
+    assert tool_index.select([], CATALOG, 'anything') == []
+
+
+def test_prompt_lists_only_the_selected_tools():
+    req = api.AgentIntentRequest(session_id='s', persona={'name': 'dev'}, goal_text='search confluence for the onboarding page',
+                                 tools_available=TOOLS, tools_catalog=CATALOG, llm={'provider': 'ollama'})
+    with patch.object(tool_index, 'TOP_K', 3), \
+            patch.object(api, '_call_ollama_api', return_value='ACTION: finish\nRESULT: ok\nREASONING: r') as call:
+        api._compute_intent_sync(req)
+    prompt = call.call_args[0][1]
+    tools_line = next(line for line in prompt.splitlines() if line.startswith('Available Tools:'))
+    assert 'confluence/page_search' in tools_line and tools_line.count(',') == 2
+    assert 'pagerduty' not in prompt
+
+
+def test_google_prompt_uses_the_offered_tools():
+    prompt = api._google_prompt('m', 'goal', None, None, {'name': 'dev'}, None, available_tools=['jira.jira_search'])
+    assert 'Available Tools: jira.jira_search' in prompt
+    assert 'Available Tools: ' + api._DEFAULT_TOOLS_LINE in api._google_prompt('m', 'goal', None, None, {'name': 'dev'}, None)
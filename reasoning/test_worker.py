@@ -13,6 +13,17 @@ class MockRedis:
     def __init__(self):
         self.data = {}
         self.lists = {}
+        self.strings = {}
+        self.ttls = {}
+        self.added = []
+
+    def setex(self, key, ttl, value):
+        self.strings[key] = value
+        self.ttls[key] = ttl
+        return True
+
+    def get(self, key):
+        return self.strings.get(key)
         
     def rpush(self, key, value):
         if key not in self.lists:
@@ -35,6 +46,7 @@ class MockRedis:
             self.data[key] = set()
         for v in values:
             self.data[key].add(v)
+            self.added.append((key, v))
         return len(values)
     
     def srem(self, key, *values):
@@ -56,8 +68,9 @@ def mock_redis():
 def mock_api_module():
     """Mock the api module"""
     with patch('reasoning.worker.api_mod') as mock_api:
-        # Mock AgentIntentRequest
-        mock_api.AgentIntentRequest = Mock
+        # Mock AgentIntentRequest (the worker builds it with model_construct)
+        mock_api.AgentIntentRequest = Mock()
+        mock_api.AgentIntentRequest.model_construct = Mock
         
         # Mock _compute_intent_sync
         mock_api._compute_intent_sync = Mock(return_value={
@@ -88,8 +101,8 @@ def test_process_job_success(mock_redis, mock_api_module):
     
     process_job(mock_redis, json.dumps(job_data))
     
-    # Verify job was added to running set
-    assert 'test-job-1' in mock_redis.smembers('savant:jobs:running')
+    # Verify job was added to running set while it ran
+    assert ('savant:jobs:running', 'test-job-1') in mock_redis.added
     
     # Verify _compute_intent_sync was called
     assert mock_api_module._compute_intent_sync.called
@@ -180,25 +193,12 @@ def test_process_job_stores_result_for_sync_polling(mock_redis, mock_api_module)
         }
     }
     
-    # Mock rpush to capture result storage
-    original_rpush = mock_redis.rpush
-    result_key = None
-    result_value = None
-    
-    def capture_rpush(key, value):
-        nonlocal result_key, result_value
-        if key.startswith('savant:result:'):
-            result_key = key
-            result_value = value
-        return original_rpush(key, value)
-    
-    mock_redis.rpush = capture_rpush
-    
     process_job(mock_redis, json.dumps(job_data))
     
-    # Verify result was stored
-    assert result_key == 'savant:result:test-job-5'
+    # Verify result was stored with a short TTL
+    result_value = mock_redis.get('savant:result:test-job-5')
     assert result_value is not None
+    assert mock_redis.ttls['savant:result:test-job-5'] == 60
     
     result = json.loads(result_value)
     assert result['status'] == 'ok'
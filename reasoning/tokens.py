@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Per-intent token accounting.
+
+While an intent is computed, `collect()` installs a usage record in a
+context variable. Prompt builders report the estimated size of each
+section (persona, driver, instructions, history, goal, tools and the fixed
+template around them). Provider replies report the real counts when the
+provider returns them: Google `usageMetadata`, or Ollama
+`prompt_eval_count`/`eval_count`. Every LLM call made for the intent is
+summed, including structured-output retries, fallbacks and hedges.
+
+Estimates use ~4 characters per token. They are meant for finding bloated
+prompts, not for billing.
+"""
+
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+SECTIONS = ('persona', 'driver', 'instructions', 'history', 'goal', 'tools', 'template')
+
+_CURRENT: ContextVar[Optional[Dict[str, Any]]] = ContextVar('reasoning_token_usage', default=None)
+_lock = threading.Lock()
+
+
+def estimate(text: Optional[str]) -> int:
+    return (len(text) + 3) // 4 if text else 0
+
+
+def new_usage() -> Dict[str, Any]:
+    return {'llm_calls': 0, 'prompt_tokens_est': 0, 'sections': {},
+            'prompt_tokens': 0, 'completion_tokens': 0, 'reported_calls': 0}
+
+
+@contextmanager
+def collect() -> Iterator[Dict[str, Any]]:
+    usage = new_usage()
+    token = _CURRENT.set(usage)
+    try:
+        yield usage
+    finally:
+        _CURRENT.reset(token)
+
+
+def note_sections(**texts: Optional[str]) -> None:
+    """Record section sizes for the prompt being built; later prompts overwrite earlier ones."""
+    usage = _CURRENT.get()
+    if usage is None:
+        return
+    with _lock:
+        for name, text in texts.items():
+            usage['sections'][name] = estimate(text)
+
+
+def note_prompt(prompt: str) -> None:
+    """One LLM call is about to send `prompt`; whatever the sections do not cover is template."""
+    usage = _CURRENT.get()
+    if usage is None:
+        return
+    total = estimate(prompt)
+    with _lock:
+        usage['llm_calls'] += 1
+        usage['prompt_tokens_est'] += total
+        sections = usage['sections']
+        covered = sum(v for k, v in sections.items() if k != 'template')
+        sections['template'] = max(0, total - covered)
+
+
+def note_usage(prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> None:
+    usage = _CURRENT.get()
+    if usage is None or (prompt_tokens is None and completion_tokens is None):
+        return
+    with _lock:
+        usage['reported_calls'] += 1
+        usage['prompt_tokens'] += int(prompt_tokens or 0)
+        usage['completion_tokens'] += int(completion_tokens or 0)
+
+
+def google_usage(result: Dict[str, Any]) -> Tuple[Optional[int], Optional[int]]:
+    meta = result.get('usageMetadata') if isinstance(result, dict) else None
+    if not isinstance(meta, dict):
+        return None, None
+    return meta.get('promptTokenCount'), meta.get('candidatesTokenCount')
+
+
+def ollama_usage(result: Dict[str, Any]) -> Tuple[Optional[int], Optional[int]]:
+    if not isinstance(result, dict):
+        return None, None
+    return result.get('prompt_eval_count'), result.get('eval_count')
+
+
+def summary(usage: Dict[str, Any]) -> Dict[str, Any]:
+    """Result/trace form; provider counts are left out when no call reported them."""
+    out = {'llm_calls': usage['llm_calls'], 'prompt_tokens_est': usage['prompt_tokens_est'],
+           'sections': {k: usage['sections'][k] for k in SECTIONS if k in usage['sections']}}
+    if usage['reported_calls']:
+        out['prompt_tokens'] = usage['prompt_tokens']
+        out['completion_tokens'] = usage['completion_tokens']
+    return out
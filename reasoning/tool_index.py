@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Tool relevance pre-selection for large tool catalogs.
+
+The agent runtime sends every tool name it may call (`tools_available`,
+both `ns/tool` and `ns.tool` spellings). It also sends one catalog line
+per tool (`tools_catalog`: "- ns/tool — description (required: a, b)").
+Listing all of them in the prompt makes it long and makes the model's
+choice less accurate as the multiplexer grows. Instead, only the TOP_K
+tools most relevant to the goal and recent history are offered.
+
+- Index: one document per tool, made of its namespace and name parts
+  (weighted NAME_WEIGHT) and its description words. It holds term
+  frequencies and IDF. An index is built once per catalog: the key is a
+  hash of the tool list and catalog. The last CACHE_SIZE indexes are
+  kept.
+- Query: the goal's words, plus the tool names and queries of the last
+  HISTORY_ITEMS history steps at half weight. Tools used in those steps
+  get a small boost, so the model keeps seeing the tool it is iterating
+  with.
+- Output: at most TOP_K names, one spelling per tool (dotted when
+  offered), in rank order. Ties keep the caller's order. Lists no longer
+  than TOP_K come back unchanged.
+
+Env:
+  - REASONING_TOOL_TOPK (default 8; 0 disables pre-selection)
+"""
+
+import hashlib
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+TOP_K = int(os.environ.get('REASONING_TOOL_TOPK', '8'))
+CACHE_SIZE = 32
+HISTORY_ITEMS = 3
+NAME_WEIGHT = 2.0
+HISTORY_WEIGHT = 0.5
+RECENT_BOOST = 0.25
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_CATALOG_RE = re.compile(r"^\s*-?\s*([^\s—]+)\s*(?:—|--|-|:)?\s*(.*)$")
+_REQUIRED_RE = re.compile(r"\(required:[^)]*\)\s*$")
+_STOPWORDS = {
+    'a', 'an', 'the', 'to', 'for', 'and', 'or', 'in', 'of', 'on', 'with', 'by', 'from', 'about', 'into', 'at',
+    'is', 'are', 'be', 'do', 'does', 'can', 'what', 'how', 'why', 'which', 'this', 'that', 'it', 'its', 'me', 'my',
+    'we', 'our', 'you', 'your', 'please', 'use', 'using', 'tool', 'tools', 'given', 'returns', 'return',
+}
+
+_lock = threading.Lock()
+_indexes: 'OrderedDict[str, ToolIndex]' = OrderedDict()
+_STATS = {'selections': 0, 'pruned': 0, 'index_builds': 0, 'index_hits': 0}
+
+
+def canonical(name: str) -> str:
+    return name.strip().replace('/', '.')
+
+
+def words(text: str) -> List[str]:
+    out = []
+    for w in _WORD_RE.findall((text or '').lower()):
+        if w in _STOPWORDS or (len(w) < 2 and not w.isdigit()):
+            continue
+        if len(w) > 3 and w.endswith('s') and not w.endswith(('ss', 'us', 'is')):
+            w = w[:-1]
+        out.append(w)
+    return out
+
+
+def parse_catalog(catalog: Optional[List[str]]) -> Dict[str, str]:
+    """Canonical tool name -> description, from runtime catalog lines."""
+    out: Dict[str, str] = {}
+    for line in catalog or []:
+        if not isinstance(line, str):
+            continue
+        m = _CATALOG_RE.match(line)
+        if m and m.group(1):
+            out[canonical(m.group(1))] = _REQUIRED_RE.sub('', m.group(2) or '').strip()
+    return out
+
+
+def catalog_hash(tools: List[str], catalog: Optional[List[str]]) -> str:
+    h = hashlib.sha1()
+    for part in list(tools) + ['\x00'] + [c for c in (catalog or []) if isinstance(c, str)]:
+        h.update(part.encode('utf-8'))
+        h.update(b'\n')
+    return h.hexdigest()[:16]
+
+
+class ToolIndex:
+    """Term-weighted documents for one tool list; `rank` scores them against a query."""
+
+    def __init__(self, tools: List[str], catalog: Optional[List[str]] = None):
+        descriptions = parse_catalog(catalog)
+        self.names: List[str] = []  # one spelling per canonical tool, dotted when offered
+        spelling: Dict[str, str] = {}
+        for name in tools:
+            key = canonical(name)
+            if key not in spelling:
+                self.names.append(key)
+            if key not in spelling or '.' in name:
+                spelling[key] = name
+        self.spelling = spelling
+        self.docs: List[Dict[str, float]] = []
+        df: Dict[str, int] = {}
+        for key in self.names:
+            doc: Dict[str, float] = {}
+            for w in words(key.replace('_', ' ')):
+                doc[w] = doc.get(w, 0.0) + NAME_WEIGHT
+            for w in words(descriptions.get(key, '')):
+                doc[w] = doc.get(w, 0.0) + 1.0
+            norm = math.sqrt(sum(v * v for v in doc.values())) or 1.0
+            self.docs.append({w: v / norm for w, v in doc.items()})
+            for w in doc:
+                df[w] = df.get(w, 0) + 1
+        n = len(self.names)
+        self.idf = {w: math.log(1.0 + n / c) for w, c in df.items()}
+
+    def rank(self, query: Dict[str, float], recent: Optional[set] = None) -> List[Tuple[str, float]]:
+        scored = []
+        for i, (key, doc) in enumerate(zip(self.names, self.docs)):
+            score = sum(weight * doc.get(w, 0.0) * self.idf.get(w, 0.0) for w, weight in query.items())
+            if recent and key in recent:
+                score += RECENT_BOOST
+            scored.append((-score, i, key))
+        scored.sort()
+        return [(self.spelling[key], -neg) for neg, _, key in scored]
+
+
+def _get_index(tools: List[str], catalog: Optional[List[str]]) -> ToolIndex:
+    key = catalog_hash(tools, catalog)
+    with _lock:
+        index = _indexes.get(key)
+        if index is not None:
+            _indexes.move_to_end(key)
+            _STATS['index_hits'] += 1
+            return index
+    index = ToolIndex(tools, catalog)
+    with _lock:
+        _indexes[key] = index
+        _STATS['index_builds'] += 1
+        while len(_indexes) > CACHE_SIZE:
+            _indexes.popitem(last=False)
+    return index
+
+
+def _history_query(history: Optional[List[Dict[str, Any]]], query: Dict[str, float]) -> set:
+    """Add the recent steps' tool names and queries to `query`; returns the canonical tools they used."""
+    recent = set()
+    for item in (history or [])[-HISTORY_ITEMS:]:
+        if not isinstance(item, dict):
+            continue
+        action = item.get('action') if isinstance(item.get('action'), dict) else item
+        tool = action.get('tool_name') or action.get('tool') or ''
+        args = action.get('args') or action.get('input') or {}
+        text = str(tool).replace('_', ' ')
+        if isinstance(args, dict):
+            text += ' ' + str(args.get('query') or args.get('q') or '')
+        if tool:
+            recent.add(canonical(str(tool)))
+        for w in words(text.replace('.', ' ').replace('/', ' ')):
+            query[w] = query.get(w, 0.0) + HISTORY_WEIGHT
+    return recent
+
+
+def select(tools: Optional[List[str]], catalog: Optional[List[str]], goal: str,
+           history: Optional[List[Dict[str, Any]]] = None, k: Optional[int] = None) -> Optional[List[str]]:
+    """The top-k tools for the prompt; None/empty lists and lists of at most k tools pass through."""
+    k = TOP_K if k is None else k
+    if not tools or k <= 0 or len(tools) <= k:
+        return tools
+    index = _get_index(tools, catalog)
+    if len(index.names) <= k:
+        picked = [index.spelling[key] for key in index.names]
+    else:
+        query: Dict[str, float] = {}
+        for w in words(goal):
+            query[w] = query.get(w, 0.0) + 1.0
+        recent = _history_query(history, query)
+        picked = [name for name, _ in index.rank(query, recent)[:k]]
+    with _lock:
+        _STATS['selections'] += 1
+        _STATS['pruned'] += len(index.names) - len(picked)
+    return picked
+
+
+def stats() -> Dict[str, Any]:
+    with _lock:
+        out = dict(_STATS)
+        out['indexes'] = len(_indexes)
+    return out
+
+
+def reset() -> None:
+    """Drop cached indexes (rebuilt on next use)."""
+    with _lock:
+        _indexes.clear()
@@ -10,12 +10,13 @@ Handles callbacks and result storage.
 """
 
 import os
+import signal
 import sys
 import time
-import json
 import redis
 import requests
 import traceback
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 
 # Disable Mongo worker auto-start in api.py
@@ -23,6 +24,15 @@ os.environ['REASONING_QUEUE_WORKER'] = '0'
 
 try:
     from reasoning import api as api_mod
+    from reasoning import batching
+    from reasoning import affinity
+    from reasoning import control
+    from reasoning import fanout
+    from reasoning import fastjson
+    from reasoning import ledger
+    from reasoning import profiling
+    from reasoning import recycling
+    from reasoning import replay
 except Exception as e:
     print(f"[reasoning-worker] Failed to import API module: {e}", file=sys.stderr)
     sys.exit(1)
@@ -34,28 +44,118 @@ PROCESSING_KEY = 'savant:jobs:running'  # Set of running job IDs
 COMPLETED_KEY = 'savant:jobs:completed' # List or ZSET of recent completions
 FAILED_KEY = 'savant:jobs:failed'
 
+# Validate only top-level scalars and container types; nested history/persona/state
+# dicts are passed through as decoded instead of being re-validated by pydantic.
+FAST_DECODE = os.environ.get('REASONING_FAST_DECODE', '1') not in ('0', '', 'false', 'False')
+
 def get_redis_client():
     return redis.Redis.from_url(REDIS_URL, decode_responses=True)
 
 def log(msg, **kwargs):
+    if api_mod._log_sampled_out(msg):
+        return
     ts = datetime.utcnow().isoformat() + 'Z'
     out = f"[{ts}] {msg}"
     if kwargs:
-        out += f" {json.dumps(kwargs)}"
+        out += f" {fastjson.dumps(kwargs, default=str)}"
     print(out, flush=True)
 
-def process_job(r, job_json):
+_OPTIONAL_STR_FIELDS = ('instructions', 'forced_tool', 'correlation_id', 'callback_url')
+_OPTIONAL_DICT_FIELDS = ('driver', 'rules', 'llm', 'repo_context', 'memory_state', 'agent_state')
+_OPTIONAL_LIST_FIELDS = ('history', 'tools_available', 'tools_catalog')
+
+
+def _check(name, value, types, label):
+    if value is not None and not isinstance(value, types):
+        raise ValueError(f"invalid payload field '{name}': expected {label}, got {type(value).__name__}")
+    return value
+
+
+def _intent_fields(payload):
+    return {
+        'session_id': payload.get('session_id') or 'dev',
+        'persona': payload.get('persona') or {'name': 'savant-engineer'},
+        'driver': payload.get('driver'),
+        'rules': payload.get('rules'),
+        'instructions': payload.get('instructions'),
+        'llm': payload.get('llm'),
+        'repo_context': payload.get('repo_context'),
+        'memory_state': payload.get('memory_state'),
+        'history': payload.get('history'),
+        'tools_available': payload.get('tools_available'),
+        'tools_catalog': payload.get('tools_catalog'),
+        'goal_text': payload.get('goal_text') or '',
+        'forced_tool': payload.get('forced_tool'),
+        'max_steps': payload.get('max_steps'),
+        'agent_state': payload.get('agent_state'),
+        'correlation_id': payload.get('correlation_id')
+    }
+
+
+def _fast_intent_request(fields):
+    """AgentIntentRequest with top-level checks only (nested sections are used as decoded)."""
+    _check('session_id', fields['session_id'], str, 'string')
+    _check('goal_text', fields['goal_text'], str, 'string')
+    _check('persona', fields['persona'], dict, 'object')
+    for name in _OPTIONAL_STR_FIELDS:
+        _check(name, fields.get(name), str, 'string')
+    for name in _OPTIONAL_DICT_FIELDS:
+        _check(name, fields.get(name), dict, 'object')
+    for name in _OPTIONAL_LIST_FIELDS:
+        _check(name, fields.get(name), list, 'array')
+    max_steps = fields.get('max_steps')
+    if max_steps is not None:
+        try:
+            if isinstance(max_steps, bool) or float(max_steps) != int(float(max_steps)):
+                raise ValueError
+            fields['max_steps'] = int(float(max_steps))
+        except (TypeError, ValueError):
+            raise ValueError(f"invalid payload field 'max_steps': expected integer, got {max_steps!r}")
+    return api_mod.AgentIntentRequest.model_construct(**fields)
+
+
+def build_intent_request(payload):
+    """Adapt a queued job payload (as sent by the Ruby client) to AgentIntentRequest."""
+    fields = _intent_fields(payload)
+    if FAST_DECODE:
+        return _fast_intent_request(fields)
+    return api_mod.AgentIntentRequest(**fields)
+
+
+def _record_invalid_job(r, job_json, error):
+    preview = str(job_json)
+    log("error: invalid json", payload=preview if len(preview) <= 500 else preview[:500] + '...')
     try:
-        job = json.loads(job_json)
-    except json.JSONDecodeError:
-        log("error: invalid json", payload=job_json)
-        return
+        r.lpush(FAILED_KEY, fastjson.dumps({'job_id': None, 'ts': time.time(), 'error': f"invalid json: {error}"}))
+        r.ltrim(FAILED_KEY, 0, 99)
+    except Exception as e:
+        log("failed_list_error", error=str(e))
+
+
+def process_job(r, job_json):
+    if isinstance(job_json, dict):
+        job = job_json  # already decoded (micro-batch path)
+    else:
+        try:
+            job = fastjson.loads(job_json)
+        except fastjson.JSONDecodeError as e:
+            _record_invalid_job(r, job_json, e)
+            return
+        if not isinstance(job, dict):
+            _record_invalid_job(r, job_json, 'job envelope is not an object')
+            return
+
+    if fanout.is_batch(job):
+        return process_batch_job(r, job, job_json)
 
     job_id = job.get('job_id')
     callback_url = job.get('callback_url')
     # Default to sync result storage key if no callback (for CLI/legacy)
     result_key = f"savant:result:{job_id}" if job_id else None
 
+    started_at = time.time()
+    mem = recycling.RECYCLER.job_started()
+    prof = profiling.PROFILER.job_started(job_id)
     log("job_started", job_id=job_id)
     if job_id:
         r.sadd(PROCESSING_KEY, job_id)
@@ -70,31 +170,18 @@ def process_job(r, job_json):
         # api.AgentIntentRequest requires: session_id, persona, goal_text
         # We wrap in try/except to catch validation errors
         
-        req = api_mod.AgentIntentRequest(**{
-            'session_id': payload.get('session_id') or 'dev',
-            'persona': payload.get('persona') or {'name': 'savant-engineer'},
-            'driver': payload.get('driver'),
-            'rules': payload.get('rules'),
-            'instructions': payload.get('instructions'),
-            'llm': payload.get('llm'),
-            'repo_context': payload.get('repo_context'),
-            'memory_state': payload.get('memory_state'),
-            'history': payload.get('history'),
-            'tools_available': payload.get('tools_available'),
-            'tools_catalog': payload.get('tools_catalog'),
-            'goal_text': payload.get('goal_text') or '',
-            'forced_tool': payload.get('forced_tool'),
-            'max_steps': payload.get('max_steps'),
-            'agent_state': payload.get('agent_state'),
-            'correlation_id': payload.get('correlation_id')
-        })
-
-        # Execute Logic
-        result = api_mod._compute_intent_sync(req)
+        with replay.RECORDER.job(job_id, payload) as rec:
+            req = build_intent_request(payload)
+
+            # Execute Logic
+            result = api_mod._compute_intent_sync(req)
+            replay.note_result(rec, result)
         
         # Success
         result['status'] = 'ok'
         result['job_id'] = job_id or ''
+        result['started_at'] = started_at
+        result['finished_at'] = time.time()
         
         # 1. Send Callback if requested
         if callback_url:
@@ -106,13 +193,18 @@ def process_job(r, job_json):
         
         # 2. Store result in Redis for sync polling (TTL 60s)
         if result_key:
-            r.setex(result_key, 60, json.dumps(result))
+            r.setex(result_key, 60, fastjson.dumps(result))
 
         # 3. Add to completed log (optional, capped)
-        r.lpush(COMPLETED_KEY, json.dumps({'job_id': job_id, 'ts': time.time(), 'status': 'ok'}))
+        r.lpush(COMPLETED_KEY, fastjson.dumps({'job_id': job_id, 'ts': time.time(), 'status': 'ok'}))
         r.ltrim(COMPLETED_KEY, 0, 99)
 
-        log("job_completed", job_id=job_id)
+        memory = recycling.RECYCLER.job_finished(mem)
+        ledger.record(r, ledger.build_entry(job, ledger.payload_size(job_json, job), started_at,
+                                            result['finished_at'], 'ok', usage=result.get('usage'),
+                                            memory=memory), log=log)
+
+        log("job_completed", job_id=job_id, **memory)
 
     except Exception as e:
         error_msg = str(e)
@@ -122,7 +214,9 @@ def process_job(r, job_json):
         error_result = {
             "status": "error",
             "error": error_msg,
-            "job_id": job_id
+            "job_id": job_id,
+            "started_at": started_at,
+            "finished_at": time.time()
         }
         
         if callback_url:
@@ -132,14 +226,135 @@ def process_job(r, job_json):
                 pass
         
         if result_key:
-            r.setex(result_key, 60, json.dumps(error_result))
+            r.setex(result_key, 60, fastjson.dumps(error_result))
 
-        r.lpush(FAILED_KEY, json.dumps({'job_id': job_id, 'ts': time.time(), 'error': error_msg}))
+        r.lpush(FAILED_KEY, fastjson.dumps({'job_id': job_id, 'ts': time.time(), 'error': error_msg}))
         r.ltrim(FAILED_KEY, 0, 99)
+
+        memory = recycling.RECYCLER.job_finished(mem)
+        ledger.record(r, ledger.build_entry(job, ledger.payload_size(job_json, job), started_at,
+                                            error_result['finished_at'], 'error', error=error_msg,
+                                            memory=memory), log=log)
+    finally:
+        recycling.RECYCLER.job_finished(mem)
+        profiling.PROFILER.job_finished(prof)
+        if job_id:
+            r.srem(PROCESSING_KEY, job_id)
+
+def _run_batch_item(r, job_id, item_id, payload, stream, emitted):
+    try:
+        with replay.RECORDER.job(f"{job_id}:{item_id}", payload) as rec:
+            result = api_mod._compute_intent_sync(build_intent_request(payload))
+            replay.note_result(rec, result)
+        doc = fanout.item_ok(item_id, result)
+    except Exception as e:
+        log("batch_item_failed", job_id=job_id, item_id=item_id, error=str(e))
+        doc = fanout.item_error(item_id, e)
+    if stream and job_id:
+        try:
+            pipe = r.pipeline(transaction=False)
+            fanout.push_item(pipe, job_id, doc)
+            pipe.execute()
+            emitted.add(item_id)
+        except Exception as e:
+            log("batch_item_push_failed", job_id=job_id, item_id=item_id, error=str(e))
+    return doc
+
+
+def process_batch_job(r, job, job_json):
+    """Run a fan-out envelope's items in parallel and store one combined result (see reasoning/fanout.py)."""
+    job_id = job.get('job_id')
+    callback_url = job.get('callback_url')
+    result_key = f"savant:result:{job_id}" if job_id else None
+    started_at = time.time()
+    emitted = set()  # item ids already streamed to the caller
+    mem = recycling.RECYCLER.job_started()
+    prof = profiling.PROFILER.job_started(job_id)
+    if job_id:
+        r.sadd(PROCESSING_KEY, job_id)
+    try:
+        try:
+            items = fanout.item_payloads(job)
+        except ValueError as e:
+            items = []
+            result = fanout.failure(job_id, job, e, started_at)
+        if items:
+            stream = fanout.mode(job) == 'stream'
+            log("batch_started", job_id=job_id, items=len(items), mode=fanout.mode(job))
+            with ThreadPoolExecutor(max_workers=max(1, min(fanout.CONCURRENCY, len(items)))) as pool:
+                docs = list(pool.map(lambda item: _run_batch_item(r, job_id, item[0], item[1], stream, emitted), items))
+            result = fanout.combined(job_id, docs, started_at)
+
+        if callback_url:
+            try:
+                requests.post(callback_url, json=result, timeout=5)
+                log("callback_sent", url=callback_url, status="ok")
+            except Exception as e:
+                log("callback_failed", url=callback_url, error=str(e))
+
+        pipe = r.pipeline(transaction=False)
+        if result_key:
+            pipe.setex(result_key, fanout.RESULT_TTL_S, fastjson.dumps(result))
+            if not items and fanout.mode(job) == 'stream':
+                for doc in result['items']:
+                    fanout.push_item(pipe, job_id, doc)
+        if result['status'] == 'error':
+            pipe.lpush(FAILED_KEY, fastjson.dumps({'job_id': job_id, 'ts': time.time(), 'error': result.get('error') or 'all batch items failed'}))
+            pipe.ltrim(FAILED_KEY, 0, 99)
+        else:
+            pipe.lpush(COMPLETED_KEY, fastjson.dumps({'job_id': job_id, 'ts': time.time(), 'status': result['status']}))
+            pipe.ltrim(COMPLETED_KEY, 0, 99)
+        pipe.execute()
+
+        error = result.get('error') or (f"{result['failed']} of {len(result['items'])} items failed" if result['failed'] else None)
+        memory = recycling.RECYCLER.job_finished(mem)
+        ledger.record(r, ledger.build_entry(job, ledger.payload_size(job_json, job), started_at, result['finished_at'],
+                                            'ok' if result['status'] == 'ok' else 'error', error=error,
+                                            usage=fanout.merged_usage(result['items']),
+                                            memory=memory), log=log)
+        log("batch_completed", job_id=job_id, status=result['status'], items=len(result['items']), failed=result['failed'],
+            **memory)
+    except Exception as e:
+        log("job_failed", job_id=job_id, error=str(e))
+        try:
+            pipe = r.pipeline(transaction=False)
+            fanout.add_failure(pipe, job_id, job, e, emitted, started_at)
+            pipe.execute()
+        except Exception as store_error:
+            log("batch_failure_store_failed", job_id=job_id, error=str(store_error))
     finally:
+        recycling.RECYCLER.job_finished(mem)
+        profiling.PROFILER.job_finished(prof)
         if job_id:
             r.srem(PROCESSING_KEY, job_id)
 
+
+def dispatch_popped(r, source, job_json, router, batch_pool=None, batch_max=batching.BATCH_MAX):
+    """Route or process what BLPOP returned from `source` (shared queue or a model lane)."""
+    items = batching.collect_batch(r, source, job_json, max_size=batch_max) if batch_pool is not None else [job_json]
+    jobs = []
+    for raw in items:
+        job = batching.decode_job(raw)
+        if job is None:
+            jobs.append(raw)
+            continue
+        # Only shared-queue jobs are re-routed; lane jobs always run where they land.
+        if source == QUEUE_KEY:
+            lane = router.route_target(r, job)
+            if lane:
+                router.push_to_lane(r, lane, raw if isinstance(raw, str) else fastjson.dumps(raw))
+                log("job_routed", job_id=job.get('job_id'), lane=lane)
+                continue
+        router.note_model(*batching.batch_key(job))
+        jobs.append(job)
+    if not jobs:
+        return
+    router.publish(r, load=len(jobs))
+    if batch_pool is not None:
+        batching.dispatch_groups(batching.group_jobs(jobs), lambda job: process_job(r, job), batch_pool, log=log)
+    else:
+        process_job(r, jobs[0])
+
 def main() -> int:
     log("worker_starting", pid=os.getpid())
     r = None
@@ -156,22 +371,76 @@ def main() -> int:
     # Register worker ID
     worker_id = f"{os.uname().nodename}:{os.getpid()}"
 
+    # Optional micro-batching: group same (provider, model) jobs and run them concurrently
+    batch_pool = None
+    if batching.BATCH_WINDOW_MS > 0 and batching.BATCH_MAX > 1:
+        batch_pool = ThreadPoolExecutor(max_workers=batching.BATCH_MAX, thread_name_prefix='reasoning-batch')
+        log("batching_enabled", window_ms=batching.BATCH_WINDOW_MS, max_size=batching.BATCH_MAX)
+
+    # Capability registry + optional model-affinity lanes
+    router = affinity.AffinityRouter(worker_id, QUEUE_KEY, concurrency=batching.BATCH_MAX if batch_pool is not None else 1)
+    if router.enabled:
+        log("model_affinity_enabled", warm_ttl_s=router.warm_ttl_s, max_warm=router.max_warm)
+
+    # Live control plane (reasoning/control.py). For this worker "concurrency" is the micro-batch size;
+    # the listener thread only records it and the loop below swaps in a pool of that size between jobs.
+    def _check_concurrency(n):
+        if batch_pool is None:
+            raise ValueError("sync worker concurrency needs micro-batching (REASONING_BATCH_WINDOW_MS > 0)")
+
+    ctl = control.WorkerControl(worker_id, 'sync', router.concurrency, on_concurrency=_check_concurrency,
+                                status=lambda: {'queue_depth': r.llen(QUEUE_KEY)})
+    control.start_listener(r, ctl, log=log)
+
+    # Optional recycling: exit once a job/RSS/age limit is hit so the supervisor starts a fresh process
+    recycler = recycling.RECYCLER
+    if recycler.enabled:
+        log("recycling_enabled", max_jobs=recycler.max_jobs, max_rss_mb=recycler.max_rss_mb, max_age_s=recycler.max_age_s)
+
+    # On-demand profiling: SIGUSR1 or a savant:profile:request key (see reasoning/profiling.py)
+    if hasattr(signal, 'SIGUSR1'):
+        signal.signal(signal.SIGUSR1, profiling.PROFILER.request_toggle)
+
     while True:
         try:
             # Heartbeat
             r.setex(f"savant:workers:heartbeat:{worker_id}", 30, str(time.time()))
+            router.publish(r, load=0)
+            profiling.PROFILER.poll(r, log=log)
+
+            if ctl.paused:
+                ctl.wait_resumed(1.0)
+                continue
+            if batch_pool is not None and ctl.concurrency != router.concurrency:
+                old_pool = batch_pool
+                batch_pool = ThreadPoolExecutor(max_workers=ctl.concurrency, thread_name_prefix='reasoning-batch')
+                old_pool.shutdown(wait=False)
+                router.concurrency = ctl.concurrency
+                log("batch_resized", max_size=ctl.concurrency)
 
-            # BLPOP returns (key, value) tuple
-            # Timeout 5 seconds to allow for heartbeat/logging if needed
-            item = r.blpop(QUEUE_KEY, timeout=5)
+            # BLPOP returns (key, value) tuple; warm-model lanes are listed before the shared queue.
+            # Timeout 5 seconds to allow for heartbeat/logging if needed (1s with affinity so idle workers steal sooner)
+            item = r.blpop(router.pop_keys(), timeout=1 if router.enabled else 5)
+            if not item:
+                # Idle: take work from another model's lane rather than sit idle
+                item = router.steal(r)
             if item:
-                _, job_json = item
-                process_job(r, job_json)
-            else:
-                # Idle heartbeat could go here
-                pass
+                source, job_json = item
+                dispatch_popped(r, source, job_json, router, batch_pool, batch_max=router.concurrency)
+
+            # dispatch_popped returns once its jobs are done, so nothing is in flight here
+            reason = recycler.reason()
+            if reason:
+                log("worker_recycling", reason=reason, **recycler.snapshot())
+                profiling.PROFILER.stop()
+                router.unregister(r)
+                if batch_pool is not None:
+                    batch_pool.shutdown(wait=True)
+                return recycling.RECYCLE_EXIT_CODE
         except KeyboardInterrupt:
             log("worker_stopping")
+            profiling.PROFILER.stop()
+            router.unregister(r)
             break
         except Exception as e:
             log("worker_loop_error", error=str(e))
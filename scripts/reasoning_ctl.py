@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Reconfigure running reasoning workers live (see reasoning/control.py).
+
+Usage:
+  python3 scripts/reasoning_ctl.py status
+  python3 scripts/reasoning_ctl.py pause | resume
+  python3 scripts/reasoning_ctl.py concurrency 16
+  python3 scripts/reasoning_ctl.py timeout 45
+  python3 scripts/reasoning_ctl.py log-sample 0.1
+  python3 scripts/reasoning_ctl.py flush-caches [circuit hedge search_memo]
+  options: --worker host:pid (repeatable; default all workers), --wait 3 (seconds), --json
+
+The command is published on `savant:control`, and the acks of every
+worker that received it are printed. Settings last until a worker
+restarts.
+
+Env:
+  - REDIS_URL (default redis://localhost:6379/0)
+"""
+
+import argparse
+import json
+import os
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+os.environ.setdefault('REASONING_QUEUE_WORKER', '0')
+
+try:
+    import redis  # type: ignore
+    from reasoning import control
+except Exception as e:  # pragma: no cover
+    print(f"reasoning deps not installed ({e}). Run: make reasoning-setup", file=sys.stderr)
+    sys.exit(2)
+
+
+def _summary(ack):
+    if not ack.get('ok'):
+        return f"error: {ack.get('error')}"
+    result = ack.get('result') or {}
+    if ack.get('cmd') != 'status':
+        return ' '.join(f"{k}={v}" for k, v in result.items())
+    process = result.get('process') or {}
+    open_breakers = [name for name, b in (result.get('breakers') or {}).items() if b.get('state') != 'closed']
+    return (f"{result.get('mode')} paused={result.get('paused')} concurrency={result.get('concurrency')} "
+            f"timeout={result.get('timeout_s')}s log_sample={result.get('log_sample')} jobs={process.get('jobs')} "
+            f"rss={process.get('rss_mb')}MB age={process.get('age_s')}s"
+            + (f" in_flight={result['in_flight']}" if 'in_flight' in result else '')
+            + (f" queue={result['queue_depth']}" if 'queue_depth' in result else '')
+            + (f" profiling={result['profiling']}" if result.get('profiling') else '')
+            + (f" open_breakers={','.join(open_breakers)}" if open_breakers else ''))
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description='Reasoning worker control plane')
+    ap.add_argument('--redis-url', default=os.environ.get('REDIS_URL', 'redis://localhost:6379/0'))
+    ap.add_argument('--worker', action='append', help='host:pid (repeatable; default: all workers)')
+    ap.add_argument('--wait', type=float, default=3.0, help='seconds to wait for acks (default 3)')
+    ap.add_argument('--json', action='store_true')
+    ap.add_argument('cmd', choices=[c.replace('_', '-') for c in control.COMMANDS])
+    ap.add_argument('values', nargs='*', help='value for concurrency/timeout/log-sample; cache names for flush-caches')
+    args = ap.parse_args()
+
+    cmd = args.cmd.replace('-', '_')
+    cmd_args = {}
+    try:
+        if cmd in ('concurrency', 'timeout', 'log_sample'):
+            if len(args.values) != 1:
+                ap.error(f"{args.cmd} takes exactly one value")
+            cmd_args['value'] = int(args.values[0]) if cmd == 'concurrency' else float(args.values[0])
+        elif cmd == 'flush_caches' and args.values:
+            cmd_args['names'] = args.values
+    except ValueError as e:
+        ap.error(str(e))
+
+    try:
+        r = redis.Redis.from_url(args.redis_url, decode_responses=True, socket_timeout=max(5, args.wait + 2),
+                                 socket_connect_timeout=2)
+        r.ping()
+    except Exception as e:
+        print(f"Redis not reachable: {e}", file=sys.stderr)
+        return 2
+
+    msg = control.command(cmd, cmd_args, target=args.worker or '*')
+    receivers = r.publish(control.CHANNEL, json.dumps(msg))
+    expected = min(receivers, len(args.worker)) if args.worker else receivers
+    acks = control.collect_acks(r, msg['id'], expected, timeout_s=args.wait) if expected else []
+    acks.sort(key=lambda a: a.get('worker_id') or '')
+    if args.json:
+        print(json.dumps({'command': msg, 'receivers': receivers, 'acks': acks}, indent=2))
+    else:
+        # Every subscribed worker receives the message; only targeted ones ack.
+        print(f"{cmd} {msg['id']}: {len(acks)} ack(s), {receivers} subscriber(s)")
+        for ack in acks:
+            print(f"  {ack.get('worker_id', ''):<32} {'ok ' if ack.get('ok') else 'ERR'} {_summary(ack)}")
+    return 0 if acks and all(a.get('ok') for a in acks) else 1
+
+
+if __name__ == '__main__':  # pragma: no cover
+    raise SystemExit(main())
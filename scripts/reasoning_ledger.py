@@ -0,0 +1,259 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Query the reasoning job ledger (see reasoning/ledger.py).
+
+Usage:
+  python3 scripts/reasoning_ledger.py tail [-n 20] [--model ollama:phi3.5:latest] [--errors]
+  python3 scripts/reasoning_ledger.py rollup [--since 60] [--by minute|hour|day] [--model ollama:phi3.5:latest]
+  python3 scripts/reasoning_ledger.py models [--since 1440]
+  python3 scripts/reasoning_ledger.py personas [--since 1440]
+  python3 scripts/reasoning_ledger.py sessions [-n 2000] [--top 20]
+  python3 scripts/reasoning_ledger.py workers [-n 2000]
+  add --json to any command for machine-readable output
+
+`--since` is in minutes. `rollup` prints count, rate, p50/p95 end-to-end
+latency (estimated from histograms) and the error rate per time bucket.
+`models` compares every provider:model seen in the window, e.g. before and
+after a model change. `personas` does the same per persona, with mean
+estimated prompt tokens first, to spot bloated persona prompts. `sessions` ranks
+the sessions in the last `-n` ledger entries by their largest prompt.
+`workers` shows the memory of each worker process in those entries: the
+last RSS, the high-water mark, and the job with the largest RSS growth.
+
+Env:
+  - REDIS_URL (default redis://localhost:6379/0)
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+
+try:
+    import redis  # type: ignore
+    from reasoning import ledger
+except Exception as e:  # pragma: no cover
+    print(f"reasoning deps not installed ({e}). Run: make reasoning-setup", file=sys.stderr)
+    sys.exit(2)
+
+BUCKET_S = {'minute': 60, 'hour': 3600, 'day': 86400}
+
+
+def _fmt_ms(v):
+    return '-' if v is None else f"{v:.0f}"
+
+
+def _fmt_pct(v):
+    return '-' if v is None else f"{v * 100:.1f}%"
+
+
+def cmd_tail(r, args):
+    rows = []
+    cursor = '+'
+    # Filters apply client-side, so page back through the stream until enough rows match.
+    while len(rows) < args.n:
+        page = ledger.read_entries(r, count=max(args.n * 4, 100), start=cursor)
+        if not page:
+            break
+        for doc in page:
+            if args.model and f"{doc.get('provider')}:{doc.get('model')}" != args.model:
+                continue
+            if args.errors and doc.get('status') == 'ok':
+                continue
+            rows.append(doc)
+            if len(rows) >= args.n:
+                break
+        cursor = '(' + page[-1]['id']
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+    print(f"{'FINISHED':<20} {'JOB':<38} {'STATUS':<6} {'MODEL':<30} {'QUEUE':>7} {'RUN':>7} {'BYTES':>8} {'PTOK':>6}")
+    for doc in rows:
+        finished = datetime.fromtimestamp(float(doc.get('finished_at') or 0)).strftime('%Y-%m-%d %H:%M:%S')
+        queue_ms = float(doc['queue_ms']) if doc.get('queue_ms') else None
+        print(f"{finished:<20} {doc.get('job_id', '')[:38]:<38} {doc.get('status', ''):<6} "
+              f"{(doc.get('provider', '') + ':' + doc.get('model', ''))[:30]:<30} "
+              f"{_fmt_ms(queue_ms):>7} {_fmt_ms(float(doc.get('run_ms') or 0)):>7} {doc.get('payload_bytes', ''):>8} "
+              f"{doc.get('prompt_tokens') or doc.get('prompt_tokens_est') or '-':>6}"
+              + (f"  {doc['error'][:60]}" if doc.get('error') else ''))
+    return 0
+
+
+def cmd_rollup(r, args):
+    end = time.time()
+    rollups = ledger.read_rollups(r, end - args.since * 60, end)
+    step = BUCKET_S[args.by]
+    scope = args.model or 'all'
+    buckets = {}
+    for rollup in rollups:
+        buckets.setdefault(int(rollup['ts'] // step) * step, []).append(rollup)
+    rows = []
+    for ts in sorted(buckets):
+        row = ledger.summarize(ledger.merge(buckets[ts], scope), step / 60.0)
+        if row['count']:
+            row['ts'] = ts
+            rows.append(row)
+    total = ledger.summarize(ledger.merge(rollups, scope), args.since)
+    if args.json:
+        print(json.dumps({'scope': scope, 'by': args.by, 'rows': rows, 'total': total}, indent=2))
+        return 0
+    fmt = '%Y-%m-%d %H:%M' if step < 86400 else '%Y-%m-%d'
+    print(f"scope={scope} by={args.by} since={args.since}m")
+    print(f"{'BUCKET':<17} {'COUNT':>6} {'/MIN':>7} {'P50':>7} {'P95':>7} {'ERR':>7}")
+    for row in rows:
+        print(f"{datetime.fromtimestamp(row['ts']).strftime(fmt):<17} {row['count']:>6} {row['per_min']:>7} "
+              f"{_fmt_ms(row['p50_ms']):>7} {_fmt_ms(row['p95_ms']):>7} {_fmt_pct(row['error_rate']):>7}")
+    print(f"{'total':<17} {total['count']:>6} {total['per_min']:>7} "
+          f"{_fmt_ms(total['p50_ms']):>7} {_fmt_ms(total['p95_ms']):>7} {_fmt_pct(total['error_rate']):>7}")
+    return 0
+
+
+def cmd_models(r, args):
+    end = time.time()
+    rollups = ledger.read_rollups(r, end - args.since * 60, end)
+    rows = []
+    for scope in ledger.scopes(rollups):
+        if scope == 'all' or scope.startswith(ledger.PERSONA_SCOPE):
+            continue
+        row = ledger.summarize(ledger.merge(rollups, scope), args.since)
+        row['model'] = scope
+        rows.append(row)
+    rows.sort(key=lambda row: -row['count'])
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+    print(f"{'MODEL':<36} {'COUNT':>6} {'P50':>7} {'P95':>7} {'RUN':>7} {'ERR':>7} {'BYTES':>8}")
+    for row in rows:
+        print(f"{row['model'][:36]:<36} {row['count']:>6} {_fmt_ms(row['p50_ms']):>7} {_fmt_ms(row['p95_ms']):>7} "
+              f"{_fmt_ms(row['mean_run_ms']):>7} {_fmt_pct(row['error_rate']):>7} {row['mean_payload_bytes']:>8}")
+    return 0
+
+
+def cmd_personas(r, args):
+    end = time.time()
+    rollups = ledger.read_rollups(r, end - args.since * 60, end)
+    rows = []
+    for scope in ledger.scopes(rollups):
+        if not scope.startswith(ledger.PERSONA_SCOPE):
+            continue
+        row = ledger.summarize(ledger.merge(rollups, scope), args.since)
+        row['persona'] = scope[len(ledger.PERSONA_SCOPE):]
+        rows.append(row)
+    rows.sort(key=lambda row: -(row['mean_prompt_tokens_est'] or 0))
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+    print(f"{'PERSONA':<30} {'COUNT':>6} {'PTOK~':>7} {'PTOK':>7} {'CTOK':>6} {'P50':>7} {'P95':>7}")
+    for row in rows:
+        print(f"{row['persona'][:30]:<30} {row['count']:>6} {_fmt_ms(row['mean_prompt_tokens_est']):>7} "
+              f"{_fmt_ms(row['mean_prompt_tokens']):>7} {_fmt_ms(row['mean_completion_tokens']):>6} "
+              f"{_fmt_ms(row['p50_ms']):>7} {_fmt_ms(row['p95_ms']):>7}")
+    return 0
+
+
+def cmd_sessions(r, args):
+    sessions = {}
+    for doc in ledger.read_entries(r, count=args.n):
+        sid = doc.get('session_id')
+        est = doc.get('prompt_tokens_est')
+        if not sid or not est:
+            continue
+        row = sessions.setdefault(sid, {'session_id': sid, 'persona': doc.get('persona') or '', 'jobs': 0,
+                                        'max_prompt_tokens_est': 0, 'total_prompt_tokens_est': 0})
+        row['jobs'] += 1
+        row['max_prompt_tokens_est'] = max(row['max_prompt_tokens_est'], int(est))
+        row['total_prompt_tokens_est'] += int(est)
+    rows = sorted(sessions.values(), key=lambda row: -row['max_prompt_tokens_est'])[:args.top]
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+    print(f"{'SESSION':<38} {'PERSONA':<20} {'JOBS':>5} {'MAX PTOK~':>10} {'SUM PTOK~':>10}")
+    for row in rows:
+        print(f"{row['session_id'][:38]:<38} {row['persona'][:20]:<20} {row['jobs']:>5} "
+              f"{row['max_prompt_tokens_est']:>10} {row['total_prompt_tokens_est']:>10}")
+    return 0
+
+
+def cmd_workers(r, args):
+    workers = {}
+    for doc in ledger.read_entries(r, count=args.n):  # newest first
+        if not doc.get('rss_mb'):
+            continue
+        row = workers.get(doc.get('worker'))
+        if row is None:
+            row = workers[doc.get('worker')] = {'worker': doc.get('worker') or '', 'jobs': 0, 'rss_mb': float(doc['rss_mb']),
+                                                'rss_hwm_mb': 0.0, 'max_delta_mb': 0.0, 'max_delta_job': ''}
+        row['jobs'] += 1
+        row['rss_hwm_mb'] = max(row['rss_hwm_mb'], float(doc.get('rss_hwm_mb') or 0))
+        delta = float(doc.get('rss_delta_mb') or 0)
+        if delta > row['max_delta_mb']:
+            row['max_delta_mb'] = delta
+            row['max_delta_job'] = doc.get('job_id') or ''
+    rows = sorted(workers.values(), key=lambda row: -row['rss_hwm_mb'])
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+    print(f"{'WORKER':<32} {'JOBS':>5} {'RSS MB':>8} {'HWM MB':>8} {'MAX +MB':>8}  JOB")
+    for row in rows:
+        print(f"{row['worker'][:32]:<32} {row['jobs']:>5} {row['rss_mb']:>8.1f} {row['rss_hwm_mb']:>8.1f} "
+              f"{row['max_delta_mb']:>8.1f}  {row['max_delta_job'][:38]}")
+    return 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description='Reasoning job ledger')
+    ap.add_argument('--redis-url', default=os.environ.get('REDIS_URL', 'redis://localhost:6379/0'))
+    ap.add_argument('--json', action='store_true')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+
+    t = sub.add_parser('tail', help='most recent jobs')
+    t.add_argument('--json', action='store_true', default=argparse.SUPPRESS)
+    t.add_argument('-n', type=int, default=20)
+    t.add_argument('--model', help='provider:model')
+    t.add_argument('--errors', action='store_true', help='only failed jobs')
+
+    ru = sub.add_parser('rollup', help='per-bucket throughput, latency and errors')
+    ru.add_argument('--json', action='store_true', default=argparse.SUPPRESS)
+    ru.add_argument('--since', type=float, default=60, help='minutes (default 60)')
+    ru.add_argument('--by', choices=sorted(BUCKET_S), default='minute')
+    ru.add_argument('--model', help='provider:model (default: all jobs)')
+
+    m = sub.add_parser('models', help='compare models over a window')
+    m.add_argument('--json', action='store_true', default=argparse.SUPPRESS)
+    m.add_argument('--since', type=float, default=1440, help='minutes (default 1440)')
+
+    p = sub.add_parser('personas', help='prompt size and latency per persona')
+    p.add_argument('--json', action='store_true', default=argparse.SUPPRESS)
+    p.add_argument('--since', type=float, default=1440, help='minutes (default 1440)')
+
+    se = sub.add_parser('sessions', help='sessions with the largest prompts')
+    se.add_argument('--json', action='store_true', default=argparse.SUPPRESS)
+    se.add_argument('-n', type=int, default=2000, help='ledger entries to scan (default 2000)')
+    se.add_argument('--top', type=int, default=20)
+
+    w = sub.add_parser('workers', help='memory per worker process')
+    w.add_argument('--json', action='store_true', default=argparse.SUPPRESS)
+    w.add_argument('-n', type=int, default=2000, help='ledger entries to scan (default 2000)')
+
+    args = ap.parse_args()
+    try:
+        r = redis.Redis.from_url(args.redis_url, decode_responses=True, socket_timeout=5, socket_connect_timeout=2)
+        r.ping()
+    except Exception as e:
+        print(f"Redis not reachable: {e}", file=sys.stderr)
+        return 2
+
+    handlers = {'tail': cmd_tail, 'rollup': cmd_rollup, 'models': cmd_models,
+                'personas': cmd_personas, 'sessions': cmd_sessions, 'workers': cmd_workers}
+    return handlers[args.cmd](r, args)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    raise SystemExit(main())
@@ -0,0 +1,544 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+End-to-end load harness for the Redis reasoning worker.
+
+Starts (or reuses) Redis, a fake Ollama/Google HTTP server, and N
+`reasoning.worker` processes, then drives jobs onto `savant:queue:reasoning`
+at the scenario's target rate and reports throughput, queue-wait and
+end-to-end latency percentiles, and error rates.
+
+Usage:
+  python3 scripts/reasoning_load_test.py scripts/load_scenarios/chat.json
+  python3 scripts/reasoning_load_test.py scripts/load_scenarios/council_burst.json --workers 4 --json
+
+Redis selection (first match wins):
+  - --redis-url / REDIS_URL_LOADTEST: use an existing server (the queue is NOT flushed)
+  - `redis-server` on PATH: spawn a throwaway instance on a free port
+  - fakeredis TcpFakeServer: in-process fallback (pip install fakeredis)
+
+Scenario file (JSON):
+  {
+    "name": "chat",
+    "duration_s": 20, "rate_per_s": 4, "workers": 2, "worker_mode": "sync",
+    "arrival": "poisson" | "uniform" | {"burst": 5, "interval_s": 2.0},
+    "llm": {"provider": "ollama", "model": "phi3.5:latest"},
+    "fake_llm": {
+      "latency_ms": {"dist": "lognormal", "p50": 400, "p99": 2500},
+      "error_rate": 0.0, "rate_limit_rate": 0.0,
+      "responses": [{"weight": 1, "text": "ACTION: finish\\nRESULT: ok\\nREASONING: done"}]
+    },
+    "payload": {"goal_text": "...", "history_len": 0, "history_output_chars": 400}
+  }
+
+Latency distributions: fixed {"ms"}, uniform {"min","max"},
+normal {"mean","std"}, lognormal {"p50","p99"}.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+try:
+    import redis  # type: ignore
+except Exception:  # pragma: no cover
+    print("redis not installed. Run: make reasoning-setup", file=sys.stderr)
+    sys.exit(2)
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+QUEUE_KEY = 'savant:queue:reasoning'
+
+
+# ---------------------
+# Latency distributions
+# ---------------------
+
+def sample_latency_ms(spec, rng: random.Random) -> float:
+    """Draw one latency sample (ms) from a distribution spec."""
+    if spec is None:
+        return 0.0
+    if isinstance(spec, (int, float)):
+        return float(spec)
+    dist = (spec.get('dist') or 'fixed').lower()
+    if dist == 'fixed':
+        val = float(spec.get('ms', 0))
+    elif dist == 'uniform':
+        val = rng.uniform(float(spec.get('min', 0)), float(spec.get('max', 0)))
+    elif dist == 'normal':
+        val = rng.gauss(float(spec.get('mean', 0)), float(spec.get('std', 0)))
+    elif dist == 'lognormal':
+        p50 = max(float(spec.get('p50', 1)), 0.001)
+        p99 = max(float(spec.get('p99', p50)), p50)
+        mu = math.log(p50)
+        sigma = (math.log(p99) - mu) / 2.326
+        val = rng.lognormvariate(mu, sigma)
+    else:
+        raise ValueError(f"unknown latency dist: {dist}")
+    cap = spec.get('max_ms')
+    if cap is not None:
+        val = min(val, float(cap))
+    return max(val, 0.0)
+
+
+def percentile(values, pct: float):
+    """Nearest-rank percentile; None for an empty sample."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(math.ceil(pct / 100.0 * len(ordered))) - 1))
+    return ordered[k]
+
+
+# ---------------------
+# Fake LLM server
+# ---------------------
+
+class FakeLLM:
+    """Response/latency model shared by all fake server request threads."""
+
+    def __init__(self, spec, seed=None):
+        self.spec = spec or {}
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+        responses = self.spec.get('responses') or [
+            {'weight': 1, 'text': 'ACTION: finish\nRESULT: done\nREASONING: fake llm'}
+        ]
+        self.responses = [(float(r.get('weight', 1)), r.get('text', '')) for r in responses]
+        self.total_weight = sum(w for w, _ in self.responses) or 1.0
+
+    def draw(self):
+        """Return (latency_ms, outcome, text) where outcome is ok|error|rate_limited."""
+        with self.lock:
+            self.requests += 1
+            latency = sample_latency_ms(self.spec.get('latency_ms'), self.rng)
+            roll = self.rng.random()
+            if roll < float(self.spec.get('rate_limit_rate', 0.0)):
+                return latency, 'rate_limited', ''
+            if roll < float(self.spec.get('rate_limit_rate', 0.0)) + float(self.spec.get('error_rate', 0.0)):
+                return latency, 'error', ''
+            pick = self.rng.random() * self.total_weight
+            for weight, text in self.responses:
+                pick -= weight
+                if pick <= 0:
+                    return latency, 'ok', text
+            return latency, 'ok', self.responses[-1][1]
+
+
+def make_handler(fake: FakeLLM):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def log_message(self, *_args):  # silence default stderr logging
+            pass
+
+        def _send(self, code, body, content_type='application/json', headers=None):
+            data = body if isinstance(body, bytes) else body.encode('utf-8')
+            self.send_response(code)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            for k, v in (headers or {}).items():
+                self.send_header(k, v)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self):
+            if self.path.startswith('/api/tags'):
+                self._send(200, json.dumps({'models': [{'name': 'phi3.5:latest'}]}))
+            else:
+                self._send(404, json.dumps({'error': 'not found'}))
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length') or 0)
+            raw = self.rfile.read(length) if length else b''
+            try:
+                body = json.loads(raw or b'{}')
+            except Exception:
+                body = {}
+            latency_ms, outcome, text = fake.draw()
+            time.sleep(latency_ms / 1000.0)
+
+            if outcome == 'rate_limited':
+                self._send(429, json.dumps({'error': {'code': 429, 'status': 'RESOURCE_EXHAUSTED'}}),
+                           headers={'Retry-After': '1'})
+                return
+            if outcome == 'error':
+                self._send(500, json.dumps({'error': 'fake llm failure'}))
+                return
+
+            if ':generateContent' in self.path:
+                self._send(200, json.dumps({
+                    'candidates': [{'content': {'parts': [{'text': text}]}}],
+                    'usageMetadata': {'promptTokenCount': len(raw) // 4, 'candidatesTokenCount': len(text) // 4},
+                }))
+            elif self.path.startswith('/api/generate') or self.path.startswith('/api/chat'):
+                model = body.get('model') or 'phi3.5:latest'
+                is_chat = self.path.startswith('/api/chat')
+                chunk = {'message': {'role': 'assistant', 'content': text}} if is_chat else {'response': text}
+                final = {'model': model, 'done': True, 'prompt_eval_count': len(raw) // 4, 'eval_count': len(text) // 4}
+                if body.get('stream') is False:
+                    final.update(chunk)
+                    self._send(200, json.dumps(final))
+                else:
+                    first = dict(chunk, model=model, done=False)
+                    empty = {'message': {'role': 'assistant', 'content': ''}} if is_chat else {'response': ''}
+                    final.update(empty)
+                    self._send(200, json.dumps(first) + "\n" + json.dumps(final) + "\n", content_type='application/x-ndjson')
+            else:
+                self._send(404, json.dumps({'error': 'not found'}))
+
+    return Handler
+
+
+def start_fake_llm(spec, seed=None):
+    fake = FakeLLM(spec, seed=seed)
+    server = ThreadingHTTPServer(('127.0.0.1', 0), make_handler(fake))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, fake
+
+
+# ---------------------
+# Redis + workers
+# ---------------------
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_redis(explicit_url=None):
+    """Return (url, stop_fn, kind)."""
+    if explicit_url:
+        return explicit_url, (lambda: None), 'external'
+
+    port = free_port()
+    binary = shutil.which('redis-server')
+    if binary:
+        proc = subprocess.Popen([binary, '--port', str(port), '--save', '', '--appendonly', 'no'],
+                                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        url = f"redis://127.0.0.1:{port}/0"
+        _wait_redis(url)
+        return url, proc.terminate, 'redis-server'
+
+    try:
+        from fakeredis import TcpFakeServer  # type: ignore
+    except Exception:
+        raise RuntimeError('No Redis available: pass --redis-url, install redis-server, or pip install fakeredis')
+    server = TcpFakeServer(('127.0.0.1', port), server_type='redis')
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"redis://127.0.0.1:{port}/0"
+    _wait_redis(url)
+    return url, server.shutdown, 'fakeredis'
+
+
+def _wait_redis(url, timeout=10.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            redis.Redis.from_url(url).ping()
+            return
+        except Exception:
+            time.sleep(0.1)
+    raise RuntimeError(f"Redis at {url} did not come up")
+
+
+WORKER_MODULES = {'sync': 'reasoning.worker', 'async': 'reasoning.async_worker'}
+
+
+def start_workers(count, redis_url, llm_url, log_path=None, extra_env=None, mode='sync'):
+    env = dict(os.environ)
+    env.update({
+        'REDIS_URL': redis_url,
+        'OLLAMA_BASE_URL': llm_url,
+        'GOOGLE_API_BASE_URL': llm_url,
+        'PYTHONPATH': ROOT_DIR + os.pathsep + env.get('PYTHONPATH', ''),
+    })
+    env.update(extra_env or {})
+    out = open(log_path, 'a') if log_path else subprocess.DEVNULL
+    procs = []
+    for _ in range(count):
+        procs.append(subprocess.Popen([sys.executable, '-m', WORKER_MODULES[mode]], cwd=ROOT_DIR, env=env,
+                                      stdout=out, stderr=subprocess.STDOUT))
+    return procs
+
+
+def stop_workers(procs, timeout=5.0):
+    for p in procs:
+        if p.poll() is None:
+            p.terminate()
+    deadline = time.time() + timeout
+    for p in procs:
+        try:
+            p.wait(timeout=max(0.1, deadline - time.time()))
+        except subprocess.TimeoutExpired:
+            p.kill()
+
+
+def wait_workers_ready(r, count, timeout=30.0) -> int:
+    """Wait until `count` worker heartbeats exist; return the number seen."""
+    deadline = time.time() + timeout
+    seen = 0
+    while time.time() < deadline:
+        seen = len(list(r.scan_iter(match='savant:workers:heartbeat:*', count=1000)))
+        if seen >= count:
+            break
+        time.sleep(0.2)
+    return seen
+
+
+# ---------------------
+# Scenario + driver
+# ---------------------
+
+def build_history(length: int, output_chars: int, goal: str):
+    items = []
+    for i in range(length):
+        items.append({
+            'action': {'action': 'tool', 'tool_name': 'context.fts_search', 'args': {'query': f"{goal} part {i}"}},
+            'output': {'content': [{'type': 'text', 'text': ('lorem ipsum ' * (output_chars // 12 + 1))[:output_chars]}]},
+        })
+    return items
+
+
+def build_payload(scenario, seq: int, rng: random.Random):
+    spec = scenario.get('payload') or {}
+    goals = spec.get('goals') or [spec.get('goal_text') or 'find where the agent runtime is defined']
+    goal = goals[seq % len(goals)]
+    personas = spec.get('personas') or ['savant-engineer']
+    persona_name = personas[seq % len(personas)]
+    prompt_md = spec.get('persona_prompt_md') or f"You are {persona_name}."
+    history_len = int(spec.get('history_len', 0))
+    jitter = int(spec.get('history_len_jitter', 0))
+    if jitter:
+        history_len = max(0, history_len + rng.randint(-jitter, jitter))
+    payload = {
+        'session_id': f"load-{seq}",
+        'persona': {'name': persona_name, 'prompt_md': prompt_md},
+        'goal_text': goal,
+        'history': build_history(history_len, int(spec.get('history_output_chars', 400)), goal),
+        'llm': scenario.get('llm') or {'provider': 'ollama', 'model': 'phi3.5:latest'},
+        'max_steps': spec.get('max_steps', 4),
+        'correlation_id': f"load-{seq}",
+    }
+    if 'tools_available' in spec:
+        payload['tools_available'] = spec['tools_available']
+    return payload
+
+
+def arrival_schedule(scenario, rng: random.Random):
+    """Yield offsets (seconds from start) at which to enqueue one job."""
+    duration = float(scenario.get('duration_s', 10))
+    rate = float(scenario.get('rate_per_s', 1))
+    arrival = scenario.get('arrival', 'poisson')
+    t = 0.0
+    if isinstance(arrival, dict) and 'burst' in arrival:
+        size = int(arrival['burst'])
+        interval = float(arrival.get('interval_s', 1.0))
+        while t < duration:
+            for _ in range(size):
+                yield t
+            t += interval
+        return
+    if rate <= 0:
+        return
+    while True:
+        t += rng.expovariate(rate) if arrival == 'poisson' else 1.0 / rate
+        if t >= duration:
+            return
+        yield t
+
+
+class Collector:
+    """Polls result keys for outstanding jobs and records timings."""
+
+    def __init__(self, r, poll_s=0.02):
+        self.r = r
+        self.poll_s = poll_s
+        self.pending = {}
+        self.records = []
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def add(self, job_id, enqueued_at):
+        with self.lock:
+            self.pending[job_id] = enqueued_at
+
+    def outstanding(self) -> int:
+        with self.lock:
+            return len(self.pending)
+
+    def _run(self):
+        while not self.stop.is_set():
+            with self.lock:
+                ids = list(self.pending.keys())
+            for i in range(0, len(ids), 500):
+                chunk = ids[i:i + 500]
+                values = self.r.mget([f"savant:result:{j}" for j in chunk])
+                now = time.time()
+                for job_id, raw in zip(chunk, values):
+                    if raw is None:
+                        continue
+                    try:
+                        res = json.loads(raw)
+                    except Exception:
+                        res = {'status': 'error', 'error': 'unparseable result'}
+                    with self.lock:
+                        enq = self.pending.pop(job_id, None)
+                    if enq is None:
+                        continue
+                    started = res.get('started_at')
+                    finished = res.get('finished_at') or now
+                    self.records.append({
+                        'job_id': job_id,
+                        'status': res.get('status'),
+                        'llm_error': str(res.get('reasoning') or '').startswith('LLM error'),
+                        'queue_wait_ms': (started - enq) * 1000.0 if started else None,
+                        'e2e_ms': (finished - enq) * 1000.0,
+                        'finished_at': finished,
+                    })
+            time.sleep(self.poll_s)
+
+
+def run_scenario(r, scenario, seed=None, drain_timeout=60.0):
+    rng = random.Random(seed)
+    collector = Collector(r)
+    collector.thread.start()
+    run_id = uuid.uuid4().hex[:8]
+    started = time.time()
+    submitted = 0
+    for seq, offset in enumerate(arrival_schedule(scenario, rng)):
+        delay = started + offset - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        job_id = f"load-{run_id}-{seq}"
+        enqueued_at = time.time()
+        job = {
+            'job_id': job_id,
+            'payload': build_payload(scenario, seq, rng),
+            'created_at': datetime.fromtimestamp(enqueued_at, tz=timezone.utc).isoformat(),
+            'enqueued_at': enqueued_at,
+        }
+        collector.add(job_id, enqueued_at)
+        r.rpush(QUEUE_KEY, json.dumps(job))
+        submitted += 1
+    enqueue_done = time.time()
+
+    deadline = time.time() + drain_timeout
+    while collector.outstanding() and time.time() < deadline:
+        time.sleep(0.05)
+    collector.stop.set()
+    collector.thread.join(timeout=2)
+    return summarize(scenario, collector.records, submitted, collector.outstanding(), started, enqueue_done)
+
+
+def summarize(scenario, records, submitted, timed_out, started, enqueue_done):
+    done = [rec for rec in records if rec['status'] == 'ok']
+    failed = [rec for rec in records if rec['status'] != 'ok']
+    waits = [rec['queue_wait_ms'] for rec in records if rec['queue_wait_ms'] is not None]
+    e2e = [rec['e2e_ms'] for rec in records]
+    last = max([rec['finished_at'] for rec in records], default=enqueue_done)
+    elapsed = max(last - started, 1e-9)
+
+    def pcts(vals):
+        return {f"p{p}": (round(percentile(vals, p), 1) if vals else None) for p in (50, 95, 99)}
+
+    return {
+        'scenario': scenario.get('name') or 'unnamed',
+        'submitted': submitted,
+        'completed': len(done),
+        'failed': len(failed),
+        'timed_out': timed_out,
+        'llm_errors': sum(1 for rec in records if rec['llm_error']),
+        'offered_rate_per_s': round(submitted / max(enqueue_done - started, 1e-9), 2),
+        'throughput_per_s': round(len(records) / elapsed, 2),
+        'error_rate': round((len(failed) + timed_out) / submitted, 4) if submitted else 0.0,
+        'queue_wait_ms': pcts(waits),
+        'e2e_ms': pcts(e2e),
+        'elapsed_s': round(elapsed, 2),
+    }
+
+
+def print_report(report, fake=None, workers=None, redis_kind=None):
+    print(f"Reasoning load test: {report['scenario']} (workers={workers}, redis={redis_kind})")
+    print(f"- submitted: {report['submitted']} at {report['offered_rate_per_s']}/s")
+    print(f"- completed: {report['completed']}  failed: {report['failed']}  timed out: {report['timed_out']}")
+    print(f"- llm errors (surfaced as finish=false): {report['llm_errors']}")
+    print(f"- throughput: {report['throughput_per_s']}/s over {report['elapsed_s']}s")
+    print(f"- error rate: {report['error_rate'] * 100:.2f}%")
+    for label in ('queue_wait_ms', 'e2e_ms'):
+        p = report[label]
+        print(f"- {label}: p50={p['p50']} p95={p['p95']} p99={p['p99']}")
+    if fake is not None:
+        print(f"- fake llm requests: {fake.requests}")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description='Load test the reasoning worker with a fake LLM')
+    ap.add_argument('scenario', help='scenario JSON file')
+    ap.add_argument('--workers', type=int, help='override scenario worker count')
+    ap.add_argument('--worker-mode', choices=sorted(WORKER_MODULES), help='sync (default) or async worker processes')
+    ap.add_argument('--rate', type=float, help='override scenario rate_per_s')
+    ap.add_argument('--duration', type=float, help='override scenario duration_s')
+    ap.add_argument('--redis-url', default=os.environ.get('REDIS_URL_LOADTEST'))
+    ap.add_argument('--seed', type=int)
+    ap.add_argument('--drain-timeout', type=float, default=60.0)
+    ap.add_argument('--worker-log', help='append worker stdout/stderr to this file')
+    ap.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = ap.parse_args()
+
+    with open(args.scenario, 'r', encoding='utf-8') as f:
+        scenario = json.load(f)
+    if args.rate is not None:
+        scenario['rate_per_s'] = args.rate
+    if args.duration is not None:
+        scenario['duration_s'] = args.duration
+    workers = int(args.workers or scenario.get('workers', 2))
+    worker_mode = args.worker_mode or scenario.get('worker_mode', 'sync')
+
+    try:
+        redis_url, stop_redis, redis_kind = start_redis(args.redis_url)
+    except Exception as e:
+        print(str(e), file=sys.stderr)
+        return 2
+
+    server, fake = start_fake_llm(scenario.get('fake_llm'), seed=args.seed)
+    llm_url = f"http://127.0.0.1:{server.server_address[1]}"
+    procs = start_workers(workers, redis_url, llm_url, log_path=args.worker_log, extra_env=scenario.get('worker_env'), mode=worker_mode)
+    try:
+        r = redis.Redis.from_url(redis_url, decode_responses=True)
+        ready = wait_workers_ready(r, workers)
+        if ready < workers:
+            print(f"only {ready}/{workers} workers reported a heartbeat", file=sys.stderr)
+        report = run_scenario(r, scenario, seed=args.seed, drain_timeout=args.drain_timeout)
+        report['workers'] = workers
+        report['worker_mode'] = worker_mode
+        report['fake_llm_requests'] = fake.requests
+    finally:
+        stop_workers(procs)
+        server.shutdown()
+        stop_redis()
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report, fake=fake, workers=workers, redis_kind=redis_kind)
+    return 0 if report['timed_out'] == 0 else 1
+
+
+if __name__ == '__main__':  # pragma: no cover
+    raise SystemExit(main())
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Query the segmented reasoning log store (see reasoning/logstore.py).
+
+Only the sidecar indexes are scanned; matching gzip blocks are read with a
+direct seek, so looking up one session does not decompress the whole store.
+
+Usage:
+  python3 scripts/reasoning_logs.py --session s-123
+  python3 scripts/reasoning_logs.py --correlation c-9 --event llm_reasoning_error --since 90
+  python3 scripts/reasoning_logs.py --stats
+  python3 scripts/reasoning_logs.py --prune
+
+`--since` / `--until` are minutes ago. Records print as JSON lines.
+
+Env:
+  - REASONING_LOG_DIR (default logs/reasoning)
+  - REASONING_LOG_RETENTION_DAYS / REASONING_LOG_RETENTION_MB (used by --prune)
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+
+from reasoning import logstore  # noqa: E402
+
+
+def stats(directory):
+    segs = logstore.segments(directory)
+    blocks = records = size = 0
+    t0 = t1 = None
+    for path in segs:
+        size += os.path.getsize(path)
+        for entry in logstore._read_index(path):
+            blocks += 1
+            records += entry.get('n', 0)
+            t0 = entry['t0'] if t0 is None else min(t0, entry['t0'])
+            t1 = entry['t1'] if t1 is None else max(t1, entry['t1'])
+    fmt = lambda t: time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(t)) if t else '-'
+    return {'directory': directory, 'segments': len(segs), 'blocks': blocks, 'records': records,
+            'bytes': size, 'oldest': fmt(t0), 'newest': fmt(t1)}
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description='Query reasoning logs')
+    ap.add_argument('--dir', default=os.environ.get('REASONING_LOG_DIR') or os.path.join(ROOT_DIR, 'logs', 'reasoning'))
+    ap.add_argument('--session', help='session_id')
+    ap.add_argument('--correlation', help='correlation_id')
+    ap.add_argument('--event', help='event name, e.g. llm_reasoning_error')
+    ap.add_argument('--since', type=float, help='minutes ago')
+    ap.add_argument('--until', type=float, help='minutes ago')
+    ap.add_argument('--limit', type=int)
+    ap.add_argument('--stats', action='store_true', help='summarize segments and exit')
+    ap.add_argument('--prune', action='store_true', help='apply the retention policy now and exit')
+    args = ap.parse_args()
+
+    if not os.path.isdir(args.dir):
+        print(f"No log store at {args.dir} (set REASONING_LOG_DIR)", file=sys.stderr)
+        return 2
+
+    if args.stats:
+        print(json.dumps(stats(args.dir), indent=2))
+        return 0
+    if args.prune:
+        removed = logstore.apply_retention(
+            args.dir,
+            float(os.environ.get('REASONING_LOG_RETENTION_DAYS', '7')) * 86400.0,
+            int(float(os.environ.get('REASONING_LOG_RETENTION_MB', '2048')) * (1 << 20)),
+            idle_s=float(os.environ.get('REASONING_LOG_SEGMENT_S', '3600')),
+        )
+        for path in removed:
+            print(f"removed {path}")
+        return 0
+
+    now = time.time()
+    try:
+        for doc in logstore.query(
+            args.dir,
+            session_id=args.session,
+            correlation_id=args.correlation,
+            event=args.event,
+            since=now - args.since * 60 if args.since is not None else None,
+            until=now - args.until * 60 if args.until is not None else None,
+            limit=args.limit,
+        ):
+            print(json.dumps(doc, ensure_ascii=False))
+    except BrokenPipeError:  # e.g. piped into head
+        pass
+    return 0
+
+
+if __name__ == '__main__':  # pragma: no cover
+    raise SystemExit(main())
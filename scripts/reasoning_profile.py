@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Profile running reasoning workers on demand (see reasoning/profiling.py).
+
+Usage:
+  python3 scripts/reasoning_profile.py start [--worker host:pid] [--mode sample|cprofile] [--jobs 20] [--seconds 60] [--interval-ms 10]
+  python3 scripts/reasoning_profile.py stop [--worker host:pid]
+  python3 scripts/reasoning_profile.py results [-n 10]
+  add --json to any command for machine-readable output
+
+Without --worker the request goes to every worker (each runs it once).
+Workers pick requests up within a couple of seconds and write their files
+to REASONING_PROFILE_DIR on their own host. `results` lists the finished
+sessions with their file paths and profiled job ids.
+
+Env:
+  - REDIS_URL (default redis://localhost:6379/0)
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+
+try:
+    import redis  # type: ignore
+    from reasoning import profiling
+except Exception as e:  # pragma: no cover
+    print(f"reasoning deps not installed ({e}). Run: make reasoning-setup", file=sys.stderr)
+    sys.exit(2)
+
+
+def _send(r, args, request):
+    key = profiling.worker_key(args.worker) if args.worker else profiling.REQUEST_KEY
+    # The shared key must outlive one poll on every worker; per-worker keys are consumed on read.
+    r.set(key, json.dumps(request), ex=int(max(30, (request.get('seconds') or 0) + 30)))
+    if args.json:
+        print(json.dumps({'key': key, 'request': request}, indent=2))
+    else:
+        print(f"requested {request['mode']} on {args.worker or 'all workers'} (id {request['id']})")
+    return 0
+
+
+def cmd_start(r, args):
+    return _send(r, args, {'id': uuid.uuid4().hex[:12], 'mode': args.mode, 'jobs': args.jobs,
+                           'seconds': args.seconds, 'interval_ms': args.interval_ms, 'requested_at': time.time()})
+
+
+def cmd_stop(r, args):
+    return _send(r, args, {'id': uuid.uuid4().hex[:12], 'mode': 'stop', 'requested_at': time.time()})
+
+
+def cmd_results(r, args):
+    rows = [json.loads(raw) for raw in r.lrange(profiling.RESULTS_KEY, 0, args.n - 1)]
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+    print(f"{'FINISHED':<20} {'WORKER':<28} {'MODE':<8} {'JOBS':>5} {'SKIP':>5}  FILES")
+    for row in rows:
+        finished = datetime.fromtimestamp(float(row.get('finished_at') or 0)).strftime('%Y-%m-%d %H:%M:%S')
+        print(f"{finished:<20} {row.get('worker_id', '')[:28]:<28} {row.get('mode', ''):<8} "
+              f"{len(row.get('job_ids') or []):>5} {len(row.get('skipped_job_ids') or []):>5}  {row.get('files', [''])[0]}")
+    return 0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description='On-demand worker profiling')
+    ap.add_argument('--redis-url', default=os.environ.get('REDIS_URL', 'redis://localhost:6379/0'))
+    ap.add_argument('--json', action='store_true')
+    sub = ap.add_subparsers(dest='cmd', required=True)
+
+    s = sub.add_parser('start', help='profile the next jobs on one or all workers')
+    s.add_argument('--json', action='store_true', default=argparse.SUPPRESS)
+    s.add_argument('--worker', help='host:pid (default: all workers)')
+    s.add_argument('--mode', choices=profiling.MODES, default=profiling.DEFAULT_MODE)
+    s.add_argument('--jobs', type=int, default=profiling.DEFAULT_JOBS, help='stop after this many jobs (0 = no limit)')
+    s.add_argument('--seconds', type=float, default=profiling.DEFAULT_SECONDS, help='stop after this long (0 = no limit)')
+    s.add_argument('--interval-ms', type=float, default=profiling.DEFAULT_INTERVAL_MS, help='sampling interval')
+
+    st = sub.add_parser('stop', help='end running sessions early')
+    st.add_argument('--json', action='store_true', default=argparse.SUPPRESS)
+    st.add_argument('--worker', help='host:pid (default: all workers)')
+
+    re_ = sub.add_parser('results', help='finished sessions and their files')
+    re_.add_argument('--json', action='store_true', default=argparse.SUPPRESS)
+    re_.add_argument('-n', type=int, default=10)
+
+    args = ap.parse_args()
+    try:
+        r = redis.Redis.from_url(args.redis_url, decode_responses=True, socket_timeout=5, socket_connect_timeout=2)
+        r.ping()
+    except Exception as e:
+        print(f"Redis not reachable: {e}", file=sys.stderr)
+        return 2
+
+    handlers = {'start': cmd_start, 'stop': cmd_stop, 'results': cmd_results}
+    return handlers[args.cmd](r, args)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    raise SystemExit(main())
@@ -1,96 +1,233 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+"""
+Live status of the Redis reasoning queue (`top`-style).
+
+Each refresh reads model lanes from the lane set kept by reasoning/affinity.py
+and discovers heartbeat keys with SCAN, then reads everything else in one
+pipelined round trip: queue depth per lane, age of the oldest queued job,
+running jobs, live workers (heartbeats plus registry entries), and
+completion/failure rates from the capped recent-jobs lists.
+
+Usage:
+  python3 scripts/reasoning_queue_status.py
+  python3 scripts/reasoning_queue_status.py --watch 2
+  python3 scripts/reasoning_queue_status.py --json
+  python3 scripts/reasoning_queue_status.py --watch 5 --json   # one JSON line per refresh
+
+Env:
+  - REDIS_URL (default redis://localhost:6379/0)
+"""
+
+import argparse
+import json
 import os
 import sys
+import time
 from datetime import datetime
 
 try:
-    import pymongo  # type: ignore
-except Exception as e:  # pragma: no cover
-    print("pymongo not installed. Run: make reasoning-setup", file=sys.stderr)
+    import redis  # type: ignore
+except Exception:  # pragma: no cover
+    print("redis not installed. Run: make reasoning-setup", file=sys.stderr)
     sys.exit(2)
 
-
-def mongo_db_name() -> str:
-    env = os.environ.get('SAVANT_ENV') or os.environ.get('RACK_ENV') or os.environ.get('RAILS_ENV') or 'development'
-    return 'savant_test' if env == 'test' else 'savant_development'
-
-
-def get_client():
-    uri = os.environ.get('MONGO_URI') or f"mongodb://{os.environ.get('MONGO_HOST', 'localhost:27017')}"
-    cli = pymongo.MongoClient(uri, serverSelectionTimeoutMS=1500, connectTimeoutMS=1500, socketTimeoutMS=2000)
-    cli.server_info()
-    return cli
-
-
-def fmt_ts(ts):
-    if isinstance(ts, datetime):
-        return ts.isoformat() + 'Z'
-    return str(ts)
-
-
-def main() -> int:
+# Keys shared with reasoning/worker.py, reasoning/affinity.py and the Ruby client.
+QUEUE_KEY = 'savant:queue:reasoning'
+LANE_PREFIX = 'savant:queue:reasoning:model:'
+LANES_KEY = 'savant:queue:reasoning:lanes'
+RUNNING_KEY = 'savant:jobs:running'
+COMPLETED_KEY = 'savant:jobs:completed'
+FAILED_KEY = 'savant:jobs:failed'
+HEARTBEAT_PREFIX = 'savant:workers:heartbeat:'
+REGISTRY_KEY = 'savant:workers:registry'
+RECENT_CAP = 100
+
+
+def _parse_created_at(value):
+    if not value:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
     try:
-        cli = get_client()
-    except Exception as e:
-        print(f"Mongo not reachable: {e}", file=sys.stderr)
-        return 2
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).timestamp()
+    except ValueError:
+        return None
 
-    dbname = mongo_db_name()
-    db = cli[dbname]
-    col = db['reasoning_queue']
 
+def _job_age(raw, now):
+    if not raw:
+        return None
     try:
-        total = col.estimated_document_count()
+        created = _parse_created_at(json.loads(raw).get('created_at'))
     except Exception:
-        total = None
+        return None
+    return max(0.0, now - created) if created else None
 
-    statuses = ['queued', 'processing', 'done', 'canceled']
-    by_status = {}
-    for s in statuses:
+
+def _recent(entries, now, window_s):
+    docs = []
+    for raw in entries or []:
+        try:
+            docs.append(json.loads(raw))
+        except Exception:
+            continue
+    in_window = [d for d in docs if now - float(d.get('ts') or 0) <= window_s]
+    # A full list whose oldest entry is still inside the window undercounts.
+    saturated = len(docs) >= RECENT_CAP and len(in_window) == len(docs)
+    return {
+        'count': len(in_window),
+        'per_min': round(len(in_window) * 60.0 / window_s, 1),
+        'saturated': saturated,
+        'last': docs[0] if docs else None,
+    }
+
+
+def snapshot(r, window_s=60.0):
+    lanes = sorted(r.smembers(LANES_KEY) or ())
+    heartbeats = sorted(r.scan_iter(match=f"{HEARTBEAT_PREFIX}*", count=500))
+    queues = [QUEUE_KEY] + lanes
+
+    pipe = r.pipeline(transaction=False)
+    for key in queues:
+        pipe.llen(key)
+        pipe.lindex(key, 0)
+    pipe.smembers(RUNNING_KEY)
+    pipe.lrange(COMPLETED_KEY, 0, RECENT_CAP - 1)
+    pipe.lrange(FAILED_KEY, 0, RECENT_CAP - 1)
+    pipe.hgetall(REGISTRY_KEY)
+    for key in heartbeats:
+        pipe.get(key)
+    res = pipe.execute()
+    now = time.time()
+
+    queue_rows = []
+    for i, key in enumerate(queues):
+        depth, head = res[2 * i], res[2 * i + 1]
+        queue_rows.append({
+            'queue': 'shared' if key == QUEUE_KEY else key[len(LANE_PREFIX):],
+            'key': key,
+            'depth': int(depth or 0),
+            'oldest_age_s': _job_age(head, now),
+        })
+    offset = 2 * len(queues)
+    running, completed, failed, registry = res[offset:offset + 4]
+    beats = res[offset + 4:]
+
+    workers = {}
+    for key, ts in zip(heartbeats, beats):
+        if ts is None:
+            continue
         try:
-            by_status[s] = col.count_documents({'status': s})
+            age = now - float(ts)
+        except (TypeError, ValueError):
+            age = None
+        workers[key[len(HEARTBEAT_PREFIX):]] = {'heartbeat_age_s': age}
+    for worker_id, doc in (registry or {}).items():
+        try:
+            info = json.loads(doc)
         except Exception:
-            by_status[s] = None
+            continue
+        if worker_id not in workers:
+            continue  # no live heartbeat: stale registry entry
+        workers[worker_id].update({
+            'models': info.get('models') or [],
+            'load': info.get('load'),
+            'concurrency': info.get('concurrency'),
+        })
+
+    ages = [q['oldest_age_s'] for q in queue_rows if q['oldest_age_s'] is not None]
+    return {
+        'ts': now,
+        'queued': sum(q['depth'] for q in queue_rows),
+        'oldest_age_s': max(ages) if ages else None,
+        'queues': queue_rows,
+        'running': sorted(running or []),
+        'workers': workers,
+        'completed': _recent(completed, now, window_s),
+        'failed': _recent(failed, now, window_s),
+        'window_s': window_s,
+    }
+
+
+def _fmt_age(age):
+    if age is None:
+        return '-'
+    if age < 120:
+        return f"{age:.1f}s"
+    if age < 7200:
+        return f"{age / 60:.1f}m"
+    return f"{age / 3600:.1f}h"
+
+
+def render(snap, redis_url):
+    stamp = datetime.fromtimestamp(snap['ts']).strftime('%H:%M:%S')
+    comp, fail = snap['completed'], snap['failed']
+    window = int(snap['window_s'])
+    lines = [
+        f"Reasoning Queue ({redis_url}) {stamp}",
+        f"queued {snap['queued']}  oldest {_fmt_age(snap['oldest_age_s'])}  "
+        f"running {len(snap['running'])}  workers {len(snap['workers'])}",
+        f"last {window}s: completed {comp['count']}{'+' if comp['saturated'] else ''} ({comp['per_min']}/min)  "
+        f"failed {fail['count']}{'+' if fail['saturated'] else ''} ({fail['per_min']}/min)",
+        "",
+        f"{'QUEUE':<40} {'DEPTH':>6} {'OLDEST':>8}",
+    ]
+    for q in snap['queues']:
+        lines.append(f"{q['queue']:<40} {q['depth']:>6} {_fmt_age(q['oldest_age_s']):>8}")
+    lines.append("")
+    lines.append(f"{'WORKER':<32} {'BEAT':>6} {'LOAD':>9}  MODELS")
+    for worker_id, w in sorted(snap['workers'].items()):
+        load = f"{w['load']}/{w['concurrency']}" if w.get('load') is not None else '-'
+        models = ', '.join(w.get('models') or []) or '-'
+        lines.append(f"{worker_id:<32} {_fmt_age(w['heartbeat_age_s']):>6} {load:>9}  {models}")
+    if snap['running']:
+        lines.append("")
+        shown = snap['running'][:10]
+        more = len(snap['running']) - len(shown)
+        lines.append("running: " + ', '.join(shown) + (f" (+{more} more)" if more > 0 else ''))
+    last_fail = fail.get('last')
+    if last_fail:
+        lines.append(f"last failure: {last_fail.get('job_id')} {_fmt_age(snap['ts'] - float(last_fail.get('ts') or 0))} ago: "
+                     f"{str(last_fail.get('error') or '')[:120]}")
+    return "\n".join(lines)
 
-    # Oldest queued item
-    try:
-        first = col.find({'status': 'queued'}, {'created_at': 1, 'correlation_id': 1}).sort('created_at', 1).limit(1).next()
-        oldest = {'correlation_id': first.get('correlation_id'), 'created_at': fmt_ts(first.get('created_at'))}
-    except Exception:
-        oldest = None
 
-    # Newest activity
-    newest = None
-    try:
-        d = col.find({}, {'updated_at': 1, 'created_at': 1}).sort([('updated_at', -1), ('created_at', -1)]).limit(1).next()
-        newest = fmt_ts(d.get('updated_at') or d.get('created_at'))
-    except Exception:
-        pass
-
-    print(f"Reasoning Queue Status (DB={dbname})")
-    print("- total:", total if total is not None else 'n/a')
-    for s in statuses:
-        v = by_status.get(s)
-        print(f"- {s}:", v if v is not None else 'n/a')
-    if oldest:
-        print(f"- oldest queued: {oldest['created_at']} (cid={oldest.get('correlation_id')})")
-    if newest:
-        print(f"- last activity: {newest}")
-
-    # Show 3 queued cids
+def main() -> int:
+    ap = argparse.ArgumentParser(description='Redis reasoning queue status')
+    ap.add_argument('--redis-url', default=os.environ.get('REDIS_URL', 'redis://localhost:6379/0'))
+    ap.add_argument('--watch', type=float, nargs='?', const=2.0, default=None, metavar='SECONDS',
+                    help='refresh continuously (default every 2s)')
+    ap.add_argument('--window', type=float, default=60.0, help='rate window in seconds (default 60)')
+    ap.add_argument('--json', action='store_true', help='print JSON (one line per refresh with --watch)')
+    args = ap.parse_args()
+
     try:
-        cur = col.find({'status': 'queued'}, {'correlation_id': 1}).limit(3)
-        cids = [doc.get('correlation_id') for doc in cur]
-        if cids:
-            print(f"- sample queued: {', '.join([str(c) for c in cids if c])}")
-    except Exception:
-        pass
+        r = redis.Redis.from_url(args.redis_url, decode_responses=True, socket_timeout=2, socket_connect_timeout=2)
+        r.ping()
+    except Exception as e:
+        print(f"Redis not reachable: {e}", file=sys.stderr)
+        return 2
 
-    return 0
+    try:
+        while True:
+            snap = snapshot(r, window_s=args.window)
+            if args.json:
+                print(json.dumps(snap, separators=(',', ':') if args.watch else None, indent=None if args.watch else 2), flush=True)
+            else:
+                if args.watch:
+                    sys.stdout.write("\033[H\033[J")
+                print(render(snap, args.redis_url), flush=True)
+            if not args.watch:
+                return 0
+            time.sleep(args.watch)
+    except KeyboardInterrupt:
+        return 0
+    except redis.RedisError as e:
+        print(f"Redis error: {e}", file=sys.stderr)
+        return 2
 
 
 if __name__ == '__main__':  # pragma: no cover
     raise SystemExit(main())
-
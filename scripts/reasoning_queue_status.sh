@@ -13,5 +13,5 @@ fi
 source "$VENV/bin/activate"
 python3 -m pip install -r reasoning/requirements.txt >/dev/null 2>&1 || true
 
-exec python3 scripts/reasoning_queue_status.py
+exec python3 scripts/reasoning_queue_status.py "$@"
 
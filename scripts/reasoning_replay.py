@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Replay recorded reasoning jobs offline (see reasoning/replay.py).
+
+Record on a worker with REASONING_RECORD_DIR=logs/replay, then:
+
+Usage:
+  python3 scripts/reasoning_replay.py logs/replay                      # every session file in the dir
+  python3 scripts/reasoning_replay.py a.jsonl.gz b.jsonl.gz --limit 500
+  python3 scripts/reasoning_replay.py logs/replay --latency 1.0        # sleep the recorded LLM latency
+  python3 scripts/reasoning_replay.py logs/replay --save before.json   # keep the report
+  python3 scripts/reasoning_replay.py logs/replay --baseline before.json
+  add --json for the full report, --show-drift N to print drifted jobs
+
+The LLM is answered from the recording, so no provider is needed. Drift
+means the replayed decision (tool, args, finish, final text or trace
+stages) differs from what production returned. CPU is per-thread time
+spent in `_compute_intent_sync`.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT_DIR)
+
+try:
+    from reasoning import replay
+except Exception as e:  # pragma: no cover
+    print(f"reasoning deps not installed ({e}). Run: make reasoning-setup", file=sys.stderr)
+    sys.exit(2)
+
+
+def _delta(now, before):
+    if not before:
+        return ''
+    return f" ({(now - before) / before * 100:+.1f}%)"
+
+
+def print_summary(summary, baseline=None):
+    base = (baseline or {}).get('summary') or {}
+    cpu, bcpu = summary['cpu_ms'], base.get('cpu_ms') or {}
+    print(f"jobs      {summary['jobs']} replayed, {summary['skipped']} skipped, {summary['errors']} errors")
+    print(f"llm calls {summary['llm_calls']} replayed / {summary['recorded_llm_calls']} recorded, "
+          f"{summary['extra_llm_calls']} beyond the recording, {summary['prompt_changed_jobs']} jobs with changed prompts")
+    for key in ('p50', 'p95', 'max', 'total'):
+        print(f"cpu {key:<5} {cpu[key]:10.3f} ms{_delta(cpu[key], bcpu.get(key))}")
+    print(f"wall p50  {summary['wall_ms']['p50']:10.3f} ms   p95 {summary['wall_ms']['p95']:.3f} ms")
+    fields = ', '.join(f"{k}={v}" for k, v in sorted(summary['drift_fields'].items())) or 'none'
+    print(f"drift     {summary['drifted']} jobs ({fields})")
+    if base:
+        print(f"baseline  {base.get('jobs')} jobs, {base.get('drifted')} drifted")
+
+
+def print_drift(jobs, n):
+    for job in [j for j in jobs if j.get('drift')][:n]:
+        print(f"\n{job['job_id']}: {', '.join(job['drift'])}" + (f" error={job['error']}" if job.get('error') else ''))
+        print(f"  recorded: {json.dumps(job.get('recorded'))[:400]}")
+        print(f"  replayed: {json.dumps(job.get('replayed'))[:400]}")
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description='Replay recorded reasoning jobs with a stubbed LLM')
+    ap.add_argument('paths', nargs='+', help='session files or directories of them')
+    ap.add_argument('--limit', type=int, default=0, help='replay at most this many jobs')
+    ap.add_argument('--latency', type=float, default=0.0, help='sleep recorded LLM latency x this factor')
+    ap.add_argument('--save', help='write the full report (JSON) here')
+    ap.add_argument('--baseline', help='earlier --save report to compare CPU against')
+    ap.add_argument('--show-drift', type=int, default=0, metavar='N')
+    ap.add_argument('--json', action='store_true')
+    args = ap.parse_args()
+
+    missing = [p for p in args.paths if not os.path.exists(p)]
+    if missing:
+        print(f"not found: {', '.join(missing)}", file=sys.stderr)
+        return 2
+
+    # Worker log lines go to stdout; keep them apart from the report.
+    with contextlib.redirect_stdout(sys.stderr):
+        report = replay.replay(replay.load(args.paths), latency_scale=args.latency, limit=args.limit)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(report, f)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_summary(report['summary'], baseline)
+        print_drift(report['jobs'], args.show_drift)
+    return 0
+
+
+if __name__ == '__main__':  # pragma: no cover
+    raise SystemExit(main())
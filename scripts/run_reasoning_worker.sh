@@ -20,4 +20,31 @@ export REASONING_QUEUE_WORKER=${REASONING_QUEUE_WORKER:-1}
 export REASONING_QUEUE_WORKERS=${REASONING_QUEUE_WORKERS:-4}
 export REASONING_QUEUE_POLL_MS=${REASONING_QUEUE_POLL_MS:-50}
 
-exec python3 -m reasoning.worker
+# REASONING_WORKER_MODE=async runs the asyncio worker (many in-flight jobs per process)
+MODULE="reasoning.worker"
+if [ "${REASONING_WORKER_MODE:-sync}" = "async" ]; then
+  MODULE="reasoning.async_worker"
+fi
+
+# Exit code 75 means the worker recycled itself (REASONING_RECYCLE_* limits): start a fresh one.
+# Anything else ends the script with that code.
+child=""
+trap 'if [ -n "$child" ]; then kill -TERM "$child" 2>/dev/null || true; fi' TERM INT
+while true; do
+  python3 -m "$MODULE" &
+  child=$!
+  set +e
+  wait "$child"
+  code=$?
+  # a trapped signal interrupts wait; wait again for the worker to drain and exit
+  while kill -0 "$child" 2>/dev/null; do
+    wait "$child"
+    code=$?
+  done
+  set -e
+  child=""
+  if [ "$code" -ne 75 ]; then
+    exit "$code"
+  fi
+  echo "reasoning worker recycled; starting a new one" >&2
+done
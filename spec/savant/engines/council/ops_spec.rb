@@ -604,5 +604,26 @@ RSpec.describe Savant::Council::Ops do
         expect(result).to eq({ already: 'hash' })
       end
     end
+
+    describe '#split_shared_fields' do
+      it 'sends fields common to every agent once and keeps the rest per item' do
+        persona = { name: 'savant-engineer', prompt_md: 'long persona' }
+        payloads = [
+          { session_id: 'council-1', persona: persona, goal_text: 'g', agent_name: 'a1', correlation_id: 'c1' },
+          { session_id: 'council-1', persona: persona, goal_text: 'g', agent_name: 'a2', correlation_id: 'c2' }
+        ]
+        shared, items = ops.send(:split_shared_fields, payloads)
+        expect(shared).to eq({ session_id: 'council-1', persona: persona, goal_text: 'g' })
+        expect(items).to eq([{ agent_name: 'a1', correlation_id: 'c1' }, { agent_name: 'a2', correlation_id: 'c2' }])
+        expect(items.map { |i| shared.merge(i) }).to eq(payloads)
+      end
+
+      it 'keeps a field per item when any agent differs' do
+        payloads = [{ persona: { name: 'p1' }, llm: { model: 'm' } }, { persona: { name: 'p2' }, llm: { model: 'm' } }]
+        shared, items = ops.send(:split_shared_fields, payloads)
+        expect(shared).to eq({ llm: { model: 'm' } })
+        expect(items).to eq([{ persona: { name: 'p1' } }, { persona: { name: 'p2' } }])
+      end
+    end
   end
 end